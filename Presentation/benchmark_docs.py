@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк инструментов документации на локальной заглушке mermaid.ink
+
+Запускает convert_mmd_to_svg.py, convert_mmd_to_docx.py и create_presentation.py
+на реальных .mmd файлах репозитория (во временной папке), подменяя mermaid.ink
+локальным HTTP-сервером с настраиваемой задержкой и долей ошибок.
+Для каждого инструмента измеряются время, количество запросов рендеринга и
+пиковая память процесса. Результаты дописываются в историю (JSON Lines) и
+сравниваются с прошлым запуском.
+
+Использование:
+    python Presentation/benchmark_docs.py [--rounds 3] [--latency-ms 50] [--failure-rate 0.1]
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import base64
+import random
+import shutil
+import struct
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PRESENTATION_DIR = Path(__file__).resolve().parent
+# История результатов (по одной строке JSON на запуск)
+HISTORY_FILE = PRESENTATION_DIR / '.benchmarks' / 'history.jsonl'
+
+TOOLS = ('svg', 'docx', 'deck')
+DEFAULT_ROUNDS = 3
+DEFAULT_LATENCY_MS = 50
+
+
+def make_png(width, height, color=(255, 255, 255)):
+    """Создать однотонный PNG заданного размера (без сторонних библиотек)"""
+    def chunk(kind, data):
+        payload = kind + data
+        return struct.pack('>I', len(data)) + payload + struct.pack('>I', zlib.crc32(payload) & 0xffffffff)
+
+    row = b'\x00' + bytes(color) * width
+    return (
+        b'\x89PNG\r\n\x1a\n' +
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+        chunk(b'IDAT', zlib.compress(row * height, 6)) +
+        chunk(b'IEND', b'')
+    )
+
+
+def decode_diagram(encoded):
+    """Декодировать код диаграммы из URL в формате mermaid.ink (base64 URL-safe без '=')"""
+    padded = encoded + '=' * (-len(encoded) % 4)
+    return base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8', errors='replace')
+
+
+class MermaidStubServer:
+    """
+    Локальная заглушка mermaid.ink: /svg/<код> и /img/<код>
+
+    Размер ответа зависит от длины кода диаграммы, задержка и доля ответов
+    HTTP 503 настраиваются. Считает запросы по эндпоинтам.
+    """
+
+    def __init__(self, latency_ms=DEFAULT_LATENCY_MS, jitter_ms=0, failure_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts = {}
+
+    def _count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _delay_and_fail(self):
+        """Выдержать задержку; вернуть True, если запрос нужно завершить ошибкой"""
+        with self.lock:
+            delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+            fail = self.random.random() < self.failure_rate
+        time.sleep(delay / 1000)
+        return fail
+
+    def render_svg(self, code):
+        lines = max(1, code.count('\n') + 1)
+        width, height = 800, 40 + 20 * lines
+        texts = ''.join(
+            f'<text x="10" y="{30 + 20 * i}">{i}</text>' for i in range(lines)
+        )
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}"><rect width="{width}" height="{height}" fill="#fff"/>'
+            f'{texts}</svg>'
+        )
+
+    def render_png(self, code):
+        lines = max(1, code.count('\n') + 1)
+        return make_png(1600, min(4000, 80 + 40 * lines))
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = self.path.strip('/').split('/', 1)
+                endpoint = parts[0]
+                if endpoint not in ('svg', 'img') or len(parts) != 2:
+                    stub._count('other')
+                    self.send_error(404)
+                    return
+                stub._count(endpoint)
+                if stub._delay_and_fail():
+                    stub._count(f'{endpoint}_failed')
+                    self.send_error(503)
+                    return
+                try:
+                    code = decode_diagram(parts[1].split('?', 1)[0])
+                except ValueError:
+                    self.send_error(400)
+                    return
+                if endpoint == 'svg':
+                    body = stub.render_svg(code).encode('utf-8')
+                    content_type = 'image/svg+xml'
+                else:
+                    body = stub.render_png(code)
+                    content_type = 'image/png'
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_tool(command, env, cwd):
+    """
+    Запустить инструмент в отдельном процессе
+
+    Returns:
+        (код возврата, время в секундах, пиковая память в МБ или None)
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=cwd, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    peak_mb = None
+    if hasattr(os, 'wait4'):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss: килобайты в Linux, байты в macOS
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        peak_mb = usage.ru_maxrss / divisor
+    else:
+        process.wait()
+    return process.returncode, time.perf_counter() - started, peak_mb
+
+
+def prepare_workdir(workdir):
+    """Скопировать входные данные инструментов во временную папку"""
+    workdir = Path(workdir)
+    for name in ('Sequence_Diagrams.mmd', 'Архитектура.mmd', 'slides.json'):
+        shutil.copy2(PRESENTATION_DIR / name, workdir / name)
+    shutil.copytree(PRESENTATION_DIR / 'Sequence_Diagrams', workdir / 'Sequence_Diagrams')
+    template = PRESENTATION_DIR / 'StockMarketAssistant_Presentation_template.pptx'
+    if template.exists():
+        shutil.copy2(template, workdir / template.name)
+
+
+def tool_commands(tool, workdir):
+    """Команды запуска инструмента (на каждом раунде - холодный старт без кэшей)"""
+    python = sys.executable
+    if tool == 'svg':
+        return [[python, str(PRESENTATION_DIR / 'convert_mmd_to_svg.py'), str(workdir / 'Sequence_Diagrams.mmd')]]
+    if tool == 'docx':
+        return [[python, str(PRESENTATION_DIR / 'convert_mmd_to_docx.py'), str(workdir / mmd)]
+                for mmd in ('Sequence_Diagrams.mmd', 'Архитектура.mmd')]
+    if tool == 'deck':
+        return [[python, str(PRESENTATION_DIR / 'create_presentation.py'), '--spec', str(workdir / 'slides.json')]]
+    raise ValueError(f"Неизвестный инструмент: {tool}")
+
+
+def reset_caches(workdir):
+    """Удалить кэши и результаты прошлых раундов"""
+    workdir = Path(workdir)
+    shutil.rmtree(workdir / '.deck_cache', ignore_errors=True)
+    for png in (workdir / 'Sequence_Diagrams').glob('diagram_*_*x*.png'):
+        png.unlink()
+    cache = workdir / 'Sequence_Diagrams' / '.raster_cache.json'
+    if cache.exists():
+        cache.unlink()
+
+
+def benchmark(tools=TOOLS, rounds=DEFAULT_ROUNDS, latency_ms=DEFAULT_LATENCY_MS,
+              jitter_ms=0, failure_rate=0.0, seed=None):
+    """
+    Прогнать инструменты на заглушке
+
+    Returns:
+        Словарь {инструмент: {'rounds': [...], 'median_s', 'render_calls', 'peak_mb', 'failures'}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='sma-bench-') as tmp, \
+            MermaidStubServer(latency_ms, jitter_ms, failure_rate, seed) as stub:
+        workdir = Path(tmp)
+        prepare_workdir(workdir)
+        env = dict(os.environ, MERMAID_INK_URL=stub.url, PYTHONIOENCODING='utf-8')
+
+        for tool in tools:
+            rounds_data = []
+            for _ in range(rounds):
+                reset_caches(workdir)
+                stub.reset_counts()
+                elapsed_total = 0.0
+                peak = None
+                exit_codes = []
+                for command in tool_commands(tool, workdir):
+                    code, elapsed, peak_mb = run_tool(command, env, workdir)
+                    exit_codes.append(code)
+                    elapsed_total += elapsed
+                    if peak_mb is not None:
+                        peak = max(peak or 0, peak_mb)
+                rounds_data.append({
+                    'seconds': elapsed_total,
+                    'peak_mb': peak,
+                    'requests': dict(stub.counts),
+                    'exit_codes': exit_codes,
+                })
+
+            times = sorted(r['seconds'] for r in rounds_data)
+            peaks = [r['peak_mb'] for r in rounds_data if r['peak_mb'] is not None]
+            results[tool] = {
+                'rounds': rounds_data,
+                'median_s': times[len(times) // 2],
+                'min_s': times[0],
+                'render_calls': max(
+                    r['requests'].get('svg', 0) + r['requests'].get('img', 0) for r in rounds_data
+                ),
+                'peak_mb': max(peaks) if peaks else None,
+                'failures': sum(1 for r in rounds_data if any(r['exit_codes'])),
+            }
+    return results
+
+
+def current_commit():
+    """Текущий git-коммит (для истории), если доступен"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PRESENTATION_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_last_entry(history_file, params):
+    """Последняя запись истории с теми же параметрами запуска"""
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    except (IOError, ValueError):
+        return None
+    for entry in reversed(entries):
+        if entry.get('params') == params:
+            return entry
+    return None
+
+
+def print_report(results, previous=None):
+    """Вывести таблицу результатов и изменение медианы относительно прошлого запуска"""
+    print()
+    print(f"{'Инструмент':<10} {'медиана, с':>11} {'мин, с':>8} {'запросов':>9} {'память, МБ':>11} {'ошибок':>7}  изменение")
+    for tool, result in results.items():
+        change = ''
+        if previous and tool in previous.get('results', {}):
+            before = previous['results'][tool]['median_s']
+            if before:
+                change = f"{(result['median_s'] - before) * 100 / before:+.1f}%"
+        peak = f"{result['peak_mb']:.1f}" if result['peak_mb'] is not None else '-'
+        print(f"{tool:<10} {result['median_s']:>11.2f} {result['min_s']:>8.2f} "
+              f"{result['render_calls']:>9} {peak:>11} {result['failures']:>7}  {change}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк инструментов документации на локальной заглушке mermaid.ink'
+    )
+    parser.add_argument('--tools', default=','.join(TOOLS),
+                        help=f"Инструменты через запятую (по умолчанию: {','.join(TOOLS)})")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help=f'Количество раундов (по умолчанию: {DEFAULT_ROUNDS})')
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_LATENCY_MS,
+                        help=f'Задержка ответа заглушки в мс (по умолчанию: {DEFAULT_LATENCY_MS})')
+    parser.add_argument('--jitter-ms', type=float, default=0,
+                        help='Случайная добавка к задержке в мс (по умолчанию: 0)')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Доля ответов HTTP 503 (по умолчанию: 0)')
+    parser.add_argument('--seed', type=int, help='Seed для задержек и ошибок заглушки')
+    parser.add_argument('--history', default=str(HISTORY_FILE),
+                        help='Файл истории результатов (JSON Lines)')
+    parser.add_argument('--no-history', action='store_true',
+                        help='Не записывать результат в историю')
+    args = parser.parse_args(argv)
+
+    tools = [tool.strip() for tool in args.tools.split(',') if tool.strip()]
+    unknown = set(tools) - set(TOOLS)
+    if unknown:
+        parser.error(f"неизвестные инструменты: {', '.join(sorted(unknown))}")
+
+    print("=" * 60)
+    print("Бенчмарк инструментов документации")
+    print("=" * 60)
+    print(f"Раундов: {args.rounds}, задержка: {args.latency_ms} мс (+{args.jitter_ms}), "
+          f"ошибок: {args.failure_rate:.0%}")
+
+    params = {
+        'rounds': args.rounds, 'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms, 'failure_rate': args.failure_rate,
+    }
+    results = benchmark(tools, args.rounds, args.latency_ms, args.jitter_ms, args.failure_rate, args.seed)
+    previous = None if args.no_history else load_last_entry(args.history, params)
+    print_report(results, previous)
+
+    if not args.no_history:
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': current_commit(),
+            'params': params,
+            'results': {
+                tool: {key: value for key, value in result.items() if key != 'rounds'}
+                for tool, result in results.items()
+            },
+        }
+        history = Path(args.history)
+        history.parent.mkdir(parents=True, exist_ok=True)
+        with open(history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        print(f"\nРезультат добавлен в историю: {history}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сборка документации по графу зависимостей: mmd -> svg -> png -> pptx/docx
+
+Каждый узел графа - один шаг: рендеринг диаграммы, растеризация, DOCX или
+презентация. Узел пересобирается, только если изменился хеш его входов
+(собственных файлов и кода, а также содержимого результатов узлов, от которых
+он зависит). Независимые узлы выполняются параллельно. В конце печатается
+отчет по времени с критическим путем.
+
+Использование:
+    python Presentation/build_docs.py [--jobs 4] [--dpi 150] [--force] [--timings] [--profile FILE]
+"""
+
+import sys
+import json
+import time
+import hashlib
+from io import BytesIO
+from pathlib import Path
+
+PRESENTATION_DIR = Path(__file__).resolve().parent
+
+# Общие опции --timings/--profile (scripts/tool_profiling.py): этапы инструментов,
+# вызванных узлами графа, суммируются по всем потокам
+SCRIPTS_DIR = PRESENTATION_DIR.parent / 'scripts'
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.append(str(SCRIPTS_DIR))
+from tool_profiling import add_profiling_arguments, run_profiled
+# Кэш сборки: состояние графа и PNG для DOCX
+BUILD_CACHE_DIR = PRESENTATION_DIR / '.build_cache'
+BUILD_STATE_FILE = 'state.json'
+
+# Исходные MMD файлы: для каждого собираются SVG (папка с именем файла) и DOCX
+MMD_FILES = ['Sequence_Diagrams.mmd', 'Архитектура.mmd']
+# Ширина страницы DOCX, под которую растеризуются диаграммы (в дюймах)
+DOCX_WIDTH_INCHES = 6.5
+# Количество параллельно выполняемых узлов
+DEFAULT_JOBS = 4
+
+
+class BuildNode:
+    """Узел графа сборки"""
+
+    def __init__(self, name, action, deps=(), inputs=(), outputs=()):
+        """
+        Args:
+            name: уникальное имя узла
+            action: функция без аргументов, выполняющая шаг
+            deps: имена узлов, от которых зависит этот узел
+            inputs: строки или пути к файлам, входящие в хеш узла
+            outputs: пути к файлам, которые создает узел
+        """
+        self.name = name
+        self.action = action
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = [Path(output) for output in outputs]
+
+
+def hash_file(path):
+    """SHA-256 содержимого файла (или метка отсутствия файла)"""
+    path = Path(path)
+    if not path.exists():
+        return 'missing'
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def input_hash(node, dep_hashes):
+    """Хеш входов узла: его собственные входы + хеши результатов зависимостей"""
+    digest = hashlib.sha256(node.name.encode('utf-8'))
+    for item in node.inputs:
+        value = hash_file(item) if isinstance(item, Path) else str(item)
+        digest.update(value.encode('utf-8'))
+    for dep in node.deps:
+        digest.update(dep_hashes[dep].encode('utf-8'))
+    return digest.hexdigest()
+
+
+def output_hash(node, key):
+    """
+    Хеш результатов узла по содержимому выходных файлов
+
+    Если узел пересобран, но результат не изменился, зависимые узлы
+    не пересобираются. Для узлов без выходных файлов используется хеш входов.
+    """
+    if not node.outputs:
+        return key
+    digest = hashlib.sha256()
+    for output in node.outputs:
+        digest.update(hash_file(output).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def topological_order(nodes):
+    """
+    Упорядочить узлы так, чтобы зависимости шли раньше зависимых
+
+    Raises:
+        ValueError: при неизвестной зависимости или цикле
+    """
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Цикл в графе сборки: {' -> '.join(path + [name])}")
+        if name not in nodes:
+            raise ValueError(f"Неизвестная зависимость: {name} (требуется для {path[-1]})")
+        state[name] = 'visiting'
+        for dep in nodes[name].deps:
+            visit(dep, path + [name])
+        state[name] = 'done'
+        order.append(name)
+
+    for name in nodes:
+        visit(name, [])
+    return order
+
+
+def load_build_state(cache_dir=BUILD_CACHE_DIR):
+    """Загрузить хеши входов узлов из прошлой сборки"""
+    try:
+        with open(Path(cache_dir) / BUILD_STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_build_state(state, cache_dir=BUILD_CACHE_DIR):
+    """Сохранить хеши входов узлов"""
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    with open(Path(cache_dir) / BUILD_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True, ensure_ascii=False)
+
+
+def run_node(node, key, previous_key, force=False):
+    """
+    Выполнить узел, если его входы изменились или нет результатов
+
+    Returns:
+        Словарь с результатом: status (built/cached/failed), start, duration, error
+    """
+    start = time.perf_counter()
+    outputs_exist = all(output.exists() for output in node.outputs)
+    if not force and key == previous_key and outputs_exist:
+        return {'status': 'cached', 'start': start, 'duration': 0.0}
+
+    try:
+        for output in node.outputs:
+            output.parent.mkdir(parents=True, exist_ok=True)
+        result = node.action()
+        missing = [str(output) for output in node.outputs if not output.exists()]
+        if result is False or missing:
+            error = f"не созданы файлы: {', '.join(missing)}" if missing else "шаг завершился неудачей"
+            status = {'status': 'failed', 'error': error}
+        else:
+            status = {'status': 'built'}
+    except Exception as e:
+        status = {'status': 'failed', 'error': str(e)}
+
+    status['start'] = start
+    status['duration'] = time.perf_counter() - start
+    return status
+
+
+def run_graph(nodes, jobs=DEFAULT_JOBS, force=False, cache_dir=BUILD_CACHE_DIR):
+    """
+    Выполнить граф: независимые узлы параллельно, неизменившиеся - из кэша
+
+    Узлы, зависимости которых завершились с ошибкой, не выполняются (blocked).
+
+    Returns:
+        Словарь {имя узла: результат run_node}
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    nodes = {node.name: node for node in nodes}
+    order = topological_order(nodes)
+    previous_state = load_build_state(cache_dir)
+    state = {}
+    dep_hashes = {}
+    results = {}
+    waiting = {name: set(nodes[name].deps) for name in order}
+    dependents = {name: [] for name in order}
+    for name in order:
+        for dep in nodes[name].deps:
+            dependents[dep].append(name)
+
+    def finish(name, result):
+        results[name] = result
+        for dependent in dependents[name]:
+            waiting[dependent].discard(name)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        submitted = set()
+
+        def submit_ready():
+            for name in order:
+                if name in results or name in submitted:
+                    continue
+                if any(results.get(dep, {}).get('status') in ('failed', 'blocked') for dep in nodes[name].deps):
+                    finish(name, {'status': 'blocked', 'start': time.perf_counter(), 'duration': 0.0})
+                    print(f"  ⊘ {name} (пропущен: ошибка в зависимостях)")
+                    continue
+                if not waiting[name]:
+                    key = input_hash(nodes[name], dep_hashes)
+                    future = executor.submit(run_node, nodes[name], key, previous_state.get(name), force)
+                    futures[future] = (name, key)
+                    submitted.add(name)
+
+        submit_ready()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key = futures.pop(future)
+                result = future.result()
+                if result['status'] in ('built', 'cached'):
+                    state[name] = key
+                    dep_hashes[name] = output_hash(nodes[name], key)
+                finish(name, result)
+                symbol = {'built': '✓', 'cached': '·', 'failed': '✗'}[result['status']]
+                suffix = f" ({result['duration']:.2f} с)" if result['status'] != 'cached' else ' (без изменений)'
+                print(f"  {symbol} {name}{suffix}")
+                if result['status'] == 'failed':
+                    print(f"      {result['error']}")
+            submit_ready()
+
+    save_build_state(state, cache_dir)
+    return results
+
+
+def critical_path(nodes, results):
+    """
+    Найти критический путь - самую длинную по времени цепочку зависимостей
+
+    Returns:
+        (список имен узлов пути, суммарная длительность в секундах)
+    """
+    nodes = {node.name: node for node in nodes}
+    finish = {}
+    previous = {}
+    for name in topological_order(nodes):
+        best_dep = max(nodes[name].deps, key=lambda dep: finish[dep], default=None)
+        start = finish[best_dep] if best_dep else 0.0
+        finish[name] = start + results.get(name, {}).get('duration', 0.0)
+        previous[name] = best_dep
+
+    if not finish:
+        return [], 0.0
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name:
+        path.append(name)
+        name = previous[name]
+    return list(reversed(path)), total
+
+
+def print_timing_report(nodes, results, wall_time):
+    """Вывести отчет: статусы узлов, самые долгие шаги и критический путь"""
+    counts = {}
+    for result in results.values():
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    busy_time = sum(result['duration'] for result in results.values())
+
+    print()
+    print("=" * 60)
+    print("Отчет по времени сборки")
+    print("=" * 60)
+    print(f"Узлов: {len(results)} (" + ", ".join(f"{status}: {count}" for status, count in sorted(counts.items())) + ")")
+    print(f"Общее время: {wall_time:.2f} с, суммарное время шагов: {busy_time:.2f} с")
+    if wall_time > 0:
+        print(f"Параллелизм: x{busy_time / wall_time:.1f}")
+
+    slowest = sorted(
+        (item for item in results.items() if item[1]['duration'] > 0),
+        key=lambda item: item[1]['duration'], reverse=True
+    )[:10]
+    if slowest:
+        print()
+        print("Самые долгие шаги:")
+        for name, result in slowest:
+            print(f"  {result['duration']:8.2f} с  {name}")
+
+    path, total = critical_path(nodes, results)
+    if total > 0:
+        print()
+        print(f"Критический путь ({total:.2f} с):")
+        for name in path:
+            print(f"  {results.get(name, {}).get('duration', 0.0):8.2f} с  {name}")
+    print("=" * 60)
+
+
+def build_pipeline(dpi=None, presentation_dir=PRESENTATION_DIR, cache_dir=BUILD_CACHE_DIR):
+    """
+    Построить граф сборки документации
+
+    - render:<mmd>/NNN - рендеринг блока Mermaid в SVG (mermaid.ink)
+    - png:docx/<mmd>/NNN - растеризация SVG под ширину страницы DOCX
+    - docx:<mmd> - DOCX с уже растеризованными диаграммами
+    - png:deck/<svg>@WxH - растеризация SVG под место на слайде
+    - deck - презентация из slides.json
+    """
+    import convert_mmd_to_svg
+    import convert_mmd_to_docx
+    import create_presentation
+
+    dpi = dpi or create_presentation.DEFAULT_DPI
+    presentation_dir = Path(presentation_dir)
+    nodes = []
+    svg_producers = {}
+
+    def render_action(code, svg_path):
+        def action():
+            svg_content = convert_mmd_to_svg.render_mermaid_to_svg(code)
+            if not svg_content:
+                return False
+            with open(svg_path, 'w', encoding='utf-8') as f:
+                f.write(svg_content)
+        return action
+
+    def raster_action(svg_path, png_path, width, height, palette_colors=None, compress_level=None):
+        def action():
+            return create_presentation.svg_to_png(
+                str(svg_path), str(png_path), width, height, palette_colors, compress_level
+            ) is not None
+        return action
+
+    def docx_action(mmd_path, docx_path, pngs_by_code):
+        def action():
+            def render_image(code):
+                png_path = pngs_by_code.get(code)
+                if png_path and png_path.exists():
+                    return BytesIO(png_path.read_bytes())
+                return None
+            convert_mmd_to_docx.parse_markdown_to_docx(str(mmd_path), str(docx_path), render_image, dpi)
+        return action
+
+    # MMD -> SVG -> PNG -> DOCX
+    for mmd_name in MMD_FILES:
+        mmd_path = presentation_dir / mmd_name
+        if not mmd_path.exists():
+            print(f"Warning: MMD file not found: {mmd_path}")
+            continue
+        stem = mmd_path.stem
+        svg_dir = presentation_dir / stem
+        docx_png_dir = Path(cache_dir) / 'docx' / stem
+        docx_width = round(DOCX_WIDTH_INCHES * dpi)
+        pngs_by_code = {}
+        raster_nodes = []
+
+        for diagram_num, code in convert_mmd_to_svg.extract_mermaid_diagrams(str(mmd_path)):
+            svg_path = svg_dir / f"diagram_{diagram_num:03d}.svg"
+            render_name = f"render:{stem}/{diagram_num:03d}"
+            nodes.append(BuildNode(
+                render_name, render_action(code, svg_path),
+                inputs=[code], outputs=[svg_path]
+            ))
+            svg_producers[svg_path] = render_name
+
+            png_path = docx_png_dir / f"diagram_{diagram_num:03d}.png"
+            raster_name = f"png:docx/{stem}/{diagram_num:03d}"
+            nodes.append(BuildNode(
+                raster_name, raster_action(svg_path, png_path, docx_width, None),
+                deps=[render_name], inputs=[f"width={docx_width}"], outputs=[png_path]
+            ))
+            pngs_by_code[code] = png_path
+            raster_nodes.append(raster_name)
+
+        docx_path = presentation_dir / f"{stem}.docx"
+        nodes.append(BuildNode(
+            f"docx:{stem}", docx_action(mmd_path, docx_path, pngs_by_code),
+            deps=raster_nodes, inputs=[mmd_path], outputs=[docx_path]
+        ))
+
+    # SVG -> PNG (под размер места на слайде) -> PPTX
+    spec_path = create_presentation.SLIDES_SPEC_PATH
+    spec = create_presentation.load_slide_spec(spec_path)
+    diagrams_path = spec_path.parent / spec['diagrams']
+    deck_rasters = []
+    for slide_spec in spec['slides']:
+        for diagram in create_presentation.slide_diagrams(slide_spec):
+            diagram_file, width_inches, height_inches = diagram
+            width_px, height_px = create_presentation.target_pixel_size(width_inches, height_inches, dpi)
+            raster_name = f"png:deck/{diagram_file}@{width_px}x{height_px}"
+            if raster_name in deck_rasters:
+                continue
+            svg_path = diagrams_path / diagram_file
+            png_path = diagrams_path / create_presentation.raster_png_name(diagram_file, width_px, height_px)
+            render_name = svg_producers.get(svg_path)
+            nodes.append(BuildNode(
+                raster_name,
+                raster_action(svg_path, png_path, width_px, height_px,
+                              create_presentation.PNG_PALETTE_COLORS,
+                              create_presentation.PNG_COMPRESS_LEVEL),
+                deps=[render_name] if render_name else [],
+                inputs=[f"settings={create_presentation.PNG_PALETTE_COLORS}/{create_presentation.PNG_COMPRESS_LEVEL}"]
+                + ([] if render_name else [svg_path]),
+                outputs=[png_path]
+            ))
+            deck_rasters.append(raster_name)
+
+    nodes.append(BuildNode(
+        'deck', lambda: create_presentation.create_presentation(dpi=dpi, spec_path=spec_path),
+        deps=deck_rasters,
+        inputs=[spec_path, spec_path.parent / spec['template'], f"dpi={dpi}"],
+        outputs=[spec_path.parent / spec['output']]
+    ))
+
+    return nodes
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Сборка документации (mmd -> svg -> png -> pptx/docx) по графу зависимостей'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=DEFAULT_JOBS,
+        help=f'Количество параллельно выполняемых узлов (по умолчанию: {DEFAULT_JOBS})'
+    )
+    parser.add_argument(
+        '--dpi',
+        type=int,
+        help='Разрешение растеризации диаграмм (по умолчанию: как в create_presentation.py)'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Пересобрать все узлы, игнорируя кэш'
+    )
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("Сборка документации по графу зависимостей")
+    print("=" * 60)
+
+    nodes = build_pipeline(args.dpi)
+    print(f"Узлов в графе: {len(nodes)}")
+    print()
+
+    started = time.perf_counter()
+    results = run_profiled(args, run_graph, nodes, jobs=args.jobs, force=args.force)
+    print_timing_report(nodes, results, time.perf_counter() - started)
+
+    failed = [name for name, result in results.items() if result['status'] in ('failed', 'blocked')]
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
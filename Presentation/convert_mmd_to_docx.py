@@ -7,15 +7,29 @@
 
 import re
 import os
+import sys
 import base64
-import requests
+import hashlib
 from io import BytesIO
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import parse_xml
-from docx.oxml.ns import nsdecls, qn
-from PIL import Image
+from pathlib import Path
+
+# Общие опции --timings/--profile и разметка этапов (scripts/tool_profiling.py)
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.append(str(SCRIPTS_DIR))
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+
+# docx, requests и PIL импортируются внутри функций, которые их используют,
+# чтобы запуск скрипта (и sma-tools) не тратил время на загрузку тяжелых модулей
+
+# Адрес API рендеринга (можно переопределить, например, локальной заглушкой)
+MERMAID_INK_URL = os.environ.get('MERMAID_INK_URL', 'https://mermaid.ink').rstrip('/')
+# Ширина диаграммы на странице (в дюймах) и разрешение, под которое
+# изображение уменьшается перед вставкой в документ
+PAGE_IMAGE_WIDTH_INCHES = 6.5
+DOCX_IMAGE_DPI = 150
+# Количество цветов палитры при пережатии PNG
+PNG_PALETTE_COLORS = 256
 
 def add_heading(doc, text, level):
     """Добавить заголовок"""
@@ -28,10 +42,12 @@ def render_mermaid_to_image(mermaid_code):
     Альтернативно можно использовать локальный mermaid-cli или playwright
     """
     try:
+        import requests
+
         # Используем mermaid.ink API для рендеринга
         # Кодируем диаграмму в base64 URL-safe
         encoded = base64.urlsafe_b64encode(mermaid_code.encode('utf-8')).decode('utf-8').rstrip('=')
-        url = f"https://mermaid.ink/img/{encoded}"
+        url = f"{MERMAID_INK_URL}/img/{encoded}"
 
         # Загружаем изображение
         response = requests.get(url, timeout=30)
@@ -47,8 +63,43 @@ def render_mermaid_to_image(mermaid_code):
         print(f"  Ошибка при рендеринге Mermaid: {e}")
         return None
 
-def add_image_to_doc(doc, image_stream, width_inches=6.5):
+def prepare_image_for_docx(image_stream, width_inches=PAGE_IMAGE_WIDTH_INCHES, dpi=DOCX_IMAGE_DPI):
+    """
+    Уменьшить изображение до ширины страницы при заданном DPI и пережать в PNG с палитрой
+
+    Returns:
+        Байты подготовленного изображения (исходные, если пережатие не уменьшило размер
+        и уменьшать изображение не требовалось)
+    """
+    from PIL import Image
+
+    original = image_stream.getvalue()
+    image = Image.open(BytesIO(original))
+    max_width = round(width_inches * dpi)
+
+    resized = image.width > max_width
+    if resized:
+        height = max(1, round(image.height * max_width / image.width))
+        resample = getattr(Image, 'Resampling', Image).LANCZOS
+        image = image.convert('RGBA').resize((max_width, height), resample)
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    quantize = getattr(Image, 'Quantize', Image)
+    image = image.quantize(colors=PNG_PALETTE_COLORS, method=quantize.FASTOCTREE)
+    output = BytesIO()
+    image.save(output, format='PNG', optimize=True, compress_level=9, dpi=(dpi, dpi))
+    prepared = output.getvalue()
+
+    if not resized and len(prepared) >= len(original):
+        return original
+    return prepared
+
+def add_image_to_doc(doc, image_stream, width_inches=PAGE_IMAGE_WIDTH_INCHES):
     """Добавить изображение в документ"""
+    from docx.shared import Pt, Inches
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
     if image_stream is None:
         return
 
@@ -60,7 +111,8 @@ def add_image_to_doc(doc, image_stream, width_inches=6.5):
         # Добавляем изображение
         run = para.add_run()
         image_stream.seek(0)
-        run.add_picture(image_stream, width=Inches(width_inches))
+        with stage('add_image'):
+            run.add_picture(image_stream, width=Inches(width_inches))
 
         # Добавляем небольшой отступ после изображения
         para.paragraph_format.space_after = Pt(12)
@@ -73,6 +125,8 @@ def add_image_to_doc(doc, image_stream, width_inches=6.5):
 
 def add_code_block_fallback(doc, code, language='mermaid'):
     """Добавить блок кода как запасной вариант"""
+    from docx.shared import Pt, Inches, RGBColor
+
     para = doc.add_paragraph()
     para.style = 'No Spacing'
 
@@ -93,8 +147,20 @@ def add_bullet_list(doc, items):
         para = doc.add_paragraph(item, style='List Bullet')
     return doc
 
-def parse_markdown_to_docx(mmd_file, docx_file):
-    """Парсинг Markdown файла и создание DOCX документа с визуализированными диаграммами"""
+def parse_markdown_to_docx(mmd_file, docx_file, render_image=None, dpi=DOCX_IMAGE_DPI):
+    """
+    Парсинг Markdown файла и создание DOCX документа с визуализированными диаграммами
+
+    render_image - функция (код Mermaid) -> BytesIO с изображением или None;
+    по умолчанию диаграммы рендерятся через mermaid.ink.
+    Одинаковые диаграммы рендерятся один раз за запуск (по хешу кода), изображения
+    уменьшаются до ширины страницы при заданном dpi перед вставкой.
+    """
+    if render_image is None:
+        render_image = render_mermaid_to_image
+    from docx import Document
+    from docx.shared import Pt, RGBColor
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
 
     # Читаем исходный файл
     with open(mmd_file, 'r', encoding='utf-8') as f:
@@ -117,6 +183,10 @@ def parse_markdown_to_docx(mmd_file, docx_file):
     lines = content.split('\n')
     i = 0
     diagram_count = 0
+    # Хеш кода диаграммы -> подготовленное изображение (None, если рендеринг не удался)
+    rendered = {}
+    source_bytes = 0
+    embedded_bytes = 0
 
     while i < len(lines):
         line = lines[i].strip()
@@ -144,11 +214,28 @@ def parse_markdown_to_docx(mmd_file, docx_file):
             print(f"Рендеринг диаграммы {diagram_count + 1}...")
             diagram_count += 1
 
-            # Рендерим диаграмму в изображение
-            image_stream = render_mermaid_to_image(code)
+            # Рендерим диаграмму в изображение (повторы берем из кэша запуска)
+            code_hash = hashlib.sha256(code.encode('utf-8')).hexdigest()
+            if code_hash in rendered:
+                print("  ↺ Такая диаграмма уже отрендерена, используется повторно")
+            else:
+                rendered[code_hash] = None
+                with stage('render'):
+                    source_stream = render_image(code)
+                if source_stream:
+                    source_bytes += len(source_stream.getvalue())
+                    try:
+                        with stage('rasterize'):
+                            rendered[code_hash] = prepare_image_for_docx(source_stream, dpi=dpi)
+                    except Exception as e:
+                        print(f"  Предупреждение: не удалось оптимизировать изображение: {e}")
+                        rendered[code_hash] = source_stream.getvalue()
+            image_bytes = rendered[code_hash]
+            image_stream = BytesIO(image_bytes) if image_bytes else None
 
             if image_stream:
-                add_image_to_doc(doc, image_stream, width_inches=6.5)
+                embedded_bytes += len(image_bytes)
+                add_image_to_doc(doc, image_stream, width_inches=PAGE_IMAGE_WIDTH_INCHES)
                 print(f"  ✓ Диаграмма {diagram_count} успешно добавлена")
             else:
                 # Запасной вариант - добавляем код
@@ -187,19 +274,36 @@ def parse_markdown_to_docx(mmd_file, docx_file):
         i += 1
 
     # Сохраняем документ
-    doc.save(docx_file)
+    with stage('save'):
+        doc.save(docx_file)
     print(f"\n✓ Документ успешно создан: {docx_file}")
     print(f"  Всего диаграмм обработано: {diagram_count}")
-
-if __name__ == '__main__':
-    import sys
+    print(f"  Уникальных диаграмм отрендерено: {len(rendered)}")
+    if source_bytes:
+        print(f"  Изображения: {source_bytes / 1024:.1f} KB получено, "
+              f"{embedded_bytes / 1024:.1f} KB вставлено в документ")
+    print(f"  Размер документа: {os.path.getsize(docx_file) / 1024:.1f} KB")
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Конвертация MMD/Markdown файла в DOCX с диаграммами'
+    )
+    parser.add_argument(
+        'mmd_file',
+        nargs='?',
+        help='Путь к MMD файлу (по умолчанию: Архитектура.mmd рядом со скриптом)'
+    )
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
 
     # Определяем пути относительно скрипта
     script_dir = os.path.dirname(os.path.abspath(__file__))
 
     # Если передан аргумент командной строки - используем его как путь к .mmd файлу
-    if len(sys.argv) > 1:
-        mmd_file = sys.argv[1]
+    if args.mmd_file:
+        mmd_file = args.mmd_file
         if not os.path.isabs(mmd_file):
             # Если путь относительный, делаем его абсолютным относительно рабочей директории
             mmd_file = os.path.abspath(mmd_file)
@@ -213,7 +317,7 @@ if __name__ == '__main__':
 
     if not os.path.exists(mmd_file):
         print(f"Ошибка: файл {mmd_file} не найден!")
-        sys.exit(1)
+        return 1
 
     # Генерируем имя выходного файла на основе входного
     mmd_dir = os.path.dirname(mmd_file)
@@ -223,5 +327,8 @@ if __name__ == '__main__':
     print(f"Конвертация {mmd_file} -> {docx_file}")
     print("=" * 50)
 
-    parse_markdown_to_docx(mmd_file, docx_file)
+    run_profiled(args, parse_markdown_to_docx, mmd_file, docx_file)
+    return 0
 
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,13 +14,14 @@ import time
 import platform
 from pathlib import Path
 
-try:
-    import requests
-except ImportError:
-    print("Ошибка: библиотека requests не установлена!")
-    print("Установите: pip install requests")
-    sys.exit(1)
-
+# Общие опции --timings/--profile и разметка этапов (scripts/tool_profiling.py)
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.append(str(SCRIPTS_DIR))
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+
+# Адрес API рендеринга (можно переопределить, например, локальной заглушкой)
+MERMAID_INK_URL = os.environ.get('MERMAID_INK_URL', 'https://mermaid.ink').rstrip('/')
 # Количество попыток рендеринга при неудаче
 MAX_RETRIES = 5
 # Задержка между попытками (в секундах)
@@ -37,6 +38,20 @@ def clear_screen():
         os.system('clear')
 
 
+def import_requests():
+    """
+    Импортировать requests при первом обращении к API
+    (чтобы запуск без рендеринга не загружал библиотеку)
+    """
+    try:
+        import requests
+    except ImportError:
+        print("Ошибка: библиотека requests не установлена!")
+        print("Установите: pip install requests")
+        sys.exit(1)
+    return requests
+
+
 def render_mermaid_to_svg(
     mermaid_code, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY
 ):
@@ -52,6 +67,8 @@ def render_mermaid_to_svg(
     Returns:
         SVG содержимое или None при неудаче
     """
+    requests = import_requests()
+
     # Пытаемся загрузить SVG с повторными попытками
     for attempt in range(1, max_retries + 1):
         try:
@@ -61,10 +78,11 @@ def render_mermaid_to_svg(
             ).decode('utf-8').rstrip('=')
 
             # Формируем URL для получения SVG
-            url = f"https://mermaid.ink/svg/{encoded}"
+            url = f"{MERMAID_INK_URL}/svg/{encoded}"
 
             # Загружаем SVG
-            response = requests.get(url, timeout=30)
+            with stage('http'):
+                response = requests.get(url, timeout=30)
 
             if response.status_code == 200:
                 svg_content = response.text
@@ -123,7 +141,7 @@ def render_mermaid_to_svg(
                     "КРИТИЧЕСКАЯ ОШИБКА: не удалось подключиться к API!\n"
                     "=" * 50 + "\n"
                     "Проверьте подключение к интернету\n"
-                    "API: https://mermaid.ink\n"
+                    f"API: {MERMAID_INK_URL}\n"
                     "\n"
                     f"Детали ошибки: {e}\n"
                     "=" * 50
@@ -243,7 +261,8 @@ def convert_mmd_to_svg(mmd_file):
 
     # Извлекаем все диаграммы
     try:
-        diagrams = extract_mermaid_diagrams(mmd_file)
+        with stage('parse'):
+            diagrams = extract_mermaid_diagrams(mmd_file)
     except (IOError, UnicodeDecodeError) as e:
         print(f"Критическая ошибка при чтении файла: {e}")
         raise  # Останавливаем выполнение
@@ -270,7 +289,7 @@ def convert_mmd_to_svg(mmd_file):
                 svg_path = output_dir / svg_filename
 
                 try:
-                    with open(svg_path, 'w', encoding='utf-8') as f:
+                    with stage('save'), open(svg_path, 'w', encoding='utf-8') as f:
                         f.write(svg_content)
                     print(f"  ✓ Сохранено: {svg_filename}")
                     success_count += 1
@@ -322,36 +341,48 @@ def convert_mmd_to_svg(mmd_file):
     return success_count > 0
 
 
-if __name__ == '__main__':
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Конвертация Mermaid диаграмм из MMD файла в SVG'
+    )
+    parser.add_argument('mmd_file', nargs='?', help='Путь к MMD файлу')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
     try:
         # Определяем путь к файлу
-        if len(sys.argv) > 1:
-            mmd_file = sys.argv[1]
+        if args.mmd_file:
+            mmd_file = args.mmd_file
             if not os.path.isabs(mmd_file):
                 # Если путь относительный, делаем его абсолютным
                 mmd_file = os.path.abspath(mmd_file)
         else:
             usage = "Использование: python convert_mmd_to_svg.py "
-            usage += "<путь_к_mmd_файлу>"
+            usage += "<путь_к_mmd_файлу> [--timings] [--profile FILE]"
             print(usage)
             print("Или используйте конфигурацию запуска в VS Code/Cursor")
-            sys.exit(1)
+            return 1
 
-        success = convert_mmd_to_svg(mmd_file)
+        success = run_profiled(args, convert_mmd_to_svg, mmd_file)
         # Завершаем с кодом 0 при успехе, 1 при полной неудаче
         exit_code = 0 if success else 1
         print()  # Пустая строка перед завершением
-        sys.exit(exit_code)
+        return exit_code
     except KeyboardInterrupt:
         print("\n\nПрервано пользователем")
-        sys.exit(130)
+        return 130
     except RuntimeError:
         # RuntimeError уже содержит понятное сообщение об ошибке
         # (например, когда npx/mmdc не найдены)
         print("\n\nПрограмма остановлена из-за критической ошибки.")
-        sys.exit(1)
+        return 1
     except Exception as e:
         print(f"\n\nКритическая ошибка: {e}")
         import traceback
         traceback.print_exc()
-        sys.exit(1)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
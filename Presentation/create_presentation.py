@@ -5,60 +5,296 @@
 на основе шаблона и детального описания слайдов
 """
 
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
-from pptx.dml.color import RGBColor
-from pptx.enum.shapes import MSO_SHAPE
 import os
+import re
+import sys
+import json
+import hashlib
 from pathlib import Path
 from datetime import datetime
-import cairosvg
 from io import BytesIO
-from PIL import Image
 
-# Цветовая схема
-ACCENT_COLOR = RGBColor(56, 189, 248)  # #38bdf8
-WHITE = RGBColor(255, 255, 255)
-LIGHT_GRAY = RGBColor(200, 200, 200)
-DARK_BG = RGBColor(30, 30, 30)
+# Общие опции --timings/--profile и разметка этапов (scripts/tool_profiling.py)
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.append(str(SCRIPTS_DIR))
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+
+# pptx, cairosvg, PIL и пул процессов импортируются внутри функций, которые их используют:
+# так --help и работа с кэшем не тратят время на загрузку тяжелых модулей
+
+# Цветовая схема (RGB)
+ACCENT_COLOR = (56, 189, 248)  # #38bdf8
+WHITE = (255, 255, 255)
+LIGHT_GRAY = (200, 200, 200)
+DARK_BG = (30, 30, 30)
+
+# Разрешение, с которым диаграммы растеризуются под размер места на слайде
+DEFAULT_DPI = 150
+# Количество цветов палитры PNG (None - без квантизации)
+PNG_PALETTE_COLORS = 256
+# Уровень сжатия zlib для PNG (0-9)
+PNG_COMPRESS_LEVEL = 9
+# Файл с хешами SVG, из которых были получены PNG (лежит рядом с диаграммами)
+RASTER_CACHE_FILE = '.raster_cache.json'
+# Как диаграмма вписывается в место на слайде: целиком, с сохранением пропорций
+RASTER_FIT = 'contain'
+
+# Описание слайдов и каталог кэша сборки (отпечатки слайдов, подготовленный шаблон)
+PRESENTATION_DIR = Path(__file__).resolve().parent
+SLIDES_SPEC_PATH = PRESENTATION_DIR / "slides.json"
+DECK_CACHE_DIR = '.deck_cache'
+DECK_MANIFEST_FILE = 'manifest.json'
+
+# Именованные цвета, доступные в описании слайдов (остальные задаются как #RRGGBB)
+NAMED_COLORS = {
+    'accent': ACCENT_COLOR,
+    'white': WHITE,
+    'light_gray': LIGHT_GRAY,
+    'dark_bg': DARK_BG,
+}
+
+def target_pixel_size(width_inches, height_inches, dpi=DEFAULT_DPI):
+    """Размер в пикселях для места на слайде заданного размера"""
+    return max(1, round(width_inches * dpi)), max(1, round(height_inches * dpi))
+
+def svg_aspect_ratio(svg_path):
+    """Отношение ширины SVG к высоте по viewBox или width/height (None, если размер не задан)"""
+    import xml.etree.ElementTree as ET
 
-def svg_to_png(svg_path, output_path=None, width=1920):
-    """Конвертировать SVG в PNG"""
+    try:
+        _, root = next(ET.iterparse(str(svg_path), events=('start',)))
+    except (ET.ParseError, OSError, StopIteration):
+        return None
+
+    view_box = (root.get('viewBox') or '').replace(',', ' ').split()
+    if len(view_box) == 4:
+        width, height = float(view_box[2]), float(view_box[3])
+    else:
+        # Размеры в процентах не задают пропорций
+        sizes = [re.fullmatch(r'\s*([\d.]+)\s*(px|pt|mm|cm|in)?\s*', root.get(name) or '')
+                 for name in ('width', 'height')]
+        if not all(sizes):
+            return None
+        width, height = (float(size.group(1)) for size in sizes)
+    return width / height if width > 0 and height > 0 else None
+
+def fit_pixel_size(width_px, height_px, aspect_ratio):
+    """Наибольший размер с пропорциями aspect_ratio, помещающийся в width_px x height_px"""
+    if not aspect_ratio:
+        return width_px, height_px
+    if width_px / height_px > aspect_ratio:
+        return max(1, round(height_px * aspect_ratio)), height_px
+    return width_px, max(1, round(width_px / aspect_ratio))
+
+def raster_png_name(svg_name, width_px, height_px):
+    """Имя PNG для SVG, растеризованного в заданный размер"""
+    return f"{Path(svg_name).stem}_{width_px}x{height_px}.png"
+
+def optimize_png(png_data, palette_colors=PNG_PALETTE_COLORS, compress_level=PNG_COMPRESS_LEVEL):
+    """Квантизовать PNG в палитру и пережать с заданным уровнем zlib"""
+    from PIL import Image
+
+    image = Image.open(BytesIO(png_data))
+    if palette_colors:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        quantize = getattr(Image, 'Quantize', Image)
+        image = image.quantize(colors=palette_colors, method=quantize.FASTOCTREE)
+    output = BytesIO()
+    image.save(output, format='PNG', optimize=True, compress_level=compress_level)
+    return output.getvalue()
+
+def svg_to_png(svg_path, output_path=None, width=1920, height=None,
+               palette_colors=None, compress_level=None):
+    """
+    Конвертировать SVG в PNG (при необходимости под размер места и с оптимизацией)
+
+    Если заданы и ширина, и высота, диаграмма вписывается в них с сохранением
+    пропорций SVG - одна из сторон PNG может оказаться меньше заданной.
+    """
     if not os.path.exists(svg_path):
         return None
 
     if output_path is None:
-        output_path = svg_path.replace('.svg', '.png')
+        output_path = str(svg_path).replace('.svg', '.png')
 
     try:
+        import cairosvg
+
+        if width and height:
+            width, height = fit_pixel_size(width, height, svg_aspect_ratio(svg_path))
+
         # Конвертируем SVG в PNG
-        png_data = cairosvg.svg2png(url=str(svg_path), output_width=width)
-        with open(output_path, 'wb') as f:
-            f.write(png_data)
+        with stage('rasterize'):
+            png_data = cairosvg.svg2png(url=str(svg_path), output_width=width, output_height=height)
+        if palette_colors or compress_level is not None:
+            with stage('optimize_png'):
+                png_data = optimize_png(
+                    png_data, palette_colors,
+                    PNG_COMPRESS_LEVEL if compress_level is None else compress_level
+                )
+        with stage('write_png'):
+            with open(output_path, 'wb') as f:
+                f.write(png_data)
         return output_path
     except Exception as e:
         print(f"Ошибка конвертации SVG {svg_path}: {e}")
         return None
 
-def add_text_box(slide, left, top, width, height, text, font_size, bold=False, color=WHITE, alignment=PP_ALIGN.LEFT):
+def file_sha256(path):
+    """Вычислить SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_raster_cache(diagrams_path):
+    """Загрузить кэш растеризации (имя PNG -> хеш исходного SVG и настройки)"""
+    cache_path = Path(diagrams_path) / RASTER_CACHE_FILE
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def save_raster_cache(diagrams_path, cache):
+    """Сохранить кэш растеризации"""
+    cache_path = Path(diagrams_path) / RASTER_CACHE_FILE
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    except IOError as e:
+        print(f"Предупреждение: не удалось сохранить кэш растеризации: {e}")
+
+def is_png_up_to_date(svg_path, png_path, svg_hash, cache, settings):
+    """
+    Проверить, нужно ли заново растеризовать SVG
+
+    PNG считается актуальным, если он новее SVG или если хеш SVG
+    совпадает с хешем, из которого PNG был получен в прошлый раз.
+    PNG, полученный с другими настройками оптимизации, всегда устаревший.
+    svg_hash - функция без аргументов, хеш считается только при необходимости.
+    """
+    if not png_path.exists():
+        return False
+    entry = cache.get(png_path.name)
+    if isinstance(entry, dict) and entry.get('settings') != settings:
+        return False
+    if png_path.stat().st_mtime >= svg_path.stat().st_mtime:
+        return True
+    return isinstance(entry, dict) and entry.get('svg') == svg_hash()
+
+def _rasterize_job(job):
+    """Задача для пула процессов: (svg, png, ширина, высота, цвета, сжатие) -> путь к PNG или None"""
+    svg_path, png_path, width, height, palette_colors, compress_level = job
+    return svg_to_png(svg_path, png_path, width, height, palette_colors, compress_level)
+
+def rasterize_diagrams(diagrams_path, diagrams, dpi=DEFAULT_DPI,
+                       palette_colors=PNG_PALETTE_COLORS,
+                       compress_level=PNG_COMPRESS_LEVEL, max_workers=None):
+    """
+    Растеризовать все нужные диаграммы до сборки слайдов
+
+    Каждая диаграмма растеризуется под размер своего места на слайде
+    (дюймы * dpi) с сохранением пропорций. Актуальные PNG пропускаются, остальные конвертируются
+    параллельно в пуле процессов.
+
+    Args:
+        diagrams: список (имя SVG, ширина в дюймах, высота в дюймах)
+
+    Returns:
+        Словарь {(имя SVG, ширина, высота): путь к PNG} для подготовленных диаграмм
+    """
+    diagrams_path = Path(diagrams_path)
+    cache = load_raster_cache(diagrams_path)
+    settings = f"colors={palette_colors};zlib={compress_level};fit={RASTER_FIT}"
+    ready = {}
+    jobs = []
+
+    for diagram in dict.fromkeys(diagrams):
+        diagram_file, width_inches, height_inches = diagram
+        svg_path = diagrams_path / diagram_file
+        if not svg_path.exists():
+            print(f"Warning: Diagram not found: {svg_path}")
+            continue
+        width_px, height_px = target_pixel_size(width_inches, height_inches, dpi)
+        png_path = diagrams_path / raster_png_name(diagram_file, width_px, height_px)
+
+        if is_png_up_to_date(svg_path, png_path, lambda: file_sha256(svg_path), cache, settings):
+            ready[diagram] = str(png_path)
+        else:
+            jobs.append((diagram, (str(svg_path), str(png_path), width_px, height_px,
+                                   palette_colors, compress_level)))
+
+    if not jobs:
+        print(f"Все диаграммы актуальны ({len(ready)}), растеризация не требуется")
+        return ready
+
+    print(f"Растеризация диаграмм ({dpi} dpi): {len(jobs)} (актуальных: {len(ready)})")
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Этапы внутри процессов пула в общую таблицу не попадают - замеряем пул целиком
+    with stage('rasterize (pool)'), ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_rasterize_job, [job for _, job in jobs])
+        for (diagram, job), png_path in zip(jobs, results):
+            if png_path:
+                ready[diagram] = png_path
+                cache[Path(png_path).name] = {'svg': file_sha256(job[0]), 'settings': settings}
+                print(f"  ✓ {diagram[0]} -> {Path(png_path).name}")
+            else:
+                print(f"  ✗ {diagram[0]}")
+
+    save_raster_cache(diagrams_path, cache)
+    return ready
+
+def format_size(size_bytes):
+    """Человекочитаемый размер файла"""
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    if size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    return f"{size_bytes / (1024 * 1024):.1f} MB"
+
+def report_deck_size(output_path, previous_size):
+    """Вывести размер сохраненной презентации и изменение относительно прошлой сборки"""
+    new_size = os.path.getsize(output_path)
+    print(f"Размер презентации: {format_size(new_size)}")
+    if previous_size:
+        saved = previous_size - new_size
+        percent = saved * 100 / previous_size
+        if saved >= 0:
+            print(f"  Уменьшение: {format_size(saved)} ({percent:.1f}%) относительно {format_size(previous_size)}")
+        else:
+            print(f"  Увеличение: {format_size(-saved)} ({-percent:.1f}%) относительно {format_size(previous_size)}")
+
+def add_text_box(slide, left, top, width, height, text, font_size, bold=False, color=WHITE, alignment='left'):
     """Добавить текстовое поле на слайд"""
+    from pptx.util import Inches, Pt
+    from pptx.enum.text import PP_ALIGN
+    from pptx.dml.color import RGBColor
+
     textbox = slide.shapes.add_textbox(Inches(left), Inches(top), Inches(width), Inches(height))
     text_frame = textbox.text_frame
     text_frame.word_wrap = True
     text_frame.text = text
 
     paragraph = text_frame.paragraphs[0]
-    paragraph.alignment = alignment
+    paragraph.alignment = getattr(PP_ALIGN, alignment.upper())
     run = paragraph.runs[0]
     run.font.size = Pt(font_size)
     run.font.bold = bold
-    run.font.color.rgb = color
+    run.font.color.rgb = RGBColor(*color)
 
     return textbox
 
 def add_bullet_list(slide, left, top, width, height, items, font_size=16, color=WHITE):
     """Добавить маркированный список на слайд"""
+    from pptx.util import Inches, Pt
+    from pptx.enum.text import PP_ALIGN
+    from pptx.dml.color import RGBColor
+
     textbox = slide.shapes.add_textbox(Inches(left), Inches(top), Inches(width), Inches(height))
     text_frame = textbox.text_frame
     text_frame.word_wrap = True
@@ -79,557 +315,396 @@ def add_bullet_list(slide, left, top, width, height, items, font_size=16, color=
         else:
             run = p.add_run()
         run.font.size = Pt(font_size)
-        run.font.color.rgb = color
+        run.font.color.rgb = RGBColor(*color)
 
     return textbox
 
 def add_image(slide, image_path, left, top, width=None, height=None):
-    """Добавить изображение на слайд"""
+    """Добавить изображение на слайд (если заданы ширина и высота - вписать по центру с сохранением пропорций)"""
+    from pptx.util import Inches
+
     if not os.path.exists(image_path):
         print(f"Warning: Image not found: {image_path}")
         return None
 
     try:
-        if width and height:
-            return slide.shapes.add_picture(image_path, Inches(left), Inches(top),
-                                           width=Inches(width), height=Inches(height))
-        else:
-            return slide.shapes.add_picture(image_path, Inches(left), Inches(top))
+        with stage('add_image'):
+            picture = slide.shapes.add_picture(image_path, Inches(left), Inches(top))
+            if width and height:
+                box_width, box_height = Inches(width), Inches(height)
+                scale = min(box_width / picture.width, box_height / picture.height)
+                picture.width = round(picture.width * scale)
+                picture.height = round(picture.height * scale)
+                picture.left = Inches(left) + (box_width - picture.width) // 2
+                picture.top = Inches(top) + (box_height - picture.height) // 2
+            return picture
     except Exception as e:
         print(f"Ошибка вставки изображения {image_path}: {e}")
         return None
 
-def create_presentation():
-    """Создать презентацию на основе шаблона"""
+def parse_color(value):
+    """Цвет из описания слайда: имя из NAMED_COLORS или #RRGGBB"""
+    if value is None:
+        return WHITE
+    if value in NAMED_COLORS:
+        return NAMED_COLORS[value]
+    value = value.lstrip('#')
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+def render_text(text, context):
+    """Подставить переменные вида {date} (прочие фигурные скобки не трогаем)"""
+    for key, value in context.items():
+        text = text.replace('{' + key + '}', str(value))
+    return text
+
+def load_slide_spec(spec_path=SLIDES_SPEC_PATH):
+    """Загрузить описание презентации из JSON"""
+    with stage('parse'), open(spec_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def slide_diagrams(slide_spec):
+    """Диаграммы слайда: список (имя SVG, ширина, высота в дюймах)"""
+    return [
+        (element['diagram'], element['box'][2], element['box'][3])
+        for element in slide_spec.get('elements', [])
+        if element['type'] == 'image'
+    ]
 
-    # Пути к файлам
-    template_path = Path("Presentation/StockMarketAssistant_Presentation_template.pptx")
-    output_path = Path("Presentation/StockMarketAssistant_Presentation_Final.pptx")
-    diagrams_path = Path("Presentation/Sequence_Diagrams")
+def slide_fingerprint(slide_spec, diagrams_path, dpi):
+    """
+    Отпечаток входных данных слайда
+
+    Учитывает описание слайда, содержимое используемых SVG и настройки
+    растеризации - если отпечаток не изменился, ресурсы слайда берутся из кэша.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(slide_spec, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    digest.update(f"dpi={dpi};colors={PNG_PALETTE_COLORS};zlib={PNG_COMPRESS_LEVEL};fit={RASTER_FIT}".encode('utf-8'))
+    for diagram_file, _, _ in slide_diagrams(slide_spec):
+        svg_path = Path(diagrams_path) / diagram_file
+        digest.update(file_sha256(svg_path).encode('utf-8') if svg_path.exists() else b'missing')
+    return digest.hexdigest()
+
+def load_deck_manifest(cache_dir, manifest_file=DECK_MANIFEST_FILE):
+    """Загрузить манифест прошлой сборки (id слайда -> отпечаток и ресурсы)"""
+    try:
+        with open(Path(cache_dir) / manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def save_deck_manifest(cache_dir, manifest, manifest_file=DECK_MANIFEST_FILE):
+    """Сохранить манифест сборки"""
+    try:
+        with open(Path(cache_dir) / manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True, ensure_ascii=False)
+    except IOError as e:
+        print(f"Предупреждение: не удалось сохранить манифест сборки: {e}")
+
+def prepare_slide_assets(slides, diagrams_path, cache_dir, dpi, manifest_file=DECK_MANIFEST_FILE, max_workers=None):
+    """
+    Подготовить ресурсы всех слайдов с учетом кэша
+
+    Для слайдов с неизменившимся отпечатком используются ресурсы прошлой
+    сборки, диаграммы остальных слайдов растеризуются заново. Отпечаток
+    попадает в манифест, только если готовы все диаграммы слайда, - слайд
+    с неудачной растеризацией пересобирается при следующем запуске.
+
+    Returns:
+        (ресурсы {(имя SVG, ширина, высота): путь к PNG}, манифест, список id измененных слайдов)
+    """
+    previous = load_deck_manifest(cache_dir, manifest_file)
+    fingerprints = {}
+    assets = {}
+    changed = []
+    pending = []
+
+    for slide_spec in slides:
+        slide_id = slide_spec['id']
+        fingerprint = slide_fingerprint(slide_spec, diagrams_path, dpi)
+        diagrams = slide_diagrams(slide_spec)
+        cached = previous.get(slide_id, {})
+        cached_assets = {tuple(key): path for *key, path in cached.get('assets', [])}
+
+        if cached.get('fingerprint') == fingerprint and all(
+            diagram in cached_assets and os.path.exists(cached_assets[diagram]) for diagram in diagrams
+        ):
+            assets.update(cached_assets)
+        else:
+            changed.append(slide_id)
+            pending.extend(diagrams)
+        fingerprints[slide_id] = fingerprint
+
+    if pending:
+        assets.update(rasterize_diagrams(diagrams_path, pending, dpi, max_workers=max_workers))
+
+    manifest = {}
+    for slide_spec in slides:
+        slide_id = slide_spec['id']
+        diagrams = slide_diagrams(slide_spec)
+        entry = {'assets': [[*diagram, assets[diagram]] for diagram in diagrams if diagram in assets]}
+        if len(entry['assets']) == len(diagrams):
+            entry['fingerprint'] = fingerprints[slide_id]
+        manifest[slide_id] = entry
+
+    return assets, manifest, changed
+
+def load_template_bytes(template_path, cache_dir):
+    """
+    Получить шаблон без слайдов в виде байтов (None, если шаблон не найден)
+
+    Шаблон с удаленными слайдами сохраняется в кэш сборки (по хешу шаблона),
+    поэтому удаление слайдов выполняется только при изменении шаблона.
+    Байты можно открывать многократно - для каждого варианта презентации.
+    """
+    if not template_path.exists():
+        return None
 
-    # Открыть шаблон
-    if template_path.exists():
+    prepared_path = Path(cache_dir) / f"template_{file_sha256(template_path)[:16]}.pptx"
+    if prepared_path.exists():
+        print(f"Открыт шаблон: {template_path} (подготовленный, из кэша)")
+        return prepared_path.read_bytes()
+
+    from pptx import Presentation
+
+    with stage('template'):
         prs = Presentation(str(template_path))
         print(f"Открыт шаблон: {template_path}")
-        # Очистить существующие слайды (кроме первого, если он есть)
+        # Очистить существующие слайды
         while len(prs.slides) > 0:
             rId = prs.slides._sldIdLst[0].rId
             prs.part.drop_rel(rId)
             del prs.slides._sldIdLst[0]
-    else:
+        prs.save(str(prepared_path))
+    return prepared_path.read_bytes()
+
+def open_presentation(template_bytes):
+    """Открыть презентацию из подготовленного шаблона или создать пустую"""
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    if template_bytes is None:
         # Создать новую презентацию, если шаблон не найден
         prs = Presentation()
         prs.slide_width = Inches(10)
         prs.slide_height = Inches(7.5)
         print("Создана новая презентация (шаблон не найден)")
-
-    # СЛАЙД 1: ТИТУЛЬНЫЙ СЛАЙД
-    slide = prs.slides.add_slide(prs.slide_layouts[0] if len(prs.slide_layouts) > 0 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Stock Market Assistant"
-
-    if len(slide.placeholders) > 1:
-        slide.placeholders[1].text = "Платформа для анализа биржевых котировок с многопользовательским доступом"
-
-    # Добавить авторов
-    authors_text = "Дубровский Никита Владимирович\nЗаворотный Александр Александрович\nМельников Игорь Евгеньевич\nШадрин Максим Александрович\nПавлов Константин Петрович"
-    add_text_box(slide, 1, 4.5, 8, 2, authors_text, 18, False, LIGHT_GRAY, PP_ALIGN.CENTER)
-
-    # Дата
-    date_text = datetime.now().strftime("%d.%m.%Y")
-    add_text_box(slide, 1, 6.5, 8, 0.5, date_text, 16, False, LIGHT_GRAY, PP_ALIGN.CENTER)
-
-    print("✓ Создан слайд 1: Титульный")
-
-    # СЛАЙД 2: ПРОБЛЕМА И РЕШЕНИЕ
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Проблема и решение"
-
-    # Проблема (слева)
-    problem_items = [
-        "Инвесторам нужна единая платформа для мониторинга котировок в реальном времени",
-        "Существующие решения: сложные, дорогие или ограниченные в функционале",
-        "Нет удобного многопользовательского доступа с кастомизацией"
-    ]
-    add_text_box(slide, 0.5, 1.5, 4, 0.5, "Проблема", 20, True, RGBColor(255, 100, 100))
-    add_bullet_list(slide, 0.5, 2, 4, 4, problem_items, 14, WHITE)
-
-    # Решение (справа)
-    solution_items = [
-        "Веб-платформа с real-time котировками через WebSocket",
-        "Простой интерфейс для портфелей и оповещений",
-        "Многопользовательский доступ с правами доступа (RBAC)",
-        "Аналитика транзакций и рейтинги активов"
-    ]
-    add_text_box(slide, 5.5, 1.5, 4, 0.5, "Решение", 20, True, RGBColor(100, 255, 100))
-    add_bullet_list(slide, 5.5, 2, 4, 4, solution_items, 14, WHITE)
-
-    # Целевая аудитория
-    audience_text = "Целевая аудитория: Розничные инвесторы • Профессиональные трейдеры • Финансовые аналитики • Инвестиционные команды"
-    add_text_box(slide, 0.5, 6.5, 9, 0.5, audience_text, 14, False, ACCENT_COLOR, PP_ALIGN.CENTER)
-
-    print("✓ Создан слайд 2: Проблема и решение")
-
-    # СЛАЙД 3: ОБЗОР СИСТЕМЫ
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Обзор системы"
-
-    capabilities = [
-        "Real-time мониторинг котировок акций, облигаций, криптовалют",
-        "Управление инвестиционными портфелями",
-        "Трекинг транзакций (покупка/продажа)",
-        "Система оповещений (Email) при достижении целевых цен",
-        "Аналитика и рейтинги активов",
-        "Многопользовательский доступ с разделением прав"
-    ]
-    add_bullet_list(slide, 0.5, 1.5, 9, 4, capabilities, 16, WHITE)
-
-    asset_types = "Типы активов: Акции (Shares) • Облигации (Bonds) • Криптовалюты (Crypto)"
-    add_text_box(slide, 0.5, 6, 9, 0.5, asset_types, 18, True, ACCENT_COLOR, PP_ALIGN.CENTER)
-
-    print("✓ Создан слайд 3: Обзор системы")
-
-    # СЛАЙД 4: ДОМЕННАЯ МОДЕЛЬ
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Доменная модель"
-
-    domain_text = """PortfolioService: Portfolio, PortfolioAsset, PortfolioAssetTransaction
-StockCardService: ShareCard, BondCard, CryptoCard, Multiplier, Dividend, Coupon
-AnalyticsService: AssetTransaction, AssetRating, Period
-AuthService: User, Role, Permission
-
-Ключевые связи:
-User → Portfolio (1:N) • Portfolio → PortfolioAsset (1:N) • PortfolioAsset → PortfolioAssetTransaction (1:N)
-PortfolioAsset → StockCard (N:1) • PortfolioAssetTransaction → AssetTransaction (1:1 через Kafka)"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, domain_text, 14, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 4: Доменная модель")
-
-    # СЛАЙД 5: ОСНОВНЫЕ БИЗНЕС-ПРОЦЕССЫ (с диаграммами)
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Основные бизнес-процессы"
-
-    processes = [
-        "1. Мониторинг котировок в реальном времени (SignalR, MOEX API)",
-        "2. Управление портфелем (CRUD операции, расчет PnL)",
-        "3. Система оповещений (Email через NotificationService)",
-        "4. Аналитика и рейтинги (Kafka, batch processing, агрегация)",
-        "5. Многопользовательский доступ (RBAC, приватные портфели)"
-    ]
-    add_bullet_list(slide, 0.5, 1.5, 9, 2.5, processes, 14, WHITE)
-
-    # Вставить диаграммы для бизнес-процессов
-    # diagram_003.svg - Получение котировок в реальном времени
-    # diagram_004.svg - Система оповещений
-    # diagram_005.svg - Аналитика
-
-    diagram_files = [
-        ("diagram_003.svg", "Котировки в реальном времени", 0.5, 4, 2.8, 2),
-        ("diagram_004.svg", "Система оповещений", 3.5, 4, 2.8, 2),
-        ("diagram_005.svg", "Аналитика", 6.5, 4, 2.8, 2)
-    ]
-
-    for diagram_file, label, left, top, width, height in diagram_files:
-        svg_path = diagrams_path / diagram_file
-        if svg_path.exists():
-            # Конвертируем SVG в PNG
-            png_path = svg_path.with_suffix('.png')
-            png_path = svg_to_png(svg_path, str(png_path))
+        return prs
+    with stage('template'):
+        return Presentation(BytesIO(template_bytes))
+
+def build_slide(prs, slide_spec, assets, context, default_layout=1):
+    """Собрать один слайд по его описанию (переменные context подставляются во все тексты слайда)"""
+    layout_index = slide_spec.get('layout', default_layout)
+    layouts = prs.slide_layouts
+    slide = prs.slides.add_slide(layouts[layout_index] if len(layouts) > layout_index else layouts[6])
+
+    if slide.shapes.title and 'title' in slide_spec:
+        slide.shapes.title.text = render_text(slide_spec['title'], context)
+
+    if 'subtitle' in slide_spec and len(slide.placeholders) > 1:
+        slide.placeholders[1].text = render_text(slide_spec['subtitle'], context)
+
+    for element in slide_spec.get('elements', []):
+        left, top, width, height = element['box']
+        element_type = element['type']
+
+        if element_type == 'text':
+            add_text_box(
+                slide, left, top, width, height,
+                render_text(element['text'], context), element['size'],
+                element.get('bold', False), parse_color(element.get('color')),
+                element.get('align', 'left')
+            )
+        elif element_type == 'bullets':
+            add_bullet_list(
+                slide, left, top, width, height,
+                [render_text(item, context) for item in element['items']],
+                element.get('size', 16), parse_color(element.get('color'))
+            )
+        elif element_type == 'image':
+            png_path = assets.get((element['diagram'], width, height))
             if png_path and os.path.exists(png_path):
                 add_image(slide, png_path, left, top, width, height)
-                add_text_box(slide, left, top + height + 0.1, width, 0.2, label, 10, False, ACCENT_COLOR, PP_ALIGN.CENTER)
-                print(f"  Вставлена диаграмма: {diagram_file}")
-
-    print("✓ Создан слайд 5: Основные бизнес-процессы")
-
-    # СЛАЙД 6: USER STORIES
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "User Stories (Фазы разработки)"
-
-    phases_text = """Phase 1 (MVP — неделя 1-3):
-• Real-time quote display
-• Portfolio CRUD (Create, Read, Update, Delete)
-• Basic transaction tracking
-• Authentication и авторизация
-
-Phase 2 (WebSocket & Alerts — неделя 4-6):
-• SignalR для real-time quotes
-• Email оповещения через NotificationService
-• Advanced alert management
-• 100 concurrent users
-
-Phase 3 (Analytics — неделя 7-9):
-• AnalyticsService: рейтинги активов
-• Агрегация данных по периодам
-• Топ активов по покупкам/продажам
-• 1000 concurrent users
-
-Phase 4 (Production hardening — неделя 10-11):
-• Security audit & penetration testing
-• Monitoring & observability (OpenTelemetry, OpenSearch)
-• Complete documentation
-• User acceptance testing"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, phases_text, 12, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 6: User Stories")
-
-    # СЛАЙД 7: ТЕХНОЛОГИЧЕСКИЙ СТЕК
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Технологический стек"
-
-    tech_stack = """Frontend: React 18 + TypeScript, Redux Toolkit, Tailwind CSS, SignalR client, Vite
-Backend: .NET 8+ LTS, ASP.NET Core Web API, C# 12, Entity Framework Core, SignalR, JWT, Autofac, NSwag, Serilog
-Database: PostgreSQL 17+, Redis 7+, MongoDB 8+
-Message Queue: Apache Kafka, Confluent Kafka .NET client, Kafka UI
-Infrastructure: .NET Aspire, Docker + Docker Compose, Kubernetes, GitHub Actions, AWS/Azure/Yandex.Cloud
-Monitoring: OpenTelemetry, OpenSearch, OpenSearch Dashboards
-External APIs: MOEX (Московская биржа), SendGrid (email)"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, tech_stack, 12, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 7: Технологический стек")
-
-    # СЛАЙД 8: МИКРОСЕРВИСНАЯ АРХИТЕКТУРА
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Микросервисная архитектура"
-
-    services_text = """6 микросервисов:
-
-1. Gateway Service - API Gateway для маршрутизации запросов, единая точка входа
-2. AuthService - Аутентификация (JWT токены), авторизация (RBAC), управление пользователями
-3. StockCardService - Управление карточками активов, интеграция с MOEX, real-time котировки через SignalR
-4. PortfolioService - Управление портфелями пользователей, регистрация транзакций, публикация событий в Kafka
-5. AnalyticsService - Потребление событий транзакций из Kafka, расчет рейтингов активов, агрегация данных
-6. NotificationService - Потребление событий из Kafka, отправка Email уведомлений
-
-Архитектурный стиль:
-Clean Architecture • Event-Driven Architecture (Kafka) • RESTful API • Database per Service"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, services_text, 12, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 8: Микросервисная архитектура")
-
-    # СЛАЙД 9: АРХИТЕКТУРА СИСТЕМЫ (LAYERS)
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Архитектура системы (Layers)"
-
-    layers_text = """Clean Architecture Layers:
-
-1. Presentation Layer (WebApi)
-   - ASP.NET Core Controllers, DTOs, Middleware, SignalR Hubs
-
-2. Application Layer
-   - Use Cases, Application Services, DTOs и маппинг, Валидаторы (FluentValidation)
-
-3. Domain Layer
-   - Entities, Value Objects, Domain Services, Domain Events, Enums и константы
-
-4. Infrastructure Layer
-   - Entity Framework Core, Repositories, Kafka Consumers/Producers, HTTP Clients
-   - External API integrations (MOEX, SendGrid), Caching (Redis)
-   - Background Services, Outbox Pattern
-
-Data Flow:
-Browser → Gateway → Backend Services → PostgreSQL/Redis/MongoDB
-PortfolioService → Kafka → AnalyticsService/NotificationService
-SignalR → Real-time quote broadcasting"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, layers_text, 11, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 9: Архитектура системы")
-
-    # СЛАЙД 10: DATABASE SCHEMA
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Database Schema (ER-модель)"
-
-    db_text = """PortfolioService (PostgreSQL):
-portfolio, portfolio_asset, portfolio_asset_transaction
-
-StockCardService (PostgreSQL + MongoDB):
-ShareCards, BondCards, CryptoCards, Multipliers, Dividends, Coupons
-MongoDB: FinancialReports (коллекция)
-
-AnalyticsService (PostgreSQL):
-asset_transactions, asset_ratings
-
-AuthService (PostgreSQL):
-users, roles, role_permissions, permissions, refresh_sessions
-
-Key Optimizations:
-Индексы на внешние ключи (portfolio_id, user_id, stock_card_id)
-Индексы на даты (transaction_date, period_start, period_end)
-Индексы для поиска (ticker, name)
-Кэширование часто запрашиваемых данных в Redis"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, db_text, 11, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 10: Database Schema")
-
-    # СЛАЙД 11: NON-FUNCTIONAL REQUIREMENTS
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Non-Functional Requirements (NFR)"
-
-    nfr_text = """Производительность:
-API response time: p95 < 200ms, p99 < 500ms • WebSocket latency: < 100ms
-Database query time: < 50ms (p95) • Поддержка 1000+ concurrent users • Throughput: 1000+ requests/second
-
-Масштабируемость:
-Горизонтальное масштабирование микросервисов • Автоматическое масштабирование в Kubernetes (HPA)
-Кэширование через Redis • Асинхронная обработка через Kafka • Database per Service
-
-Надежность:
-Availability: 99.9% (SLA) • Retry механизмы (Polly) • Circuit Breaker • Graceful degradation • Health checks
-
-Безопасность:
-TLS 1.3 • JWT токены (1 час) • Refresh token rotation • Rate limiting (100 req/min)
-Валидация входных данных (FluentValidation) • SQL injection protection (EF Core) • CORS restricted
-
-Поддерживаемость:
-Clean Architecture • Unit test coverage: 80%+ • Integration tests (TestContainers)
-Структурированное логирование (Serilog + OpenSearch) • Мониторинг (OpenTelemetry) • API documentation (Swagger)"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, nfr_text, 10, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 11: Non-Functional Requirements")
-
-    # СЛАЙД 12: SECURITY ARCHITECTURE
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Security Architecture"
-
-    security_text = """Authentication:
-JWT tokens с коротким временем жизни (15 минут для access token)
-Refresh token rotation (автоматическая смена, 30 дней)
-Password policy: min 8 chars, complexity requirements
-ASP.NET Identity для управления пользователями
-
-Authorization:
-RBAC: ADMIN, USER roles • Row-level security для user data (фильтрация по user_id)
-Policy-based authorization в ASP.NET Core • Приватные портфели (IsPrivate флаг)
-
-Data Protection:
-TLS 1.3 for transit (HTTPS) • AES-256 for data at rest
-Password hashing (bcrypt через ASP.NET Identity) • Secrets management (environment variables, Azure Key Vault)
-
-API Security:
-Rate limiting per user (100 req/min) • CORS restricted to registered domains
-API key validation для внешних интеграций • Request signing для sensitive operations
-Input validation (FluentValidation) • SQL injection protection (EF Core)"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, security_text, 11, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 12: Security Architecture")
-
-    # СЛАЙД 13: TESTING STRATEGY
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Testing Strategy"
-
-    testing_text = """Unit Tests (80% coverage):
-xUnit / NUnit (test framework) • Moq / NSubstitute (mocking) • FluentAssertions (assertions)
-Domain services, application services, utilities • Component logic tests
-
-Integration Tests:
-API endpoints с database (TestContainers для PostgreSQL)
-External API mocking (MOEX, SendGrid) • Kafka integration tests (Testcontainers)
-HTTP client testing (WebApplicationFactory)
-
-Performance Tests:
-Load testing (k6, NBomber) • Stress testing для определения пределов
-Database performance tests
-
-E2E Tests:
-Playwright / Cypress для frontend • API E2E tests через Gateway"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, testing_text, 11, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 13: Testing Strategy")
-
-    # СЛАЙД 14: DEPLOYMENT & DEVOPS
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Deployment & DevOps"
-
-    devops_text = """CI/CD Pipeline (GitHub Actions):
-1. Code push to Git 2. Linting & formatting checks 3. Unit tests 4. Integration tests
-5. Build Docker image 6. Push to container registry 7. Deploy to staging
-8. Run E2E tests 9. Manual approval 10. Deploy to production (blue-green deployment)
-
-Infrastructure:
-Docker containers для всех сервисов • .NET Aspire для локальной разработки
-Kubernetes для orchestration (production) • Database: Managed PostgreSQL (AWS RDS / Azure Database)
-Cache: Redis cluster (managed service) • Load balancer: ALB (AWS) / Azure LB
-CDN: Cloudflare / AWS CloudFront • Monitoring: OpenTelemetry • Logging: OpenSearch
-Dashboards: OpenSearch Dashboards • Kafka UI (порт 9100) • Mongo Express (порт 5005) • PgWeb (порты 5000, 5001)
-
-Deployment Strategy:
-Blue-Green deployment для zero-downtime • Canary releases для постепенного rollout
-Database migrations через EF Core Migrations (автоматические при старте)
-Health checks для всех сервисов (/health, /alive)"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, devops_text, 10, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 14: Deployment & DevOps")
-
-    # СЛАЙД 15: MONITORING & OBSERVABILITY
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Monitoring & Observability"
-
-    monitoring_text = """Metrics & Tracing (OpenTelemetry):
-API response time (p50, p95, p99) • Database query time • Cache hit ratio (Redis)
-WebSocket connections (SignalR) • Kafka message processing rate
-Error rates по сервисам • Distributed tracing между сервисами
-
-Dashboards (OpenSearch Dashboards):
-System health (CPU, memory, disk) • API performance (latency, throughput)
-Database metrics (connections, slow queries) • Business metrics (active users, transactions, portfolios)
-Error rates и logs • Kafka topics monitoring
-
-Logging (OpenSearch):
-Structured JSON logs • Log levels: ERROR, WARN, INFO, DEBUG
-Centralized search и analysis • Correlation IDs для трейсинга запросов
-Интеграция с OpenTelemetry для контекста
-
-Observability:
-OpenTelemetry для метрик, трейсинга и логов
-OpenSearch для хранения и анализа логов • OpenSearch Dashboards для визуализации"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, monitoring_text, 10, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 15: Monitoring & Observability")
-
-    # СЛАЙД 16: EVENT-DRIVEN COMMUNICATION (с диаграммами)
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Event-Driven Communication"
-
-    kafka_text = """Kafka Topics:
-
-1. portfolio.transactions
-   - Producer: PortfolioService
-   - Consumers: AnalyticsService, NotificationService
-   - Consumer Group: analytics-service-transactions
-   - Batch processing: 100 сообщений за раз
-   - Manual offset commit после успешной обработки
-
-2. financial.report.created
-   - Producer: StockCardService
-   - Payload: FinancialReportCreatedMessage
-   - Хранение отчетов в MongoDB
-
-Схема взаимодействия:
-PortfolioService → Outbox → Kafka → AnalyticsService/NotificationService"""
-
-    add_text_box(slide, 0.5, 1.5, 4.5, 4, kafka_text, 11, False, WHITE, PP_ALIGN.LEFT)
-
-    # Вставить диаграмму Kafka (diagram_002.svg - Создание транзакции с публикацией в Kafka)
-    svg_path = diagrams_path / "diagram_002.svg"
-    if svg_path.exists():
-        png_path = svg_path.with_suffix('.png')
-        png_path = svg_to_png(svg_path, str(png_path))
-        if png_path and os.path.exists(png_path):
-            add_image(slide, png_path, 5.5, 1.5, 4.5, 4)
-            print(f"  Вставлена диаграмма: diagram_002.svg")
-
-    print("✓ Создан слайд 16: Event-Driven Communication")
-
-    # СЛАЙД 17: API ENDPOINTS
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "API Endpoints"
-
-    api_text = """PortfolioService:
-GET/POST /api/v1/portfolios • GET/PUT/DELETE /api/v1/portfolios/{id}
-GET/POST /api/v1/portfolio-assets • GET/POST /api/v1/portfolio-assets/{id}/transactions
-
-StockCardService:
-GET /api/stockcard/shares • GET /api/stockcard/bonds • GET /api/stockcard/crypto
-GET /api/stockcard/{ticker} • GET /api/stockcard/{ticker}/price
-SignalR Hub: /priceHub (подписка на real-time котировки)
-
-AnalyticsService:
-GET /api/analytics/transactions • GET /api/analytics/assets/top-bought
-GET /api/analytics/assets/top-sold • GET /api/analytics/portfolios/{id}/history
-POST /api/analytics/portfolios/compare
-
-AuthService:
-POST /api/auth/register • POST /api/auth/login • POST /api/auth/refresh • POST /api/auth/logout
-
-NotificationService:
-POST /api/notifications/send • Потребление событий из Kafka для автоматических уведомлений"""
-
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, api_text, 10, False, WHITE, PP_ALIGN.LEFT)
-
-    print("✓ Создан слайд 17: API Endpoints")
-
-    # СЛАЙД 18: ВЫВОДЫ И ПЕРСПЕКТИВЫ
-    slide = prs.slides.add_slide(prs.slide_layouts[1] if len(prs.slide_layouts) > 1 else prs.slide_layouts[6])
-
-    if slide.shapes.title:
-        slide.shapes.title.text = "Выводы и перспективы"
-
-    results_text = """Технические результаты:
-✓ Масштабируемая микросервисная архитектура с Clean Architecture
-✓ Real-time infrastructure с SignalR WebSocket
-✓ Event-Driven Architecture с Kafka
-✓ Оптимизированные databases с индексами
-✓ Multi-layer security (JWT, encryption)
-✓ Comprehensive monitoring и observability
-
-Бизнес-результаты:
-✓ Единая платформа для мониторинга котировок
-✓ Удобное управление портфелями
-✓ Автоматические оповещения
-✓ Аналитика и рейтинги активов
-✓ Многопользовательский доступ с RBAC
+                if element.get('label'):
+                    add_text_box(slide, left, top + height + 0.1, width, 0.2,
+                                 render_text(element['label'], context), 10, False, ACCENT_COLOR, 'center')
+                print(f"  Вставлена диаграмма: {element['diagram']}")
+        else:
+            print(f"Warning: Unknown element type '{element_type}' on slide {slide_spec['id']}")
 
-Перспективы:
-1. Масштабирование в Kubernetes для production
-2. Использование ИИ для аналитики и прогнозирования
-3. Расширение типов активов (фьючерсы, опционы)
-4. Мобильное приложение (React Native)
-5. Расширенная аналитика с ML моделями"""
+    return slide
 
-    add_text_box(slide, 0.5, 1.5, 9, 5.5, results_text, 11, False, WHITE, PP_ALIGN.LEFT)
+def build_deck(template_bytes, slides, assets, output_path, context, default_layout=1):
+    """Собрать и сохранить презентацию из подготовленных шаблона и ресурсов"""
+    prs = open_presentation(template_bytes)
 
-    print("✓ Создан слайд 18: Выводы и перспективы")
+    for number, slide_spec in enumerate(slides, start=1):
+        with stage('slides'):
+            build_slide(prs, slide_spec, assets, context, default_layout)
+        print(f"✓ Создан слайд {number}: {slide_spec.get('name', slide_spec['id'])}")
 
     # Сохранить презентацию
-    prs.save(str(output_path))
+    previous_size = output_path.stat().st_size if output_path.exists() else None
+    with stage('save'):
+        prs.save(str(output_path))
     print(f"\n{'='*60}")
     print(f"Презентация сохранена: {output_path}")
     print(f"Всего слайдов: {len(prs.slides)}")
+    report_deck_size(output_path, previous_size)
     print(f"{'='*60}")
+    return output_path
+
+def create_presentation(dpi=DEFAULT_DPI, spec_path=SLIDES_SPEC_PATH):
+    """Создать презентацию на основе шаблона и описания слайдов"""
+
+    spec = load_slide_spec(spec_path)
+    spec_dir = Path(spec_path).parent
+
+    # Пути к файлам
+    template_path = spec_dir / spec['template']
+    output_path = spec_dir / spec['output']
+    diagrams_path = spec_dir / spec['diagrams']
+    cache_dir = spec_dir / DECK_CACHE_DIR
+    cache_dir.mkdir(exist_ok=True)
+
+    slides = spec['slides']
+
+    # Растеризуем диаграммы измененных слайдов заранее (параллельно, с пропуском актуальных)
+    assets, manifest, changed = prepare_slide_assets(slides, diagrams_path, cache_dir, dpi)
+    print(f"Изменено слайдов с прошлой сборки: {len(changed)} из {len(slides)}")
+
+    template_bytes = load_template_bytes(template_path, cache_dir)
+    context = {'date': datetime.now().strftime("%d.%m.%Y")}
+    build_deck(template_bytes, slides, assets, output_path, context, spec.get('default_layout', 1))
+    save_deck_manifest(cache_dir, manifest)
+
+def select_variant_slides(spec, variant):
+    """Слайды варианта: все слайды описания или только перечисленные в 'slides' (в порядке описания)"""
+    slides = spec['slides']
+    if 'slides' not in variant:
+        return slides
+    selected = set(variant['slides'])
+    unknown = selected - {slide_spec['id'] for slide_spec in slides}
+    if unknown:
+        print(f"Warning: Variant {variant['name']} references unknown slides: {', '.join(sorted(unknown))}")
+    return [slide_spec for slide_spec in slides if slide_spec['id'] in selected]
+
+def _build_variant_job(job):
+    """Задача для пула процессов: собрать один вариант презентации"""
+    template_bytes, slides, assets, output_path, context, default_layout = job
+    return str(build_deck(template_bytes, slides, assets, Path(output_path), context, default_layout))
+
+def create_presentation_variants(variants_path, dpi=DEFAULT_DPI, parallel=False, max_workers=None):
+    """
+    Собрать несколько вариантов презентации за один запуск
+
+    Описание вариантов - JSON со списком 'variants', у каждого варианта:
+    name, spec (описание слайдов), необязательные output, slides (id слайдов
+    для короткой версии) и variables (переменные для подстановки в текст).
+    Каждый шаблон разбирается и очищается один раз. Диаграммы от переменных
+    не зависят, поэтому ресурсы готовятся один раз на описание слайдов (все
+    диаграммы - одним проходом растеризации) и общие для всех его вариантов;
+    затем варианты собираются последовательно или в пуле процессов
+    (parallel=True).
+    """
+    variants_path = Path(variants_path)
+    with open(variants_path, 'r', encoding='utf-8') as f:
+        variants = json.load(f)['variants']
+
+    base_dir = variants_path.parent
+    cache_dir = base_dir / DECK_CACHE_DIR
+    cache_dir.mkdir(exist_ok=True)
+    date_text = datetime.now().strftime("%d.%m.%Y")
+
+    specs = {}
+    templates = {}
+    plans = []
+    for variant in variants:
+        spec_path = base_dir / variant.get('spec', SLIDES_SPEC_PATH.name)
+        if spec_path not in specs:
+            specs[spec_path] = load_slide_spec(spec_path)
+        spec = specs[spec_path]
+        spec_dir = spec_path.parent
+        template_path = spec_dir / spec['template']
+        if template_path not in templates:
+            templates[template_path] = load_template_bytes(template_path, cache_dir)
+        output_path = spec_dir / variant.get('output', f"{Path(spec['output']).stem}_{variant['name']}.pptx")
+        plans.append((variant, spec_path, spec, templates[template_path], output_path))
+
+    # Ресурсы - один раз на описание слайдов: слайды всех его вариантов одним проходом
+    used_slides = {}
+    for variant, spec_path, spec, _, _ in plans:
+        used = used_slides.setdefault(spec_path, set())
+        used.update(slide_spec['id'] for slide_spec in select_variant_slides(spec, variant))
+    prepared = {}
+    manifests = []
+    for spec_path, used in used_slides.items():
+        spec = specs[spec_path]
+        slides = [slide_spec for slide_spec in spec['slides'] if slide_spec['id'] in used]
+        manifest_file = f"manifest_{spec_path.stem}.json"
+        assets, manifest, changed = prepare_slide_assets(
+            slides, spec_path.parent / spec['diagrams'], cache_dir, dpi, manifest_file, max_workers
+        )
+        prepared[spec_path] = (assets, set(changed))
+        manifests.append((manifest, manifest_file))
+
+    jobs = []
+    for variant, spec_path, spec, template_bytes, output_path in plans:
+        slides = select_variant_slides(spec, variant)
+        assets, changed = prepared[spec_path]
+        changed_count = sum(slide_spec['id'] in changed for slide_spec in slides)
+        print(f"Вариант {variant['name']}: изменено слайдов {changed_count} из {len(slides)}")
+        context = {'date': date_text, **variant.get('variables', {})}
+        jobs.append((template_bytes, slides, assets, str(output_path), context, spec.get('default_layout', 1)))
+
+    if parallel and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outputs = list(executor.map(_build_variant_job, jobs))
+    else:
+        outputs = [_build_variant_job(job) for job in jobs]
+
+    for manifest, manifest_file in manifests:
+        save_deck_manifest(cache_dir, manifest, manifest_file)
+
+    print(f"Собрано вариантов: {len(outputs)}")
+    for output in outputs:
+        print(f"  {output}")
+    return outputs
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Создание презентации Stock Market Assistant')
+    parser.add_argument(
+        '--spec',
+        default=str(SLIDES_SPEC_PATH),
+        help='JSON-описание слайдов (по умолчанию: slides.json рядом со скриптом)'
+    )
+    parser.add_argument(
+        '--variants',
+        help='JSON со списком вариантов презентации для пакетной сборки'
+    )
+    parser.add_argument(
+        '--parallel',
+        action='store_true',
+        help='Собирать варианты параллельно в пуле процессов'
+    )
+    parser.add_argument(
+        '--dpi',
+        type=int,
+        default=DEFAULT_DPI,
+        help=f'Разрешение растеризации диаграмм (по умолчанию: {DEFAULT_DPI})'
+    )
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.variants:
+        run_profiled(args, create_presentation_variants, args.variants, dpi=args.dpi, parallel=args.parallel)
+    else:
+        run_profiled(args, create_presentation, dpi=args.dpi, spec_path=args.spec)
 
 if __name__ == "__main__":
-    create_presentation()
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Поиск максимальной устойчивой пропускной способности AnalyticsService
+
+Продюсер с обратной связью: отправляет транзакции в portfolio.transactions
+с заданной скоростью, по шагам (--step-seconds) измеряет отставание
+обработки и меняет скорость по AIMD:
+    - отставание в пределах --max-lag и почти не растет: скорость += --increase
+    - отставание больше --max-lag или растет быстрее LAG_GROWTH_SHARE * --max-lag
+      за шаг: скорость *= --decrease, затем скорость держится, пока отставание
+      разбирается, и снижается снова, только если оно продолжает расти
+
+Отставание берется из lag consumer group (--signal lag, по умолчанию) или
+из количества сохраненных строк asset_transactions (--signal db):
+отправлено - вставлено с начала прогона. Результат - наибольшая скорость,
+при которой отставание остается ограниченным (медиана по циклам AIMD), и
+скорость потребления, измеренная на этих шагах.
+
+Использование:
+    python scripts/capacity_producer.py --max-lag 2000 --cycles 3
+    python scripts/capacity_producer.py --signal db --db-dsn "host=localhost dbname=analytics-db user=postgres"
+
+Требует: kafka-python; для --signal db - psycopg2
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from send_test_kafka_message import create_test_transaction_message, serialize_value
+from kafka_lag_monitor import KafkaOffsetsSource, LagTracker
+from kafka_common import DEFAULT_BOOTSTRAP, DEFAULT_GROUP, DEFAULT_TOPIC, DEFAULT_DB_DSN, import_psycopg2
+
+# kafka-python и psycopg2 импортируются при запуске прогона
+
+# Начальная скорость, шаг увеличения (сообщений/с) и множитель уменьшения
+DEFAULT_START_RATE = 100
+DEFAULT_INCREASE = 100
+DEFAULT_DECREASE = 0.5
+DEFAULT_MIN_RATE = 10
+# Длительность шага регулирования (в секундах)
+DEFAULT_STEP_SECONDS = 10
+# Допустимое отставание (сообщений) - граница "устойчивой" скорости
+DEFAULT_MAX_LAG = 1000
+# Рост отставания за шаг (доля от --max-lag), при котором скорость уже не устойчива:
+# на коротком шаге отставание может не успеть превысить --max-lag
+LAG_GROWTH_SHARE = 0.2
+# Сколько снижений скорости (циклов AIMD) сделать до остановки
+DEFAULT_CYCLES = 3
+# Шаг считается ограниченным продюсером, если отправлено меньше этой доли от цели
+PRODUCER_LIMIT_RATIO = 0.9
+# Сколько шагов подряд, ограниченных продюсером, допускается до остановки
+PRODUCER_LIMIT_STEPS = 3
+DEFAULT_DB_TABLE = 'asset_transactions'
+
+
+class LagSignal:
+    """Отставание как суммарный lag consumer group AnalyticsService"""
+
+    name = 'lag'
+
+    def __init__(self, args):
+        self.source = KafkaOffsetsSource(args.bootstrap_server, args.group, args.topic)
+        self.tracker = LagTracker(smoothing=1.0)
+
+    def measure(self, acked):
+        """(отставание в сообщениях, скорость потребления в сообщениях/с или None)"""
+        status = self.tracker.update(self.source.snapshot(), time.monotonic())
+        return status['lag'], status['consume_rate']
+
+    def close(self):
+        self.source.close()
+
+
+class PersistedSignal:
+    """
+    Отставание как разница между подтвержденными Kafka и вставленными в БД строками
+
+    Количество вставок берется из pg_stat_user_tables.n_tup_ins, а не
+    COUNT(*): запрос не сканирует таблицу, статистика отстает на доли секунды.
+    """
+
+    name = 'db'
+
+    def __init__(self, args):
+        psycopg2 = import_psycopg2()
+        with stage('connect'):
+            self.connection = psycopg2.connect(args.db_dsn)
+        self.connection.autocommit = True
+        self.table = args.db_table
+        self.baseline = self._inserted()
+        self.previous = (self.baseline, time.monotonic())
+
+    def _inserted(self):
+        with self.connection.cursor() as cursor:
+            # Без этого статистика кэшируется до конца транзакции
+            cursor.execute("SELECT pg_stat_clear_snapshot()")
+            cursor.execute("SELECT n_tup_ins FROM pg_stat_user_tables WHERE relname = %s", (self.table,))
+            row = cursor.fetchone()
+        if row is None:
+            raise RuntimeError(f"таблица {self.table} не найдена в pg_stat_user_tables")
+        return row[0]
+
+    def measure(self, acked):
+        inserted = self._inserted()
+        now = time.monotonic()
+        previous_inserted, previous_time = self.previous
+        self.previous = (inserted, now)
+        rate = (inserted - previous_inserted) / (now - previous_time) if now > previous_time else None
+        return max(0, acked - (inserted - self.baseline)), rate
+
+    def close(self):
+        self.connection.close()
+
+
+class AimdController:
+    """Additive increase / multiplicative decrease по признаку ограниченного отставания"""
+
+    def __init__(self, start_rate, increase, decrease, min_rate, max_rate=None):
+        self.rate = float(start_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.backing_off = False
+        self.previous_lag = None
+        self.cycle_peaks = []
+        self.last_healthy_rate = None
+
+    def update(self, lag, max_lag, send_rate):
+        """
+        Учесть итог шага и выбрать скорость следующего
+
+        Returns:
+            Решение: 'increase', 'hold', 'decrease' или 'drain'
+        """
+        producer_limited = send_rate < self.rate * PRODUCER_LIMIT_RATIO
+        growth = lag - self.previous_lag if self.previous_lag is not None else 0
+        self.previous_lag = lag
+
+        if lag <= max_lag and growth <= max_lag * LAG_GROWTH_SHARE:
+            self.backing_off = False
+            # Устойчивой считается фактически отправленная, а не целевая скорость
+            self.last_healthy_rate = min(self.rate, send_rate)
+            if producer_limited or (self.max_rate and self.rate >= self.max_rate):
+                return 'hold'
+            self.rate += self.increase
+            if self.max_rate:
+                self.rate = min(self.rate, self.max_rate)
+            return 'increase'
+
+        if self.backing_off and growth <= 0:
+            # После снижения ждем, пока накопленное отставание разберется
+            return 'drain'
+        if not self.backing_off and self.last_healthy_rate is not None:
+            self.cycle_peaks.append(self.last_healthy_rate)
+        self.backing_off = True
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        return 'decrease'
+
+
+class PacedProducer:
+    """Долгоживущий асинхронный продюсер, отправляющий с заданной скоростью"""
+
+    def __init__(self, args):
+        try:
+            from kafka import KafkaProducer
+        except ImportError:
+            print("Ошибка: библиотека kafka-python не установлена!")
+            print("Установите: pip install kafka-python")
+            sys.exit(1)
+        with stage('connect'):
+            self.producer = KafkaProducer(
+                bootstrap_servers=args.bootstrap_server,
+                value_serializer=serialize_value,
+                key_serializer=lambda k: k.encode('utf-8') if k else None,
+                linger_ms=args.linger_ms,
+                batch_size=args.batch_size,
+                acks=args.acks,
+            )
+        self.topic = args.topic
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+
+    def _on_success(self, _metadata):
+        self.acked += 1
+
+    def _on_error(self, _exception):
+        self.errors += 1
+
+    def send_for(self, rate, seconds):
+        """
+        Отправлять сообщения со скоростью rate в течение seconds секунд
+
+        Returns:
+            Количество отправленных сообщений
+        """
+        started = time.monotonic()
+        sent = 0
+        while True:
+            elapsed = time.monotonic() - started
+            if elapsed >= seconds:
+                break
+            due = int(elapsed * rate) + 1 - sent
+            for _ in range(due):
+                message, key = create_test_transaction_message()
+                with stage('send'):
+                    future = self.producer.send(self.topic, key=key, value=message)
+                future.add_callback(self._on_success)
+                future.add_errback(self._on_error)
+                sent += 1
+            if due <= 0:
+                time.sleep(min(1.0 / rate, seconds - elapsed, 0.01))
+        self.sent += sent
+        return sent
+
+    def close(self):
+        with stage('flush'):
+            self.producer.flush()
+        self.producer.close()
+
+
+def make_signal(args):
+    return PersistedSignal(args) if args.signal == 'db' else LagSignal(args)
+
+
+def find_capacity(args):
+    """Прогон AIMD, вернуть словарь с шагами и итоговой оценкой"""
+    signal = make_signal(args)
+    producer = PacedProducer(args)
+    controller = AimdController(args.start_rate, args.increase, args.decrease, args.min_rate, args.max_rate)
+    steps = []
+    limited_steps = 0
+    started = time.monotonic()
+    signal.measure(0)
+
+    print(f"{'шаг':>4} {'цель/с':>9} {'отпр./с':>9} {'потр./с':>9} {'отставание':>11} {'ошибок':>7}  решение")
+    try:
+        while len(controller.cycle_peaks) < args.cycles:
+            if args.duration and time.monotonic() - started >= args.duration:
+                print("⚠️ Достигнута максимальная длительность прогона")
+                break
+            rate = controller.rate
+            step_started = time.monotonic()
+            sent = producer.send_for(rate, args.step_seconds)
+            send_rate = sent / (time.monotonic() - step_started)
+            with stage('measure'):
+                lag, consume_rate = signal.measure(producer.acked)
+            producer_limited = send_rate < rate * PRODUCER_LIMIT_RATIO
+            decision = controller.update(lag, args.max_lag, send_rate)
+            step = {
+                'step': len(steps) + 1,
+                'target_rate': rate,
+                'send_rate': send_rate,
+                'consume_rate': consume_rate,
+                'lag': lag,
+                'errors': producer.errors,
+                'producer_limited': producer_limited,
+                'decision': decision,
+            }
+            steps.append(step)
+            consume = '?' if consume_rate is None else f"{consume_rate:.0f}"
+            note = ' (ограничено продюсером)' if producer_limited else ''
+            print(f"{step['step']:>4} {rate:>9.0f} {send_rate:>9.0f} {consume:>9} {lag:>11} "
+                  f"{producer.errors:>7}  {decision}{note}", flush=True)
+            limited_steps = limited_steps + 1 if producer_limited and decision == 'hold' else 0
+            if limited_steps >= PRODUCER_LIMIT_STEPS:
+                print("⚠️ Продюсер не успевает за целевой скоростью, а consumer - успевает: "
+                      "предел выше, чем может отправить этот продюсер")
+                break
+            if args.max_rate and decision == 'hold' and rate >= args.max_rate:
+                print("⚠️ Достигнута --max-rate без роста отставания")
+                break
+    except KeyboardInterrupt:
+        print("\nПрерывание: итог по выполненным шагам")
+    finally:
+        producer.close()
+        signal.close()
+
+    return build_result(args, controller, steps, producer)
+
+
+def build_result(args, controller, steps, producer):
+    """Итоговая оценка устойчивой скорости"""
+    peaks = controller.cycle_peaks
+    if peaks:
+        sustainable = statistics.median(peaks)
+    else:
+        # Ни одного снижения: оценка снизу - последняя скорость без роста отставания
+        sustainable = controller.last_healthy_rate
+    healthy_consume = [step['consume_rate'] for step in steps
+                       if step['consume_rate'] is not None and step['lag'] <= args.max_lag]
+    return {
+        'signal': args.signal,
+        'max_lag': args.max_lag,
+        'step_seconds': args.step_seconds,
+        'sustainable_rate': sustainable,
+        'lower_bound_only': not peaks,
+        'cycle_peaks': peaks,
+        'max_consume_rate': max(healthy_consume) if healthy_consume else None,
+        'producer_limited': any(step['producer_limited'] for step in steps),
+        'sent': producer.sent,
+        'acked': producer.acked,
+        'errors': producer.errors,
+        'steps': steps,
+    }
+
+
+def print_result(result):
+    print()
+    print("=" * 60)
+    if result['sustainable_rate'] is None:
+        print("Устойчивая скорость не найдена: отставание превышено уже на начальной скорости")
+    else:
+        prefix = 'не меньше ' if result['lower_bound_only'] else ''
+        print(f"Устойчивая скорость: {prefix}{result['sustainable_rate']:.0f} сообщений/с "
+              f"(отставание <= {result['max_lag']}, сигнал: {result['signal']})")
+    if result['cycle_peaks']:
+        print(f"Пики по циклам AIMD: {', '.join(f'{peak:.0f}' for peak in result['cycle_peaks'])}")
+    if result['max_consume_rate'] is not None:
+        print(f"Наибольшая измеренная скорость потребления: {result['max_consume_rate']:.0f} сообщений/с")
+    if result['producer_limited']:
+        print("⚠️ На части шагов продюсер не успевал за целевой скоростью - "
+              "увеличьте --linger-ms / --batch-size")
+    print(f"Отправлено: {result['sent']}, подтверждено: {result['acked']}, ошибок: {result['errors']}")
+    print("=" * 60)
+
+
+def run(args):
+    result = find_capacity(args)
+    print_result(result)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Отчет сохранен: {args.report}")
+    return 0 if result['sustainable_rate'] is not None else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Поиск максимальной устойчивой скорости обработки транзакций (AIMD по отставанию)'
+    )
+    parser.add_argument('--bootstrap-server', default=DEFAULT_BOOTSTRAP,
+                        help=f'Адрес Kafka брокера (по умолчанию: {DEFAULT_BOOTSTRAP})')
+    parser.add_argument('--topic', default=DEFAULT_TOPIC,
+                        help=f'Название топика (по умолчанию: {DEFAULT_TOPIC})')
+    parser.add_argument('--group', default=DEFAULT_GROUP,
+                        help=f'Consumer group для --signal lag (по умолчанию: {DEFAULT_GROUP})')
+    parser.add_argument('--signal', choices=['lag', 'db'], default='lag',
+                        help='Источник отставания: lag consumer group или вставленные строки в БД')
+    parser.add_argument('--db-dsn', default=DEFAULT_DB_DSN,
+                        help='Строка подключения к analytics-db для --signal db (или ANALYTICS_DB_DSN)')
+    parser.add_argument('--db-table', default=DEFAULT_DB_TABLE,
+                        help=f'Таблица транзакций для --signal db (по умолчанию: {DEFAULT_DB_TABLE})')
+    parser.add_argument('--start-rate', type=float, default=DEFAULT_START_RATE,
+                        help=f'Начальная скорость, сообщений/с (по умолчанию: {DEFAULT_START_RATE})')
+    parser.add_argument('--increase', type=float, default=DEFAULT_INCREASE,
+                        help=f'Прибавка скорости за шаг, сообщений/с (по умолчанию: {DEFAULT_INCREASE})')
+    parser.add_argument('--decrease', type=float, default=DEFAULT_DECREASE,
+                        help=f'Множитель скорости при превышении отставания (по умолчанию: {DEFAULT_DECREASE})')
+    parser.add_argument('--min-rate', type=float, default=DEFAULT_MIN_RATE,
+                        help=f'Минимальная скорость, сообщений/с (по умолчанию: {DEFAULT_MIN_RATE})')
+    parser.add_argument('--max-rate', type=float, help='Максимальная скорость, сообщений/с')
+    parser.add_argument('--step-seconds', type=float, default=DEFAULT_STEP_SECONDS,
+                        help=f'Длительность шага регулирования (по умолчанию: {DEFAULT_STEP_SECONDS})')
+    parser.add_argument('--max-lag', type=int, default=DEFAULT_MAX_LAG,
+                        help=f'Допустимое отставание, сообщений (по умолчанию: {DEFAULT_MAX_LAG})')
+    parser.add_argument('--cycles', type=int, default=DEFAULT_CYCLES,
+                        help=f'Количество снижений скорости до остановки (по умолчанию: {DEFAULT_CYCLES})')
+    parser.add_argument('--duration', type=float, help='Максимальная длительность прогона в секундах')
+    parser.add_argument('--linger-ms', type=int, default=5, help='linger.ms продюсера (по умолчанию: 5)')
+    parser.add_argument('--batch-size', type=int, default=64 * 1024,
+                        help='batch.size продюсера в байтах (по умолчанию: 65536)')
+    parser.add_argument('--acks', default='1', choices=['0', '1', 'all'],
+                        help='acks продюсера: 0, 1 или all (по умолчанию: 1)')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить шаги и итог в JSON')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.acks != 'all':
+        args.acks = int(args.acks)
+
+    return run_profiled(args, run, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
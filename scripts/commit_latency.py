@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Задержка от отправки сообщения до коммита его offset'а consumer group
+
+Продюсер сообщает offset каждого подтвержденного сообщения (add), фоновый
+опрос закоммиченных offset'ов группы (monitor_commits, источник -
+KafkaOffsetsSource из kafka_lag_monitor) отмечает сообщения с offset'ом
+меньше закоммиченного. Задержки копятся в гистограммах по группам
+сообщений, которые задает вызывающий (вид сообщения, поток сценария).
+
+Используется poison_benchmark и scenario_runner.
+"""
+
+import time
+import heapq
+import threading
+
+from tool_profiling import stage
+from kafka_common import LatencyHistogram
+
+
+class CommitLatencyTracker:
+    """
+    Задержка от отправки до коммита offset'а consumer group по группам сообщений
+
+    Args:
+        ignored_groups: служебные группы - их сообщения ожидаются и попадают
+            в гистограммы, но не учитываются в last_commit_time и unresolved()
+    """
+
+    def __init__(self, ignored_groups=()):
+        self.lock = threading.Lock()
+        self.ignored_groups = frozenset(ignored_groups)
+        self.pending = {}
+        self.outstanding = 0
+        self.histograms = {}
+        self.last_commit_time = None
+
+    def add(self, partition, offset, sent_at, group):
+        with self.lock:
+            heapq.heappush(self.pending.setdefault(partition, []), (offset, sent_at, group))
+
+    def expect(self, count):
+        with self.lock:
+            self.outstanding += count
+
+    def resolve(self, committed, now):
+        """Отметить сообщения с offset'ом меньше закоммиченного"""
+        with self.lock:
+            for partition, offset in committed.items():
+                heap = self.pending.get(partition)
+                while heap and offset is not None and heap[0][0] < offset:
+                    _, sent_at, group = heapq.heappop(heap)
+                    self.histograms.setdefault(group, LatencyHistogram()).record((now - sent_at) * 1000)
+                    self.outstanding -= 1
+                    if group not in self.ignored_groups:
+                        self.last_commit_time = now
+
+    def unresolved(self):
+        """Сколько подтвержденных брокером сообщений (кроме служебных) еще не закоммичено"""
+        with self.lock:
+            return sum(group not in self.ignored_groups
+                       for heap in self.pending.values() for _, _, group in heap)
+
+    def done(self):
+        with self.lock:
+            return self.outstanding <= 0
+
+
+def monitor_commits(source, tracker, interval, stop):
+    """Фоновый опрос закоммиченных offset'ов"""
+    while not stop.is_set():
+        with stage('poll'):
+            snapshot = source.snapshot()
+        tracker.resolve({partition: values[0] for partition, values in snapshot.items()}, time.monotonic())
+        stop.wait(interval)
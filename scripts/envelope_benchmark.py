@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Оценка приема транзакций конвертами (N транзакций в одной записи Kafka)
+
+Для каждого размера конверта из --sizes отправляет одну и ту же нагрузку
+(--count транзакций) в отдельный топик и читает ее эталонным consumer,
+повторяющим цикл TransactionConsumer.ProcessBatchAsync в AnalyticsService:
+до --consumer-batch записей (KafkaConfiguration.BatchSize) за раз, разбор
+каждой записи, сохранение всех транзакций пачки одной транзакцией БД и
+синхронный коммит offset'а. Размер 1 - текущий контракт (одиночный
+TransactionMessage с ключом portfolioId), остальные - конверты из
+transaction_envelope.py.
+
+С --dsn транзакции пишутся в analytics-db, в отдельную таблицу
+envelope_benchmark_transactions (копия asset_transactions с индексами,
+удаляется в конце); без --dsn измеряется только Kafka и разбор.
+Публикация TransactionReceivedEvent не эмулируется: она идет по одной на
+транзакцию и от конвертов не зависит.
+
+Результат - скорость приема (транзакций/с) по размерам и ускорение
+относительно первого размера. Это оценка до смены контракта: сервис
+конверты пока не понимает, поэтому топик portfolio.transactions запрещен.
+
+Использование:
+    python scripts/envelope_benchmark.py --sizes 1,10,50,100 --count 20000
+    python scripts/envelope_benchmark.py --sizes 1,100 --dsn "host=localhost dbname=analytics-db user=postgres"
+    python scripts/envelope_benchmark.py --sizes 50 --count 100000 --produce-only
+
+Требует: kafka-python; с --dsn - psycopg2
+"""
+
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from send_test_kafka_message import create_test_transaction_message
+from transaction_envelope import EnvelopePacker, EnvelopeError, encode_envelope, decode_record
+from kafka_common import (DEFAULT_BOOTSTRAP, DEFAULT_TOPIC, import_kafka, import_psycopg2, topic_partitions,
+                          produce)
+
+# kafka-python и psycopg2 импортируются при запуске
+
+DEFAULT_BENCHMARK_TOPIC = 'portfolio.transactions.batched'
+DEFAULT_SIZES = '1,10,50,100'
+DEFAULT_COUNT = 20000
+# KafkaConfiguration.BatchSize в AnalyticsService
+DEFAULT_CONSUMER_BATCH = 100
+# Сколько ждать записей, прежде чем считать замер оборванным (в секундах)
+DEFAULT_IDLE_TIMEOUT = 30
+SCRATCH_TABLE = 'envelope_benchmark_transactions'
+# Строк в одном INSERT (EF Core отправляет команды SaveChanges пачками)
+INSERT_PAGE_SIZE = 1000
+TRANSACTION_COLUMNS = ['id', 'portfolio_id', 'stock_card_id', 'asset_type', 'transaction_type', 'quantity',
+                       'price_per_unit', 'total_amount', 'transaction_time', 'currency', 'metadata',
+                       'created_at', 'updated_at']
+
+
+def parse_sizes(text):
+    try:
+        sizes = [int(value) for value in text.split(',') if value.strip()]
+    except ValueError:
+        raise ValueError(f"Некорректный список размеров: {text}") from None
+    if not sizes or any(size <= 0 for size in sizes):
+        raise ValueError(f"Размеры конвертов должны быть положительными: {text}")
+    return sizes
+
+
+def build_messages(count, seed):
+    """Транзакции нагрузки: одинаковые для всех размеров конверта"""
+    rng = random.Random(seed)
+    return [create_test_transaction_message(rng) for _ in range(count)]
+
+
+def key_partitioner(partitions):
+    """Партиция по ключу, как у продюсера kafka-python (murmur2)"""
+    # murmur2 есть в kafka-python 2.x и 3.x, а вызываемый DefaultPartitioner - только в 2.x
+    from kafka.partitioner.default import murmur2
+
+    partitions = sorted(partitions)
+    return lambda key: partitions[(murmur2(key.encode('utf-8')) & 0x7fffffff) % len(partitions)]
+
+
+def build_records(messages, size, partition_of):
+    """
+    Записи для отправки: (партиция или None, ключ, значение)
+
+    Размер 1 - одиночные сообщения с ключом (текущий контракт), иначе конверты
+    по партициям ключа.
+    """
+    if size == 1:
+        return [(None, key.encode('utf-8'), json.dumps(message, separators=(',', ':')).encode('utf-8'))
+                for message, key in messages]
+    packer = EnvelopePacker(size, partition_of)
+    envelopes = []
+    for message, key in messages:
+        packed = packer.add(message, key)
+        if packed:
+            envelopes.append(packed)
+    envelopes.extend(packer.flush())
+    return [(partition, None, encode_envelope(envelope)) for partition, envelope in envelopes]
+
+
+class TransactionSink:
+    """Сохранение пачки транзакций одной транзакцией БД, как ProcessBatchAsync"""
+
+    def __init__(self, dsn):
+        psycopg2 = import_psycopg2()
+        import psycopg2.extras
+
+        self.execute_values = psycopg2.extras.execute_values
+        self.connection = psycopg2.connect(dsn)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+            cursor.execute(f"CREATE TABLE {SCRATCH_TABLE} (LIKE asset_transactions INCLUDING ALL)")
+        self.connection.commit()
+
+    def reset(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {SCRATCH_TABLE}")
+        self.connection.commit()
+
+    def write(self, items):
+        now = datetime.now(timezone.utc)
+        rows = [(item['id'], item['portfolioId'], item['stockCardId'], item['assetType'], item['transactionType'],
+                 item['quantity'], item['pricePerUnit'], item['totalAmount'], item['transactionTime'],
+                 item['currency'], item.get('metadata'), now, now) for item in items]
+        try:
+            with self.connection.cursor() as cursor:
+                statement = f"INSERT INTO {SCRATCH_TABLE} ({', '.join(TRANSACTION_COLUMNS)}) VALUES %s"
+                self.execute_values(cursor, statement, rows, page_size=INSERT_PAGE_SIZE)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+
+    def close(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        self.connection.commit()
+        self.connection.close()
+
+
+def consume(args, kafka, ranges, sink):
+    """
+    Прочитать записи диапазонов циклом AnalyticsService
+
+    Returns:
+        Словарь: seconds, records, items, batches, errors и время этапов
+        poll/decode/db/commit в секундах
+    """
+    consumer = kafka.KafkaConsumer(
+        bootstrap_servers=args.bootstrap_server,
+        group_id=f"envelope-benchmark-{uuid.uuid4()}",
+        enable_auto_commit=False,
+        max_poll_records=args.consumer_batch,
+    )
+    stats = {'records': 0, 'items': 0, 'batches': 0, 'errors': 0,
+             'poll': 0.0, 'decode': 0.0, 'db': 0.0, 'commit': 0.0}
+    try:
+        partitions = [tp for tp, (start, stop) in ranges.items() if stop > start]
+        consumer.assign(partitions)
+        for tp in partitions:
+            consumer.seek(tp, ranges[tp][0])
+        pending = set(partitions)
+        started = time.perf_counter()
+        last_data = time.monotonic()
+        while pending:
+            moment = time.perf_counter()
+            with stage('poll'):
+                batches = consumer.poll(timeout_ms=1000, max_records=args.consumer_batch)
+            stats['poll'] += time.perf_counter() - moment
+            records = [record for tp, tp_records in batches.items() for record in tp_records
+                       if record.offset < ranges[tp][1]]
+            if not records:
+                if time.monotonic() - last_data > args.idle_timeout:
+                    print(f"  ⚠ Нет записей {args.idle_timeout} с, замер оборван")
+                    stats['errors'] += 1
+                    break
+                continue
+            last_data = time.monotonic()
+
+            moment = time.perf_counter()
+            items = []
+            with stage('decode'):
+                for record in records:
+                    try:
+                        items.extend(decode_record(record.value)[1])
+                    except EnvelopeError:
+                        stats['errors'] += 1
+            stats['decode'] += time.perf_counter() - moment
+
+            if sink is not None and items:
+                moment = time.perf_counter()
+                with stage('db'):
+                    sink.write(items)
+                stats['db'] += time.perf_counter() - moment
+
+            moment = time.perf_counter()
+            with stage('commit'):
+                consumer.commit()
+            stats['commit'] += time.perf_counter() - moment
+
+            stats['records'] += len(records)
+            stats['items'] += len(items)
+            stats['batches'] += 1
+            for tp in list(pending):
+                if consumer.position(tp) >= ranges[tp][1]:
+                    pending.discard(tp)
+        stats['seconds'] = time.perf_counter() - started
+    finally:
+        consumer.close()
+    return stats
+
+
+def measure_size(args, kafka, producer, offsets, messages, size, partition_of, sink):
+    """Отправить нагрузку конвертами размера size и (без --produce-only) прочитать ее"""
+    with stage('pack'):
+        records = build_records(messages, size, partition_of)
+    value_bytes = sum(len(value) for _, _, value in records)
+
+    partitions = topic_partitions(kafka, offsets, args.topic)
+    start = offsets.end_offsets(partitions)
+    produce_seconds, produce_errors = produce(producer, args.topic, records)
+    stop = offsets.end_offsets(partitions)
+    result = {
+        'size': size,
+        'records': len(records),
+        'items': len(messages),
+        'bytes_per_item': value_bytes / len(messages),
+        'produce_seconds': produce_seconds,
+        'produce_items_per_s': len(messages) / produce_seconds if produce_seconds else 0.0,
+        'produce_errors': produce_errors,
+    }
+    if args.produce_only:
+        return result
+
+    if sink is not None:
+        sink.reset()
+    stats = consume(args, kafka, {tp: (start[tp], stop[tp]) for tp in partitions}, sink)
+    seconds = stats.pop('seconds', None) or 1e-9
+    result.update({
+        'consume_seconds': seconds,
+        'consume_items_per_s': stats['items'] / seconds,
+        'consume_records_per_s': stats['records'] / seconds,
+        'consumed_items': stats['items'],
+        'consumer_batches': stats['batches'],
+        'decode_errors': stats['errors'],
+        'stage_ms_per_1000_items': {name: stats[name] * 1e6 / max(stats['items'], 1)
+                                    for name in ('poll', 'decode', 'db', 'commit')},
+    })
+    return result
+
+
+def print_report(results, args):
+    print()
+    print("=" * 100)
+    print(f"Прием конвертами: {args.count} транзакций, пачка consumer {args.consumer_batch} записей"
+          f"{', с записью в БД' if args.dsn else ', без БД'}")
+    print("=" * 100)
+    header = f"  {'размер':>6} {'записей':>8} {'байт/тр':>8} {'отправка тр/с':>14}"
+    if not args.produce_only:
+        header += (f" {'прием тр/с':>11} {'ускорение':>9} {'пачек':>6}  мс на 1000 тр: "
+                   f"{'poll':>6} {'разбор':>6} {'БД':>6} {'commit':>6}")
+    print(header)
+    baseline = results[0].get('consume_items_per_s')
+    for result in results:
+        line = (f"  {result['size']:>6} {result['records']:>8} {result['bytes_per_item']:>8.0f} "
+                f"{result['produce_items_per_s']:>14,.0f}")
+        if not args.produce_only:
+            stages = result['stage_ms_per_1000_items']
+            speedup = result['consume_items_per_s'] / baseline if baseline else 0.0
+            line += (f" {result['consume_items_per_s']:>11,.0f} {speedup:>8.2f}x {result['consumer_batches']:>6}"
+                     f"  {'':15}{stages['poll']:>6.1f} {stages['decode']:>6.1f} {stages['db']:>6.1f} "
+                     f"{stages['commit']:>6.1f}")
+        print(line)
+    print("=" * 100)
+    for result in results:
+        problems = []
+        if result['produce_errors']:
+            problems.append(f"ошибок отправки {result['produce_errors']}")
+        if result.get('decode_errors'):
+            problems.append(f"ошибок разбора {result['decode_errors']}")
+        if not args.produce_only and result['consumed_items'] != result['items']:
+            problems.append(f"прочитано {result['consumed_items']} из {result['items']} транзакций")
+        if problems:
+            print(f"  ✗ размер {result['size']}: {', '.join(problems)}")
+
+
+def has_errors(result, produce_only):
+    if result['produce_errors']:
+        return True
+    return not produce_only and (result['decode_errors'] or result['consumed_items'] != result['items'])
+
+
+def run(args):
+    kafka = import_kafka()
+    sizes = parse_sizes(args.sizes)
+
+    print("=" * 60)
+    print("Оценка приема транзакций конвертами")
+    print("=" * 60)
+    print(f"Bootstrap Server: {args.bootstrap_server}, топик: {args.topic}")
+    print(f"Размеры конверта: {', '.join(map(str, sizes))}, транзакций на размер: {args.count}")
+    print()
+
+    with stage('generate'):
+        messages = build_messages(args.count, args.seed)
+    with stage('connect'):
+        producer = kafka.KafkaProducer(bootstrap_servers=args.bootstrap_server, acks='all')
+        offsets = kafka.KafkaConsumer(bootstrap_servers=args.bootstrap_server, group_id=None)
+    sink = None
+    try:
+        partition_of = key_partitioner(producer.partitions_for(args.topic))
+        if args.dsn and not args.produce_only:
+            sink = TransactionSink(args.dsn)
+        results = []
+        for size in sizes:
+            print(f"Размер {size}...", flush=True)
+            results.append(measure_size(args, kafka, producer, offsets, messages, size, partition_of, sink))
+    finally:
+        if sink is not None:
+            sink.close()
+        producer.close()
+        offsets.close()
+
+    print_report(results, args)
+    if args.report:
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'params': {'bootstrap_server': args.bootstrap_server, 'topic': args.topic, 'count': args.count,
+                       'consumer_batch': args.consumer_batch, 'db': bool(args.dsn),
+                       'produce_only': args.produce_only},
+            'sizes': results,
+        }
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nОтчет сохранен: {args.report}")
+    return 1 if any(has_errors(result, args.produce_only) for result in results) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Оценка приема транзакций конвертами по N штук в одной записи Kafka'
+    )
+    parser.add_argument('--bootstrap-server', default=DEFAULT_BOOTSTRAP,
+                        help=f'Адрес Kafka брокера (по умолчанию: {DEFAULT_BOOTSTRAP})')
+    parser.add_argument('--topic', default=DEFAULT_BENCHMARK_TOPIC,
+                        help=f'Топик для замера (по умолчанию: {DEFAULT_BENCHMARK_TOPIC})')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'Размеры конверта, 1 - текущий контракт (по умолчанию: {DEFAULT_SIZES})')
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT,
+                        help=f'Транзакций на размер (по умолчанию: {DEFAULT_COUNT})')
+    parser.add_argument('--consumer-batch', type=int, default=DEFAULT_CONSUMER_BATCH,
+                        help=f'Записей в пачке consumer (по умолчанию: {DEFAULT_CONSUMER_BATCH}, '
+                             f'как KafkaConfiguration.BatchSize)')
+    parser.add_argument('--dsn', help='Писать транзакции в analytics-db (строка подключения psycopg2)')
+    parser.add_argument('--produce-only', action='store_true',
+                        help='Только отправить конверты, без чтения (для проверки прототипа consumer)')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help=f'Сколько ждать записей при чтении, с (по умолчанию: {DEFAULT_IDLE_TIMEOUT})')
+    parser.add_argument('--seed', type=int, default=1, help='Seed нагрузки (по умолчанию: 1)')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить результаты в JSON')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.count <= 0 or args.consumer_batch <= 0:
+        print("Ошибка: --count и --consumer-batch должны быть положительными")
+        return 1
+    if args.topic == DEFAULT_TOPIC:
+        print(f"Ошибка: AnalyticsService не разбирает конверты, используйте отдельный топик, "
+              f"а не {DEFAULT_TOPIC}")
+        return 1
+    try:
+        return run_profiled(args, run, args)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
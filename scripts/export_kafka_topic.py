@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Выгрузка топика portfolio.transactions в колоночные файлы для офлайн-анализа
+
+В отличие от CheckKafkaTopic.cs, который печатает сообщения по одному,
+читает топик большими пачками без consumer group (offset'ы не коммитятся),
+начиная с offset'а или момента времени, и пишет Parquet или Arrow IPC
+потоково - группами строк (row group), поэтому память ограничена размером
+одной группы, а не топика.
+
+Колонки: метаданные записи Kafka (partition, offset, timestamp, key,
+value_size) и поля TransactionMessage. Суммы (decimal в C#) выгружаются как
+float64 - для анализа распределений этого достаточно. Сообщения, которые не
+удалось разобрать, сохраняются с valid = false и пустыми полями.
+
+Использование:
+    python scripts/export_kafka_topic.py --output transactions.parquet
+    python scripts/export_kafka_topic.py --since 2024-01-01T00:00:00Z --until 2024-01-02T00:00:00Z \\
+        --output day.arrow
+    python scripts/export_kafka_topic.py --portfolio-id <UUID> --from-offset 1000000 --output p.parquet
+
+Требует: kafka-python, pyarrow
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from kafka_common import DEFAULT_BOOTSTRAP, DEFAULT_TOPIC, import_kafka
+
+# kafka-python и pyarrow импортируются при выгрузке, чтобы --help запускался быстро
+
+# Строк в одной группе строк (row group) - определяет пиковое потребление памяти
+DEFAULT_ROW_GROUP_SIZE = 100_000
+# Записей за один poll и байт за один fetch: большие пачки вместо сообщений по одному
+DEFAULT_MAX_POLL_RECORDS = 10_000
+DEFAULT_FETCH_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_PARTITION_FETCH_BYTES = 16 * 1024 * 1024
+# Сколько секунд ждать новых записей, прежде чем завершить выгрузку
+DEFAULT_IDLE_TIMEOUT = 10
+FORMATS = ('parquet', 'arrow')
+COMPRESSIONS = ('zstd', 'snappy', 'gzip', 'none')
+
+# Поля TransactionMessage: (имя в JSON, тип колонки)
+MESSAGE_FIELDS = [
+    ('id', 'string'),
+    ('portfolioId', 'string'),
+    ('stockCardId', 'string'),
+    ('assetType', 'int32'),
+    ('transactionType', 'int32'),
+    ('quantity', 'int64'),
+    ('pricePerUnit', 'float64'),
+    ('totalAmount', 'float64'),
+    ('transactionTime', 'timestamp'),
+    ('currency', 'string'),
+    ('metadata', 'string'),
+]
+RECORD_FIELDS = [
+    ('partition', 'int32'),
+    ('offset', 'int64'),
+    ('timestamp', 'timestamp_ms'),
+    ('key', 'string'),
+    ('value_size', 'int32'),
+]
+
+
+def import_pyarrow():
+    """Импортировать pyarrow при первом обращении"""
+    try:
+        import pyarrow
+    except ImportError:
+        print("Ошибка: библиотека pyarrow не установлена!")
+        print("Установите: pip install pyarrow")
+        sys.exit(1)
+    return pyarrow
+
+
+def arrow_type(pa, name):
+    return {
+        'string': pa.string(),
+        'int32': pa.int32(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+        'timestamp_ms': pa.timestamp('ms', tz='UTC'),
+        'bool': pa.bool_(),
+    }[name]
+
+
+def build_schema(pa):
+    """Схема выгружаемых файлов"""
+    fields = [pa.field(name, arrow_type(pa, kind)) for name, kind in RECORD_FIELDS]
+    fields.append(pa.field('valid', pa.bool_()))
+    fields += [pa.field(name, arrow_type(pa, kind)) for name, kind in MESSAGE_FIELDS]
+    return pa.schema(fields)
+
+
+def parse_time_ms(value):
+    """Строка ISO 8601 или число миллисекунд -> миллисекунды UTC"""
+    if value.isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+class ColumnBuffer:
+    """
+    Накопление записей до размера группы строк
+
+    Метаданные записей копятся по колонкам, а значения - сырыми байтами: вся
+    группа разбирается одним вызовом pyarrow.json (в несколько раз быстрее
+    json.loads по одному сообщению). Если группа не разбирается целиком
+    (битый JSON, metadata-объект, время с 7 знаками дробной части), она
+    разбирается построчно, а неразобранные сообщения получают valid = false.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.columns = {name: [] for name, _ in RECORD_FIELDS}
+        self.values = []
+        self.rows = 0
+
+    def append(self, record):
+        columns = self.columns
+        value = record.value or b''
+        columns['partition'].append(record.partition)
+        columns['offset'].append(record.offset)
+        columns['timestamp'].append(record.timestamp)
+        columns['key'].append(record.key.decode('utf-8', 'replace') if record.key is not None else None)
+        columns['value_size'].append(len(value))
+        self.values.append(value)
+        self.rows += 1
+
+    def to_table(self, pa, schema):
+        """Собрать pyarrow.Table и очистить буфер"""
+        arrays = [pa.array(self.columns[name], type=schema.field(name).type) for name, _ in RECORD_FIELDS]
+        message_schema = pa.schema([schema.field(name) for name, _ in MESSAGE_FIELDS])
+        with stage('parse'):
+            messages = self._parse_block(pa, message_schema)
+            if messages is not None:
+                valid = pa.array([True] * self.rows)
+            else:
+                messages, valid = self._parse_rows(pa, message_schema)
+        table = pa.Table.from_arrays(arrays + [valid] + messages.columns, schema=schema)
+        self.clear()
+        return table
+
+    def _parse_block(self, pa, message_schema):
+        """Разобрать все значения одним вызовом pyarrow.json или вернуть None"""
+        import pyarrow.json as pj
+
+        if any(b'\n' in value or not value.strip() for value in self.values):
+            return None
+        options = pj.ParseOptions(explicit_schema=message_schema, unexpected_field_behavior='ignore')
+        try:
+            table = pj.read_json(pa.BufferReader(b'\n'.join(self.values)), parse_options=options)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            return None
+        return table if table.num_rows == self.rows else None
+
+    def _parse_rows(self, pa, message_schema):
+        """Построчный разбор: (таблица полей сообщений, колонка valid)"""
+        columns = {name: [] for name, _ in MESSAGE_FIELDS}
+        valid = []
+        for raw in self.values:
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                message = None
+            valid.append(message is not None)
+            for name, _ in MESSAGE_FIELDS:
+                value = message.get(name) if message is not None else None
+                if name == 'metadata' and value is not None and not isinstance(value, str):
+                    value = json.dumps(value)
+                columns[name].append(value)
+
+        arrays = []
+        for field in message_schema:
+            values = columns[field.name]
+            if field.name == 'transactionTime':
+                arrays.append(self._timestamps(pa, values, field.type))
+                continue
+            try:
+                arrays.append(pa.array(values, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                # Поле неожиданного типа в отдельных сообщениях - такие значения пустые
+                arrays.append(pa.array([self._coerce(value, field.type, pa) for value in values],
+                                       type=field.type))
+        return pa.Table.from_arrays(arrays, schema=message_schema), pa.array(valid, type=pa.bool_())
+
+    @staticmethod
+    def _timestamps(pa, values, arrow_timestamp):
+        """ISO 8601 -> timestamp: сначала векторно в Arrow, при ошибке - построчно"""
+        strings = pa.array([value if isinstance(value, str) else None for value in values], type=pa.string())
+        try:
+            return strings.cast(arrow_timestamp)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            parsed = []
+            for value in strings.to_pylist():
+                try:
+                    moment = datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
+                except ValueError:
+                    moment = None
+                if moment is not None and moment.tzinfo is None:
+                    moment = moment.replace(tzinfo=timezone.utc)
+                parsed.append(moment)
+            return pa.array(parsed, type=arrow_timestamp)
+
+    @staticmethod
+    def _coerce(value, arrow_type, pa):
+        try:
+            pa.array([value], type=arrow_type)
+            return value
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            return None
+
+
+class ColumnarWriter:
+    """Потоковая запись групп строк в Parquet или Arrow IPC"""
+
+    def __init__(self, path, file_format, schema, compression):
+        pa = import_pyarrow()
+        self.path = path
+        codec = None if compression == 'none' else compression
+        if file_format == 'parquet':
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(path, schema, compression=codec or 'none')
+            self._write = lambda table: self._writer.write_table(table, row_group_size=table.num_rows)
+        else:
+            # В Arrow IPC поддерживаются только zstd и lz4
+            options = pa.ipc.IpcWriteOptions(compression=codec if codec in ('zstd', 'lz4') else None)
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, schema, options=options)
+            self._write = self._writer.write_table
+
+    def write(self, table):
+        self._write(table)
+
+    def close(self):
+        self._writer.close()
+        if hasattr(self, '_sink'):
+            self._sink.close()
+
+
+def detect_format(path, file_format):
+    if file_format:
+        return file_format
+    return 'arrow' if path.endswith(('.arrow', '.feather', '.ipc')) else 'parquet'
+
+
+def make_filter(portfolio_ids, stock_card_ids):
+    """
+    Фильтр сообщений по portfolioId / stockCardId
+
+    Returns:
+        (prefilter(raw bytes) -> bool, apply(pa, table) -> table) или (None, None) без фильтра.
+        Предфильтр отбрасывает сообщения по подстроке до разбора JSON, точная
+        проверка полей выполняется над разобранной группой строк.
+    """
+    if not portfolio_ids and not stock_card_ids:
+        return None, None
+    portfolio_ids = sorted({value.lower() for value in portfolio_ids or ()})
+    stock_card_ids = sorted({value.lower() for value in stock_card_ids or ()})
+    needles = [value.encode('ascii') for value in portfolio_ids + stock_card_ids]
+
+    def prefilter(raw):
+        lowered = raw.lower()
+        return any(needle in lowered for needle in needles)
+
+    def apply(pa, table):
+        import pyarrow.compute as pc
+
+        mask = None
+        for column, values in (('portfolioId', portfolio_ids), ('stockCardId', stock_card_ids)):
+            if values:
+                matches = pc.is_in(pc.utf8_lower(table[column]), value_set=pa.array(values))
+                mask = matches if mask is None else pc.and_kleene(mask, matches)
+        # Неразобранные сообщения, прошедшие предфильтр, сохраняются для анализа
+        mask = pc.or_kleene(pc.fill_null(mask, False), pc.invert(table['valid']))
+        return table.filter(mask)
+
+    return prefilter, apply
+
+
+def resolve_ranges(consumer, partitions, args):
+    """
+    Диапазоны выгрузки по партициям
+
+    Returns:
+        Словарь {TopicPartition: (начальный offset, конечный offset не включительно)}.
+        Конец - не дальше конечного offset'а на момент запуска, чтобы выгрузка завершалась.
+    """
+    beginning = consumer.beginning_offsets(partitions)
+    end = consumer.end_offsets(partitions)
+    since = until = None
+    if args.since:
+        since = consumer.offsets_for_times({tp: parse_time_ms(args.since) for tp in partitions})
+    if args.until:
+        until = consumer.offsets_for_times({tp: parse_time_ms(args.until) for tp in partitions})
+
+    ranges = {}
+    for tp in partitions:
+        start = beginning[tp]
+        stop = end[tp]
+        if args.from_offset is not None:
+            start = max(start, args.from_offset)
+        if since is not None:
+            found = since.get(tp)
+            start = max(start, found.offset if found is not None else stop)
+        if args.to_offset is not None:
+            stop = min(stop, args.to_offset)
+        if until is not None and until.get(tp) is not None:
+            stop = min(stop, until[tp].offset)
+        ranges[tp] = (start, max(start, stop))
+    return ranges
+
+
+def export(args):
+    """Выгрузить топик, вернуть словарь со статистикой"""
+    kafka = import_kafka()
+    pa = import_pyarrow()
+    import pyarrow.compute as pc
+
+    with stage('connect'):
+        consumer = kafka.KafkaConsumer(
+            bootstrap_servers=args.bootstrap_server,
+            group_id=None,
+            enable_auto_commit=False,
+            max_poll_records=args.max_poll_records,
+            fetch_max_bytes=args.fetch_max_bytes,
+            max_partition_fetch_bytes=args.partition_fetch_bytes,
+        )
+    try:
+        partition_ids = consumer.partitions_for_topic(args.topic)
+        if not partition_ids:
+            raise RuntimeError(f"топик {args.topic} не найден или не имеет партиций")
+        if args.partitions:
+            partition_ids = set(partition_ids) & set(args.partitions)
+        partitions = [kafka.TopicPartition(args.topic, p) for p in sorted(partition_ids)]
+
+        with stage('seek'):
+            ranges = resolve_ranges(consumer, partitions, args)
+            pending = {tp for tp, (start, stop) in ranges.items() if start < stop}
+            consumer.assign(partitions)
+            for tp, (start, _) in ranges.items():
+                consumer.seek(tp, start)
+            # Пустые диапазоны не читаем
+            consumer.pause(*[tp for tp in partitions if tp not in pending])
+
+        total = sum(stop - start for start, stop in ranges.values())
+        print(f"Выгрузка {args.topic}: партиций {len(partitions)}, записей в диапазоне: {total}")
+
+        prefilter, apply_filter = make_filter(args.portfolio_id, args.stock_card_id)
+        schema = build_schema(pa)
+        file_format = detect_format(args.output, args.format)
+        writer = ColumnarWriter(args.output, file_format, schema, args.compression)
+        buffer = ColumnBuffer()
+        stats = {'read': 0, 'written': 0, 'invalid': 0, 'bytes': 0, 'row_groups': 0}
+        started = time.perf_counter()
+        last_data = time.monotonic()
+        next_progress = args.progress
+
+        def flush():
+            table = buffer.to_table(pa, schema)
+            if apply_filter is not None:
+                table = apply_filter(pa, table)
+            if args.max_messages:
+                table = table.slice(0, args.max_messages - stats['written'])
+            if table.num_rows:
+                with stage('write'):
+                    writer.write(table)
+                stats['row_groups'] += 1
+            stats['written'] += table.num_rows
+            stats['invalid'] += table.num_rows - (pc.sum(table['valid']).as_py() or 0)
+
+        try:
+            while pending:
+                if args.max_messages and stats['written'] >= args.max_messages:
+                    break
+                with stage('fetch'):
+                    batches = consumer.poll(timeout_ms=1000)
+                if not batches:
+                    if time.monotonic() - last_data > args.idle_timeout:
+                        print(f"⚠️ Нет новых записей {args.idle_timeout} с, выгрузка остановлена")
+                        break
+                    continue
+                last_data = time.monotonic()
+
+                with stage('decode'):
+                    for tp, records in batches.items():
+                        stop = ranges[tp][1]
+                        for record in records:
+                            if record.offset >= stop:
+                                break
+                            stats['read'] += 1
+                            stats['bytes'] += len(record.value or b'')
+                            if prefilter is not None and not prefilter(record.value or b''):
+                                continue
+                            buffer.append(record)
+                        if tp in pending and consumer.position(tp) >= stop:
+                            pending.discard(tp)
+                            consumer.pause(tp)
+                if buffer.rows >= args.row_group_size:
+                    flush()
+
+                if args.progress and stats['read'] >= next_progress:
+                    next_progress = stats['read'] + args.progress
+                    elapsed = time.perf_counter() - started
+                    print(f"  прочитано {stats['read']}/{total}, записано {stats['written']}, "
+                          f"{stats['read'] / elapsed:.0f} записей/с")
+        finally:
+            if buffer.rows:
+                flush()
+            writer.close()
+
+        stats['seconds'] = time.perf_counter() - started
+        stats['file_size'] = os.path.getsize(args.output)
+        stats['format'] = file_format
+        return stats
+    finally:
+        consumer.close()
+
+
+def print_summary(stats, output):
+    seconds = stats['seconds'] or 1e-9
+    print()
+    print("=" * 60)
+    print(f"Файл: {output} ({stats['format']}, {stats['file_size'] / 1024 / 1024:.1f} МБ, "
+          f"групп строк: {stats['row_groups']})")
+    print(f"Прочитано: {stats['read']} записей, {stats['bytes'] / 1024 / 1024:.1f} МБ")
+    print(f"Записано строк: {stats['written']} (не разобрано: {stats['invalid']})")
+    print(f"Скорость: {stats['read'] / seconds:.0f} записей/с, "
+          f"{stats['bytes'] / 1024 / 1024 / seconds:.1f} МБ/с")
+    print("=" * 60)
+
+
+def run(args):
+    stats = export(args)
+    print_summary(stats, args.output)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Выгрузка топика Kafka в Parquet / Arrow IPC для офлайн-анализа'
+    )
+    parser.add_argument('--bootstrap-server', default=DEFAULT_BOOTSTRAP,
+                        help=f'Адрес Kafka брокера (по умолчанию: {DEFAULT_BOOTSTRAP})')
+    parser.add_argument('--topic', default=DEFAULT_TOPIC,
+                        help=f'Название топика (по умолчанию: {DEFAULT_TOPIC})')
+    parser.add_argument('--output', '-o', required=True,
+                        help='Выходной файл (.parquet, или .arrow/.feather для Arrow IPC)')
+    parser.add_argument('--format', choices=FORMATS, help='Формат файла (по умолчанию: по расширению)')
+    parser.add_argument('--compression', choices=COMPRESSIONS, default='zstd',
+                        help='Сжатие (по умолчанию: zstd)')
+    parser.add_argument('--partitions', type=int, nargs='+', help='Номера партиций (по умолчанию: все)')
+    parser.add_argument('--from-offset', type=int, help='Начальный offset в каждой партиции')
+    parser.add_argument('--to-offset', type=int, help='Конечный offset (не включительно) в каждой партиции')
+    parser.add_argument('--since', help='Начало по времени записи: ISO 8601 или миллисекунды')
+    parser.add_argument('--until', help='Конец по времени записи (не включительно): ISO 8601 или миллисекунды')
+    parser.add_argument('--portfolio-id', action='append', help='Только сообщения портфеля (можно повторять)')
+    parser.add_argument('--stock-card-id', action='append', help='Только сообщения актива (можно повторять)')
+    parser.add_argument('--max-messages', type=int, help='Максимум выгружаемых строк')
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help=f'Строк в группе строк (по умолчанию: {DEFAULT_ROW_GROUP_SIZE})')
+    parser.add_argument('--max-poll-records', type=int, default=DEFAULT_MAX_POLL_RECORDS,
+                        help=f'Записей за один poll (по умолчанию: {DEFAULT_MAX_POLL_RECORDS})')
+    parser.add_argument('--fetch-max-bytes', type=int, default=DEFAULT_FETCH_MAX_BYTES,
+                        help=f'Байт за один fetch (по умолчанию: {DEFAULT_FETCH_MAX_BYTES})')
+    parser.add_argument('--partition-fetch-bytes', type=int, default=DEFAULT_PARTITION_FETCH_BYTES,
+                        help=f'Байт на партицию за один fetch (по умолчанию: {DEFAULT_PARTITION_FETCH_BYTES})')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help=f'Завершить, если нет записей N секунд (по умолчанию: {DEFAULT_IDLE_TIMEOUT})')
+    parser.add_argument('--progress', type=int, default=0, metavar='N',
+                        help='Печатать прогресс примерно каждые N записей')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    return run_profiled(args, run, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
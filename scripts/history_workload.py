@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Формирование нагрузки на историю портфелей и оценка попаданий в кэш
+
+Task 7.3 требует, чтобы доля попаданий в кэш GetHistoryAsync была выше 80%.
+PortfolioServiceClient кэширует историю по ключу (портфель, дата начала,
+дата конца) с точностью до дня, с абсолютным TTL 5 минут. Поэтому доля
+попаданий зависит от того, как запросы распределены по портфелям и периодам.
+
+Модуль генерирует поток запросов GET /portfolios/{id}/history:
+    - портфели берутся из потока, который отправлял продюсер (--portfolios-from),
+      или задаются списком
+    - популярность портфелей: zipf (--skew) или working-set (доля горячих
+      портфелей получает долю запросов, горячий набор сдвигается со временем)
+    - окна периода (последние N дней до текущей даты) выбираются по Zipf
+
+Для потока оценивается доля попаданий при заданных размерах кэша:
+симуляцией LRU + TTL (как IMemoryCache с ограничением размера) и
+аналитически (приближение Че для LRU, ограниченное попаданиями в окне TTL).
+
+Использование:
+    python scripts/history_workload.py --portfolios-from stream.jsonl --model zipf --skew 1.1 \\
+        --rate 50 --duration 3600 --cache-sizes 100,500,1000,unbounded
+    python scripts/history_workload.py --model working-set --hot-fraction 0.2 --hot-share 0.8 \\
+        --output history.jsonl
+    python scripts/load_test_api.py --history-stream history.jsonl --mix history=1
+"""
+
+import sys
+import json
+import math
+import uuid
+import random
+import argparse
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+
+# TTL записи кэша истории (PortfolioServiceClient.CacheTTLMinutes), в секундах
+CACHE_TTL_SECONDS = 5 * 60
+# Целевая доля попаданий (Task 7.3)
+TARGET_HIT_RATE = 0.8
+# Параметры потока по умолчанию
+DEFAULT_RATE = 20
+DEFAULT_DURATION = 3600
+DEFAULT_PORTFOLIOS = 1000
+DEFAULT_SKEW = 1.0
+DEFAULT_HOT_FRACTION = 0.2
+DEFAULT_HOT_SHARE = 0.8
+# Окна периода (дней назад от текущей даты) и их неравномерность
+DEFAULT_WINDOWS = '7,30,90,365'
+DEFAULT_WINDOW_SKEW = 1.0
+DEFAULT_CACHE_SIZES = '100,1000,10000,unbounded'
+MODELS = ['zipf', 'working-set']
+
+
+def load_portfolio_ids(portfolio_ids=None, portfolios_from=None):
+    """Идентификаторы портфелей из списка или из JSONL потока продюсера (в порядке появления)"""
+    if portfolio_ids:
+        return [item.strip() for item in portfolio_ids.split(',') if item.strip()]
+    if portfolios_from:
+        ids = {}
+        with open(portfolios_from, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    ids[json.loads(line)['portfolioId']] = None
+        return list(ids)
+    return []
+
+
+def zipf_weights(count, skew):
+    """Веса рангов 1..count по закону Ципфа: 1 / rank^skew (нормированные)"""
+    weights = [1 / (rank ** skew) for rank in range(1, count + 1)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def working_set_weights(count, hot_fraction, hot_share):
+    """Веса для модели working set: hot_share запросов приходится на первые hot_fraction портфелей"""
+    hot = max(1, min(count, round(count * hot_fraction)))
+    cold = count - hot
+    if not cold:
+        return [1 / count] * count
+    return [hot_share / hot] * hot + [(1 - hot_share) / cold] * cold
+
+
+def cumulative(weights):
+    """Накопленные веса для random.choices(cum_weights=...)"""
+    total = 0.0
+    result = []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+
+class HistoryWorkload:
+    """
+    Модель потока запросов истории портфелей
+
+    Портфели перемешиваются (seed), чтобы популярность не совпадала с порядком
+    их появления в потоке продюсера. В модели working-set горячий набор
+    сдвигается на hot_fraction * drift портфелей каждые shift_seconds секунд.
+    """
+
+    def __init__(self, portfolio_ids, model='zipf', skew=DEFAULT_SKEW,
+                 hot_fraction=DEFAULT_HOT_FRACTION, hot_share=DEFAULT_HOT_SHARE,
+                 shift_seconds=None, drift=0.5, windows=(7, 30, 90, 365),
+                 window_skew=DEFAULT_WINDOW_SKEW, seed=0):
+        if not portfolio_ids:
+            raise ValueError('нет идентификаторов портфелей')
+        self.rng = random.Random(seed)
+        self.portfolio_ids = list(portfolio_ids)
+        self.rng.shuffle(self.portfolio_ids)
+        self.model = model
+        self.shift_seconds = shift_seconds
+        self.shift_step = max(1, round(len(self.portfolio_ids) * hot_fraction * drift))
+        if model == 'zipf':
+            self.portfolio_weights = zipf_weights(len(self.portfolio_ids), skew)
+        else:
+            self.portfolio_weights = working_set_weights(len(self.portfolio_ids), hot_fraction, hot_share)
+        self.portfolio_cum = cumulative(self.portfolio_weights)
+        self.windows = list(windows)
+        self.window_weights = zipf_weights(len(self.windows), window_skew)
+        self.window_cum = cumulative(self.window_weights)
+
+    def portfolio_at(self, rank, elapsed):
+        """Портфель по рангу популярности с учетом сдвига горячего набора"""
+        if self.model == 'working-set' and self.shift_seconds:
+            rank = (rank + int(elapsed // self.shift_seconds) * self.shift_step) % len(self.portfolio_ids)
+        return self.portfolio_ids[rank]
+
+    def requests(self, rate, duration, start_time):
+        """
+        Поток запросов с пуассоновским поступлением
+
+        Yields:
+            (секунды от начала, id портфеля, дата начала, дата конца) - даты с точностью до дня
+        """
+        ranks = range(len(self.portfolio_ids))
+        window_indexes = range(len(self.windows))
+        elapsed = 0.0
+        while True:
+            elapsed += self.rng.expovariate(rate)
+            if elapsed >= duration:
+                return
+            rank = self.rng.choices(ranks, cum_weights=self.portfolio_cum)[0]
+            window = self.windows[self.rng.choices(window_indexes, cum_weights=self.window_cum)[0]]
+            end_date = (start_time + timedelta(seconds=elapsed)).date()
+            start_date = end_date - timedelta(days=window)
+            yield elapsed, self.portfolio_at(rank, elapsed), start_date, end_date
+
+    def key_probabilities(self):
+        """Вероятности ключей кэша (портфель, окно) в пределах одного дня без сдвига горячего набора"""
+        return [p * w for p in self.portfolio_weights for w in self.window_weights]
+
+
+def simulate_cache(requests, capacity=None, ttl=CACHE_TTL_SECONDS):
+    """
+    Симуляция кэша LRU с абсолютным TTL (как IMemoryCache.Set с TimeSpan)
+
+    Args:
+        requests: список (время, портфель, дата начала, дата конца)
+        capacity: максимальное количество записей (None - без ограничения)
+
+    Returns:
+        Доля попаданий
+    """
+    cache = OrderedDict()
+    hits = 0
+    for elapsed, portfolio_id, start_date, end_date in requests:
+        key = (portfolio_id, start_date, end_date)
+        expires_at = cache.get(key)
+        if expires_at is not None and expires_at > elapsed:
+            hits += 1
+            cache.move_to_end(key)
+            continue
+        cache[key] = elapsed + ttl
+        cache.move_to_end(key)
+        if capacity is not None and len(cache) > capacity:
+            cache.popitem(last=False)
+    return hits / len(requests) if requests else 0.0
+
+
+def che_characteristic_time(probabilities, capacity):
+    """
+    Характеристическое время LRU (приближение Че) в запросах
+
+    T находится из sum(1 - exp(-p_i * T)) = capacity; запись, к которой
+    обращались в последние T запросов, считается находящейся в кэше.
+    """
+    if capacity is None or capacity >= len(probabilities):
+        return math.inf
+
+    def occupancy(t):
+        return sum(1 - math.exp(-p * t) for p in probabilities)
+
+    low, high = 0.0, 1.0
+    while occupancy(high) < capacity:
+        high *= 2
+    for _ in range(60):
+        middle = (low + high) / 2
+        if occupancy(middle) < capacity:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def analytic_hit_rate(probabilities, capacity, rate, ttl=CACHE_TTL_SECONDS):
+    """
+    Аналитическая оценка доли попаданий LRU с абсолютным TTL
+
+    Для каждого ключа берется меньшая из двух оценок: LRU по Че
+    (1 - exp(-p * T)) и кэш без ограничения размера с TTL - каждый промах
+    открывает окно TTL, в котором в среднем rate * p * ttl запросов попадают.
+    """
+    t = che_characteristic_time(probabilities, capacity)
+    hit_rate = 0.0
+    for p in probabilities:
+        lru = 1.0 if t == math.inf else 1 - math.exp(-p * t)
+        in_ttl = rate * p * ttl
+        hit_rate += p * min(lru, in_ttl / (1 + in_ttl))
+    return hit_rate
+
+
+def parse_cache_sizes(spec):
+    """'100,1000,unbounded' -> [100, 1000, None]"""
+    sizes = []
+    for item in spec.split(','):
+        item = item.strip()
+        sizes.append(None if item in ('unbounded', 'inf', '0') else int(item))
+    return sizes
+
+
+def smallest_size_for_target(results, target):
+    """Наименьший размер кэша из проверенных, при котором симуляция достигает цели"""
+    bounded = [(size, hit) for size, hit, _ in results if size is not None and hit >= target]
+    if bounded:
+        return min(bounded)[0]
+    if any(size is None and hit >= target for size, hit, _ in results):
+        return None
+    return False
+
+
+def write_stream(requests, path):
+    """Записать поток запросов в JSONL для load_test_api.py --history-stream"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for elapsed, portfolio_id, start_date, end_date in requests:
+            f.write(json.dumps({
+                't': round(elapsed, 6),
+                'portfolioId': portfolio_id,
+                'startDate': f"{start_date.isoformat()}T00:00:00Z",
+                'endDate': f"{end_date.isoformat()}T23:59:59Z",
+            }) + '\n')
+
+
+def run(args):
+    """Сгенерировать поток, оценить долю попаданий по размерам кэша"""
+    portfolio_ids = load_portfolio_ids(args.portfolio_ids, args.portfolios_from)
+    if not portfolio_ids:
+        rng = random.Random(f"{args.seed}:portfolios")
+        portfolio_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(args.portfolios)]
+        print(f"Предупреждение: портфели не заданы (--portfolios-from), используются {args.portfolios} случайных")
+    windows = [int(item) for item in args.windows.split(',')]
+
+    workload = HistoryWorkload(
+        portfolio_ids, args.model, args.skew, args.hot_fraction, args.hot_share,
+        args.shift_seconds, args.drift, windows, args.window_skew, args.seed
+    )
+    start_time = datetime.now(timezone.utc).replace(microsecond=0)
+
+    with stage('generate'):
+        requests = list(workload.requests(args.rate, args.duration, start_time))
+    keys = len({(portfolio_id, start_date, end_date) for _, portfolio_id, start_date, end_date in requests})
+
+    print("=" * 72)
+    print("Поток запросов истории портфелей")
+    print("=" * 72)
+    model = f"zipf (s={args.skew})" if args.model == 'zipf' else \
+        f"working-set ({args.hot_fraction:.0%} портфелей -> {args.hot_share:.0%} запросов" + \
+        (f", сдвиг каждые {args.shift_seconds:g} с)" if args.shift_seconds else ")")
+    print(f"Портфелей: {len(portfolio_ids)}, модель: {model}")
+    print(f"Окна (дней): {args.windows}, zipf s={args.window_skew}")
+    print(f"Запросов: {len(requests)} ({args.rate:g} rps, {args.duration:g} с), уникальных ключей кэша: {keys}")
+
+    if args.output:
+        with stage('write'):
+            write_stream(requests, args.output)
+        print(f"Поток сохранен: {args.output}")
+
+    probabilities = workload.key_probabilities()
+    sizes = parse_cache_sizes(args.cache_sizes)
+    if args.check_size is not None and args.check_size not in sizes:
+        sizes.append(args.check_size)
+
+    results = []
+    print()
+    print(f"  {'размер кэша':>12} {'симуляция LRU+TTL':>18} {'аналитика':>10}")
+    for size in sorted(sizes, key=lambda value: math.inf if value is None else value):
+        with stage('simulate'):
+            simulated = simulate_cache(requests, size, args.ttl)
+        with stage('analytic'):
+            analytic = analytic_hit_rate(probabilities, size, args.rate, args.ttl)
+        results.append((size, simulated, analytic))
+        mark = '✓' if simulated >= args.target else '✗'
+        print(f"  {('без лимита' if size is None else size):>12} {mark} {simulated:>16.1%} "
+              f"{analytic:>10.1%}")
+
+    print()
+    required = smallest_size_for_target(results, args.target)
+    if required is False:
+        print(f"✗ Цель {args.target:.0%} не достигается ни при одном размере: "
+              f"TTL {args.ttl:g} с слишком мал для этого распределения запросов")
+    elif required is None:
+        print(f"Цель {args.target:.0%} достигается только без ограничения размера кэша")
+    else:
+        print(f"Минимальный проверенный размер кэша для {args.target:.0%}: {required} записей")
+
+    if args.check_size is not None:
+        hit = next(simulated for size, simulated, _ in results if size == args.check_size)
+        passed = hit >= args.target
+        print(f"{'✓' if passed else '✗'} Размер {args.check_size}: {hit:.1%} (цель {args.target:.0%})")
+        return 0 if passed else 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Поток запросов истории портфелей и оценка доли попаданий в кэш GetHistoryAsync'
+    )
+    parser.add_argument('--portfolios-from', metavar='FILE',
+                        help='JSONL поток продюсера, из которого берутся идентификаторы портфелей')
+    parser.add_argument('--portfolio-ids', help='Идентификаторы портфелей через запятую')
+    parser.add_argument('--portfolios', type=int, default=DEFAULT_PORTFOLIOS,
+                        help=f'Количество случайных портфелей, если они не заданы (по умолчанию: {DEFAULT_PORTFOLIOS})')
+    parser.add_argument('--model', choices=MODELS, default='zipf',
+                        help='Модель популярности портфелей (по умолчанию: zipf)')
+    parser.add_argument('--skew', type=float, default=DEFAULT_SKEW,
+                        help=f'Параметр s распределения Ципфа (по умолчанию: {DEFAULT_SKEW})')
+    parser.add_argument('--hot-fraction', type=float, default=DEFAULT_HOT_FRACTION,
+                        help=f'working-set: доля горячих портфелей (по умолчанию: {DEFAULT_HOT_FRACTION})')
+    parser.add_argument('--hot-share', type=float, default=DEFAULT_HOT_SHARE,
+                        help=f'working-set: доля запросов к горячим портфелям (по умолчанию: {DEFAULT_HOT_SHARE})')
+    parser.add_argument('--shift-seconds', type=float,
+                        help='working-set: период сдвига горячего набора в секундах (по умолчанию: без сдвига)')
+    parser.add_argument('--drift', type=float, default=0.5,
+                        help='working-set: доля горячего набора, сменяемая при сдвиге (по умолчанию: 0.5)')
+    parser.add_argument('--windows', default=DEFAULT_WINDOWS,
+                        help=f'Окна периода в днях до текущей даты (по умолчанию: {DEFAULT_WINDOWS})')
+    parser.add_argument('--window-skew', type=float, default=DEFAULT_WINDOW_SKEW,
+                        help=f'Параметр Ципфа для выбора окна (по умолчанию: {DEFAULT_WINDOW_SKEW})')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'Запросов истории в секунду (по умолчанию: {DEFAULT_RATE})')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f'Длительность потока в секундах (по умолчанию: {DEFAULT_DURATION})')
+    parser.add_argument('--ttl', type=float, default=CACHE_TTL_SECONDS,
+                        help=f'TTL записи кэша в секундах (по умолчанию: {CACHE_TTL_SECONDS})')
+    parser.add_argument('--cache-sizes', default=DEFAULT_CACHE_SIZES,
+                        help=f'Размеры кэша в записях для оценки (по умолчанию: {DEFAULT_CACHE_SIZES})')
+    parser.add_argument('--target', type=float, default=TARGET_HIT_RATE,
+                        help=f'Целевая доля попаданий (по умолчанию: {TARGET_HIT_RATE})')
+    parser.add_argument('--check-size', type=int,
+                        help='Проверить размер кэша: код возврата 1, если цель не достигается')
+    parser.add_argument('--output', metavar='FILE',
+                        help='Сохранить поток запросов в JSONL (для load_test_api.py --history-stream)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed генератора (по умолчанию: 0)')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        return run_profiled(args, run, args)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Общие константы и помощники инструментов нагрузки Kafka
+
+Инструменты в scripts/ не импортируют друг друга: настройки по умолчанию
+(адрес брокера, топик и группа AnalyticsService, тикеры), гистограмма задержек и
+помощники для kafka-python и psycopg2, которые нужны нескольким
+инструментам, лежат здесь. Модуль ничего тяжелого не импортирует -
+kafka-python и psycopg2 загружаются через import_kafka() и
+import_psycopg2() при первом обращении.
+"""
+
+import os
+import sys
+import math
+import time
+
+from tool_profiling import stage
+
+DEFAULT_BOOTSTRAP = 'localhost:9092'
+DEFAULT_TOPIC = 'portfolio.transactions'
+DEFAULT_GROUP = 'analytics-service-transactions'
+# Строка подключения к analytics-db (docker-compose) для инструментов, пишущих или читающих БД
+DEFAULT_DB_DSN = os.environ.get(
+    'ANALYTICS_DB_DSN', 'host=localhost port=5432 dbname=analytics-db user=postgres password=postgres')
+# Тикеры карточек активов для сценариев и котировок (дальше - синтетические)
+TICKERS = ['SBER', 'GAZP', 'LKOH', 'YNDX', 'GMKN', 'NVTK', 'ROSN', 'TATN', 'MGNT', 'MTSS',
+           'PLZL', 'CHMF', 'ALRS', 'MOEX', 'VTBR', 'AFLT', 'POLY', 'PHOR', 'IRAO', 'RUAL']
+# Относительная точность гистограммы задержек (ширина логарифмических корзин)
+HISTOGRAM_PRECISION = 0.01
+PERCENTILES = [50, 90, 95, 99]
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмическими корзинами (относительная точность 1%)"""
+
+    def __init__(self, precision=HISTOGRAM_PRECISION):
+        self.log_base = math.log1p(precision)
+        self.buckets = {}
+        self.count = 0
+        self.max_value = 0.0
+
+    def record(self, value_ms):
+        bucket = int(math.log(max(value_ms, 0.001) * 1000) / self.log_base)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.max_value = max(self.max_value, value_ms)
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.max_value = max(self.max_value, other.max_value)
+
+    def to_dict(self):
+        """Корзины для JSON отчета (сливаются с другими через from_dict и merge)"""
+        return {'precision': math.expm1(self.log_base), 'count': self.count, 'max_ms': self.max_value,
+                'buckets': {str(bucket): count for bucket, count in sorted(self.buckets.items())}}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['precision'])
+        histogram.buckets = {int(bucket): count for bucket, count in data['buckets'].items()}
+        histogram.count = data['count']
+        histogram.max_value = data['max_ms']
+        return histogram
+
+    def percentile(self, percent):
+        """Значение перцентиля в мс (верхняя граница корзины, не больше максимума)"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(math.exp((bucket + 1) * self.log_base) / 1000, self.max_value)
+        return self.max_value
+
+
+def import_kafka():
+    """Импортировать kafka-python при первом обращении"""
+    try:
+        import kafka
+    except ImportError:
+        print("Ошибка: библиотека kafka-python не установлена!")
+        print("Установите: pip install kafka-python")
+        sys.exit(1)
+    return kafka
+
+
+def import_psycopg2():
+    """Импортировать psycopg2 при первом обращении"""
+    try:
+        import psycopg2
+    except ImportError:
+        print("Ошибка: библиотека psycopg2 не установлена!")
+        print("Установите: pip install psycopg2-binary")
+        sys.exit(1)
+    return psycopg2
+
+
+def topic_partitions(kafka, consumer, topic):
+    """Партиции топика (TopicPartition по возрастанию номера)"""
+    partition_ids = consumer.partitions_for_topic(topic)
+    if not partition_ids:
+        raise ValueError(f"топик {topic} не найден или не имеет партиций")
+    return [kafka.TopicPartition(topic, partition) for partition in sorted(partition_ids)]
+
+
+def produce(producer, topic, records):
+    """Отправить записи (партиция или None, ключ, значение) и дождаться подтверждений: (секунд, ошибок)"""
+    state = {'errors': 0}
+
+    def on_error(_exception):
+        state['errors'] += 1
+
+    started = time.perf_counter()
+    for partition, key, value in records:
+        with stage('send'):
+            future = producer.send(topic, key=key, value=value, partition=partition)
+        future.add_errback(on_error)
+    with stage('flush'):
+        producer.flush()
+    return time.perf_counter() - started, state['errors']
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Мониторинг отставания (lag) consumer group AnalyticsService
+
+Периодически сравнивает закоммиченные offset'ы группы с конечными offset'ами
+каждой партиции топика и считает:
+    - lag по партициям и суммарно
+    - скорость потребления и скорость записи в топик (сообщений/с, сглаженные)
+    - скорость разбора отставания и оценку времени до полного догона
+
+Вывод - обновляемая таблица в терминале или JSON-строки (--json) для
+сохранения и построения графиков. Заменяет разовые снимки
+check_kafka_consumer_status.sh / check_kafka_consumer.ps1 при бэкфиллах,
+когда нужно видеть, успевает ли consumer.
+
+Использование:
+    python scripts/kafka_lag_monitor.py
+    python scripts/kafka_lag_monitor.py --interval 2 --json > lag.jsonl
+    python scripts/kafka_lag_monitor.py --until-caught-up --timeout 1800
+
+Требует: kafka-python
+"""
+
+import sys
+import json
+import math
+import time
+import argparse
+from datetime import datetime, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from kafka_common import DEFAULT_BOOTSTRAP, DEFAULT_GROUP, DEFAULT_TOPIC
+
+# kafka-python импортируется в KafkaOffsetsSource, чтобы --help не загружал клиент
+
+# Интервал опроса offset'ов (в секундах)
+DEFAULT_INTERVAL = 5
+# Коэффициент экспоненциального сглаживания скоростей (1 - без сглаживания)
+DEFAULT_SMOOTHING = 0.3
+
+
+class KafkaOffsetsSource:
+    """Получение закоммиченных и конечных offset'ов партиций топика"""
+
+    def __init__(self, bootstrap_servers, group, topic):
+        try:
+            from kafka import KafkaConsumer
+        except ImportError:
+            print("Ошибка: библиотека kafka-python не установлена!")
+            print("Установите: pip install kafka-python")
+            sys.exit(1)
+
+        self.group = group
+        self.topic = topic
+        with stage('connect'):
+            # Consumer с group_id группы, но без подписки: в группу не вступает и ничего
+            # не коммитит, только читает ее offset'ы. committed() есть и в kafka-python 2.x,
+            # и в 3.x (KafkaAdminClient.list_consumer_group_offsets в 3.x убран)
+            self.consumer = KafkaConsumer(bootstrap_servers=bootstrap_servers, group_id=group,
+                                          enable_auto_commit=False)
+
+    def partitions(self):
+        from kafka import TopicPartition
+
+        partition_ids = self.consumer.partitions_for_topic(self.topic)
+        if not partition_ids:
+            raise RuntimeError(f"топик {self.topic} не найден или не имеет партиций")
+        return [TopicPartition(self.topic, partition) for partition in sorted(partition_ids)]
+
+    def snapshot(self):
+        """
+        Снимок offset'ов
+
+        Returns:
+            Словарь {номер партиции: (закоммиченный offset или None, начальный offset, конечный offset)}
+        """
+        partitions = self.partitions()
+        with stage('committed'):
+            committed = {partition: self.consumer.committed(partition) for partition in partitions}
+        with stage('end offsets'):
+            end_offsets = self.consumer.end_offsets(partitions)
+            beginning_offsets = self.consumer.beginning_offsets(partitions)
+        result = {}
+        for partition in partitions:
+            offset = committed[partition]
+            offset = offset if offset is not None and offset >= 0 else None
+            result[partition.partition] = (offset, beginning_offsets[partition], end_offsets[partition])
+        return result
+
+    def close(self):
+        self.consumer.close()
+
+
+def partition_lag(committed, beginning, end):
+    """Отставание партиции: без коммита группа прочтет все с начального offset'а"""
+    return max(0, end - (beginning if committed is None else committed))
+
+
+class LagTracker:
+    """Расчет отставания, скоростей и времени до догона по последовательным снимкам"""
+
+    def __init__(self, smoothing=DEFAULT_SMOOTHING):
+        self.smoothing = smoothing
+        self.previous = None
+        self.previous_time = None
+        self.consume_rate = None
+        self.produce_rate = None
+
+    def _smooth(self, current, value):
+        return value if current is None else current + self.smoothing * (value - current)
+
+    def update(self, snapshot, now):
+        """
+        Учесть новый снимок offset'ов
+
+        Returns:
+            Словарь с полями: partitions (список по партициям), lag, consume_rate,
+            produce_rate, drain_rate (скорость уменьшения lag), eta_seconds
+            (None - скорость еще не известна, inf - consumer не догоняет)
+        """
+        partitions = []
+        for partition, (committed, beginning, end) in sorted(snapshot.items()):
+            partitions.append({
+                'partition': partition,
+                'committed': committed,
+                'end': end,
+                'lag': partition_lag(committed, beginning, end),
+            })
+        lag = sum(item['lag'] for item in partitions)
+
+        if self.previous is not None and now > self.previous_time:
+            elapsed = now - self.previous_time
+            consumed = produced = 0
+            for partition, (committed, beginning, end) in snapshot.items():
+                previous_committed, previous_beginning, previous_end = self.previous.get(
+                    partition, (committed, beginning, end))
+                produced += max(0, end - previous_end)
+                if committed is not None:
+                    consumed += max(0, committed - (previous_committed
+                                                    if previous_committed is not None else previous_beginning))
+            self.consume_rate = self._smooth(self.consume_rate, consumed / elapsed)
+            self.produce_rate = self._smooth(self.produce_rate, produced / elapsed)
+
+        self.previous = snapshot
+        self.previous_time = now
+
+        drain_rate = None
+        eta_seconds = None
+        if self.consume_rate is not None:
+            drain_rate = self.consume_rate - self.produce_rate
+            if lag == 0:
+                eta_seconds = 0.0
+            elif drain_rate > 0:
+                eta_seconds = lag / drain_rate
+            else:
+                eta_seconds = math.inf
+
+        return {
+            'partitions': partitions,
+            'lag': lag,
+            'consume_rate': self.consume_rate,
+            'produce_rate': self.produce_rate,
+            'drain_rate': drain_rate,
+            'eta_seconds': eta_seconds,
+        }
+
+
+def format_duration(seconds):
+    """Длительность для таблицы: 1ч 02м, 3м 15с, 42с, ∞ или ?"""
+    if seconds is None:
+        return '?'
+    if seconds == math.inf:
+        return '∞ (не догоняет)'
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}ч {seconds % 3600 // 60:02d}м"
+    if seconds >= 60:
+        return f"{seconds // 60}м {seconds % 60:02d}с"
+    return f"{seconds}с"
+
+
+def format_rate(rate):
+    return '?' if rate is None else f"{rate:.1f}/с"
+
+
+def print_table(status, group, topic, live):
+    """Вывести состояние группы таблицей (в режиме live - поверх предыдущей)"""
+    if live:
+        sys.stdout.write('\033[H\033[J')
+    print(f"{datetime.now().strftime('%H:%M:%S')}  группа: {group}  топик: {topic}")
+    print("=" * 60)
+    print(f"  {'партиция':>8} {'закоммичено':>14} {'конец':>14} {'lag':>12}")
+    for item in status['partitions']:
+        committed = '-' if item['committed'] is None else item['committed']
+        print(f"  {item['partition']:>8} {committed:>14} {item['end']:>14} {item['lag']:>12}")
+    print("=" * 60)
+    print(f"  Lag: {status['lag']}")
+    print(f"  Потребление: {format_rate(status['consume_rate'])}, "
+          f"запись в топик: {format_rate(status['produce_rate'])}, "
+          f"разбор отставания: {format_rate(status['drain_rate'])}")
+    print(f"  До догона: {format_duration(status['eta_seconds'])}")
+    if not live:
+        print()
+    sys.stdout.flush()
+
+
+def status_json(status, group, topic):
+    """Состояние группы одной JSON-строкой"""
+    eta = status['eta_seconds']
+    return json.dumps({
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'group': group,
+        'topic': topic,
+        'lag': status['lag'],
+        'consume_rate': status['consume_rate'],
+        'produce_rate': status['produce_rate'],
+        'drain_rate': status['drain_rate'],
+        'eta_seconds': None if eta == math.inf else eta,
+        'caught_up': status['lag'] == 0,
+        'partitions': status['partitions'],
+    })
+
+
+def monitor(source, args):
+    """
+    Опрашивать offset'ы и выводить состояние
+
+    Returns:
+        Код возврата: 1, если с --until-caught-up группа не догнала топик за --timeout
+    """
+    tracker = LagTracker(args.smoothing)
+    live = not args.json and sys.stdout.isatty()
+    started = time.monotonic()
+    polls = 0
+
+    while True:
+        with stage('poll'):
+            snapshot = source.snapshot()
+        status = tracker.update(snapshot, time.monotonic())
+        polls += 1
+
+        if args.json:
+            print(status_json(status, args.group, args.topic), flush=True)
+        else:
+            print_table(status, args.group, args.topic, live)
+
+        if args.until_caught_up and status['lag'] == 0:
+            if not args.json:
+                print("✓ Consumer group догнала топик")
+            return 0
+        if args.count and polls >= args.count:
+            return 0
+        if args.timeout and time.monotonic() - started >= args.timeout:
+            if args.until_caught_up:
+                if not args.json:
+                    print(f"✗ Не догнала за {format_duration(args.timeout)}, lag: {status['lag']}")
+                return 1
+            return 0
+        time.sleep(args.interval)
+
+
+def run(args):
+    source = KafkaOffsetsSource(args.bootstrap_server, args.group, args.topic)
+    try:
+        return monitor(source, args)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Мониторинг отставания consumer group AnalyticsService по партициям топика'
+    )
+    parser.add_argument('--bootstrap-server', default=DEFAULT_BOOTSTRAP,
+                        help=f'Адрес Kafka брокера (по умолчанию: {DEFAULT_BOOTSTRAP})')
+    parser.add_argument('--group', default=DEFAULT_GROUP,
+                        help=f'Consumer group (по умолчанию: {DEFAULT_GROUP})')
+    parser.add_argument('--topic', default=DEFAULT_TOPIC,
+                        help=f'Топик (по умолчанию: {DEFAULT_TOPIC})')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'Интервал опроса в секундах (по умолчанию: {DEFAULT_INTERVAL})')
+    parser.add_argument('--smoothing', type=float, default=DEFAULT_SMOOTHING,
+                        help=f'Сглаживание скоростей, 0..1 (по умолчанию: {DEFAULT_SMOOTHING})')
+    parser.add_argument('--json', action='store_true', help='Выводить JSON-строки вместо таблицы')
+    parser.add_argument('--count', type=int, help='Количество опросов (по умолчанию: до Ctrl+C)')
+    parser.add_argument('--until-caught-up', action='store_true',
+                        help='Завершиться, когда lag станет 0 (с --timeout: код 1, если не догнала)')
+    parser.add_argument('--timeout', type=float, help='Максимальная длительность мониторинга в секундах')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    return run_profiled(args, run, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Распределенная нагрузка с нескольких машин: шарды, одновременный старт, сводный отчет
+
+Шард i/N (i от 0 до N-1) отправляет непересекающуюся часть общего потока:
+    - генерация: номера сообщений [i * count / N, (i + 1) * count / N) - с общим
+      --seed идентификаторы и ключи сообщений зависят только от номера,
+      поэтому шарды не пересекаются и запуск воспроизводим;
+    - --replay: строки, у которых crc32(portfolioId) % N == i - все сообщения
+      портфеля уходят с одной машины и сохраняют порядок.
+
+Одновременный старт:
+    - barrier_start(): каталог на общем диске. Шарды создают в нем ready.<i>,
+      шард 0 дожидается всех и пишет start со временем старта (нужны
+      синхронизированные часы, NTP);
+    - rendezvous_start(): шард 0 принимает TCP соединения остальных и, когда
+      все на месте, рассылает задержку до старта - от часов узлов не зависит.
+
+Отчеты узлов (node_report) сливаются merge_reports() в общий: суммарные
+счетчики, общая гистограмма задержек и пропускная способность кластера
+(подтверждено / от первого старта до последнего подтверждения).
+"""
+
+import os
+import json
+import time
+import zlib
+import socket
+from datetime import datetime, timezone
+
+from kafka_common import LatencyHistogram
+
+DEFAULT_START_DELAY = 3.0
+DEFAULT_SYNC_TIMEOUT = 600.0
+SYNC_POLL_INTERVAL = 0.1
+START_FILE = 'start'
+
+
+def parse_shard(text):
+    """'i/N' -> (i, N)"""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"некорректный шард: {text} (ожидается i/N, например 0/4)") from None
+    if count <= 0 or not 0 <= index < count:
+        raise ValueError(f"некорректный шард: {text} (нужно 0 <= i < N)")
+    return index, count
+
+
+def shard_range(shard, total):
+    """Номера сообщений шарда: [начало, конец)"""
+    index, count = shard
+    return index * total // count, (index + 1) * total // count
+
+
+def owns_key(shard, key):
+    """Принадлежит ли ключ шарду (разбиение --replay потока по портфелям)"""
+    index, count = shard
+    return zlib.crc32(key.encode('utf-8')) % count == index
+
+
+def _write_atomic(path, data):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def _wait_for(predicate, timeout, what):
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        if result:
+            return result
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"не дождались {what} за {timeout:g} с")
+        time.sleep(SYNC_POLL_INTERVAL)
+
+
+def barrier_start(directory, shard, signature, delay=DEFAULT_START_DELAY, timeout=DEFAULT_SYNC_TIMEOUT):
+    """
+    Барьер через каталог на общем диске
+
+    Args:
+        signature: параметры запуска, которые должны совпадать у всех шардов
+
+    Returns:
+        Момент старта по time.monotonic() этого узла
+    """
+    index, count = shard
+    os.makedirs(directory, exist_ok=True)
+    start_path = os.path.join(directory, START_FILE)
+    if os.path.exists(start_path):
+        raise ValueError(f"в {directory} уже есть {START_FILE} от прошлого запуска: укажите новый каталог")
+    _write_atomic(os.path.join(directory, f"ready.{index}"),
+                  {'host': socket.gethostname(), 'pid': os.getpid(), 'signature': signature})
+
+    if index == 0:
+        def all_ready():
+            for other in range(count):
+                path = os.path.join(directory, f"ready.{other}")
+                if not os.path.exists(path):
+                    return False
+                with open(path, 'r', encoding='utf-8') as f:
+                    if json.load(f)['signature'] != signature:
+                        raise ValueError(f"шард {other}/{count} запущен с другими параметрами")
+            return True
+
+        _wait_for(all_ready, timeout, f"готовности {count} шардов")
+        _write_atomic(start_path, {'start_at': time.time() + delay})
+
+    _wait_for(lambda: os.path.exists(start_path), timeout, "сигнала старта")
+    with open(start_path, 'r', encoding='utf-8') as f:
+        start_at = json.load(f)['start_at']
+    return time.monotonic() + (start_at - time.time())
+
+
+def _send_line(connection, data):
+    connection.sendall((json.dumps(data) + '\n').encode('utf-8'))
+
+
+def _read_line(connection):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(4096)
+        if not chunk:
+            raise ConnectionError("соединение закрыто до сигнала старта")
+        data += chunk
+    return json.loads(data)
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"некорректный адрес: {text} (ожидается HOST:PORT)")
+    return host, int(port)
+
+
+def rendezvous_start(address, shard, signature, delay=DEFAULT_START_DELAY, timeout=DEFAULT_SYNC_TIMEOUT):
+    """
+    Барьер через TCP: шард 0 слушает address, остальные подключаются к нему
+
+    Returns:
+        Момент старта по time.monotonic() этого узла
+    """
+    index, count = shard
+    host, port = parse_address(address)
+    deadline = time.monotonic() + timeout
+
+    if index != 0:
+        while True:
+            try:
+                connection = socket.create_connection((host, port), timeout=5)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"шард 0 не отвечает на {address} за {timeout:g} с") from None
+                time.sleep(SYNC_POLL_INTERVAL * 10)
+        with connection:
+            connection.settimeout(max(deadline - time.monotonic(), 1))
+            _send_line(connection, {'shard': index, 'signature': signature})
+            reply = _read_line(connection)
+        if 'error' in reply:
+            raise ValueError(reply['error'])
+        return time.monotonic() + reply['delay']
+
+    server = socket.create_server(('', port))
+    peers = {}
+    try:
+        server.settimeout(SYNC_POLL_INTERVAL * 10)
+        while len(peers) < count - 1:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"подключилось {len(peers)} из {count - 1} шардов за {timeout:g} с")
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(10)
+            hello = _read_line(connection)
+            error = None
+            if hello['signature'] != signature:
+                error = f"шард {hello['shard']}/{count} запущен с другими параметрами"
+            elif hello['shard'] in peers or not 0 < hello['shard'] < count:
+                error = f"шард {hello['shard']}/{count} уже подключен или вне диапазона"
+            if error:
+                _send_line(connection, {'error': error})
+                connection.close()
+                continue
+            peers[hello['shard']] = connection
+        for connection in peers.values():
+            _send_line(connection, {'delay': delay})
+    finally:
+        for connection in peers.values():
+            connection.close()
+        server.close()
+    return time.monotonic() + delay
+
+
+def node_report(shard, started_at, finished_at, sent, acked, errors, latency, params):
+    """Отчет узла: время по часам узла (Unix), счетчики, гистограмма задержек подтверждения"""
+    return {
+        'shard': list(shard),
+        'host': socket.gethostname(),
+        'params': params,
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'sent': sent,
+        'acked': acked,
+        'errors': errors,
+        'latency': latency.to_dict(),
+    }
+
+
+def merge_reports(reports):
+    """
+    Общий отчет кластера из отчетов узлов
+
+    Returns:
+        (словарь отчета, общая гистограмма задержек)
+    """
+    if not reports:
+        raise ValueError("нет отчетов для слияния")
+    count = reports[0]['shard'][1]
+    seen = [report['shard'][0] for report in reports]
+    if any(report['shard'][1] != count for report in reports):
+        raise ValueError("отчеты от запусков с разным числом шардов")
+    duplicates = sorted({index for index in seen if seen.count(index) > 1})
+    if duplicates:
+        raise ValueError(f"повторяющиеся шарды: {', '.join(map(str, duplicates))}")
+
+    latency = LatencyHistogram.from_dict(reports[0]['latency'])
+    for report in reports[1:]:
+        latency.merge(LatencyHistogram.from_dict(report['latency']))
+    started_at = min(report['started_at'] for report in reports)
+    finished_at = max(report['finished_at'] for report in reports)
+    acked = sum(report['acked'] for report in reports)
+    duration = max(finished_at - started_at, 1e-9)
+    merged = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'shards': count,
+        'missing_shards': sorted(set(range(count)) - set(seen)),
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'duration_s': duration,
+        'sent': sum(report['sent'] for report in reports),
+        'acked': acked,
+        'errors': sum(report['errors'] for report in reports),
+        'messages_per_s': acked / duration,
+        'sum_node_messages_per_s': sum(report['acked'] / max(report['finished_at'] - report['started_at'], 1e-9)
+                                       for report in reports),
+        'latency': latency.to_dict(),
+        'nodes': [{key: report[key] for key in ('shard', 'host', 'started_at', 'finished_at', 'sent', 'acked',
+                                                 'errors')} for report in reports],
+    }
+    return merged, latency
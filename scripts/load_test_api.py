@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нагрузочное тестирование HTTP API AnalyticsService с проверкой SLA
+
+Генератор нагрузки на asyncio с открытой моделью поступления запросов:
+запросы отправляются по расписанию (--rate, пуассоновский или равномерный
+поток) независимо от того, успел ли ответить сервер. Задержка считается от
+запланированного момента отправки, поэтому ожидание свободного соединения
+и перегрузка сервера попадают в перцентили (без coordinated omission).
+
+Возможности:
+    - пул keep-alive соединений (HTTP/1.1, без внешних зависимостей)
+    - взвешенная смесь запросов к эндпоинтам (--mix)
+    - гистограммы задержек по эндпоинтам (p50/p90/p95/p99/max)
+    - проверка SLA (по умолчанию из Task 7.3: p95 < 500 мс), код возврата 1 при нарушении
+    - локальная заглушка API для проверки без сервиса (--stub)
+
+Использование:
+    python scripts/load_test_api.py --url http://localhost:5000 --rate 50 --duration 60 --token <JWT>
+    python scripts/load_test_api.py --stub --rate 200 --duration 10
+    python scripts/load_test_api.py --url http://localhost:5000 --mix top-bought=5,history=1 \\
+        --sla p95=500 --sla compare:p99=1500 --sla errors=0.01
+    python scripts/load_test_api.py --serve-stub 8081
+
+Запросы истории можно брать из потока scripts/history_workload.py (--history-stream):
+портфели и окна периода идут в порядке потока, чтобы проверить долю попаданий
+в кэш GetHistoryAsync на той же нагрузке, для которой она оценивалась.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, urlencode
+from datetime import datetime, timezone, timedelta
+
+from tool_profiling import add_profiling_arguments, run_profiled
+from kafka_common import LatencyHistogram, PERCENTILES
+
+# asyncio импортируется внутри функций: его загрузка занимает заметную часть
+# бюджета времени импорта (sma_tools selfcheck imports)
+
+# Эндпоинты и смесь запросов по умолчанию (веса)
+ENDPOINTS = ['transactions', 'top-bought', 'top-sold', 'history', 'compare']
+DEFAULT_MIX = 'transactions=3,top-bought=2,top-sold=2,history=2,compare=1'
+# Параметры нагрузки по умолчанию
+DEFAULT_RATE = 20
+DEFAULT_DURATION = 30
+DEFAULT_WARMUP = 0
+DEFAULT_CONNECTIONS = 32
+DEFAULT_MAX_INFLIGHT = 1000
+DEFAULT_TIMEOUT = 10
+# SLA по умолчанию (Task 7.3): p95 < 500 мс, доля ошибок не больше 1%
+DEFAULT_SLA = ['p95=500', 'errors=0.01']
+# Интервал периода запросов к аналитике (в днях до текущего момента)
+PERIOD_DAYS = 30
+# Параметры заглушки по умолчанию
+STUB_LATENCY_MS = 20
+STUB_JITTER_MS = 10
+STUB_ERROR_RATE = 0.0
+
+
+class EndpointStats:
+    """Статистика одного эндпоинта"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.errors = {}
+
+    @property
+    def requests(self):
+        return self.latency.count
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+    def error_rate(self):
+        return self.error_count / self.requests if self.requests else 0.0
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.service.merge(other.service)
+        for kind, count in other.errors.items():
+            self.errors[kind] = self.errors.get(kind, 0) + count
+
+
+class HttpConnectionPool:
+    """Пул keep-alive соединений HTTP/1.1 к одному хосту"""
+
+    def __init__(self, url, size=DEFAULT_CONNECTIONS, timeout=DEFAULT_TIMEOUT):
+        import asyncio
+
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.ssl = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.host_header = parts.netloc
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.opened = 0
+
+    async def _connect(self):
+        import asyncio
+
+        self.opened += 1
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl or None), self.timeout
+        )
+
+    async def request(self, method, path, headers=None, body=None):
+        """
+        Выполнить запрос
+
+        Returns:
+            (HTTP статус, тело ответа, момент отправки запроса по perf_counter)
+        """
+        import asyncio
+
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            reader, writer = connection
+            sent_at = time.perf_counter()
+            try:
+                status, response_body, keep_alive = await asyncio.wait_for(
+                    self._exchange(reader, writer, method, path, headers or {}, body), self.timeout
+                )
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append(connection)
+            else:
+                writer.close()
+            return status, response_body, sent_at
+
+    async def _exchange(self, reader, writer, method, path, headers, body):
+        lines = [f"{method} {self.base_path}{path} HTTP/1.1", f"Host: {self.host_header}",
+                 "Connection: keep-alive", f"Content-Length: {len(body) if body else 0}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('соединение закрыто сервером')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            response_body = b''.join(chunks)
+            keep_alive = True
+        elif 'content-length' in response_headers:
+            response_body = await reader.readexactly(int(response_headers['content-length']))
+            keep_alive = True
+        else:
+            response_body = await reader.read()
+            keep_alive = False
+
+        if response_headers.get('connection', '').lower() == 'close':
+            keep_alive = False
+        return status, response_body, keep_alive
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+def parse_mix(spec):
+    """Строка 'эндпоинт=вес,...' -> словарь весов"""
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f"неизвестный эндпоинт '{name}' (доступны: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError('сумма весов смеси должна быть больше нуля')
+    return mix
+
+
+def parse_sla(specs):
+    """
+    Разобрать пороги SLA
+
+    Формат: [эндпоинт:]pNN=мс или [эндпоинт:]errors=доля,
+    без эндпоинта порог относится к каждому эндпоинту и к итогу.
+
+    Returns:
+        Список (эндпоинт или None, метрика, порог)
+    """
+    rules = []
+    for spec in specs:
+        scope, _, rule = spec.rpartition(':')
+        metric, _, threshold = rule.partition('=')
+        if scope and scope not in ENDPOINTS:
+            raise ValueError(f"неизвестный эндпоинт в SLA '{spec}'")
+        if metric != 'errors' and not (metric.startswith('p') and metric[1:].replace('.', '', 1).isdigit()):
+            raise ValueError(f"неизвестная метрика в SLA '{spec}' (ожидается pNN или errors)")
+        rules.append((scope or None, metric, float(threshold)))
+    return rules
+
+
+def load_portfolio_ids(args):
+    """Идентификаторы портфелей из --portfolio-ids или из JSONL потока (--portfolios-from)"""
+    if args.portfolio_ids:
+        return [item.strip() for item in args.portfolio_ids.split(',') if item.strip()]
+    if args.portfolios_from:
+        ids = {}
+        with open(args.portfolios_from, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    ids[json.loads(line)['portfolioId']] = None
+        return list(ids)
+    return []
+
+
+def load_history_stream(path):
+    """Запросы истории из JSONL (history_workload.py --output): список (id портфеля, начало, конец)"""
+    requests = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                requests.append((item['portfolioId'], item['startDate'], item['endDate']))
+    if not requests:
+        raise ValueError(f"поток запросов истории пуст: {path}")
+    return requests
+
+
+class RequestFactory:
+    """Построение запросов к эндпоинтам AnalyticsService"""
+
+    def __init__(self, portfolio_ids, rng, period_days=PERIOD_DAYS, history_stream=None):
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.start_date = (now - timedelta(days=period_days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.end_date = now.strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.portfolio_ids = portfolio_ids or [str(uuid.uuid4()) for _ in range(10)]
+        self.rng = rng
+        self.history_stream = history_stream
+        self.history_position = 0
+
+    def build(self, endpoint):
+        """Returns: (метод, путь с параметрами, тело JSON или None)"""
+        period = {'startDate': self.start_date, 'endDate': self.end_date}
+        if endpoint == 'transactions':
+            return 'GET', '/api/analytics/transactions?' + urlencode({'periodType': 'Week'}), None
+        if endpoint in ('top-bought', 'top-sold'):
+            params = dict(period, top=10, context='Global')
+            return 'GET', f'/api/analytics/assets/{endpoint}?' + urlencode(params), None
+        if endpoint == 'history' and self.history_stream:
+            portfolio_id, start_date, end_date = self.history_stream[self.history_position]
+            self.history_position = (self.history_position + 1) % len(self.history_stream)
+            params = {'startDate': start_date, 'endDate': end_date}
+            return 'GET', f'/api/analytics/portfolios/{portfolio_id}/history?' + urlencode(params), None
+        if endpoint == 'history':
+            portfolio_id = self.rng.choice(self.portfolio_ids)
+            return 'GET', f'/api/analytics/portfolios/{portfolio_id}/history?' + urlencode(period), None
+        portfolio_ids = self.rng.sample(self.portfolio_ids, min(len(self.portfolio_ids), self.rng.randint(2, 3)))
+        body = json.dumps(dict(period, portfolioIds=portfolio_ids)).encode('utf-8')
+        return 'POST', '/api/analytics/portfolios/compare', body
+
+
+async def issue_request(pool, factory, endpoint, headers, intended_at, record):
+    """Выполнить один запрос и записать задержку от запланированного момента"""
+    import asyncio
+
+    method, path, body = factory.build(endpoint)
+    request_headers = dict(headers)
+    if body is not None:
+        request_headers['Content-Type'] = 'application/json'
+    sent_at = None
+    error = None
+    try:
+        status, _, sent_at = await pool.request(method, path, request_headers, body)
+        if status >= 400:
+            error = f'http {status}'
+    except asyncio.TimeoutError:
+        error = 'timeout'
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+        error = type(e).__name__
+    finished_at = time.perf_counter()
+    record(endpoint, intended_at, sent_at, finished_at, error)
+
+
+async def run_load(url, mix, rate, duration, warmup=DEFAULT_WARMUP, connections=DEFAULT_CONNECTIONS,
+                   max_inflight=DEFAULT_MAX_INFLIGHT, timeout=DEFAULT_TIMEOUT, arrival='poisson',
+                   token=None, portfolio_ids=None, seed=None, history_stream=None):
+    """
+    Подать нагрузку с открытой моделью поступления запросов
+
+    Returns:
+        Словарь: stats (эндпоинт -> EndpointStats), dropped (запросы, не отправленные
+        из-за лимита одновременных запросов), elapsed (окно измерения), connections
+    """
+    import asyncio
+
+    rng = random.Random(seed)
+    factory = RequestFactory(portfolio_ids, rng, history_stream=history_stream)
+    pool = HttpConnectionPool(url, connections, timeout)
+    headers = {'Accept': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    stats = {name: EndpointStats() for name in names}
+    dropped = {'count': 0}
+    inflight = set()
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = started + warmup + duration
+
+    def record(endpoint, intended_at, sent_at, finished_at, error):
+        if intended_at < measure_from:
+            return
+        endpoint_stats = stats[endpoint]
+        endpoint_stats.latency.record((finished_at - intended_at) * 1000)
+        if sent_at is not None:
+            endpoint_stats.service.record((finished_at - sent_at) * 1000)
+        if error:
+            endpoint_stats.errors[error] = endpoint_stats.errors.get(error, 0) + 1
+
+    intended_at = started
+    while True:
+        intended_at += rng.expovariate(rate) if arrival == 'poisson' else 1 / rate
+        if intended_at >= stop_at:
+            break
+        delay = intended_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(inflight) >= max_inflight:
+            # Клиент не успевает: запрос считается потерянным, а не отложенным
+            if intended_at >= measure_from:
+                dropped['count'] += 1
+            continue
+        endpoint = rng.choices(names, weights)[0]
+        task = asyncio.ensure_future(issue_request(pool, factory, endpoint, headers, intended_at, record))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+
+    # Интенсивность считается по окну планирования, без ожидания последних ответов
+    elapsed = time.perf_counter() - measure_from
+    if inflight:
+        await asyncio.wait(inflight)
+    pool.close()
+    return {
+        'stats': stats,
+        'dropped': dropped['count'],
+        'elapsed': elapsed,
+        'connections': pool.opened,
+    }
+
+
+def stub_response(method, path, rng):
+    """Ответ заглушки API для пути запроса"""
+    route = path.split('?', 1)[0]
+    if route == '/api/analytics/transactions' and method == 'GET':
+        return 200, {'transactions': [], 'totalCount': 0}
+    if route in ('/api/analytics/assets/top-bought', '/api/analytics/assets/top-sold') and method == 'GET':
+        assets = [{'stockCardId': str(uuid.UUID(int=rng.getrandbits(128))), 'buyTransactionCount': 10 - i,
+                   'sellTransactionCount': 10 - i} for i in range(10)]
+        return 200, {'assets': assets, 'top': 10, 'context': 1}
+    if route.startswith('/api/analytics/portfolios/') and route.endswith('/history') and method == 'GET':
+        return 200, {'portfolioId': route.split('/')[4], 'transactions': []}
+    if route == '/api/analytics/portfolios/compare' and method == 'POST':
+        return 200, {'portfolios': []}
+    return 404, {'error': 'NotFound'}
+
+
+async def handle_stub_connection(reader, writer, latency_ms, jitter_ms, error_rate, rng):
+    """Обработать keep-alive соединение заглушки"""
+    import asyncio
+
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            content_length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    content_length = int(value)
+            if content_length:
+                await reader.readexactly(content_length)
+
+            await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000)
+            if rng.random() < error_rate:
+                status, payload = 500, {'error': 'StubFailure'}
+            else:
+                status, payload = stub_response(method, path, rng)
+            body = json.dumps(payload).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+class StubApiServer:
+    """
+    Локальная заглушка API AnalyticsService в отдельном потоке со своим циклом событий
+
+    Используется как контекстный менеджер; адрес - в атрибуте url.
+    """
+
+    def __init__(self, port=0, latency_ms=STUB_LATENCY_MS, jitter_ms=STUB_JITTER_MS,
+                 error_rate=STUB_ERROR_RATE, seed=None):
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.url = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    async def _start(self):
+        import asyncio
+
+        self._server = await asyncio.start_server(
+            lambda reader, writer: handle_stub_connection(
+                reader, writer, self.latency_ms, self.jitter_ms, self.error_rate, self.rng),
+            '127.0.0.1', self.port, backlog=1024
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def _serve(self):
+        import asyncio
+
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def check_sla(result, rules):
+    """
+    Проверить пороги SLA по эндпоинтам и итогу
+
+    Returns:
+        Список (область, метрика, значение, порог, выполнено)
+    """
+    total = EndpointStats()
+    for endpoint_stats in result['stats'].values():
+        total.merge(endpoint_stats)
+
+    checks = []
+    for scope, metric, threshold in rules:
+        targets = [(scope, result['stats'][scope])] if scope else \
+            [('all', total)] + sorted(result['stats'].items())
+        for name, endpoint_stats in targets:
+            if not endpoint_stats.requests and name != 'all':
+                continue
+            if metric == 'errors':
+                value = endpoint_stats.error_rate()
+                if name == 'all' and result['dropped']:
+                    value = (endpoint_stats.error_count + result['dropped']) / \
+                        (endpoint_stats.requests + result['dropped'])
+            else:
+                value = endpoint_stats.latency.percentile(float(metric[1:]))
+            checks.append((name, metric, value, threshold, value <= threshold))
+    return checks
+
+
+def print_report(result, checks, rate):
+    """Вывести таблицу задержек по эндпоинтам и результаты SLA"""
+    total = EndpointStats()
+    for endpoint_stats in result['stats'].values():
+        total.merge(endpoint_stats)
+
+    print()
+    print("=" * 96)
+    print(f"Задержки от запланированного момента отправки (мс), "
+          f"окно: {result['elapsed']:.1f} с, соединений: {result['connections']}")
+    print("=" * 96)
+    header = f"  {'эндпоинт':<14} {'запросов':>9} {'rps':>8} {'ошибок':>7}"
+    header += ''.join(f" {'p' + str(p):>8}" for p in PERCENTILES) + f" {'max':>8} {'сервис p95':>11}"
+    print(header)
+    rows = sorted(result['stats'].items()) + [('all', total)]
+    for name, endpoint_stats in rows:
+        if not endpoint_stats.requests:
+            continue
+        rps = endpoint_stats.requests / result['elapsed'] if result['elapsed'] > 0 else 0
+        line = f"  {name:<14} {endpoint_stats.requests:>9} {rps:>8.1f} {endpoint_stats.error_count:>7}"
+        line += ''.join(f" {endpoint_stats.latency.percentile(p):>8.1f}" for p in PERCENTILES)
+        line += f" {endpoint_stats.latency.max_value:>8.1f} {endpoint_stats.service.percentile(95):>11.1f}"
+        print(line)
+    print("=" * 96)
+
+    achieved = (total.requests + result['dropped']) / result['elapsed'] if result['elapsed'] > 0 else 0
+    print(f"Целевая интенсивность: {rate:.1f} rps, запланировано: {achieved:.1f} rps")
+    if result['dropped']:
+        print(f"  ✗ Не отправлено из-за лимита одновременных запросов: {result['dropped']}")
+    errors = {}
+    for endpoint_stats in result['stats'].values():
+        for kind, count in endpoint_stats.errors.items():
+            errors[kind] = errors.get(kind, 0) + count
+    if errors:
+        print("Ошибки: " + ', '.join(f"{kind}: {count}" for kind, count in sorted(errors.items())))
+
+    if checks:
+        print()
+        print("SLA:")
+        for name, metric, value, threshold, passed in checks:
+            if metric == 'errors':
+                print(f"  {'✓' if passed else '✗'} {name} errors {value:.2%} (порог {threshold:.2%})")
+            else:
+                print(f"  {'✓' if passed else '✗'} {name} {metric} {value:.1f} мс (порог {threshold:.0f} мс)")
+
+
+def build_report(result, checks, args):
+    """Отчет в JSON"""
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'params': {'url': args.url, 'rate': args.rate, 'duration': args.duration, 'mix': args.mix,
+                   'arrival': args.arrival, 'connections': args.connections},
+        'elapsed': result['elapsed'],
+        'dropped': result['dropped'],
+        'endpoints': {
+            name: {
+                'requests': endpoint_stats.requests,
+                'errors': endpoint_stats.errors,
+                'latency_ms': {f'p{p}': endpoint_stats.latency.percentile(p) for p in PERCENTILES},
+                'max_ms': endpoint_stats.latency.max_value,
+                'service_p95_ms': endpoint_stats.service.percentile(95),
+            }
+            for name, endpoint_stats in result['stats'].items()
+        },
+        'sla': [
+            {'scope': name, 'metric': metric, 'value': value, 'threshold': threshold, 'passed': passed}
+            for name, metric, value, threshold, passed in checks
+        ],
+    }
+
+
+def run(args):
+    """Подать нагрузку (на API или заглушку), вывести отчет и проверить SLA"""
+    import asyncio
+
+    mix = parse_mix(args.mix)
+    rules = parse_sla(args.sla or DEFAULT_SLA)
+    portfolio_ids = load_portfolio_ids(args)
+    history_stream = load_history_stream(args.history_stream) if args.history_stream else None
+    if not portfolio_ids and history_stream:
+        portfolio_ids = list(dict.fromkeys(portfolio_id for portfolio_id, _, _ in history_stream))
+    if not portfolio_ids:
+        print("Предупреждение: идентификаторы портфелей не заданы, history/compare "
+              "используют случайные (--portfolio-ids или --portfolios-from)")
+
+    print("=" * 60)
+    print("Нагрузочное тестирование AnalyticsService API")
+    print("=" * 60)
+
+    def load(url):
+        print(f"API: {url}")
+        print(f"Интенсивность: {args.rate} rps ({args.arrival}), длительность: {args.duration} с, "
+              f"прогрев: {args.warmup} с")
+        print(f"Смесь: {', '.join(f'{name}={weight:g}' for name, weight in mix.items())}")
+        return asyncio.run(run_load(
+            url, mix, args.rate, args.duration, args.warmup, args.connections,
+            args.max_inflight, args.timeout, args.arrival, args.token, portfolio_ids, args.seed, history_stream
+        ))
+
+    if args.stub:
+        with StubApiServer(latency_ms=args.stub_latency_ms, jitter_ms=args.stub_jitter_ms,
+                           error_rate=args.stub_error_rate, seed=args.seed) as stub:
+            result = load(stub.url)
+    else:
+        result = load(args.url)
+
+    checks = check_sla(result, rules)
+    print_report(result, checks, args.rate)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(build_report(result, checks, args), f, indent=2, ensure_ascii=False)
+        print(f"\nОтчет сохранен: {args.report}")
+
+    return 0 if all(passed for *_, passed in checks) else 1
+
+
+def serve_stub(args):
+    """Запустить заглушку API отдельно (до Ctrl+C)"""
+    with StubApiServer(args.serve_stub, args.stub_latency_ms, args.stub_jitter_ms,
+                       args.stub_error_rate, args.seed) as stub:
+        print(f"Заглушка AnalyticsService API: {stub.url} (Ctrl+C для остановки)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Нагрузочное тестирование HTTP API AnalyticsService с проверкой SLA'
+    )
+    parser.add_argument('--url', default=os.environ.get('ANALYTICS_API_URL', 'http://localhost:5000'),
+                        help='Адрес AnalyticsService (по умолчанию: ANALYTICS_API_URL или http://localhost:5000)')
+    parser.add_argument('--token', default=os.environ.get('ANALYTICS_API_TOKEN'),
+                        help='JWT для API (по умолчанию: переменная ANALYTICS_API_TOKEN)')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help=f'Интенсивность запросов в секунду (по умолчанию: {DEFAULT_RATE})')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f'Длительность измерения в секундах (по умолчанию: {DEFAULT_DURATION})')
+    parser.add_argument('--warmup', type=float, default=DEFAULT_WARMUP,
+                        help='Прогрев в секундах, не входит в статистику (по умолчанию: 0)')
+    parser.add_argument('--arrival', choices=['poisson', 'constant'], default='poisson',
+                        help='Модель поступления запросов (по умолчанию: poisson)')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f'Веса эндпоинтов (по умолчанию: {DEFAULT_MIX})')
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS,
+                        help=f'Размер пула соединений (по умолчанию: {DEFAULT_CONNECTIONS})')
+    parser.add_argument('--max-inflight', type=int, default=DEFAULT_MAX_INFLIGHT,
+                        help=f'Лимит одновременных запросов (по умолчанию: {DEFAULT_MAX_INFLIGHT})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Таймаут запроса в секундах (по умолчанию: {DEFAULT_TIMEOUT})')
+    parser.add_argument('--sla', action='append', metavar='[ENDPOINT:]pNN=MS|errors=RATE',
+                        help=f"Порог SLA, можно несколько (по умолчанию: {' '.join(DEFAULT_SLA)})")
+    parser.add_argument('--portfolio-ids', help='Идентификаторы портфелей через запятую (history, compare)')
+    parser.add_argument('--portfolios-from', metavar='FILE',
+                        help='Взять идентификаторы портфелей из JSONL потока транзакций')
+    parser.add_argument('--history-stream', metavar='FILE',
+                        help='Запросы истории из JSONL потока history_workload.py (по порядку)')
+    parser.add_argument('--seed', type=int, help='Seed расписания и смеси запросов')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить отчет в JSON')
+    parser.add_argument('--stub', action='store_true', help='Подать нагрузку на локальную заглушку API')
+    parser.add_argument('--serve-stub', type=int, metavar='PORT', help='Только запустить заглушку API на порту')
+    parser.add_argument('--stub-latency-ms', type=float, default=STUB_LATENCY_MS,
+                        help=f'Задержка ответа заглушки (по умолчанию: {STUB_LATENCY_MS})')
+    parser.add_argument('--stub-jitter-ms', type=float, default=STUB_JITTER_MS,
+                        help=f'Разброс задержки заглушки (по умолчанию: {STUB_JITTER_MS})')
+    parser.add_argument('--stub-error-rate', type=float, default=STUB_ERROR_RATE,
+                        help='Доля ответов заглушки с HTTP 500 (по умолчанию: 0)')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.serve_stub is not None:
+        return serve_stub(args)
+    try:
+        return run_profiled(args, run, args)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк пути обработки ошибок AnalyticsService: битые и некорректные сообщения
+
+Отправляет в portfolio.transactions серии сообщений (фазы) с разной долей
+нарушений правил валидации из Presentation/EVENT_FIELDS_LIST.md (неверный
+totalAmount, время в будущем, недопустимые enum, обрезанный JSON, null и т.д.)
+и для каждой фазы измеряет:
+    - пропускную способность consumer: сообщений фазы / время до коммита последнего
+    - задержку от отправки до коммита offset'а consumer group (p50/p95/p99)
+    - сколько сообщений каждого вида нарушения попало в DLQ (portfolio.transactions.dlq)
+
+Первая фаза (обычно доля 0) - базовая, остальные сравниваются с ней.
+Сообщения из DLQ сопоставляются с нарушениями по значению - видно, какие
+правила сервис действительно проверяет.
+
+Consumer коммитит offset последнего успешно обработанного сообщения, поэтому
+сообщения с нарушениями в конце партиции не коммитятся до следующего
+валидного. После сообщений фазы в каждую партицию отправляется одно валидное
+служебное сообщение - оно закрывает фазу и в статистику не входит.
+
+Использование:
+    python scripts/poison_benchmark.py --count 5000 --ratios 0,0.05,0.2
+    python scripts/poison_benchmark.py --violations truncated_json=2,time_future=1 --rate 500
+
+Требует: kafka-python
+"""
+
+import sys
+import json
+import random
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from send_test_kafka_message import create_test_transaction_message
+from kafka_lag_monitor import KafkaOffsetsSource, partition_lag
+from kafka_common import DEFAULT_BOOTSTRAP, DEFAULT_GROUP, DEFAULT_TOPIC, PERCENTILES
+from commit_latency import CommitLatencyTracker, monitor_commits
+
+# kafka-python импортируется при запуске бенчмарка
+
+DEFAULT_COUNT = 5000
+DEFAULT_RATIOS = '0,0.1'
+# Интервал опроса закоммиченных offset'ов (в секундах) - разрешение задержки
+DEFAULT_POLL_INTERVAL = 0.25
+# Сколько ждать обработки сообщений фазы (в секундах)
+DEFAULT_TIMEOUT = 300
+# Сколько ждать сообщений в DLQ после коммита последнего сообщения фазы
+DEFAULT_DLQ_WAIT = 5
+DLQ_SUFFIX = '.dlq'
+REQUIRED_FIELDS = ['id', 'portfolioId', 'stockCardId', 'assetType', 'transactionType', 'quantity',
+                   'pricePerUnit', 'totalAmount', 'transactionTime', 'currency']
+VALID = 'valid'
+# Группа служебных сообщений, закрывающих фазу (в статистику не входят)
+SENTINEL = 'sentinel'
+
+
+def _total(message):
+    """Пересчитать totalAmount, чтобы нарушение касалось только проверяемого поля"""
+    message['totalAmount'] = round(message['quantity'] * message['pricePerUnit'], 2)
+
+
+def _set(field, value):
+    def mutate(message, rng):
+        message[field] = value(message, rng) if callable(value) else value
+        return message
+    return mutate
+
+
+def _quantity_nonpositive(message, rng):
+    message['quantity'] = rng.choice([0, -message['quantity']])
+    _total(message)
+    return message
+
+
+def _price_negative(message, rng):
+    message['pricePerUnit'] = -message['pricePerUnit']
+    _total(message)
+    return message
+
+
+def _null_field(message, rng):
+    message[rng.choice(REQUIRED_FIELDS)] = None
+    return message
+
+
+# Нарушения: имя -> (правило из EVENT_FIELDS_LIST.md, изменение сообщения).
+# Изменение возвращает словарь (будет сериализован в JSON), bytes (отправляются
+# как есть) или None (сообщение с пустым значением).
+VIOLATIONS = {
+    'id_invalid': ('1. id - валидный GUID', _set('id', 'not-a-guid')),
+    'id_empty': ('1. id - не пустой GUID', _set('id', '00000000-0000-0000-0000-000000000000')),
+    'portfolio_id_invalid': ('2. portfolioId - валидный GUID', _set('portfolioId', '12345')),
+    'stock_card_id_empty': ('4. stockCardId - не пустой GUID',
+                            _set('stockCardId', '00000000-0000-0000-0000-000000000000')),
+    'asset_type_enum': ('5. assetType - 1, 2 или 3', _set('assetType', lambda m, rng: rng.choice([0, 4, 99]))),
+    'transaction_type_enum': ('6. transactionType - 1 или 2',
+                              _set('transactionType', lambda m, rng: rng.choice([0, 3, -1]))),
+    'quantity_nonpositive': ('7. quantity > 0', _quantity_nonpositive),
+    'price_negative': ('8. pricePerUnit >= 0', _price_negative),
+    'total_amount_mismatch': ('9. totalAmount = quantity * pricePerUnit',
+                              _set('totalAmount', lambda m, rng: round(m['totalAmount'] * 1.5 + 1, 2))),
+    'time_future': ('10. transactionTime - не в будущем',
+                    _set('transactionTime', lambda m, rng: (datetime.now(timezone.utc)
+                                                            + timedelta(days=30)).isoformat())),
+    'time_format': ('10. transactionTime - ISO 8601', _set('transactionTime', '22.01.2025 10:30')),
+    'currency_empty': ('11. currency - не пустая', _set('currency', '')),
+    'currency_too_long': ('11. currency - не длиннее 10 символов', _set('currency', 'RUSSIAN-RUBLE')),
+    'metadata_type': ('12. metadata - null или строка', _set('metadata', {'note': 1})),
+    'null_field': ('обязательное поле равно null', _null_field),
+    'wrong_type': ('типы полей (quantity - int)', _set('quantity', 'сто')),
+    'truncated_json': ('обрезанный JSON',
+                       lambda m, rng: json.dumps(m).encode('utf-8')[:rng.randint(1, 120)]),
+    'not_json': ('не JSON', lambda m, rng: b'\x00\xff' + bytes(rng.getrandbits(8) for _ in range(30))),
+    'null_value': ('пустое значение сообщения (null)', lambda m, rng: None),
+}
+
+
+def parse_violations(text):
+    """'truncated_json=2,time_future=1' или 'all' -> {нарушение: вес}"""
+    if not text or text == 'all':
+        return {name: 1.0 for name in VIOLATIONS}
+    weights = {}
+    for item in text.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in VIOLATIONS:
+            raise argparse.ArgumentTypeError(
+                f"неизвестное нарушение: {name} (доступны: {', '.join(VIOLATIONS)})")
+        weights[name] = float(weight) if weight else 1.0
+    return weights
+
+
+def parse_ratios(text):
+    ratios = [float(value) for value in text.split(',') if value.strip()]
+    if not ratios or any(not 0 <= ratio <= 1 for ratio in ratios):
+        raise argparse.ArgumentTypeError("доли ошибок должны быть в диапазоне 0..1")
+    return ratios
+
+
+def build_message(kind, rng):
+    """
+    Сообщение фазы
+
+    Returns:
+        (значение - bytes или None, ключ - bytes)
+    """
+    message, key = create_test_transaction_message()
+    if kind == VALID:
+        return json.dumps(message).encode('utf-8'), key.encode('utf-8')
+    value = VIOLATIONS[kind][1](message, rng)
+    if isinstance(value, dict):
+        value = json.dumps(value, ensure_ascii=False).encode('utf-8')
+    return value, key.encode('utf-8')
+
+
+def plan_phase(count, ratio, weights, rng):
+    """Виды сообщений фазы: ровно round(count * ratio) нарушений, перемешанных с валидными"""
+    bad = round(count * ratio)
+    names = list(weights)
+    kinds = rng.choices(names, weights=[weights[name] for name in names], k=bad) + [VALID] * (count - bad)
+    rng.shuffle(kinds)
+    return kinds
+
+
+class PhaseSender:
+    """Отправка сообщений фазы одним продюсером с учетом offset'ов подтверждений"""
+
+    def __init__(self, args):
+        try:
+            from kafka import KafkaProducer
+        except ImportError:
+            print("Ошибка: библиотека kafka-python не установлена!")
+            print("Установите: pip install kafka-python")
+            sys.exit(1)
+        with stage('connect'):
+            self.producer = KafkaProducer(bootstrap_servers=args.bootstrap_server, linger_ms=5)
+        self.topic = args.topic
+        self.errors = 0
+
+    def send(self, kinds, rng, rate, tracker):
+        """
+        Отправить сообщения (с rate - равномерно, иначе пачкой)
+
+        Returns:
+            (время начала отправки, {значение: нарушение} для сопоставления с DLQ)
+        """
+        sent_values = {}
+        tracker.expect(len(kinds))
+        started = time.monotonic()
+        for index, kind in enumerate(kinds):
+            if rate:
+                delay = started + index / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            with stage('build'):
+                value, key = build_message(kind, rng)
+            if kind != VALID:
+                sent_values[value] = kind
+            sent_at = time.monotonic()
+            with stage('send'):
+                future = self.producer.send(self.topic, key=key, value=value)
+            group = VALID if kind == VALID else 'invalid'
+            future.add_callback(lambda metadata, sent_at=sent_at, group=group:
+                                tracker.add(metadata.partition, metadata.offset, sent_at, group))
+            future.add_errback(self._on_error, tracker)
+        with stage('flush'):
+            self.producer.flush()
+        return started, sent_values
+
+    def send_sentinels(self, rng, tracker):
+        """Отправить по одному валидному служебному сообщению в каждую партицию топика"""
+        partitions = sorted(self.producer.partitions_for(self.topic))
+        tracker.expect(len(partitions))
+        for partition in partitions:
+            value, key = build_message(VALID, rng)
+            sent_at = time.monotonic()
+            future = self.producer.send(self.topic, key=key, value=value, partition=partition)
+            future.add_callback(lambda metadata, sent_at=sent_at:
+                                tracker.add(metadata.partition, metadata.offset, sent_at, SENTINEL))
+            future.add_errback(self._on_error, tracker)
+        with stage('flush'):
+            self.producer.flush()
+
+    def _on_error(self, tracker, _exception):
+        self.errors += 1
+        tracker.expect(-1)
+
+    def close(self):
+        self.producer.close()
+
+
+def wait_caught_up(source, timeout):
+    """Дождаться нулевого lag перед фазой, чтобы измерять только ее сообщения"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        snapshot = source.snapshot()
+        if all(partition_lag(*offsets) == 0 for offsets in snapshot.values()):
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def dlq_end_offsets(consumer, topic):
+    from kafka import TopicPartition
+
+    partition_ids = consumer.partitions_for_topic(topic)
+    if not partition_ids:
+        return None
+    return consumer.end_offsets([TopicPartition(topic, partition) for partition in partition_ids])
+
+
+def read_dlq(consumer, start_offsets, sent_values, wait):
+    """Прочитать новые сообщения DLQ и сопоставить с нарушениями по значению"""
+    time.sleep(wait)
+    end_offsets = consumer.end_offsets(list(start_offsets))
+    partitions = [tp for tp in start_offsets if end_offsets[tp] > start_offsets[tp]]
+    counts = {}
+    if not partitions:
+        return counts
+    consumer.assign(partitions)
+    for tp in partitions:
+        consumer.seek(tp, start_offsets[tp])
+    remaining = {tp: end_offsets[tp] for tp in partitions}
+    deadline = time.monotonic() + max(wait, 10)
+    while remaining and time.monotonic() < deadline:
+        for tp, records in consumer.poll(timeout_ms=500).items():
+            for record in records:
+                if record.offset >= end_offsets[tp]:
+                    break
+                if record.value is None:
+                    kind = 'null_value'
+                else:
+                    kind = sent_values.get(record.value, 'не из этого прогона')
+                counts[kind] = counts.get(kind, 0) + 1
+            if consumer.position(tp) >= end_offsets[tp]:
+                remaining.pop(tp, None)
+    return counts
+
+
+def run_phase(args, ratio, weights, rng, sender, source, dlq_consumer):
+    """Одна фаза: отправка, ожидание коммитов, чтение DLQ"""
+    if not wait_caught_up(source, args.timeout):
+        print("⚠️ Consumer group не догнала топик перед фазой - задержки будут завышены")
+
+    kinds = plan_phase(args.count, ratio, weights, rng)
+    injected = {}
+    for kind in kinds:
+        if kind != VALID:
+            injected[kind] = injected.get(kind, 0) + 1
+
+    dlq_start = dlq_end_offsets(dlq_consumer, args.topic + DLQ_SUFFIX)
+    tracker = CommitLatencyTracker(ignored_groups=(SENTINEL,))
+    stop = threading.Event()
+    monitor = threading.Thread(target=monitor_commits, args=(source, tracker, args.poll_interval, stop),
+                               daemon=True)
+    monitor.start()
+    try:
+        started, sent_values = sender.send(kinds, rng, args.rate, tracker)
+        sender.send_sentinels(rng, tracker)
+        deadline = time.monotonic() + args.timeout
+        while not tracker.done() and time.monotonic() < deadline:
+            time.sleep(args.poll_interval)
+    finally:
+        stop.set()
+        monitor.join()
+
+    finished = tracker.last_commit_time or time.monotonic()
+    unprocessed = tracker.unresolved()
+    phase = {
+        'ratio': ratio,
+        'count': len(kinds),
+        'injected': injected,
+        'unprocessed': unprocessed,
+        'seconds': finished - started,
+        'throughput': (len(kinds) - unprocessed) / (finished - started) if finished > started else None,
+        'latency_ms': {
+            group: {f'p{p}': histogram.percentile(p) for p in PERCENTILES}
+            for group, histogram in tracker.histograms.items() if group != SENTINEL
+        },
+        'dlq': None,
+    }
+    if dlq_start is not None:
+        with stage('dlq'):
+            phase['dlq'] = read_dlq(dlq_consumer, dlq_start, sent_values, args.dlq_wait)
+    return phase
+
+
+def print_phase(phase, baseline):
+    print()
+    print("=" * 70)
+    print(f"Доля нарушений: {phase['ratio']:.0%}, сообщений: {phase['count']}")
+    print("=" * 70)
+    if phase['unprocessed']:
+        print(f"⚠️ Не закоммичено за отведенное время: {phase['unprocessed']}")
+    if phase['throughput'] is not None:
+        line = f"Пропускная способность: {phase['throughput']:.0f} сообщений/с"
+        if baseline is not None and baseline is not phase and baseline['throughput']:
+            change = (phase['throughput'] / baseline['throughput'] - 1) * 100
+            line += f" ({change:+.1f}% к базовой фазе)"
+        print(line)
+    for group, title in ((VALID, 'валидные'), ('invalid', 'с нарушениями')):
+        latency = phase['latency_ms'].get(group)
+        if not latency:
+            continue
+        values = ', '.join(f"{name}={value:.0f}" for name, value in latency.items())
+        line = f"Задержка до коммита ({title}), мс: {values}"
+        base_latency = (baseline or {}).get('latency_ms', {}).get(VALID)
+        if group == VALID and baseline is not phase and base_latency and base_latency['p95']:
+            line += f" (p95 {(latency['p95'] / base_latency['p95'] - 1) * 100:+.1f}%)"
+        print(line)
+
+    if phase['injected']:
+        dlq = phase['dlq']
+        print()
+        print(f"  {'нарушение':<24} {'правило':<42} {'отпр.':>6} {'в DLQ':>6}")
+        for kind, count in sorted(phase['injected'].items()):
+            in_dlq = '?' if dlq is None else dlq.get(kind, 0)
+            print(f"  {kind:<24} {VIOLATIONS[kind][0]:<42} {count:>6} {in_dlq:>6}")
+        if dlq is None:
+            print("  DLQ топик не найден - сообщения с ошибками не проверены")
+        elif dlq.get('не из этого прогона'):
+            print(f"  В DLQ также {dlq['не из этого прогона']} сообщений не из этого прогона")
+
+
+def run(args):
+    try:
+        from kafka import KafkaConsumer
+    except ImportError:
+        print("Ошибка: библиотека kafka-python не установлена!")
+        print("Установите: pip install kafka-python")
+        sys.exit(1)
+
+    rng = random.Random(args.seed)
+    source = KafkaOffsetsSource(args.bootstrap_server, args.group, args.topic)
+    dlq_consumer = KafkaConsumer(bootstrap_servers=args.bootstrap_server, group_id=None,
+                                 enable_auto_commit=False)
+    sender = PhaseSender(args)
+    phases = []
+    try:
+        for ratio in args.ratios:
+            print(f"Фаза: доля нарушений {ratio:.0%}, {args.count} сообщений...", flush=True)
+            phase = run_phase(args, ratio, args.violations, rng, sender, source, dlq_consumer)
+            phases.append(phase)
+            print_phase(phase, phases[0])
+    finally:
+        sender.close()
+        dlq_consumer.close()
+        source.close()
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'group': args.group, 'topic': args.topic, 'phases': phases}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"\nОтчет сохранен: {args.report}")
+    return 0 if all(not phase['unprocessed'] for phase in phases) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Бенчмарк обработки битых и некорректных сообщений в AnalyticsService'
+    )
+    parser.add_argument('--bootstrap-server', default=DEFAULT_BOOTSTRAP,
+                        help=f'Адрес Kafka брокера (по умолчанию: {DEFAULT_BOOTSTRAP})')
+    parser.add_argument('--topic', default=DEFAULT_TOPIC,
+                        help=f'Название топика (по умолчанию: {DEFAULT_TOPIC}, DLQ: <топик>{DLQ_SUFFIX})')
+    parser.add_argument('--group', default=DEFAULT_GROUP,
+                        help=f'Consumer group AnalyticsService (по умолчанию: {DEFAULT_GROUP})')
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT,
+                        help=f'Сообщений в фазе (по умолчанию: {DEFAULT_COUNT})')
+    parser.add_argument('--ratios', type=parse_ratios, default=parse_ratios(DEFAULT_RATIOS),
+                        help=f'Доли нарушений по фазам, первая - базовая (по умолчанию: {DEFAULT_RATIOS})')
+    parser.add_argument('--violations', type=parse_violations, default=parse_violations('all'),
+                        help='Виды нарушений с весами: имя=вес,... или all '
+                             f"(доступны: {', '.join(VIOLATIONS)})")
+    parser.add_argument('--rate', type=float,
+                        help='Скорость отправки, сообщений/с (по умолчанию: пачкой, для замера пропускной '
+                             'способности; для замера задержки задайте скорость ниже предельной)')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'Интервал опроса offset\'ов в секундах (по умолчанию: {DEFAULT_POLL_INTERVAL})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Ожидание обработки фазы в секундах (по умолчанию: {DEFAULT_TIMEOUT})')
+    parser.add_argument('--dlq-wait', type=float, default=DEFAULT_DLQ_WAIT,
+                        help=f'Ожидание сообщений в DLQ в секундах (по умолчанию: {DEFAULT_DLQ_WAIT})')
+    parser.add_argument('--seed', type=int, default=0, help='Seed генератора нарушений (по умолчанию: 0)')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить результаты фаз в JSON')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    return run_profiled(args, run, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
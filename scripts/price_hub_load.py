@@ -0,0 +1,943 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест рассылки котировок через SignalR hub /pricehub (StockCardService)
+
+Открывает тысячи одновременных WebSocket-подписок на тикеры и измеряет,
+как доставка обновлений PriceUpdate деградирует с ростом числа подписчиков:
+задержка доставки (момент получения минус поле time, выставленное
+PriceStreamingService при отправке) и доля потерянных обновлений.
+
+Протокол SignalR (negotiate, WebSocket, JSON hub protocol) реализован на
+asyncio без внешних зависимостей. Подписчики добавляются ступенями
+(--subscribers 100,500,1000): соединения предыдущей ступени остаются открытыми,
+на каждой ступени после паузы --settle идет окно измерения --duration.
+
+Потери считаются по окну: обновление тикера, опубликованное в окне, должны
+получить все подписчики тикера, подключенные к началу окна. Набор
+опубликованных обновлений берется из полученных (поле time; у заглушки -
+сквозной номер seq, по нему видны и обновления, не дошедшие ни до кого).
+
+Часы: задержка считается относительно часов издателя. Для сервиса на другой
+машине синхронизируйте время (NTP) или задайте --clock-offset-ms;
+у локальной заглушки часы общие.
+
+Использование:
+    python scripts/price_hub_load.py --stub --subscribers 100,500,1000 --duration 15
+    python scripts/price_hub_load.py --url http://localhost:5196 --subscribers 100,1000,5000
+    python scripts/price_hub_load.py --serve-stub 5197 --stub-interval 0.5
+    python scripts/price_hub_load.py --url http://localhost:5197 --subscribers 1000,5000,10000
+
+Для тысяч соединений лимит открытых файлов поднимается до жесткого
+(ulimit -n); заглушку под большой нагрузкой лучше запускать отдельным
+процессом (--serve-stub), чтобы она не делила процессор с клиентами.
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlsplit
+from datetime import datetime, timezone
+
+from tool_profiling import add_profiling_arguments, run_profiled
+from history_workload import zipf_weights, cumulative
+from kafka_common import TICKERS, LatencyHistogram, PERCENTILES
+
+# asyncio импортируется внутри функций (бюджет времени импорта, см. load_test_api.py)
+
+DEFAULT_URL = 'http://localhost:5196'
+HUB_PATH = '/pricehub'
+DEFAULT_SUBSCRIBERS = '100,500,1000'
+DEFAULT_TICKERS_PER_CLIENT = 3
+DEFAULT_TICKER_SKEW = 1.0
+DEFAULT_DURATION = 30
+# Пауза после подключения ступени до начала окна измерения (в секундах)
+DEFAULT_SETTLE = 3
+# Ожидание обновлений, опубликованных в конце окна (в секундах)
+DEFAULT_GRACE = 2
+DEFAULT_CONNECT_RATE = 500
+DEFAULT_TIMEOUT = 10
+
+# Период рассылки PriceStreamingService (Task.Delay(1500))
+PUBLISH_INTERVAL = 1.5
+# Клиент SignalR должен отправлять ping чаще ClientTimeoutInterval сервера (30 с)
+KEEPALIVE_INTERVAL = 15
+# Буфер отправки соединения в заглушке, сверх которого обновления не отправляются
+STUB_MAX_BUFFER = 1024 * 1024
+
+RECORD_SEPARATOR = '\x1e'
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+# Типы сообщений SignalR hub protocol
+MSG_INVOCATION, MSG_COMPLETION, MSG_PING, MSG_CLOSE = 1, 3, 6, 7
+
+
+class HubError(Exception):
+    """Ошибка протокола SignalR или отказ сервера"""
+
+
+# ---------------------------------------------------------------------------
+# WebSocket (RFC 6455) и записи SignalR поверх asyncio streams
+# ---------------------------------------------------------------------------
+
+def websocket_accept(key):
+    """Значение Sec-WebSocket-Accept для ключа клиента"""
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def apply_mask(payload, mask):
+    """Наложить (или снять) маску кадра XOR целым числом вместо цикла по байтам"""
+    if not payload:
+        return payload
+    size = len(payload)
+    key = (mask * (size // 4 + 1))[:size]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(size, 'big')
+
+
+def encode_frame(opcode, payload, masked):
+    """Кадр WebSocket с FIN; кадры клиента маскируются, кадры сервера - нет"""
+    size = len(payload)
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if masked else 0
+    if size < 126:
+        header.append(mask_bit | size)
+    elif size < 65536:
+        header.append(mask_bit | 126)
+        header += size.to_bytes(2, 'big')
+    else:
+        header.append(mask_bit | 127)
+        header += size.to_bytes(8, 'big')
+    if not masked:
+        return bytes(header) + payload
+    mask = os.urandom(4)
+    return bytes(header) + mask + apply_mask(payload, mask)
+
+
+async def read_frame(reader):
+    """Прочитать кадр: (fin, opcode, payload) с уже снятой маской"""
+    first, second = await reader.readexactly(2)
+    size = second & 0x7F
+    if size == 126:
+        size = int.from_bytes(await reader.readexactly(2), 'big')
+    elif size == 127:
+        size = int.from_bytes(await reader.readexactly(8), 'big')
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(size) if size else b''
+    if mask:
+        payload = apply_mask(payload, mask)
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+async def read_message(reader, writer, masked):
+    """
+    Прочитать сообщение WebSocket, собрав фрагменты и ответив на ping
+
+    Returns:
+        (opcode, payload); для закрытия соединения opcode = OP_CLOSE
+    """
+    fragments = []
+    message_opcode = None
+    while True:
+        fin, opcode, payload = await read_frame(reader)
+        if opcode == OP_PING:
+            writer.write(encode_frame(OP_PONG, payload, masked))
+            continue
+        if opcode == OP_PONG:
+            continue
+        if opcode == OP_CLOSE:
+            return OP_CLOSE, payload
+        if opcode != OP_CONTINUATION:
+            message_opcode = opcode
+        fragments.append(payload)
+        if fin:
+            return message_opcode, b''.join(fragments)
+
+
+def encode_record(message):
+    """Сообщение JSON hub protocol с разделителем записей"""
+    return (json.dumps(message, separators=(',', ':')) + RECORD_SEPARATOR).encode('utf-8')
+
+
+def parse_publish_time(value):
+    """Время отправки PriceUpdateDto.Time ("yyyy-MM-ddTHH:mm:ss.fffK") в секундах Unix"""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def format_publish_time(moment):
+    """Время в формате PriceStreamingService: миллисекунды и суффикс Z"""
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f"{moment.microsecond // 1000:03d}Z"
+
+
+async def read_head(reader):
+    """Прочитать стартовую строку и заголовки HTTP: (строка, {имя: значение})"""
+    start_line = (await reader.readline()).decode('latin-1').strip()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return start_line, headers
+
+
+def decode_chunked(body):
+    """Тело ответа с Transfer-Encoding: chunked"""
+    result = bytearray()
+    position = 0
+    while position < len(body):
+        line_end = body.index(b'\r\n', position)
+        size = int(body[position:line_end].split(b';')[0], 16)
+        if not size:
+            break
+        result += body[line_end + 2:line_end + 2 + size]
+        position = line_end + 2 + size + 2
+    return bytes(result)
+
+
+# ---------------------------------------------------------------------------
+# Клиент hub
+# ---------------------------------------------------------------------------
+
+class HubEndpoint:
+    """Адрес hub: хост, порт, TLS и путь"""
+
+    def __init__(self, url, hub_path=HUB_PATH):
+        parts = urlsplit(url)
+        self.secure = parts.scheme in ('https', 'wss')
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port or (443 if self.secure else 80)
+        self.path = parts.path.rstrip('/') + hub_path
+
+    async def open(self, timeout):
+        import asyncio
+
+        ssl_context = None
+        if self.secure:
+            import ssl
+            ssl_context = ssl.create_default_context()
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context), timeout)
+
+    async def negotiate(self, timeout):
+        """POST {hub}/negotiate: токен соединения для WebSocket"""
+        reader, writer = await self.open(timeout)
+        try:
+            writer.write(
+                f"POST {self.path}/negotiate?negotiateVersion=1 HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Length: 0\r\nConnection: close\r\n\r\n".encode('latin-1'))
+            status_line, headers = await read_head(reader)
+            body = await reader.read()
+        finally:
+            writer.close()
+        status = int(status_line.split(' ', 2)[1])
+        if status != 200:
+            raise HubError(f"negotiate: HTTP {status}")
+        if 'chunked' in headers.get('transfer-encoding', ''):
+            body = decode_chunked(body)
+        data = json.loads(body)
+        transports = [item.get('transport') for item in data.get('availableTransports', [])]
+        if 'WebSockets' not in transports:
+            raise HubError("negotiate: транспорт WebSockets недоступен")
+        return data.get('connectionToken') or data['connectionId']
+
+    async def connect(self, token, timeout):
+        """Открыть WebSocket к hub (upgrade) и выполнить handshake JSON протокола"""
+        import asyncio
+
+        reader, writer = await self.open(timeout)
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        query = f"?id={token}" if token else ''
+        writer.write(
+            f"GET {self.path}{query} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+            f"Sec-WebSocket-Version: 13\r\n\r\n".encode('latin-1'))
+        try:
+            status_line, headers = await asyncio.wait_for(read_head(reader), timeout)
+            status = int(status_line.split(' ', 2)[1]) if status_line else 0
+            if status != 101:
+                raise HubError(f"upgrade: HTTP {status}")
+            if headers.get('sec-websocket-accept') != websocket_accept(key):
+                raise HubError("upgrade: неверный Sec-WebSocket-Accept")
+
+            writer.write(encode_frame(OP_TEXT, encode_record({'protocol': 'json', 'version': 1}), True))
+            opcode, payload = await asyncio.wait_for(read_message(reader, writer, True), timeout)
+            if opcode == OP_CLOSE:
+                raise HubError("handshake: соединение закрыто")
+            handshake = json.loads(payload.decode('utf-8').split(RECORD_SEPARATOR, 1)[0])
+            if handshake.get('error'):
+                raise HubError(f"handshake: {handshake['error']}")
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+
+class Subscriber:
+    """Одно соединение с hub и его тикеры"""
+
+    def __init__(self, index, tickers):
+        self.index = index
+        self.tickers = tickers
+        self.reader = None
+        self.writer = None
+        self.subscribed = False
+        self.closed = False
+        self.buffer = ''
+        self.completion = None
+        self.task = None
+
+    def send(self, message):
+        self.writer.write(encode_frame(OP_TEXT, encode_record(message), True))
+
+
+class FanoutLoad:
+    """
+    Пул подписчиков, растущий ступенями, и сбор статистики окна измерения
+
+    Обновления приходят в on_update из циклов чтения соединений; пока окно
+    не открыто (подключение, пауза), они не учитываются.
+    """
+
+    def __init__(self, endpoint, tickers, tickers_per_client, ticker_skew, skip_negotiation,
+                 timeout, connect_rate, clock_offset_ms, seed=None):
+        self.endpoint = endpoint
+        self.tickers = tickers
+        self.tickers_per_client = min(tickers_per_client, len(tickers))
+        self.cum_weights = cumulative(zipf_weights(len(tickers), ticker_skew))
+        self.skip_negotiation = skip_negotiation
+        self.timeout = timeout
+        self.connect_rate = connect_rate
+        self.clock_offset = clock_offset_ms / 1000
+        self.rng = random.Random(seed)
+        self.subscribers = []
+        self.window = None
+        self.connect_latency = LatencyHistogram()
+        self.connect_errors = {}
+        self.disconnects = 0
+
+    def choose_tickers(self):
+        """Тикеры подписчика: без повторов, популярные (первые) - чаще"""
+        chosen = []
+        while len(chosen) < self.tickers_per_client:
+            ticker = self.rng.choices(self.tickers, cum_weights=self.cum_weights)[0]
+            if ticker not in chosen:
+                chosen.append(ticker)
+        return chosen
+
+    async def connect(self, subscriber):
+        """negotiate, WebSocket, handshake и Subscribe с ожиданием ответа сервера"""
+        import asyncio
+
+        started = time.perf_counter()
+        try:
+            token = None if self.skip_negotiation else await self.endpoint.negotiate(self.timeout)
+            subscriber.reader, subscriber.writer = await self.endpoint.connect(token, self.timeout)
+            subscriber.completion = asyncio.get_running_loop().create_future()
+            subscriber.task = asyncio.create_task(self.read_loop(subscriber))
+            subscriber.send({'type': MSG_INVOCATION, 'invocationId': '0', 'target': 'Subscribe',
+                             'arguments': [subscriber.tickers]})
+            completion = await asyncio.wait_for(subscriber.completion, self.timeout)
+            if completion.get('error'):
+                raise HubError(f"Subscribe: {completion['error']}")
+        except (OSError, HubError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as exc:
+            kind = 'timeout' if isinstance(exc, asyncio.TimeoutError) else str(exc) if isinstance(exc, HubError) \
+                else type(exc).__name__
+            self.connect_errors[kind] = self.connect_errors.get(kind, 0) + 1
+            self.close_subscriber(subscriber)
+            return
+        subscriber.subscribed = True
+        self.connect_latency.record((time.perf_counter() - started) * 1000)
+
+    async def read_loop(self, subscriber):
+        """Цикл чтения соединения: PriceUpdate, ответы на вызовы, закрытие"""
+        import asyncio
+
+        try:
+            while True:
+                opcode, payload = await read_message(subscriber.reader, subscriber.writer, True)
+                received_at = time.time()
+                if opcode == OP_CLOSE:
+                    break
+                subscriber.buffer += payload.decode('utf-8')
+                *records, subscriber.buffer = subscriber.buffer.split(RECORD_SEPARATOR)
+                for record in records:
+                    message = json.loads(record)
+                    kind = message.get('type')
+                    if kind == MSG_INVOCATION and message.get('target') == 'PriceUpdate':
+                        if self.window:
+                            self.window.record(message['arguments'][0], received_at)
+                    elif kind == MSG_COMPLETION and not subscriber.completion.done():
+                        subscriber.completion.set_result(message)
+                    elif kind == MSG_CLOSE:
+                        return self.on_disconnect(subscriber)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            pass
+        self.on_disconnect(subscriber)
+
+    def on_disconnect(self, subscriber):
+        if subscriber.completion and not subscriber.completion.done():
+            subscriber.completion.set_exception(HubError("соединение закрыто сервером"))
+        if subscriber.subscribed and not subscriber.closed:
+            self.disconnects += 1
+        self.close_subscriber(subscriber)
+
+    def close_subscriber(self, subscriber):
+        if subscriber.closed:
+            return
+        subscriber.closed = True
+        if subscriber.writer:
+            try:
+                subscriber.writer.write(encode_frame(OP_CLOSE, (1000).to_bytes(2, 'big'), True))
+            except (OSError, RuntimeError):
+                pass
+            subscriber.writer.close()
+
+    def active(self):
+        return [subscriber for subscriber in self.subscribers if subscriber.subscribed and not subscriber.closed]
+
+    async def grow(self, target):
+        """Довести число подписчиков до target, открывая соединения с темпом connect_rate"""
+        import asyncio
+
+        count = target - len(self.subscribers)
+        started = time.perf_counter()
+        tasks = []
+        for _ in range(max(0, count)):
+            delay = started + len(tasks) / self.connect_rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            subscriber = Subscriber(len(self.subscribers), self.choose_tickers())
+            self.subscribers.append(subscriber)
+            tasks.append(asyncio.create_task(self.connect(subscriber)))
+        if tasks:
+            await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    async def keepalive(self):
+        """Ping SignalR от каждого подписчика, чтобы сервер не закрыл соединение по таймауту"""
+        import asyncio
+
+        ping = encode_frame(OP_TEXT, encode_record({'type': MSG_PING}), True)
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            for subscriber in self.active():
+                try:
+                    subscriber.writer.write(ping)
+                except (OSError, RuntimeError):
+                    pass
+
+    async def measure(self, duration, grace):
+        """Окно измерения: обновления, опубликованные в [начало, начало + duration)"""
+        import asyncio
+
+        subscribers = self.active()
+        ticker_subscribers = {}
+        for subscriber in subscribers:
+            for ticker in subscriber.tickers:
+                ticker_subscribers[ticker.upper()] = ticker_subscribers.get(ticker.upper(), 0) + 1
+        disconnects_before = self.disconnects
+        started = time.time()
+        cpu_started = time.process_time()
+        self.window = FanoutWindow(started, started + duration, self.clock_offset)
+        await asyncio.sleep(duration + grace)
+        window, self.window = self.window, None
+        result = window.summary(ticker_subscribers)
+        result.update({
+            'connected': len(subscribers),
+            'disconnects': self.disconnects - disconnects_before,
+            'client_cpu': (time.process_time() - cpu_started) / (duration + grace),
+        })
+        return result
+
+    async def close(self):
+        import asyncio
+
+        for subscriber in self.subscribers:
+            self.close_subscriber(subscriber)
+        tasks = [subscriber.task for subscriber in self.subscribers if subscriber.task]
+        if tasks:
+            await asyncio.wait(tasks, timeout=self.timeout)
+            for task in tasks:
+                task.cancel()
+
+
+class FanoutWindow:
+    """Задержки и учет потерь обновлений, опубликованных в окне измерения"""
+
+    def __init__(self, start, end, clock_offset=0.0):
+        self.start = start
+        self.end = end
+        self.clock_offset = clock_offset
+        self.latency = LatencyHistogram()
+        self.received = {}
+        # Опубликованные обновления по тикеру: time или seq (у заглушки)
+        self.published = {}
+        self.negative = 0
+
+    def record(self, update, received_at):
+        published_at = parse_publish_time(update['time']) - self.clock_offset
+        if not self.start <= published_at < self.end:
+            return
+        ticker = update['ticker'].upper()
+        self.published.setdefault(ticker, set()).add(update.get('seq', update['time']))
+        self.received[ticker] = self.received.get(ticker, 0) + 1
+        latency_ms = (received_at - published_at) * 1000
+        if latency_ms < 0:
+            self.negative += 1
+        self.latency.record(latency_ms)
+
+    def published_count(self, ticker):
+        """Число опубликованных в окне обновлений; пропуски seq - обновления, не дошедшие ни до кого"""
+        ids = self.published.get(ticker, ())
+        if ids and all(isinstance(item, int) for item in ids):
+            return max(ids) - min(ids) + 1
+        return len(ids)
+
+    def summary(self, ticker_subscribers):
+        published = {ticker: self.published_count(ticker) for ticker in ticker_subscribers}
+        expected = sum(count * published[ticker] for ticker, count in ticker_subscribers.items())
+        received = sum(self.received.get(ticker, 0) for ticker in ticker_subscribers)
+        duration = self.end - self.start
+        return {
+            'window_s': duration,
+            'tickers': len(ticker_subscribers),
+            'published': sum(published.values()),
+            'expected': expected,
+            'received': received,
+            'dropped': max(0, expected - received),
+            'drop_rate': max(0, expected - received) / expected if expected else 0.0,
+            'updates_per_s': received / duration if duration > 0 else 0.0,
+            'latency': self.latency,
+            'negative_latency': self.negative,
+        }
+
+
+def raise_fd_limit(needed):
+    """Поднять мягкий лимит открытых файлов до needed (не выше жесткого); вернуть итоговый лимит"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(hard, needed)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+# ---------------------------------------------------------------------------
+# Заглушка hub
+# ---------------------------------------------------------------------------
+
+class PriceHubStub:
+    """
+    Локальная заглушка /pricehub: negotiate, WebSocket, Subscribe/Unsubscribe и
+    рассылка PriceUpdate группам тикеров каждые interval секунд
+
+    Работает в отдельном потоке со своим циклом событий, как StubApiServer в
+    load_test_api.py. В обновлениях кроме полей PriceUpdateDto есть сквозной
+    номер seq по тикеру. drop_rate - доля случайно не отправленных обновлений
+    (проверка учета потерь); соединению с переполненным буфером отправки
+    (больше max_buffer байт) обновления не отправляются.
+    """
+
+    def __init__(self, port=0, interval=PUBLISH_INTERVAL, drop_rate=0.0,
+                 max_buffer=STUB_MAX_BUFFER, seed=None):
+        self.port = port
+        self.interval = interval
+        self.drop_rate = drop_rate
+        self.max_buffer = max_buffer
+        self.rng = random.Random(seed)
+        self.url = None
+        self.groups = {}
+        self.prices = {}
+        self.seq = {}
+        self.counters = {'connections': 0, 'published': 0, 'sent': 0, 'dropped': 0, 'slow': 0}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def next_update(self, ticker):
+        """PriceUpdateDto (camelCase, как сериализует SignalR) со случайным блужданием цены"""
+        previous = self.prices.get(ticker) or round(self.rng.uniform(50, 500), 2)
+        price = round(previous * (1 + self.rng.gauss(0, 0.002)), 2)
+        self.prices[ticker] = price
+        self.seq[ticker] = self.seq.get(ticker, 0) + 1
+        change = round(price - previous, 2)
+        return {
+            'ticker': ticker,
+            'price': price,
+            'change': change,
+            'changePercent': round(change / previous * 100, 2),
+            'time': format_publish_time(datetime.now(timezone.utc)),
+            'volume': self.rng.randint(1000, 100000),
+            'numTrades': self.rng.randint(10, 1000),
+            'seq': self.seq[ticker],
+        }
+
+    async def broadcast(self):
+        """Рассылка по группам с фиксированным периодом (сериализация кадра - один раз на группу)"""
+        import asyncio
+
+        next_at = time.perf_counter()
+        while True:
+            next_at += self.interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            for ticker, members in list(self.groups.items()):
+                if not members:
+                    continue
+                frame = encode_frame(OP_TEXT, encode_record(
+                    {'type': MSG_INVOCATION, 'target': 'PriceUpdate', 'arguments': [self.next_update(ticker)]}
+                ), False)
+                self.counters['published'] += 1
+                for writer in list(members):
+                    if self.drop_rate and self.rng.random() < self.drop_rate:
+                        self.counters['dropped'] += 1
+                    elif writer.transport.get_write_buffer_size() > self.max_buffer:
+                        self.counters['slow'] += 1
+                    else:
+                        writer.write(frame)
+                        self.counters['sent'] += 1
+
+    async def handle(self, reader, writer):
+        import asyncio
+
+        try:
+            request_line, headers = await read_head(reader)
+            if not request_line:
+                return
+            method, target, _ = request_line.split(' ', 2)
+            path = target.split('?', 1)[0]
+            if method == 'POST' and path.endswith('/negotiate'):
+                connection_id = base64.urlsafe_b64encode(os.urandom(16)).decode('ascii').rstrip('=')
+                body = json.dumps({
+                    'negotiateVersion': 1, 'connectionId': connection_id, 'connectionToken': connection_id,
+                    'availableTransports': [{'transport': 'WebSockets', 'transferFormats': ['Text', 'Binary']}],
+                }).encode('utf-8')
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: " + str(len(body)).encode('ascii') + b"\r\n\r\n" + body)
+                await writer.drain()
+            elif method == 'GET' and headers.get('upgrade', '').lower() == 'websocket':
+                writer.write(
+                    f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {websocket_accept(headers['sec-websocket-key'])}\r\n\r\n"
+                    .encode('latin-1'))
+                await self.serve_websocket(reader, writer)
+            else:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+        except (OSError, ValueError, KeyError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_websocket(self, reader, writer):
+        """Handshake JSON протокола и вызовы hub от одного клиента"""
+        self.counters['connections'] += 1
+        buffer = ''
+        handshake_done = False
+        try:
+            while True:
+                opcode, payload = await read_message(reader, writer, False)
+                if opcode == OP_CLOSE:
+                    writer.write(encode_frame(OP_CLOSE, payload[:2], False))
+                    return
+                buffer += payload.decode('utf-8')
+                *records, buffer = buffer.split(RECORD_SEPARATOR)
+                for record in records:
+                    message = json.loads(record)
+                    if not handshake_done:
+                        handshake_done = True
+                        writer.write(encode_frame(OP_TEXT, b'{}' + RECORD_SEPARATOR.encode('ascii'), False))
+                        continue
+                    if message.get('type') == MSG_CLOSE:
+                        return
+                    if message.get('type') != MSG_INVOCATION:
+                        continue
+                    tickers = [str(ticker).upper() for ticker in (message.get('arguments') or [[]])[0]]
+                    if message.get('target') == 'Subscribe':
+                        for ticker in tickers:
+                            self.groups.setdefault(ticker, set()).add(writer)
+                    elif message.get('target') == 'Unsubscribe':
+                        for ticker in tickers:
+                            self.groups.get(ticker, set()).discard(writer)
+                    if 'invocationId' in message:
+                        writer.write(encode_frame(OP_TEXT, encode_record(
+                            {'type': MSG_COMPLETION, 'invocationId': message['invocationId'], 'result': None}
+                        ), False))
+        finally:
+            for members in self.groups.values():
+                members.discard(writer)
+
+    async def _start(self):
+        import asyncio
+
+        self._server = await asyncio.start_server(self.handle, '127.0.0.1', self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._broadcaster = asyncio.get_running_loop().create_task(self.broadcast())
+
+    def _serve(self):
+        import asyncio
+
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._broadcaster.cancel()
+        self._server.close()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+# ---------------------------------------------------------------------------
+# Запуск и отчет
+# ---------------------------------------------------------------------------
+
+def parse_subscribers(spec):
+    """Ступени числа подписчиков: '100,500,1000' -> [100, 500, 1000] (по возрастанию)"""
+    try:
+        steps = [int(item) for item in spec.split(',') if item.strip()]
+    except ValueError:
+        raise ValueError(f"Некорректный список ступеней: {spec}")
+    if not steps or any(step <= 0 for step in steps) or steps != sorted(set(steps)):
+        raise ValueError(f"Ступени должны быть положительными и возрастать: {spec}")
+    return steps
+
+
+async def run_steps(endpoint, steps, args, tickers):
+    """Ступени нагрузки: подключение, пауза, окно измерения; результаты по ступеням"""
+    import asyncio
+
+    load = FanoutLoad(endpoint, tickers, args.tickers_per_client, args.ticker_skew, args.skip_negotiation,
+                      args.timeout, args.connect_rate, args.clock_offset_ms, args.seed)
+    keepalive = asyncio.create_task(load.keepalive())
+    results = []
+    try:
+        for target in steps:
+            errors_before = sum(load.connect_errors.values())
+            connect_time = await load.grow(target)
+            await asyncio.sleep(args.settle)
+            result = await load.measure(args.duration, args.grace)
+            result.update({
+                'subscribers': target,
+                'failed': sum(load.connect_errors.values()) - errors_before,
+                'connect_s': connect_time,
+                'connect_p95_ms': load.connect_latency.percentile(95),
+            })
+            print_step(result)
+            results.append(result)
+            if not result['connected']:
+                print("Ни одно соединение не подписано, следующие ступени пропущены")
+                break
+    finally:
+        keepalive.cancel()
+        await load.close()
+    return results, load.connect_errors
+
+
+def print_step(result):
+    latency = result['latency']
+    print(f"  {result['subscribers']:>7} подписчиков: подключено {result['connected']}, "
+          f"ошибок {result['failed']}, получено {result['received']} "
+          f"({result['updates_per_s']:.0f}/с), p99 {latency.percentile(99):.1f} мс, "
+          f"потери {result['drop_rate']:.2%}")
+
+
+def print_report(results, errors, stub_counters=None):
+    print()
+    print("=" * 104)
+    print("Доставка PriceUpdate: задержка от публикации до получения (мс) и потери по ступеням")
+    print("=" * 104)
+    header = f"  {'подписч.':>8} {'подключ.':>8} {'ошибок':>7} {'обновл/с':>9}"
+    header += ''.join(f" {'p' + str(p):>7}" for p in PERCENTILES) + f" {'max':>8} {'потери':>8} {'CPU кл.':>8}"
+    print(header)
+    for result in results:
+        latency = result['latency']
+        line = (f"  {result['subscribers']:>8} {result['connected']:>8} {result['failed']:>7} "
+                f"{result['updates_per_s']:>9.0f}")
+        line += ''.join(f" {latency.percentile(p):>7.1f}" for p in PERCENTILES)
+        line += f" {latency.max_value:>8.1f} {result['drop_rate']:>8.2%} {result['client_cpu']:>8.0%}"
+        print(line)
+    print("=" * 104)
+
+    if errors:
+        print("Ошибки подключения: " + ', '.join(f"{kind}: {count}" for kind, count in sorted(errors.items())))
+    for result in results:
+        if result['disconnects']:
+            print(f"  ✗ {result['subscribers']} подписчиков: разорвано в окне {result['disconnects']} соединений")
+        if result['negative_latency']:
+            print(f"  ⚠ {result['subscribers']} подписчиков: {result['negative_latency']} обновлений получены "
+                  f"раньше времени публикации - расхождение часов, задайте --clock-offset-ms")
+        if result['client_cpu'] > 0.9:
+            print(f"  ⚠ {result['subscribers']} подписчиков: клиент загружен на {result['client_cpu']:.0%} CPU, "
+                  f"задержки могут быть завышены клиентом")
+    if stub_counters:
+        print(f"Заглушка: опубликовано {stub_counters['published']}, отправлено {stub_counters['sent']}, "
+              f"отброшено случайно {stub_counters['dropped']}, из-за переполненного буфера {stub_counters['slow']}")
+
+
+def build_report(results, errors, args, stub_counters=None):
+    """Отчет в JSON"""
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'params': {'url': 'stub' if args.stub else args.url, 'subscribers': args.subscribers,
+                   'tickers': args.tickers, 'tickers_per_client': args.tickers_per_client,
+                   'ticker_skew': args.ticker_skew, 'duration': args.duration,
+                   'clock_offset_ms': args.clock_offset_ms},
+        'steps': [
+            {
+                **{key: value for key, value in result.items() if key != 'latency'},
+                'latency_ms': {f'p{p}': result['latency'].percentile(p) for p in PERCENTILES},
+                'max_ms': result['latency'].max_value,
+            }
+            for result in results
+        ],
+        'connect_errors': errors,
+        'stub': stub_counters,
+    }
+
+
+def run(args):
+    """Ступени подписчиков на hub (или заглушку), отчет и проверка порога потерь"""
+    import asyncio
+
+    steps = parse_subscribers(args.subscribers)
+    tickers = [ticker.strip().upper() for ticker in args.tickers.split(',') if ticker.strip()]
+    if not tickers:
+        raise ValueError("Не заданы тикеры (--tickers)")
+
+    # Сокет на подписчика, на время negotiate - второй; заглушка в процессе - еще по одному
+    needed = steps[-1] * (3 if args.stub else 2) + 64
+    limit = raise_fd_limit(needed)
+    if limit is not None and limit < needed:
+        print(f"Предупреждение: лимит открытых файлов {limit} меньше нужного {needed} (ulimit -n)")
+
+    print("=" * 60)
+    print("Нагрузка на рассылку котировок SignalR /pricehub")
+    print("=" * 60)
+
+    def load(url):
+        print(f"Hub: {url}{HUB_PATH}")
+        print(f"Ступени: {', '.join(map(str, steps))} подписчиков, тикеров: {len(tickers)}, "
+              f"на подписчика: {min(args.tickers_per_client, len(tickers))}")
+        print(f"Окно: {args.duration} с после паузы {args.settle} с, подключение: {args.connect_rate}/с")
+        return asyncio.run(run_steps(HubEndpoint(url), steps, args, tickers))
+
+    stub_counters = None
+    if args.stub:
+        with PriceHubStub(interval=args.stub_interval, drop_rate=args.stub_drop_rate, seed=args.seed) as stub:
+            results, errors = load(stub.url)
+            stub_counters = dict(stub.counters)
+    else:
+        results, errors = load(args.url)
+
+    print_report(results, errors, stub_counters)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(build_report(results, errors, args, stub_counters), f, indent=2, ensure_ascii=False)
+        print(f"\nОтчет сохранен: {args.report}")
+
+    if not any(result['received'] for result in results):
+        print("\n✗ Ни одного обновления в окнах измерения: hub не рассылает котировки по этим тикерам")
+        return 1
+    if args.max_drop_rate is not None and any(result['drop_rate'] > args.max_drop_rate for result in results):
+        print(f"\n✗ Доля потерь выше порога {args.max_drop_rate:.2%}")
+        return 1
+    return 0
+
+
+def serve_stub(args):
+    """Запустить заглушку hub отдельно (до Ctrl+C)"""
+    with PriceHubStub(args.serve_stub, args.stub_interval, args.stub_drop_rate, seed=args.seed) as stub:
+        print(f"Заглушка PriceHub: {stub.url}{HUB_PATH} (Ctrl+C для остановки)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный тест рассылки котировок через SignalR hub /pricehub'
+    )
+    parser.add_argument('--url', default=os.environ.get('STOCKCARD_API_URL', DEFAULT_URL),
+                        help=f'Адрес StockCardService (по умолчанию: STOCKCARD_API_URL или {DEFAULT_URL})')
+    parser.add_argument('--subscribers', default=DEFAULT_SUBSCRIBERS,
+                        help=f'Ступени числа подписчиков через запятую (по умолчанию: {DEFAULT_SUBSCRIBERS})')
+    parser.add_argument('--tickers', default=','.join(TICKERS),
+                        help='Тикеры подписок через запятую (по умолчанию: 20 тикеров MOEX)')
+    parser.add_argument('--tickers-per-client', type=int, default=DEFAULT_TICKERS_PER_CLIENT,
+                        help=f'Тикеров на подписчика (по умолчанию: {DEFAULT_TICKERS_PER_CLIENT})')
+    parser.add_argument('--ticker-skew', type=float, default=DEFAULT_TICKER_SKEW,
+                        help=f'Параметр Ципфа популярности тикеров, 0 - равномерно '
+                             f'(по умолчанию: {DEFAULT_TICKER_SKEW})')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f'Окно измерения на ступени в секундах (по умолчанию: {DEFAULT_DURATION})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help=f'Пауза после подключения ступени (по умолчанию: {DEFAULT_SETTLE})')
+    parser.add_argument('--grace', type=float, default=DEFAULT_GRACE,
+                        help=f'Ожидание обновлений из конца окна (по умолчанию: {DEFAULT_GRACE})')
+    parser.add_argument('--connect-rate', type=float, default=DEFAULT_CONNECT_RATE,
+                        help=f'Новых соединений в секунду (по умолчанию: {DEFAULT_CONNECT_RATE})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Таймаут подключения и подписки в секундах (по умолчанию: {DEFAULT_TIMEOUT})')
+    parser.add_argument('--skip-negotiation', action='store_true',
+                        help='Подключаться по WebSocket без negotiate (как skipNegotiation в JS клиенте)')
+    parser.add_argument('--clock-offset-ms', type=float, default=0.0,
+                        help='На сколько часы издателя спешат относительно клиента (по умолчанию: 0)')
+    parser.add_argument('--max-drop-rate', type=float,
+                        help='Порог доли потерь на ступени, код возврата 1 при превышении')
+    parser.add_argument('--seed', type=int, help='Seed выбора тикеров (и заглушки)')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить отчет в JSON')
+    parser.add_argument('--stub', action='store_true', help='Нагрузка на локальную заглушку hub')
+    parser.add_argument('--serve-stub', type=int, metavar='PORT', help='Только запустить заглушку hub на порту')
+    parser.add_argument('--stub-interval', type=float, default=PUBLISH_INTERVAL,
+                        help=f'Период рассылки заглушки в секундах (по умолчанию: {PUBLISH_INTERVAL})')
+    parser.add_argument('--stub-drop-rate', type=float, default=0.0,
+                        help='Доля обновлений, которые заглушка не отправляет (по умолчанию: 0)')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.serve_stub is not None:
+        return serve_stub(args)
+    try:
+        return run_profiled(args, run, args)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Подбор настроек продюсера Kafka перебором параметров
+
+Для каждой точки пространства параметров (batch.size, linger.ms, сжатие,
+acks, размер поля metadata) отправляет одну и ту же нагрузку - заранее
+сериализованные сообщения транзакций, как в send_test_kafka_message.py -
+новым продюсером и измеряет пропускную способность (до подтверждения
+последнего сообщения) и задержку подтверждения каждого сообщения.
+
+Поиск:
+    - grid: все сочетания значений
+    - coordinate: покоординатный подъем от текущих настроек Portfolio Service
+      (acks=all, linger.ms=5, batch.size=16384, без сжатия): по очереди для
+      каждого параметра выбирается лучшее значение при остальных
+      фиксированных, пока лучшая точка меняется. Лучшая - с наибольшей
+      пропускной способностью среди укладывающихся в --max-p99-ms
+
+Размер metadata - свойство нагрузки, а не настройка продюсера: точки с разным
+размером не сравниваются между собой. Итог для каждого размера - таблица
+точек, Парето-оптимальные настройки (нельзя улучшить пропускную способность,
+не ухудшив p99) и фрагмент ProducerConfig (Confluent.Kafka) лучшей из них
+для Portfolio Service.
+
+По умолчанию сообщения отправляются без ограничения скорости (насыщение);
+с --rate - по расписанию, и задержка считается от запланированного момента.
+
+Использование:
+    python scripts/producer_sweep.py --messages 20000
+    python scripts/producer_sweep.py --search coordinate --max-p99-ms 50 --metadata-bytes 0,1024
+    python scripts/producer_sweep.py --compression none,lz4,zstd --acks all --rate 5000 --report sweep.json
+
+Требует: kafka-python; для сжатия - python-snappy, lz4, zstandard (точки
+с недоступным кодеком пропускаются)
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import statistics
+from datetime import datetime, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from send_test_kafka_message import create_test_transaction_message
+from kafka_common import DEFAULT_BOOTSTRAP, DEFAULT_TOPIC, LatencyHistogram, PERCENTILES
+
+# kafka-python импортируется при создании продюсера точки
+
+KNOBS = ['batch_size', 'linger_ms', 'compression', 'acks', 'metadata_bytes']
+DEFAULT_BATCH_SIZES = '16384,65536,262144'
+DEFAULT_LINGER_MS = '0,5,20'
+DEFAULT_COMPRESSION = 'none,gzip,snappy,lz4,zstd'
+DEFAULT_ACKS = '1,all'
+DEFAULT_METADATA_BYTES = '0'
+DEFAULT_MESSAGES = 20000
+DEFAULT_WARMUP = 1000
+DEFAULT_REPEATS = 1
+# Текущий ProducerConfig Portfolio Service (AutofacModule.RegisterKafka) - старт покоординатного поиска
+BASELINE = {'batch_size': 16384, 'linger_ms': 5, 'compression': 'none', 'acks': 'all', 'metadata_bytes': 0}
+COMPRESSION_CODECS = ('none', 'gzip', 'snappy', 'lz4', 'zstd')
+# Кодеки, которым kafka-python нужна отдельная библиотека: кодек -> (проверка в kafka.codec, pip-пакет)
+CODEC_LIBRARIES = {'snappy': ('has_snappy', 'python-snappy'), 'lz4': ('has_lz4', 'lz4'),
+                   'zstd': ('has_zstd', 'zstandard')}
+# Слова для поля metadata: сжимаемость как у текста, а не случайных байт
+METADATA_WORDS = ['source', 'web', 'mobile', 'broker', 'manual', 'import', 'note', 'rebalance', 'dividend',
+                  'portfolio', 'order', 'limit', 'market', 'fee', 'tax', 'comment', 'client', 'session']
+CONFLUENT_COMPRESSION = {'none': 'None', 'gzip': 'Gzip', 'snappy': 'Snappy', 'lz4': 'Lz4', 'zstd': 'Zstd'}
+CONFLUENT_ACKS = {0: 'None', 1: 'Leader', 'all': 'All'}
+
+
+def parse_acks(value):
+    value = value.strip()
+    if value == 'all' or value == '-1':
+        return 'all'
+    if value in ('0', '1'):
+        return int(value)
+    raise ValueError(f"Некорректное значение acks: {value} (0, 1 или all)")
+
+
+def parse_compression(value):
+    value = value.strip().lower()
+    if value not in COMPRESSION_CODECS:
+        raise ValueError(f"Неизвестный кодек: {value} (доступны: {', '.join(COMPRESSION_CODECS)})")
+    return value
+
+
+def parse_values(spec, cast, name):
+    """Список значений параметра через запятую без повторов"""
+    try:
+        values = [cast(item) for item in spec.split(',') if item.strip()]
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}")
+    if not values:
+        raise ValueError(f"{name}: не задано ни одного значения")
+    return list(dict.fromkeys(values))
+
+
+def build_space(args):
+    """Пространство параметров: {параметр: [значения]}"""
+    return {
+        'batch_size': parse_values(args.batch_sizes, int, '--batch-sizes'),
+        'linger_ms': parse_values(args.linger_ms, int, '--linger-ms'),
+        'compression': parse_values(args.compression, parse_compression, '--compression'),
+        'acks': parse_values(args.acks, parse_acks, '--acks'),
+        'metadata_bytes': parse_values(args.metadata_bytes, int, '--metadata-bytes'),
+    }
+
+
+def point_key(point):
+    return tuple(point[knob] for knob in KNOBS)
+
+
+def format_point(point):
+    return (f"batch={point['batch_size']} linger={point['linger_ms']} {point['compression']} "
+            f"acks={point['acks']} metadata={point['metadata_bytes']}")
+
+
+def make_metadata(size, rng):
+    """Строка metadata длиной size байт из слов (None при size = 0, как в тестовом сообщении)"""
+    if not size:
+        return None
+    parts = []
+    length = 0
+    while length < size:
+        word = f"{rng.choice(METADATA_WORDS)}={rng.choice(METADATA_WORDS)}{rng.randint(0, 999)};"
+        parts.append(word)
+        length += len(word)
+    return ''.join(parts)[:size]
+
+
+def build_workload(count, metadata_bytes, seed):
+    """Заранее сериализованные сообщения (ключ, значение): сериализация не входит в замер"""
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(count):
+        message, key = create_test_transaction_message()
+        message['metadata'] = make_metadata(metadata_bytes, rng)
+        workload.append((key.encode('utf-8'), json.dumps(message).encode('utf-8')))
+    return workload
+
+
+def unavailable_codecs(codecs):
+    """Кодеки из списка, библиотеки которых не установлены: {кодек: pip-пакет}"""
+    try:
+        from kafka import codec
+    except ImportError:
+        print("Ошибка: библиотека kafka-python не установлена!")
+        print("Установите: pip install kafka-python")
+        sys.exit(1)
+    return {
+        name: CODEC_LIBRARIES[name][1]
+        for name in codecs
+        if name in CODEC_LIBRARIES and not getattr(codec, CODEC_LIBRARIES[name][0])()
+    }
+
+
+def create_producer(args, point):
+    try:
+        from kafka import KafkaProducer
+    except ImportError:
+        print("Ошибка: библиотека kafka-python не установлена!")
+        print("Установите: pip install kafka-python")
+        sys.exit(1)
+    return KafkaProducer(
+        bootstrap_servers=args.bootstrap_server,
+        batch_size=point['batch_size'],
+        linger_ms=point['linger_ms'],
+        compression_type=None if point['compression'] == 'none' else point['compression'],
+        acks=point['acks'],
+    )
+
+
+def producer_metrics(producer):
+    """Средние из метрик kafka-python: степень сжатия, размер пакета, время в очереди"""
+    try:
+        metrics = producer.metrics().get('producer-metrics', {})
+    except Exception:
+        return {}
+    names = ['compression-rate-avg', 'batch-size-avg', 'record-queue-time-avg', 'request-latency-avg']
+    return {name: metrics[name] for name in names if isinstance(metrics.get(name), (int, float))}
+
+
+def send_workload(producer, topic, workload, rate=None):
+    """
+    Отправить нагрузку и дождаться подтверждений
+
+    Returns:
+        (длительность до последнего подтверждения, гистограмма задержек, ошибок)
+    """
+    latency = LatencyHistogram()
+    state = {'last_ack': None, 'errors': 0}
+
+    def on_ack(sent_at, _metadata):
+        now = time.perf_counter()
+        latency.record((now - sent_at) * 1000)
+        state['last_ack'] = now
+
+    def on_error(_exception):
+        state['errors'] += 1
+
+    started = time.perf_counter()
+    for index, (key, value) in enumerate(workload):
+        if rate:
+            sent_at = started + index / rate
+            delay = sent_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            sent_at = time.perf_counter()
+        with stage('send'):
+            future = producer.send(topic, key=key, value=value)
+        future.add_callback(on_ack, sent_at)
+        future.add_errback(on_error)
+    with stage('flush'):
+        producer.flush()
+    finished = state['last_ack'] or time.perf_counter()
+    return finished - started, latency, state['errors']
+
+
+def measure_point(args, point, workloads):
+    """
+    Замер одной точки (--repeats раз, каждый - новым продюсером после прогрева)
+
+    Returns:
+        Результат точки; при невозможности создать продюсер - с полем skipped
+    """
+    workload = workloads.get(point['metadata_bytes'])
+    if workload is None:
+        with stage('workload'):
+            workload = build_workload(args.messages + args.warmup, point['metadata_bytes'], args.seed)
+        workloads[point['metadata_bytes']] = workload
+    warmup, measured = workload[:args.warmup], workload[args.warmup:]
+    payload_bytes = sum(len(key) + len(value) for key, value in measured)
+
+    throughputs = []
+    latency = LatencyHistogram()
+    errors = 0
+    metrics = {}
+    for _ in range(args.repeats):
+        try:
+            with stage('connect'):
+                producer = create_producer(args, point)
+        except (AssertionError, ValueError, RuntimeError) as e:
+            # Отсутствие библиотеки кодека kafka-python 2.x сообщает через AssertionError,
+            # 3.x - через RuntimeError (недоступные кодеки run() исключает заранее)
+            return {'point': point, 'skipped': str(e)}
+        try:
+            if warmup:
+                send_workload(producer, args.topic, warmup)
+            elapsed, run_latency, run_errors = send_workload(producer, args.topic, measured, args.rate)
+            metrics = producer_metrics(producer)
+        finally:
+            producer.close()
+        throughputs.append(len(measured) / elapsed if elapsed > 0 else 0.0)
+        latency.merge(run_latency)
+        errors += run_errors
+
+    throughput = statistics.median(throughputs)
+    return {
+        'point': point,
+        'messages_per_s': throughput,
+        'mb_per_s': throughput * payload_bytes / len(measured) / 1e6 if measured else 0.0,
+        'message_bytes': payload_bytes / len(measured) if measured else 0,
+        'latency': latency,
+        'errors': errors,
+        'metrics': metrics,
+    }
+
+
+def meets_latency(result, max_p99_ms):
+    return max_p99_ms is None or result['latency'].percentile(99) <= max_p99_ms
+
+
+def score(result, max_p99_ms):
+    """Ключ сравнения: сначала укладывающиеся в p99, среди них - по пропускной способности"""
+    if 'skipped' in result or result['errors']:
+        return (0, 0.0)
+    if meets_latency(result, max_p99_ms):
+        return (2, result['messages_per_s'])
+    return (1, -result['latency'].percentile(99))
+
+
+def pareto_front(results):
+    """Точки, которые не доминируются другими по (пропускная способность больше, p99 меньше)"""
+    candidates = [result for result in results if 'skipped' not in result and not result['errors']]
+    front = []
+    for result in candidates:
+        throughput, p99 = result['messages_per_s'], result['latency'].percentile(99)
+        dominated = any(
+            other['messages_per_s'] >= throughput and other['latency'].percentile(99) <= p99
+            and (other['messages_per_s'] > throughput or other['latency'].percentile(99) < p99)
+            for other in candidates
+        )
+        if not dominated:
+            front.append(result)
+    return sorted(front, key=lambda result: result['messages_per_s'])
+
+
+class Sweep:
+    """Замеры точек с кэшем: точка, уже измеренная при поиске, повторно не отправляется"""
+
+    def __init__(self, args):
+        self.args = args
+        self.results = {}
+        self.workloads = {}
+
+    def evaluate(self, point):
+        key = point_key(point)
+        if key not in self.results:
+            if self.args.max_points and len(self.results) >= self.args.max_points:
+                return None
+            result = measure_point(self.args, point, self.workloads)
+            self.results[key] = result
+            print_progress(len(self.results), result)
+        return self.results[key]
+
+    def grid(self, space):
+        for values in itertools.product(*(space[knob] for knob in KNOBS)):
+            if self.evaluate(dict(zip(KNOBS, values))) is None:
+                break
+
+    def coordinate(self, space):
+        """
+        Покоординатный подъем от BASELINE (значения вне пространства - первые из списка),
+        отдельно для каждого размера metadata
+        """
+        for metadata_bytes in space['metadata_bytes']:
+            if not self.ascend(space, metadata_bytes):
+                return
+
+    def ascend(self, space, metadata_bytes):
+        """Подъем при фиксированном размере metadata; False - исчерпан лимит точек"""
+        best = {knob: BASELINE[knob] if BASELINE[knob] in space[knob] else space[knob][0] for knob in KNOBS}
+        best['metadata_bytes'] = metadata_bytes
+        best_result = self.evaluate(best)
+        if best_result is None:
+            return False
+        improved = True
+        while improved:
+            improved = False
+            for knob in KNOBS[:-1]:
+                for value in space[knob]:
+                    candidate = dict(best, **{knob: value})
+                    result = self.evaluate(candidate)
+                    if result is None:
+                        return False
+                    if score(result, self.args.max_p99_ms) > score(best_result, self.args.max_p99_ms):
+                        best, best_result = candidate, result
+                        improved = True
+        return True
+
+
+def print_progress(index, result):
+    if 'skipped' in result:
+        print(f"  [{index}] {format_point(result['point'])}: пропущена ({result['skipped']})")
+        return
+    print(f"  [{index}] {format_point(result['point'])}: {result['messages_per_s']:.0f} сообщ/с, "
+          f"p99 {result['latency'].percentile(99):.1f} мс" + (f", ошибок {result['errors']}" if result['errors'] else ''))
+
+
+def confluent_config(point):
+    """Фрагмент ProducerConfig Portfolio Service с настройками точки"""
+    return '\n'.join([
+        f"Acks = Acks.{CONFLUENT_ACKS[point['acks']]},",
+        f"LingerMs = {point['linger_ms']},",
+        f"BatchSize = {point['batch_size']},",
+        f"CompressionType = CompressionType.{CONFLUENT_COMPRESSION[point['compression']]},",
+    ])
+
+
+def group_by_metadata(results):
+    """Точки по размеру metadata (разные нагрузки между собой не сравниваются)"""
+    groups = {}
+    for result in results:
+        groups.setdefault(result['point']['metadata_bytes'], []).append(result)
+    return dict(sorted(groups.items()))
+
+
+def select_best(front, max_p99_ms):
+    """Наибольшая пропускная способность среди точек фронта, укладывающихся в p99"""
+    eligible = [result for result in front if meets_latency(result, max_p99_ms)]
+    return max(eligible, key=lambda result: result['messages_per_s']) if eligible else None
+
+
+def print_report(results, fronts, bests, args):
+    front_keys = {point_key(result['point']) for front in fronts.values() for result in front}
+
+    print()
+    print("=" * 112)
+    print(f"Точки по пропускной способности (сообщений: {args.messages}"
+          f"{f', скорость {args.rate:g}/с' if args.rate else ', без ограничения скорости'}), "
+          f"★ - Парето для своего размера metadata")
+    print("=" * 112)
+    header = (f"  {'':1} {'batch':>7} {'linger':>6} {'сжатие':>7} {'acks':>4} {'meta':>5} {'байт':>6} "
+              f"{'сообщ/с':>9} {'МБ/с':>7}")
+    header += ''.join(f" {'p' + str(p):>7}" for p in PERCENTILES) + f" {'max':>8} {'ошибок':>6}"
+    print(header)
+    for group in group_by_metadata(results).values():
+        measured = sorted((result for result in group if 'skipped' not in result),
+                          key=lambda result: -result['messages_per_s'])
+        for result in measured:
+            point = result['point']
+            latency = result['latency']
+            line = (f"  {'★' if point_key(point) in front_keys else ' '} {point['batch_size']:>7} "
+                    f"{point['linger_ms']:>6} {point['compression']:>7} {str(point['acks']):>4} "
+                    f"{point['metadata_bytes']:>5} {result['message_bytes']:>6.0f} "
+                    f"{result['messages_per_s']:>9.0f} {result['mb_per_s']:>7.2f}")
+            line += ''.join(f" {latency.percentile(p):>7.1f}" for p in PERCENTILES)
+            line += f" {latency.max_value:>8.1f} {result['errors']:>6}"
+            print(line)
+    print("=" * 112)
+
+    skipped = [result for result in results if 'skipped' in result]
+    if skipped:
+        reasons = sorted({result['skipped'] for result in skipped})
+        print(f"Пропущено точек: {len(skipped)} ({'; '.join(reasons)})")
+
+    limit = f" при p99 <= {args.max_p99_ms:g} мс" if args.max_p99_ms is not None else ''
+    for metadata_bytes, best in bests.items():
+        print(f"\nmetadata {metadata_bytes} байт:")
+        if not fronts[metadata_bytes]:
+            print("  ✗ Нет точек без ошибок отправки")
+            continue
+        if best is None:
+            print(f"  ✗ Ни одна точка не укладывается в p99 {args.max_p99_ms:g} мс")
+            continue
+        print(f"  Лучшая пропускная способность{limit}: {format_point(best['point'])} - "
+              f"{best['messages_per_s']:.0f} сообщ/с, p99 {best['latency'].percentile(99):.1f} мс")
+        print("  ProducerConfig Portfolio Service (AutofacModule.RegisterKafka):")
+        for line in confluent_config(best['point']).splitlines():
+            print(f"      {line}")
+        if best['point']['acks'] != 'all':
+            print("  ⚠ Portfolio Service включает EnableIdempotence, для него нужен Acks.All")
+
+
+def build_report(results, fronts, bests, args):
+    """Отчет в JSON"""
+    def describe(result):
+        if 'skipped' in result:
+            return {'point': result['point'], 'skipped': result['skipped']}
+        return {
+            'point': result['point'],
+            'messages_per_s': result['messages_per_s'],
+            'mb_per_s': result['mb_per_s'],
+            'message_bytes': result['message_bytes'],
+            'latency_ms': {f'p{p}': result['latency'].percentile(p) for p in PERCENTILES},
+            'max_ms': result['latency'].max_value,
+            'errors': result['errors'],
+            'metrics': result['metrics'],
+        }
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'params': {'bootstrap_server': args.bootstrap_server, 'topic': args.topic, 'search': args.search,
+                   'messages': args.messages, 'warmup': args.warmup, 'repeats': args.repeats,
+                   'rate': args.rate, 'max_p99_ms': args.max_p99_ms},
+        'points': [describe(result) for result in results],
+        'by_metadata_bytes': {
+            str(metadata_bytes): {
+                'pareto': [result['point'] for result in fronts[metadata_bytes]],
+                'best': best['point'] if best else None,
+            }
+            for metadata_bytes, best in bests.items()
+        },
+    }
+
+
+def run(args):
+    space = build_space(args)
+    missing = unavailable_codecs(space['compression'])
+    for name, package in missing.items():
+        print(f"⚠️ Кодек {name} недоступен (pip install {package}) - точки с ним пропущены")
+    space['compression'] = [name for name in space['compression'] if name not in missing]
+    if not space['compression']:
+        print("Ошибка: ни один из заданных кодеков сжатия недоступен")
+        return 1
+    sweep = Sweep(args)
+
+    total = 1
+    for values in space.values():
+        total *= len(values)
+    print("=" * 60)
+    print("Перебор параметров продюсера Kafka")
+    print("=" * 60)
+    print(f"Bootstrap Server: {args.bootstrap_server}, топик: {args.topic}")
+    print(f"Поиск: {args.search}, точек в сетке: {total}, сообщений на точку: {args.messages} "
+          f"(+{args.warmup} прогрев) x {args.repeats}")
+    for knob in KNOBS:
+        print(f"  {knob}: {', '.join(map(str, space[knob]))}")
+    print()
+
+    if args.search == 'grid':
+        sweep.grid(space)
+    else:
+        sweep.coordinate(space)
+
+    results = list(sweep.results.values())
+    fronts = {metadata_bytes: pareto_front(group) for metadata_bytes, group in group_by_metadata(results).items()}
+    bests = {metadata_bytes: select_best(front, args.max_p99_ms) for metadata_bytes, front in fronts.items()}
+    print_report(results, fronts, bests, args)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(build_report(results, fronts, bests, args), f, indent=2, ensure_ascii=False)
+        print(f"\nОтчет сохранен: {args.report}")
+    return 0 if bests and all(bests.values()) else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Подбор batch.size, linger.ms, сжатия и acks продюсера Kafka перебором'
+    )
+    parser.add_argument('--bootstrap-server', default=DEFAULT_BOOTSTRAP,
+                        help=f'Адрес Kafka брокера (по умолчанию: {DEFAULT_BOOTSTRAP})')
+    parser.add_argument('--topic', default=DEFAULT_TOPIC,
+                        help=f'Название топика (по умолчанию: {DEFAULT_TOPIC})')
+    parser.add_argument('--search', choices=['grid', 'coordinate'], default='grid',
+                        help='Полный перебор или покоординатный подъем (по умолчанию: grid)')
+    parser.add_argument('--batch-sizes', default=DEFAULT_BATCH_SIZES,
+                        help=f'Значения batch.size в байтах (по умолчанию: {DEFAULT_BATCH_SIZES})')
+    parser.add_argument('--linger-ms', default=DEFAULT_LINGER_MS,
+                        help=f'Значения linger.ms (по умолчанию: {DEFAULT_LINGER_MS})')
+    parser.add_argument('--compression', default=DEFAULT_COMPRESSION,
+                        help=f'Кодеки сжатия (по умолчанию: {DEFAULT_COMPRESSION})')
+    parser.add_argument('--acks', default=DEFAULT_ACKS,
+                        help=f'Значения acks: 0, 1, all (по умолчанию: {DEFAULT_ACKS})')
+    parser.add_argument('--metadata-bytes', default=DEFAULT_METADATA_BYTES,
+                        help=f'Размеры поля metadata в байтах (по умолчанию: {DEFAULT_METADATA_BYTES})')
+    parser.add_argument('--messages', type=int, default=DEFAULT_MESSAGES,
+                        help=f'Сообщений на замер точки (по умолчанию: {DEFAULT_MESSAGES})')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP,
+                        help=f'Сообщений прогрева перед замером (по умолчанию: {DEFAULT_WARMUP})')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help=f'Повторов замера точки, берется медиана (по умолчанию: {DEFAULT_REPEATS})')
+    parser.add_argument('--rate', type=float,
+                        help='Скорость отправки, сообщений/с (по умолчанию: без ограничения)')
+    parser.add_argument('--max-p99-ms', type=float,
+                        help='Допустимый p99 задержки подтверждения для выбора лучшей точки')
+    parser.add_argument('--max-points', type=int, help='Ограничить число измеряемых точек')
+    parser.add_argument('--seed', type=int, default=1, help='Seed содержимого metadata (по умолчанию: 1)')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить точки и Парето-фронт в JSON')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.messages <= 0 or args.repeats <= 0 or args.warmup < 0:
+        print("Ошибка: --messages и --repeats должны быть положительными, --warmup - неотрицательным")
+        return 1
+    try:
+        return run_profiled(args, run, args)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,694 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Эталонная агрегация транзакций для проверки AnalyticsService
+
+Считает по тому же потоку транзакций, что отправляет продюсер, рейтинги
+активов (топ по покупкам/продажам, глобально и по портфелям) и сводку
+истории портфелей за периоды. Агрегация векторная (NumPy, колонки), поэтому
+10M+ транзакций укладываются в бюджет агрегации из Task 7.3 (30 с).
+Результаты сравниваются с ответами API AnalyticsService.
+
+Источник транзакций:
+    - сгенерированный поток (--count, --seed): детерминированный, его можно
+      записать в JSONL (--write-stream) и отправить продюсером через --replay
+    - JSONL с сообщениями в формате топика portfolio.transactions (--input)
+
+Использование:
+    python scripts/reference_aggregation.py --count 10000000 --period day
+    python scripts/reference_aggregation.py --count 100000 --write-stream stream.jsonl
+    python scripts/send_test_kafka_message.py --replay stream.jsonl
+    python scripts/reference_aggregation.py --input stream.jsonl --period all \\
+        --api-url http://localhost:5000 --token <JWT>
+
+Требует: numpy
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+
+# Бюджет времени агрегации (Task 7.3), в секундах
+AGGREGATION_BUDGET_SECONDS = 30
+# Длительность периодов агрегации фиксированной длины (в секундах)
+PERIOD_SECONDS = {'hour': 3600, 'day': 86400}
+PERIODS = ['all', 'hour', 'day', 'week', 'month']
+# Коды типов транзакций и контекстов анализа (как в AnalyticsService)
+TRANSACTION_BUY = 1
+TRANSACTION_SELL = 2
+CONTEXT_GLOBAL = 1
+CONTEXT_PORTFOLIO = 2
+# Количество топ активов по умолчанию и максимум (DomainConstants.Aggregation)
+DEFAULT_TOP = 10
+MAX_TOP = 100
+# Допустимое расхождение денежных сумм при сравнении с API
+AMOUNT_TOLERANCE = 0.01
+# Сводки портфелей сверяются по списку транзакций периода (/api/analytics/transactions
+# без пагинации) - для периодов с большим числом транзакций проверка пропускается
+MAX_LISTED_TRANSACTIONS = 200_000
+# Параметры сгенерированного потока по умолчанию
+DEFAULT_COUNT = 1_000_000
+DEFAULT_PORTFOLIOS = 1000
+DEFAULT_ASSETS = 200
+DEFAULT_DAYS = 30
+# Ключи групп считаются плотными (bincount без сортировки), если их диапазон
+# не больше количества транзакций, умноженного на этот коэффициент
+DENSE_KEY_FACTOR = 4
+# Суффикс файла с колонками, разобранными из JSONL (кэш рядом с исходным файлом)
+COLUMNS_CACHE_SUFFIX = '.columns.npz'
+
+
+def import_numpy():
+    """Импортировать numpy при первом обращении"""
+    try:
+        import numpy
+    except ImportError:
+        print("Ошибка: библиотека numpy не установлена!")
+        print("Установите: pip install numpy")
+        sys.exit(1)
+    return numpy
+
+
+def format_time(seconds):
+    """Секунды UTC -> строка ISO 8601 в формате API (2024-01-01T00:00:00Z)"""
+    return datetime.fromtimestamp(int(seconds), timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def parse_time(value):
+    """Строка ISO 8601 (transactionTime) -> секунды UTC"""
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def make_ids(count, rng):
+    """Детерминированные UUID v4 из генератора random.Random"""
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(count)]
+
+
+def generate_model(portfolios=DEFAULT_PORTFOLIOS, assets=DEFAULT_ASSETS, days=DEFAULT_DAYS,
+                   end_time=None, seed=0):
+    """
+    Общая часть модели потока: окно времени, типы и базовые цены активов, идентификаторы
+
+    Returns:
+        (модель, генератор numpy для строк потока)
+    """
+    np = import_numpy()
+
+    if end_time is None:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        end_time = int(today.timestamp())
+
+    id_rng = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    model = {
+        'start_time': end_time - days * 86400,
+        'end_time': end_time,
+        'asset_types': rng.integers(1, 4, assets, dtype=np.int8),
+        'base_prices': np.round(rng.uniform(10, 5000, assets), 2),
+        'portfolio_ids': make_ids(portfolios, id_rng),
+        'stock_card_ids': make_ids(assets, id_rng),
+    }
+    return model, rng
+
+
+def generate_rows(model, count, rng):
+    """
+    Сгенерировать count транзакций модели в колонках генератором rng
+
+    Returns:
+        Словарь колонок: portfolio, asset (индексы в portfolio_ids/stock_card_ids),
+        transaction_type, asset_type, quantity, price, total_amount, time (секунды UTC),
+        а также списки portfolio_ids и stock_card_ids
+    """
+    np = import_numpy()
+
+    assets = len(model['stock_card_ids'])
+    asset = rng.integers(0, assets, count, dtype=np.int32)
+    quantity = rng.integers(1, 1000, count).astype(np.float64)
+    price = np.round(model['base_prices'][asset] * rng.uniform(0.95, 1.05, count), 2)
+    return {
+        'portfolio': rng.integers(0, len(model['portfolio_ids']), count, dtype=np.int32),
+        'asset': asset,
+        'transaction_type': rng.integers(TRANSACTION_BUY, TRANSACTION_SELL + 1, count, dtype=np.int8),
+        'asset_type': model['asset_types'][asset],
+        'quantity': quantity,
+        'price': price,
+        'total_amount': np.round(quantity * price, 2),
+        'time': rng.integers(model['start_time'], model['end_time'], count, dtype=np.int64),
+        'portfolio_ids': model['portfolio_ids'],
+        'stock_card_ids': model['stock_card_ids'],
+    }
+
+
+def generate_columns(count=DEFAULT_COUNT, portfolios=DEFAULT_PORTFOLIOS, assets=DEFAULT_ASSETS,
+                     days=DEFAULT_DAYS, end_time=None, seed=0):
+    """Сгенерировать поток транзакций сразу в колонках (см. generate_rows)"""
+    model, rng = generate_model(portfolios, assets, days, end_time, seed)
+    return generate_rows(model, count, rng)
+
+
+def iter_messages(columns, seed=0):
+    """Сообщения в формате топика portfolio.transactions для колонок потока"""
+    id_rng = random.Random(f"{seed}:transactions")
+    portfolio_ids = columns['portfolio_ids']
+    stock_card_ids = columns['stock_card_ids']
+    for row in range(len(columns['time'])):
+        yield {
+            "id": str(uuid.UUID(int=id_rng.getrandbits(128), version=4)),
+            "portfolioId": portfolio_ids[columns['portfolio'][row]],
+            "stockCardId": stock_card_ids[columns['asset'][row]],
+            "assetType": int(columns['asset_type'][row]),
+            "transactionType": int(columns['transaction_type'][row]),
+            "quantity": int(columns['quantity'][row]),  # int в TransactionMessage
+            "pricePerUnit": float(columns['price'][row]),
+            "totalAmount": float(columns['total_amount'][row]),
+            "transactionTime": datetime.fromtimestamp(
+                int(columns['time'][row]), timezone.utc).isoformat(),
+            "currency": "RUB",
+            "metadata": None
+        }
+
+
+def write_stream(columns, path, seed=0):
+    """Записать поток в JSONL (одно сообщение на строку) для отправки продюсером"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for message in iter_messages(columns, seed):
+            f.write(json.dumps(message) + '\n')
+
+
+def load_columns(path):
+    """
+    Прочитать JSONL с сообщениями в колонки
+
+    Разобранные колонки кэшируются в <файл>.columns.npz: повторный запуск
+    по тому же файлу не разбирает JSON заново.
+    """
+    np = import_numpy()
+    path = Path(path)
+    cache_path = path.with_name(path.name + COLUMNS_CACHE_SUFFIX)
+
+    if cache_path.exists() and cache_path.stat().st_mtime >= path.stat().st_mtime:
+        with np.load(cache_path) as data:
+            columns = {name: data[name] for name in data.files}
+        columns['portfolio_ids'] = columns['portfolio_ids'].tolist()
+        columns['stock_card_ids'] = columns['stock_card_ids'].tolist()
+        print(f"Колонки загружены из кэша: {cache_path}")
+        return columns
+
+    portfolio_codes = {}
+    asset_codes = {}
+    rows = {name: [] for name in ('portfolio', 'asset', 'transaction_type', 'asset_type',
+                                  'quantity', 'price', 'total_amount', 'time')}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+                rows['portfolio'].append(portfolio_codes.setdefault(message['portfolioId'], len(portfolio_codes)))
+                rows['asset'].append(asset_codes.setdefault(message['stockCardId'], len(asset_codes)))
+                rows['transaction_type'].append(message['transactionType'])
+                rows['asset_type'].append(message['assetType'])
+                rows['quantity'].append(message['quantity'])
+                rows['price'].append(message['pricePerUnit'])
+                rows['total_amount'].append(message['totalAmount'])
+                rows['time'].append(parse_time(message['transactionTime']))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Предупреждение: строка {line_number} пропущена: {e}")
+
+    dtypes = {'portfolio': np.int32, 'asset': np.int32, 'transaction_type': np.int8,
+              'asset_type': np.int8, 'quantity': np.float64, 'price': np.float64,
+              'total_amount': np.float64, 'time': np.int64}
+    columns = {name: np.array(values, dtype=dtypes[name]) for name, values in rows.items()}
+    columns['portfolio_ids'] = list(portfolio_codes)
+    columns['stock_card_ids'] = list(asset_codes)
+
+    try:
+        np.savez(cache_path, **{name: np.asarray(values) for name, values in columns.items()})
+    except IOError as e:
+        print(f"Предупреждение: не удалось сохранить кэш колонок: {e}")
+    return columns
+
+
+def period_buckets(times, period, start_time, end_time):
+    """
+    Разбить транзакции по периодам
+
+    Args:
+        times: секунды UTC транзакций (уже отфильтрованные по [start_time, end_time])
+        period: 'all' (один период start..end), 'hour', 'day', 'week' (с понедельника) или 'month'
+
+    Returns:
+        (индекс периода для каждой транзакции, список границ периодов [(начало, конец)])
+    """
+    np = import_numpy()
+
+    if period == 'all':
+        return np.zeros(len(times), dtype=np.int64), [(start_time, end_time)]
+
+    # Номер периода с начала эпохи: месяцы, недели (с понедельника) или часы/дни
+    if period == 'month':
+        units = times.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    elif period == 'week':
+        # 1970-01-01 - четверг: сдвиг на 3 дня выравнивает недели по понедельникам
+        units = (times // 86400 + 3) // 7
+    else:
+        units = times // PERIOD_SECONDS[period]
+
+    if not len(units):
+        return units, []
+    # Номера периодов плотные - перенумеровываем непустые периоды без сортировки
+    first_unit = int(units.min())
+    offsets = units - first_unit
+    present = np.bincount(offsets) > 0
+    index = (np.cumsum(present) - 1)[offsets]
+    present_units = np.flatnonzero(present) + first_unit
+
+    if period == 'month':
+        months = present_units.astype('datetime64[M]')
+        starts = months.astype('datetime64[s]').astype(np.int64)
+        ends = (months + 1).astype('datetime64[s]').astype(np.int64) - 1
+    elif period == 'week':
+        starts = (present_units * 7 - 3) * 86400
+        ends = starts + 7 * 86400 - 1
+    else:
+        starts = present_units * PERIOD_SECONDS[period]
+        ends = starts + PERIOD_SECONDS[period] - 1
+    bounds = [(int(start), int(end)) for start, end in zip(starts, ends)]
+    return index.astype(np.int64), bounds
+
+
+def group_sums(keys, columns):
+    """
+    Суммы покупок и продаж по ключам групп
+
+    Плотные ключи суммируются через bincount напрямую, разреженные
+    предварительно перенумеровываются через np.unique (сортировка).
+
+    Returns:
+        Словарь: key (уникальные ключи) и массивы buy_count, sell_count,
+        buy_amount, sell_amount, buy_quantity, sell_quantity
+    """
+    np = import_numpy()
+
+    key_space = int(keys.max()) + 1 if len(keys) else 0
+    dense = key_space <= DENSE_KEY_FACTOR * max(len(keys), 1)
+    if dense:
+        unique_keys, inverse, size = None, keys, key_space
+    else:
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        size = len(unique_keys)
+
+    buy = columns['transaction_type'] == TRANSACTION_BUY
+    sell = columns['transaction_type'] == TRANSACTION_SELL
+    amount = columns['total_amount']
+    quantity = columns['quantity']
+    sums = {
+        'buy_count': np.bincount(inverse, weights=buy, minlength=size).astype(np.int64),
+        'sell_count': np.bincount(inverse, weights=sell, minlength=size).astype(np.int64),
+        'buy_amount': np.bincount(inverse, weights=np.where(buy, amount, 0), minlength=size),
+        'sell_amount': np.bincount(inverse, weights=np.where(sell, amount, 0), minlength=size),
+        'buy_quantity': np.bincount(inverse, weights=np.where(buy, quantity, 0), minlength=size),
+        'sell_quantity': np.bincount(inverse, weights=np.where(sell, quantity, 0), minlength=size),
+    }
+    if dense:
+        # Оставляем только ключи, которые встречались
+        unique_keys = np.flatnonzero(np.bincount(inverse, minlength=size))
+        sums = {name: values[unique_keys] for name, values in sums.items()}
+    sums['key'] = unique_keys
+    return sums
+
+
+def aggregate(columns, period='all', start_time=None, end_time=None):
+    """
+    Посчитать эталонные агрегаты
+
+    Returns:
+        Словарь: bounds (границы периодов), global (по периоду и активу),
+        portfolio (по периоду, портфелю и активу), history (по периоду и портфелю)
+    """
+    np = import_numpy()
+
+    times = columns['time']
+    if start_time is None:
+        start_time = int(times.min()) if len(times) else 0
+    if end_time is None:
+        end_time = int(times.max()) if len(times) else 0
+
+    with stage('filter'):
+        selected = (times >= start_time) & (times <= end_time)
+        if not selected.all():
+            columns = {name: (values[selected] if hasattr(values, 'shape') else values)
+                       for name, values in columns.items()}
+
+    with stage('buckets'):
+        bucket, bounds = period_buckets(columns['time'], period, start_time, end_time)
+
+    assets = max(len(columns['stock_card_ids']), 1)
+    portfolios = max(len(columns['portfolio_ids']), 1)
+    portfolio = columns['portfolio'].astype(np.int64)
+    asset = columns['asset'].astype(np.int64)
+
+    with stage('rollup global'):
+        global_sums = group_sums(bucket * assets + asset, columns)
+    with stage('rollup portfolio'):
+        portfolio_sums = group_sums((bucket * portfolios + portfolio) * assets + asset, columns)
+    with stage('rollup history'):
+        history_sums = group_sums(bucket * portfolios + portfolio, columns)
+
+    # Ключи групп -> индексы периода, портфеля и актива
+    global_sums['bucket'], global_sums['asset'] = np.divmod(global_sums['key'], assets)
+    bucket_portfolio, portfolio_sums['asset'] = np.divmod(portfolio_sums['key'], assets)
+    portfolio_sums['bucket'], portfolio_sums['portfolio'] = np.divmod(bucket_portfolio, portfolios)
+    history_sums['bucket'], history_sums['portfolio'] = np.divmod(history_sums['key'], portfolios)
+
+    return {
+        'bounds': bounds,
+        'transactions': int(len(columns['time'])),
+        'global': global_sums,
+        'portfolio': portfolio_sums,
+        'history': history_sums,
+        'portfolio_ids': columns['portfolio_ids'],
+        'stock_card_ids': columns['stock_card_ids'],
+    }
+
+
+def top_assets(sums, stock_card_ids, bucket, side='buy', top=DEFAULT_TOP, portfolio=None):
+    """
+    Топ активов периода (как GetTopBoughtAsync/GetTopSoldAsync):
+    по количеству транзакций, при равенстве - по сумме
+
+    Returns:
+        Список словарей stockCardId, count, amount, quantity
+    """
+    np = import_numpy()
+
+    mask = (sums['bucket'] == bucket) & (sums[f'{side}_count'] > 0)
+    if portfolio is not None:
+        mask &= sums['portfolio'] == portfolio
+    rows = np.flatnonzero(mask)
+    order = np.lexsort((-sums[f'{side}_amount'][rows], -sums[f'{side}_count'][rows]))[:top]
+    return [
+        {
+            'stockCardId': stock_card_ids[sums['asset'][row]],
+            'count': int(sums[f'{side}_count'][row]),
+            'amount': round(float(sums[f'{side}_amount'][row]), 2),
+            'quantity': float(sums[f'{side}_quantity'][row]),
+        }
+        for row in rows[order]
+    ]
+
+
+def portfolio_history(result, bucket, portfolio):
+    """Сводка истории портфеля за период: количество и суммы покупок/продаж"""
+    sums = result['history']
+    rows = ((sums['bucket'] == bucket) & (sums['portfolio'] == portfolio)).nonzero()[0]
+    if not len(rows):
+        return {'buy_count': 0, 'sell_count': 0, 'buy_amount': 0.0, 'sell_amount': 0.0}
+    row = rows[0]
+    return {
+        'buy_count': int(sums['buy_count'][row]),
+        'sell_count': int(sums['sell_count'][row]),
+        'buy_amount': round(float(sums['buy_amount'][row]), 2),
+        'sell_amount': round(float(sums['sell_amount'][row]), 2),
+    }
+
+
+def busiest_portfolios(result, bucket, count):
+    """Портфели с наибольшим числом транзакций в периоде (для выборочной проверки)"""
+    np = import_numpy()
+
+    sums = result['history']
+    rows = np.flatnonzero(sums['bucket'] == bucket)
+    totals = sums['buy_count'][rows] + sums['sell_count'][rows]
+    return [int(sums['portfolio'][row]) for row in rows[np.argsort(-totals, kind='stable')][:count]]
+
+
+def api_get(api_url, path, params, token=None, timeout=30):
+    """GET к API AnalyticsService, возвращает разобранный JSON"""
+    from urllib.parse import urlencode
+    from urllib.request import Request, urlopen
+
+    url = f"{api_url.rstrip('/')}{path}?{urlencode(params)}"
+    request = Request(url, headers={'Accept': 'application/json'})
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+    with stage('api'), urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def diff_top(reference, api_assets, side):
+    """
+    Сравнить топ активов с ответом API
+
+    Порядок сравнивается по ключу ранжирования (количество, сумма), а не по
+    stockCardId, чтобы активы с равным ключом могли стоять в любом порядке.
+
+    Returns:
+        Список описаний расхождений
+    """
+    count_field = 'buyTransactionCount' if side == 'buy' else 'sellTransactionCount'
+    amount_field = 'totalBuyAmount' if side == 'buy' else 'totalSellAmount'
+    by_id = {item['stockCardId']: item for item in reference}
+    problems = []
+
+    if len(api_assets) != len(reference):
+        problems.append(f"количество активов: API {len(api_assets)}, эталон {len(reference)}")
+
+    for position, (expected, actual) in enumerate(zip(reference, api_assets), start=1):
+        actual_key = (actual.get(count_field), float(actual.get(amount_field) or 0))
+        if actual_key[0] != expected['count'] or abs(actual_key[1] - expected['amount']) > AMOUNT_TOLERANCE:
+            problems.append(
+                f"#{position}: API {actual.get('stockCardId')} ({actual_key[0]}, {actual_key[1]:.2f}), "
+                f"эталон {expected['stockCardId']} ({expected['count']}, {expected['amount']:.2f})"
+            )
+        elif actual.get('stockCardId') not in by_id:
+            problems.append(f"#{position}: актив {actual.get('stockCardId')} отсутствует в эталонном топе")
+    return problems
+
+
+def period_transaction_count(result, bucket):
+    """Количество транзакций периода по эталону"""
+    sums = result['history']
+    rows = sums['bucket'] == bucket
+    return int(sums['buy_count'][rows].sum() + sums['sell_count'][rows].sum())
+
+
+def summarize_transactions(transactions, portfolio_ids):
+    """Сводки портфелей по списку транзакций API: {portfolioId: сводка} для портфелей из portfolio_ids"""
+    wanted = {portfolio_id.lower() for portfolio_id in portfolio_ids}
+    summaries = {
+        portfolio_id: {'buy_count': 0, 'sell_count': 0, 'buy_amount': 0.0, 'sell_amount': 0.0}
+        for portfolio_id in wanted
+    }
+    for transaction in transactions:
+        portfolio_id = str(transaction.get('portfolioId', '')).lower()
+        if portfolio_id not in wanted:
+            continue
+        summary = summaries[portfolio_id]
+        side = 'buy' if transaction.get('transactionType') == TRANSACTION_BUY else 'sell'
+        summary[f'{side}_count'] += 1
+        summary[f'{side}_amount'] += float(transaction.get('totalAmount') or 0)
+    return summaries
+
+
+def diff_history(reference, summary):
+    """Сравнить сводку портфеля за период со сводкой по транзакциям API"""
+    problems = []
+    for name, expected in reference.items():
+        actual = summary[name]
+        if abs(actual - expected) > (AMOUNT_TOLERANCE if isinstance(expected, float) else 0):
+            problems.append(f"{name}: API {actual:.2f}, эталон {expected:.2f}")
+    return problems
+
+
+def compare_with_api(result, api_url, token=None, top=DEFAULT_TOP, check_portfolios=3):
+    """
+    Сравнить эталонные агрегаты с API по всем периодам
+
+    Проверяются top-bought/top-sold в глобальном контексте и в контексте
+    самых активных портфелей, а также сводки этих портфелей (количество и
+    суммы покупок/продаж). Сводки считаются по /api/analytics/transactions за
+    период - это таблица asset_transactions AnalyticsService. Маршрут
+    /api/analytics/portfolios/{id}/history для сверки не подходит: он
+    проксирует портфель из PortfolioService, а не транзакции из Kafka.
+    Фильтра по портфелю у списка транзакций нет, поэтому он запрашивается один
+    раз на период и только если транзакций в периоде не больше
+    MAX_LISTED_TRANSACTIONS.
+
+    Returns:
+        Количество найденных расхождений
+    """
+    from urllib.error import URLError
+
+    portfolio_ids = result['portfolio_ids']
+    stock_card_ids = result['stock_card_ids']
+    mismatches = 0
+
+    for bucket, (start_time, end_time) in enumerate(result['bounds']):
+        period_params = {'startDate': format_time(start_time), 'endDate': format_time(end_time)}
+        print(f"\nПериод {period_params['startDate']} - {period_params['endDate']}")
+        checked_portfolios = busiest_portfolios(result, bucket, check_portfolios)
+        checks = [(None, CONTEXT_GLOBAL)] + [(portfolio, CONTEXT_PORTFOLIO) for portfolio in checked_portfolios]
+
+        for portfolio, context in checks:
+            params = dict(period_params, top=top, context='Global' if context == CONTEXT_GLOBAL else 'Portfolio')
+            sums = result['global']
+            scope = 'глобально'
+            if portfolio is not None:
+                params['portfolioId'] = portfolio_ids[portfolio]
+                sums = result['portfolio']
+                scope = f"портфель {portfolio_ids[portfolio]}"
+
+            for side, endpoint in (('buy', 'top-bought'), ('sell', 'top-sold')):
+                reference = top_assets(sums, stock_card_ids, bucket, side, top, portfolio)
+                try:
+                    response = api_get(api_url, f'/api/analytics/assets/{endpoint}', params, token)
+                except (URLError, ValueError) as e:
+                    print(f"  ✗ {endpoint} ({scope}): ошибка запроса: {e}")
+                    mismatches += 1
+                    continue
+                problems = diff_top(reference, response.get('assets', []), side)
+                mismatches += len(problems)
+                print(f"  {'✓' if not problems else '✗'} {endpoint} ({scope}): "
+                      f"{'совпадает' if not problems else f'расхождений: {len(problems)}'}")
+                for problem in problems:
+                    print(f"      {problem}")
+
+        if not checked_portfolios:
+            continue
+        listed = period_transaction_count(result, bucket)
+        if listed > MAX_LISTED_TRANSACTIONS:
+            print(f"  - transactions: пропущено, транзакций в периоде {listed} "
+                  f"(больше {MAX_LISTED_TRANSACTIONS}, задайте --period короче)")
+            continue
+        try:
+            response = api_get(api_url, '/api/analytics/transactions',
+                               dict(period_params, periodType='Custom'), token)
+        except (URLError, ValueError) as e:
+            print(f"  ✗ transactions: ошибка запроса: {e}")
+            mismatches += 1
+            continue
+        summaries = summarize_transactions(response.get('transactions', []),
+                                           [portfolio_ids[portfolio] for portfolio in checked_portfolios])
+        for portfolio in checked_portfolios:
+            scope = f"портфель {portfolio_ids[portfolio]}"
+            problems = diff_history(portfolio_history(result, bucket, portfolio),
+                                    summaries[portfolio_ids[portfolio].lower()])
+            mismatches += len(problems)
+            print(f"  {'✓' if not problems else '✗'} transactions ({scope}): "
+                  f"{'совпадает' if not problems else f'расхождений: {len(problems)}'}")
+            for problem in problems:
+                print(f"      {problem}")
+
+    return mismatches
+
+
+def build_report(result, top=DEFAULT_TOP):
+    """Отчет с эталонными топами по всем периодам (для сохранения в JSON)"""
+    periods = []
+    for bucket, (start_time, end_time) in enumerate(result['bounds']):
+        periods.append({
+            'startDate': format_time(start_time),
+            'endDate': format_time(end_time),
+            'topBought': top_assets(result['global'], result['stock_card_ids'], bucket, 'buy', top),
+            'topSold': top_assets(result['global'], result['stock_card_ids'], bucket, 'sell', top),
+        })
+    return {'transactions': result['transactions'], 'top': top, 'periods': periods}
+
+
+def run(args):
+    """Загрузить или сгенерировать поток, посчитать агрегаты и сравнить с API"""
+    with stage('load'):
+        if args.input:
+            print(f"Чтение потока: {args.input}")
+            columns = load_columns(args.input)
+        else:
+            print(f"Генерация потока: {args.count} транзакций, портфелей: {args.portfolios}, "
+                  f"активов: {args.assets}, seed: {args.seed}")
+            columns = generate_columns(args.count, args.portfolios, args.assets, args.days, seed=args.seed)
+    print(f"Транзакций в потоке: {len(columns['time'])}")
+
+    if args.write_stream:
+        with stage('write stream'):
+            write_stream(columns, args.write_stream, args.seed)
+        print(f"Поток записан: {args.write_stream}")
+
+    start_time = parse_time(args.start) if args.start else None
+    end_time = parse_time(args.end) if args.end else None
+
+    started = time.perf_counter()
+    result = aggregate(columns, args.period, start_time, end_time)
+    elapsed = time.perf_counter() - started
+    within_budget = elapsed <= AGGREGATION_BUDGET_SECONDS
+
+    print()
+    print("=" * 60)
+    print(f"Агрегация: {result['transactions']} транзакций, периодов: {len(result['bounds'])}")
+    print(f"  Групп актив/период: {len(result['global']['key'])}, "
+          f"портфель/актив/период: {len(result['portfolio']['key'])}")
+    print(f"  {'✓' if within_budget else '✗'} Время: {elapsed:.2f} с "
+          f"(бюджет: {AGGREGATION_BUDGET_SECONDS} с)")
+    print("=" * 60)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(build_report(result, args.top), f, indent=2, ensure_ascii=False)
+        print(f"Эталонный отчет сохранен: {args.report}")
+
+    mismatches = 0
+    if args.api_url:
+        mismatches = compare_with_api(result, args.api_url, args.token, args.top, args.check_portfolios)
+        print()
+        print(f"Расхождений с API: {mismatches}")
+
+    return 0 if within_budget and not mismatches else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Эталонная агрегация транзакций и сравнение с API AnalyticsService'
+    )
+    parser.add_argument('--input', help='JSONL с сообщениями (по умолчанию поток генерируется)')
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT,
+                        help=f'Количество сгенерированных транзакций (по умолчанию: {DEFAULT_COUNT})')
+    parser.add_argument('--portfolios', type=int, default=DEFAULT_PORTFOLIOS,
+                        help=f'Количество портфелей (по умолчанию: {DEFAULT_PORTFOLIOS})')
+    parser.add_argument('--assets', type=int, default=DEFAULT_ASSETS,
+                        help=f'Количество активов (по умолчанию: {DEFAULT_ASSETS})')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS,
+                        help=f'Длительность сгенерированного потока в днях (по умолчанию: {DEFAULT_DAYS})')
+    parser.add_argument('--seed', type=int, default=0, help='Seed генератора (по умолчанию: 0)')
+    parser.add_argument('--write-stream', metavar='FILE',
+                        help='Записать поток в JSONL для отправки продюсером (--replay)')
+    parser.add_argument('--period', choices=PERIODS, default='all',
+                        help='Период агрегации (по умолчанию: all - весь интервал одним периодом)')
+    parser.add_argument('--start', help='Начало интервала, ISO 8601 (по умолчанию: первая транзакция)')
+    parser.add_argument('--end', help='Конец интервала, ISO 8601 (по умолчанию: последняя транзакция)')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, choices=range(1, MAX_TOP + 1),
+                        metavar=f'1..{MAX_TOP}', help=f'Размер топа (по умолчанию: {DEFAULT_TOP})')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить эталонные топы в JSON')
+    parser.add_argument('--api-url', help='Адрес AnalyticsService для сравнения (например, http://localhost:5000)')
+    parser.add_argument('--token', default=os.environ.get('ANALYTICS_API_TOKEN'),
+                        help='JWT для API (по умолчанию: переменная ANALYTICS_API_TOKEN)')
+    parser.add_argument('--check-portfolios', type=int, default=3,
+                        help='Сколько самых активных портфелей проверять в каждом периоде (по умолчанию: 3)')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    return run_profiled(args, run, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сценарии смешанной нагрузки: несколько потоков событий в один или несколько топиков
+
+Сценарий (JSON, примеры в scripts/scenarios/) описывает:
+    pools    - общие пулы сущностей: portfolios, stock_cards (с типами активов и
+               текущими ценами) и portfolio_assets - активы, созданные потоком
+               с "creates"; выбор сущностей по закону Ципфа ("skew")
+    streams  - потоки событий: event (transaction, portfolio_asset_created,
+               price_update), topic, rate (событий/с), arrival (poisson или
+               constant), start (секунда начала), key (поле-ключ сообщения),
+               params, creates / requires (имя пула portfolio_assets)
+    track    - {топик: consumer group}: для этих топиков измеряется задержка
+               до коммита offset'а группой
+
+Причинный порядок: поток с "requires" выбирает только сущности, создание
+которых уже подтверждено брокером (продюсер дождался ack), поэтому событие
+создания записано в Kafka раньше зависимых от него. Порядок чтения это не
+гарантирует: события разных топиков (portfolio.assets и
+portfolio.transactions) лежат в разных партициях, и consumer'ы читают их
+независимо. Ключ portfolioId сохраняет порядок событий одного портфеля только
+внутри каждого топика.
+
+Все потоки выполняются одним планировщиком по расписанию (open-loop):
+задержки считаются от запланированного момента отправки, поэтому
+отставание отправителя не скрывает задержку брокера.
+
+Использование:
+    python scripts/scenario_runner.py scripts/scenarios/mixed_portfolio_activity.json
+    python scripts/scenario_runner.py scenario.json --rate-scale 2 --duration 300 --report scenario.json.report
+    python scripts/scenario_runner.py scenario.json --output events.jsonl   # без Kafka
+
+Требует: kafka-python (кроме --output)
+"""
+
+import sys
+import json
+import math
+import time
+import heapq
+import random
+import argparse
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from history_workload import zipf_weights, cumulative
+from reference_aggregation import make_ids
+from kafka_common import DEFAULT_BOOTSTRAP, TICKERS, LatencyHistogram, PERCENTILES
+
+# kafka-python импортируется в KafkaSink
+
+ARRIVALS = ('poisson', 'constant')
+DEFAULT_DURATION = 60
+# Сколько ждать коммитов отслеживаемых топиков после окончания сценария (в секундах)
+DEFAULT_DRAIN_TIMEOUT = 60
+# Интервал опроса закоммиченных offset'ов для "track" (в секундах)
+TRACK_POLL_INTERVAL = 0.25
+DEFAULT_ASSET_TYPES = {'1': 1.0}
+
+
+class EntityPool:
+    """Пул идентификаторов с выбором по закону Ципфа (первые - самые популярные)"""
+
+    def __init__(self, items, skew=0.0):
+        self.items = list(items)
+        self.skew = skew
+        self._cum_weights = None
+
+    def add(self, item):
+        self.items.append(item)
+        self._cum_weights = None
+
+    def choose(self, rng):
+        if not self.items:
+            return None
+        if not self.skew:
+            return rng.choice(self.items)
+        if self._cum_weights is None or len(self._cum_weights) != len(self.items):
+            self._cum_weights = cumulative(zipf_weights(len(self.items), self.skew))
+        return rng.choices(self.items, cum_weights=self._cum_weights)[0]
+
+    def __len__(self):
+        return len(self.items)
+
+
+class ScenarioState:
+    """Общие пулы сущностей и цены активов"""
+
+    def __init__(self, pools, rng):
+        portfolios = pools.get('portfolios', {})
+        cards = pools.get('stock_cards', {})
+        self.portfolios = EntityPool(make_ids(portfolios.get('size', 100), rng), portfolios.get('skew', 0.0))
+
+        card_ids = make_ids(cards.get('size', 20), rng)
+        asset_types = cards.get('asset_types', DEFAULT_ASSET_TYPES)
+        type_values = [int(value) for value in asset_types]
+        type_weights = list(asset_types.values())
+        self.cards = {}
+        for index, card_id in enumerate(card_ids):
+            ticker = TICKERS[index] if index < len(TICKERS) else f"SMA{index:03d}"
+            self.cards[card_id] = {
+                'ticker': ticker,
+                'assetType': rng.choices(type_values, weights=type_weights)[0],
+                'price': round(math.exp(rng.uniform(math.log(10), math.log(5000))), 2),
+            }
+        self.stock_cards = EntityPool(card_ids, cards.get('skew', 0.0))
+
+        self.created = {}
+        for name, config in pools.items():
+            if name in ('portfolios', 'stock_cards'):
+                continue
+            pool = EntityPool([], config.get('skew', 0.0))
+            for _ in range(config.get('initial', 0)):
+                pool.add(self.new_portfolio_asset(rng))
+            self.created[name] = pool
+        # Созданные сущности, подтвержденные брокером (заполняется из потока ввода-вывода)
+        self.acked = deque()
+
+    def new_portfolio_asset(self, rng):
+        card_id = self.stock_cards.choose(rng)
+        return {
+            'id': make_ids(1, rng)[0],
+            'portfolioId': self.portfolios.choose(rng),
+            'stockCardId': card_id,
+            'assetType': self.cards[card_id]['assetType'],
+        }
+
+    def drain_acked(self):
+        while self.acked:
+            pool_name, entity = self.acked.popleft()
+            self.created[pool_name].add(entity)
+
+
+def event_transaction(state, stream, rng, moment):
+    """TransactionMessage для portfolio.transactions"""
+    params = stream.get('params', {})
+    if stream.get('requires'):
+        asset = state.created[stream['requires']].choose(rng)
+        if asset is None:
+            return None, None
+    else:
+        card_id = state.stock_cards.choose(rng)
+        asset = {'portfolioId': state.portfolios.choose(rng), 'stockCardId': card_id,
+                 'assetType': state.cards[card_id]['assetType']}
+    price = state.cards[asset['stockCardId']]['price']
+    quantity = rng.randint(1, params.get('max_quantity', 100))
+    message = {
+        "id": make_ids(1, rng)[0],
+        "portfolioId": asset['portfolioId'],
+        "stockCardId": asset['stockCardId'],
+        "assetType": asset['assetType'],
+        "transactionType": 2 if rng.random() < params.get('sell_share', 0.4) else 1,
+        "quantity": quantity,
+        "pricePerUnit": price,
+        "totalAmount": round(quantity * price, 2),
+        "transactionTime": moment.isoformat(),
+        "currency": params.get('currency', 'RUB'),
+        "metadata": None
+    }
+    return message, None
+
+
+def event_portfolio_asset_created(state, stream, rng, moment):
+    """Создание актива портфеля (как POST /api/v1/portfolio-assets в PortfolioService)"""
+    params = stream.get('params', {})
+    asset = state.new_portfolio_asset(rng)
+    message = dict(asset)
+    message.update({
+        "purchasePricePerUnit": state.cards[asset['stockCardId']]['price'],
+        "quantity": rng.randint(1, params.get('max_quantity', 100)),
+        "createdAt": moment.isoformat(),
+    })
+    return message, asset
+
+
+def event_price_update(state, stream, rng, moment):
+    """Обновление цены (поля PriceUpdateDto из PriceStreamingService) со случайным блужданием"""
+    params = stream.get('params', {})
+    card_id = state.stock_cards.choose(rng)
+    card = state.cards[card_id]
+    previous = card['price']
+    card['price'] = max(0.01, round(previous * math.exp(rng.gauss(0, params.get('volatility', 0.002))), 2))
+    message = {
+        "stockCardId": card_id,
+        "ticker": card['ticker'],
+        "price": card['price'],
+        "change": round(card['price'] - previous, 2),
+        "changePercent": round((card['price'] - previous) / previous * 100, 2),
+        "time": moment.isoformat(timespec='milliseconds'),
+        "volume": rng.randint(1, 10000),
+        "numTrades": rng.randint(1, 100),
+    }
+    return message, None
+
+
+EVENTS = {
+    'transaction': (event_transaction, 'portfolioId'),
+    'portfolio_asset_created': (event_portfolio_asset_created, 'portfolioId'),
+    'price_update': (event_price_update, 'stockCardId'),
+}
+
+
+def load_scenario(path):
+    """Прочитать и проверить файл сценария (ValueError с описанием ошибки)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        scenario = json.load(f)
+    streams = scenario.get('streams')
+    if not streams:
+        raise ValueError("в сценарии нет потоков (streams)")
+    pools = scenario.setdefault('pools', {})
+    created = {stream['creates'] for stream in streams if stream.get('creates')}
+    names = set()
+    for stream in streams:
+        name = stream.get('name') or stream.get('event')
+        stream['name'] = name
+        if name in names:
+            raise ValueError(f"повторяется имя потока: {name}")
+        names.add(name)
+        if stream.get('event') not in EVENTS:
+            raise ValueError(f"поток {name}: неизвестное событие {stream.get('event')} "
+                             f"(доступны: {', '.join(EVENTS)})")
+        if not stream.get('topic'):
+            raise ValueError(f"поток {name}: не задан topic")
+        if not stream.get('rate', 0) > 0:
+            raise ValueError(f"поток {name}: rate должен быть больше 0")
+        if stream.setdefault('arrival', 'poisson') not in ARRIVALS:
+            raise ValueError(f"поток {name}: arrival должен быть {' или '.join(ARRIVALS)}")
+        if stream.get('creates') and stream['event'] != 'portfolio_asset_created':
+            raise ValueError(f"поток {name}: creates поддерживается только для portfolio_asset_created")
+        requires = stream.get('requires')
+        if requires and requires not in created and not pools.get(requires, {}).get('initial'):
+            raise ValueError(f"поток {name}: пул {requires} никто не создает и он пуст (initial)")
+        stream.setdefault('key', EVENTS[stream['event']][1])
+    for pool_name in created | {stream['requires'] for stream in streams if stream.get('requires')}:
+        pools.setdefault(pool_name, {})
+    return scenario
+
+
+class StreamStats:
+    """Счетчики и задержки одного потока"""
+
+    def __init__(self):
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.skipped = 0
+        self.ack_latency = LatencyHistogram()
+
+    def summary(self, elapsed, commit_histogram=None):
+        result = {
+            'sent': self.sent,
+            'acked': self.acked,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'rate': self.acked / elapsed if elapsed > 0 else 0.0,
+            'ack_latency_ms': {f'p{p}': self.ack_latency.percentile(p) for p in PERCENTILES}
+            if self.ack_latency.count else None,
+            'commit_latency_ms': None,
+        }
+        if commit_histogram is not None and commit_histogram.count:
+            result['commit_latency_ms'] = {f'p{p}': commit_histogram.percentile(p) for p in PERCENTILES}
+        return result
+
+
+class KafkaSink:
+    """Отправка событий в Kafka одним асинхронным продюсером"""
+
+    live = True
+
+    def __init__(self, bootstrap_servers):
+        try:
+            from kafka import KafkaProducer
+        except ImportError:
+            print("Ошибка: библиотека kafka-python не установлена!")
+            print("Установите: pip install kafka-python")
+            sys.exit(1)
+        with stage('connect'):
+            self.producer = KafkaProducer(
+                bootstrap_servers=bootstrap_servers,
+                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                key_serializer=lambda k: k.encode('utf-8') if k else None,
+                linger_ms=5,
+            )
+
+    def send(self, topic, key, value, on_ack, on_error):
+        with stage('send'):
+            future = self.producer.send(topic, key=key, value=value)
+        future.add_callback(on_ack)
+        future.add_errback(on_error)
+
+    def close(self):
+        with stage('flush'):
+            self.producer.flush()
+        self.producer.close()
+
+
+class FileSink:
+    """Запись событий в JSONL вместо Kafka (виртуальное время, без ожидания)"""
+
+    live = False
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.clock = 0.0
+
+    def send(self, topic, key, value, on_ack, on_error):
+        self.file.write(json.dumps({'t': round(self.clock, 6), 'topic': topic, 'key': key, 'value': value},
+                                   ensure_ascii=False) + '\n')
+        on_ack(None)
+
+    def close(self):
+        self.file.close()
+
+
+def interarrival(stream, rate, rng):
+    return rng.expovariate(rate) if stream['arrival'] == 'poisson' else 1.0 / rate
+
+
+def start_tracking(track, bootstrap_servers):
+    """Трекеры задержки до коммита и фоновые опросы для топиков из "track" """
+    from kafka_lag_monitor import KafkaOffsetsSource
+    from commit_latency import CommitLatencyTracker, monitor_commits
+
+    trackers = {}
+    stop = threading.Event()
+    threads = []
+    sources = []
+    for topic, group in track.items():
+        source = KafkaOffsetsSource(bootstrap_servers, group, topic)
+        tracker = CommitLatencyTracker()
+        thread = threading.Thread(target=monitor_commits, args=(source, tracker, TRACK_POLL_INTERVAL, stop),
+                                  daemon=True)
+        thread.start()
+        trackers[topic] = tracker
+        threads.append(thread)
+        sources.append(source)
+
+    def finish():
+        stop.set()
+        for thread in threads:
+            thread.join()
+        for source in sources:
+            source.close()
+
+    return trackers, finish
+
+
+def run_scenario(scenario, sink, args):
+    """Выполнить сценарий, вернуть отчет"""
+    rng = random.Random(scenario.get('seed', 0))
+    state = ScenarioState(scenario['pools'], rng)
+    streams = scenario['streams']
+    duration = args.duration or scenario.get('duration', DEFAULT_DURATION)
+    stats = {stream['name']: StreamStats() for stream in streams}
+    track = dict(scenario.get('track', {}), **(args.track or {})) if sink.live else {}
+    trackers, finish_tracking = start_tracking(track, args.bootstrap_server) if track else ({}, None)
+
+    heap = []
+    for index, stream in enumerate(streams):
+        rate = stream['rate'] * args.rate_scale
+        heapq.heappush(heap, (stream.get('start', 0) + interarrival(stream, rate, rng), index))
+
+    wall_start = datetime.now(timezone.utc)
+    started = time.monotonic()
+    try:
+        while heap:
+            due, index = heap[0]
+            if due >= duration:
+                break
+            heapq.heappop(heap)
+            stream = streams[index]
+            stream_stats = stats[stream['name']]
+            if sink.live:
+                delay = started + due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                sink.clock = due
+            state.drain_acked()
+
+            with stage(stream['event']):
+                message, created = EVENTS[stream['event']][0](
+                    state, stream, rng, wall_start + timedelta(seconds=due))
+            heapq.heappush(heap, (due + interarrival(stream, stream['rate'] * args.rate_scale, rng), index))
+            if message is None:
+                stream_stats.skipped += 1
+                continue
+
+            intended = started + due
+            tracker = trackers.get(stream['topic'])
+            if tracker is not None:
+                tracker.expect(1)
+
+            def on_ack(metadata, stream_stats=stream_stats, intended=intended, created=created,
+                       pool=stream.get('creates'), tracker=tracker, name=stream['name']):
+                stream_stats.acked += 1
+                if sink.live:
+                    stream_stats.ack_latency.record((time.monotonic() - intended) * 1000)
+                if pool and created is not None:
+                    state.acked.append((pool, created))
+                if tracker is not None and metadata is not None:
+                    tracker.add(metadata.partition, metadata.offset, intended, name)
+
+            def on_error(_exception, stream_stats=stream_stats, tracker=tracker):
+                stream_stats.errors += 1
+                if tracker is not None:
+                    tracker.expect(-1)
+
+            sink.send(stream['topic'], message.get(stream['key']), message, on_ack, on_error)
+            stream_stats.sent += 1
+    except KeyboardInterrupt:
+        print("\nПрерывание: отчет по отправленным событиям")
+    finally:
+        sink.close()
+        elapsed = time.monotonic() - started if sink.live else duration
+        if trackers:
+            deadline = time.monotonic() + args.drain_timeout
+            while time.monotonic() < deadline and not all(t.done() for t in trackers.values()):
+                time.sleep(TRACK_POLL_INTERVAL)
+            finish_tracking()
+
+    return build_report(scenario, streams, stats, trackers, elapsed, args.rate_scale)
+
+
+def build_report(scenario, streams, stats, trackers, elapsed, rate_scale=1.0):
+    report = {'scenario': scenario.get('name'), 'elapsed': elapsed, 'streams': {}, 'topics': {}}
+    for stream in streams:
+        tracker = trackers.get(stream['topic'])
+        histogram = tracker.histograms.get(stream['name']) if tracker else None
+        summary = stats[stream['name']].summary(elapsed, histogram)
+        summary.update({'event': stream['event'], 'topic': stream['topic'], 'target_rate': stream['rate'] * rate_scale})
+        report['streams'][stream['name']] = summary
+
+    total_ack = LatencyHistogram()
+    for stream in streams:
+        topic = report['topics'].setdefault(stream['topic'], {'sent': 0, 'acked': 0, 'errors': 0})
+        summary = report['streams'][stream['name']]
+        for field in ('sent', 'acked', 'errors'):
+            topic[field] += summary[field]
+        total_ack.merge(stats[stream['name']].ack_latency)
+    for topic in report['topics'].values():
+        topic['rate'] = topic['acked'] / elapsed if elapsed > 0 else 0.0
+    acked = sum(summary['acked'] for summary in report['streams'].values())
+    report['total'] = {
+        'sent': sum(summary['sent'] for summary in report['streams'].values()),
+        'acked': acked,
+        'errors': sum(summary['errors'] for summary in report['streams'].values()),
+        'rate': acked / elapsed if elapsed > 0 else 0.0,
+        'ack_latency_ms': {f'p{p}': total_ack.percentile(p) for p in PERCENTILES} if total_ack.count else None,
+    }
+    for topic, tracker in trackers.items():
+        report['topics'][topic]['uncommitted'] = max(0, tracker.outstanding)
+    return report
+
+
+def format_latency(latency):
+    if not latency:
+        return '-'
+    return '/'.join(f"{latency[f'p{p}']:.0f}" for p in (50, 95, 99))
+
+
+def print_report(report):
+    print()
+    print("=" * 100)
+    print(f"Сценарий: {report['scenario']}, длительность: {report['elapsed']:.1f} с")
+    print("=" * 100)
+    print(f"  {'поток':<18} {'топик':<24} {'цель/с':>7} {'факт/с':>7} {'отпр.':>8} {'ошибок':>7} "
+          f"{'пропуск':>7}  {'ack p50/95/99':>14}  {'коммит p50/95/99':>16}")
+    for name, summary in report['streams'].items():
+        print(f"  {name:<18} {summary['topic']:<24} {summary['target_rate']:>7.0f} {summary['rate']:>7.1f} "
+              f"{summary['sent']:>8} {summary['errors']:>7} {summary['skipped']:>7}  "
+              f"{format_latency(summary['ack_latency_ms']):>14}  {format_latency(summary['commit_latency_ms']):>16}")
+    print("-" * 100)
+    for topic, summary in report['topics'].items():
+        line = f"  {topic:<43} {summary['rate']:>15.1f} {summary['sent']:>8} {summary['errors']:>7}"
+        if summary.get('uncommitted'):
+            line += f"  не закоммичено: {summary['uncommitted']}"
+        print(line)
+    total = report['total']
+    print(f"  {'ВСЕГО':<43} {total['rate']:>15.1f} {total['sent']:>8} {total['errors']:>7}  "
+          f"{'':>7}  {format_latency(total['ack_latency_ms']):>14}")
+    print("=" * 100)
+    print("Задержки в мс от запланированного момента отправки")
+
+
+def parse_track(text):
+    topic, _, group = text.partition('=')
+    if not topic or not group:
+        raise argparse.ArgumentTypeError("ожидается ТОПИК=CONSUMER_GROUP")
+    return topic, group
+
+
+def run(args):
+    try:
+        scenario = load_scenario(args.scenario)
+    except (OSError, ValueError) as e:
+        print(f"❌ Ошибка сценария {args.scenario}: {e}")
+        return 1
+    args.track = dict(args.track or [])
+
+    sink = FileSink(args.output) if args.output else KafkaSink(args.bootstrap_server)
+    streams = ', '.join(f"{s['name']} ({s['rate'] * args.rate_scale:g}/с -> {s['topic']})"
+                        for s in scenario['streams'])
+    print(f"Сценарий {scenario.get('name', args.scenario)}: {streams}")
+    report = run_scenario(scenario, sink, args)
+    print_report(report)
+    if args.output:
+        print(f"События записаны: {args.output}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчет сохранен: {args.report}")
+    return 0 if report['total']['errors'] == 0 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Смешанная нагрузка по сценарию: несколько потоков событий в топики Kafka'
+    )
+    parser.add_argument('scenario', help='Файл сценария (JSON), например scripts/scenarios/mixed_portfolio_activity.json')
+    parser.add_argument('--bootstrap-server', default=DEFAULT_BOOTSTRAP,
+                        help=f'Адрес Kafka брокера (по умолчанию: {DEFAULT_BOOTSTRAP})')
+    parser.add_argument('--duration', type=float, help='Длительность в секундах (по умолчанию: из сценария)')
+    parser.add_argument('--rate-scale', type=float, default=1.0,
+                        help='Множитель скоростей всех потоков (по умолчанию: 1)')
+    parser.add_argument('--track', type=parse_track, action='append', metavar='ТОПИК=GROUP',
+                        help='Измерять задержку до коммита группой (дополняет "track" сценария)')
+    parser.add_argument('--drain-timeout', type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                        help=f'Ожидание коммитов после сценария в секундах (по умолчанию: {DEFAULT_DRAIN_TIMEOUT})')
+    parser.add_argument('--output', metavar='FILE', help='Записать события в JSONL вместо отправки в Kafka')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить отчет в JSON')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    return run_profiled(args, run, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
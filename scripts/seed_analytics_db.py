@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Массовое наполнение analytics-db транзакциями в обход Kafka
+
+Генерирует транзакции той же моделью, что reference_aggregation.py
+(портфели, активы, базовые цены, окно --days), и загружает их прямо в
+asset_transactions через COPY ... FROM STDIN (FORMAT binary) параллельными
+порциями: каждый процесс (--workers) генерирует порцию в колонках NumPy,
+кодирует ее в бинарный формат COPY целиком (структурный массив с полями
+PostgreSQL, без построчного цикла) и загружает своей транзакцией.
+
+По загруженным транзакциям считаются рейтинги asset_ratings за окно
+генерации, как их считает AssetRatingAggregationService: Global по активу и
+Portfolio по портфелю и активу, с рангами по количеству и сумме транзакций.
+Рейтинги загружаются тем же бинарным COPY; рейтинги с тем же периодом
+предварительно удаляются.
+
+С --rebuild-indexes индексы и первичный ключ asset_transactions удаляются
+перед загрузкой и создаются заново после нее (параллельно, по соединению на
+индекс) - для десятков миллионов строк это быстрее обновления индексов при
+вставке. Определения индексов сохраняются в --index-backup и
+восстанавливаются даже при ошибке загрузки.
+
+Использование:
+    python scripts/seed_analytics_db.py --count 50000000 --truncate --rebuild-indexes
+    python scripts/seed_analytics_db.py --count 1000000 --portfolios 5000 --assets 500 --workers 4
+    python scripts/seed_analytics_db.py --dsn "host=localhost dbname=analytics-db user=postgres" --skip-ratings
+
+Порции детерминированы (--seed и номер порции) и не зависят от --workers.
+
+Требует: numpy, psycopg2
+"""
+
+import io
+import os
+import sys
+import time
+import uuid
+import argparse
+from datetime import datetime, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from reference_aggregation import (import_numpy, generate_model, generate_rows, group_sums, format_time,
+                                   CONTEXT_GLOBAL, CONTEXT_PORTFOLIO,
+                                   DEFAULT_PORTFOLIOS, DEFAULT_ASSETS, DEFAULT_DAYS)
+from kafka_common import DEFAULT_DB_DSN, import_psycopg2
+
+# numpy и psycopg2 импортируются при запуске загрузки
+
+DEFAULT_COUNT = 50_000_000
+DEFAULT_CHUNK_SIZE = 250_000
+DEFAULT_WORKERS = min(os.cpu_count() or 1, 8)
+DEFAULT_MAINTENANCE_WORK_MEM = '1GB'
+DEFAULT_INDEX_BACKUP = 'seed_indexes_backup.sql'
+TRANSACTIONS_TABLE = 'asset_transactions'
+RATINGS_TABLE = 'asset_ratings'
+# Частичные суммы рейтингов по портфелям сливаются, когда их накопится столько
+MERGE_PARTS = 8
+INT4_MAX = 2 ** 31 - 1
+# Номер потока генератора для идентификаторов рейтингов (не пересекается с номерами порций)
+RATINGS_STREAM = 2 ** 32 - 1
+
+# Бинарный формат COPY: сигнатура, флаги, длина расширения заголовка; в конце -1
+COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + bytes(8)
+COPY_TRAILER = b'\xff\xff'
+# Начало отсчета timestamp в PostgreSQL (2000-01-01 UTC) в секундах Unix
+PG_EPOCH = 946684800
+# numeric(18,2) в бинарном виде фиксированной длины: 5 цифр по основанию 10000,
+# вес 3 (до 10^16 в целой части), dscale 2; ведущие нули PostgreSQL отбрасывает сам
+NUMERIC_DIGITS = 5
+NUMERIC_WEIGHT = 3
+NUMERIC_NEGATIVE = 0x4000
+# Размер значения по типу колонки (None - всегда NULL)
+COLUMN_SIZES = {'uuid': 16, 'int4': 4, 'numeric': 8 + 2 * NUMERIC_DIGITS, 'timestamptz': 8, 'null': None}
+
+TRANSACTION_COLUMNS = [
+    ('id', 'uuid'), ('portfolio_id', 'uuid'), ('stock_card_id', 'uuid'), ('asset_type', 'int4'),
+    ('transaction_type', 'int4'), ('quantity', 'int4'), ('price_per_unit', 'numeric'),
+    ('total_amount', 'numeric'), ('transaction_time', 'timestamptz'), ('currency', ('text', 3)),
+    ('metadata', 'null'), ('created_at', 'timestamptz'), ('updated_at', 'timestamptz'),
+]
+# Тикер и название по умолчанию, как в AssetRatingAggregationService: STK + 17 символов Guid("N")
+TICKER_LENGTH = 20
+NAME_LENGTH = len('Asset ') + 36
+
+
+def rating_columns(portfolio):
+    """Колонки asset_ratings; у Global рейтингов portfolio_id - NULL"""
+    return [
+        ('id', 'uuid'), ('stock_card_id', 'uuid'), ('asset_type', 'int4'), ('ticker', ('text', TICKER_LENGTH)),
+        ('name', ('text', NAME_LENGTH)), ('period_start', 'timestamptz'), ('period_end', 'timestamptz'),
+        ('buy_transaction_count', 'int4'), ('sell_transaction_count', 'int4'), ('total_buy_amount', 'numeric'),
+        ('total_sell_amount', 'numeric'), ('total_buy_quantity', 'int4'), ('total_sell_quantity', 'int4'),
+        ('transaction_count_rank', 'int4'), ('transaction_amount_rank', 'int4'), ('last_updated', 'timestamptz'),
+        ('context', 'int4'), ('portfolio_id', 'uuid' if portfolio else 'null'), ('created_at', 'timestamptz'),
+        ('updated_at', 'timestamptz'),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Бинарный формат COPY
+# ---------------------------------------------------------------------------
+
+def column_size(kind):
+    return kind[1] if isinstance(kind, tuple) else COLUMN_SIZES[kind]
+
+
+def copy_dtype(columns):
+    """
+    Структурный dtype строки бинарного COPY: число полей, затем длина и значение
+    каждой колонки (big-endian, без выравнивания)
+    """
+    np = import_numpy()
+    fields = [('field_count', '>i2')]
+    for name, kind in columns:
+        fields.append((f'{name}_size', '>i4'))
+        if isinstance(kind, tuple):
+            fields.append((name, f'S{kind[1]}'))
+        elif kind == 'uuid':
+            fields.append((name, 'u1', (16,)))
+        elif kind == 'int4':
+            fields.append((name, '>i4'))
+        elif kind == 'numeric':
+            fields.append((name, '>i2', (4 + NUMERIC_DIGITS,)))
+        elif kind == 'timestamptz':
+            fields.append((name, '>i8'))
+    return np.dtype(fields)
+
+
+def encode_copy(columns, values, count):
+    """Данные для COPY ... FROM STDIN (FORMAT binary): заголовок, count строк, завершение"""
+    np = import_numpy()
+    rows = np.empty(count, dtype=copy_dtype(columns))
+    rows['field_count'] = len(columns)
+    for name, kind in columns:
+        size = column_size(kind)
+        rows[f'{name}_size'] = -1 if size is None else size
+        if size is not None:
+            rows[name] = values[name]
+    return COPY_HEADER + rows.tobytes() + COPY_TRAILER
+
+
+def numeric_values(cents):
+    """Суммы в копейках (int64) -> numeric(18,2) в бинарном виде фиксированной длины"""
+    np = import_numpy()
+    cents = np.asarray(cents, dtype=np.int64)
+    result = np.empty((len(cents), 4 + NUMERIC_DIGITS), dtype=np.int64)
+    result[:, 0] = NUMERIC_DIGITS
+    result[:, 1] = NUMERIC_WEIGHT
+    result[:, 2] = np.where(cents < 0, NUMERIC_NEGATIVE, 0)
+    result[:, 3] = 2
+    magnitude = np.abs(cents)
+    integer = magnitude // 100
+    for digit in range(NUMERIC_DIGITS - 1):
+        result[:, 4 + digit] = integer // 10000 ** (NUMERIC_WEIGHT - digit) % 10000
+    # Дробная часть - одна цифра по основанию 10000: 0.01 = 100 / 10000
+    result[:, 3 + NUMERIC_DIGITS] = magnitude % 100 * 100
+    return result
+
+
+def to_cents(amounts):
+    np = import_numpy()
+    return np.rint(np.asarray(amounts) * 100).astype(np.int64)
+
+
+def timestamp_values(seconds):
+    """Секунды Unix -> timestamptz (микросекунды от 2000-01-01 UTC)"""
+    np = import_numpy()
+    return (np.asarray(seconds, dtype=np.int64) - PG_EPOCH) * 1_000_000
+
+
+def uuid_values(ids):
+    """Строки UUID -> массив (n, 16) байт"""
+    np = import_numpy()
+    return np.frombuffer(b''.join(uuid.UUID(value).bytes for value in ids), dtype=np.uint8).reshape(-1, 16)
+
+
+def random_uuids(rng, count):
+    """Случайные UUID v4 (n, 16) из генератора numpy"""
+    np = import_numpy()
+    values = rng.integers(0, 256, (count, 16), dtype=np.uint8)
+    values[:, 6] = (values[:, 6] & 0x0F) | 0x40
+    values[:, 8] = (values[:, 8] & 0x3F) | 0x80
+    return values
+
+
+def copy_rows(cursor, table, columns, payload):
+    names = ', '.join(name for name, _ in columns)
+    cursor.copy_expert(f"COPY {table} ({names}) FROM STDIN (FORMAT binary)", io.BytesIO(payload),
+                       size=8 * 1024 * 1024)
+
+
+# ---------------------------------------------------------------------------
+# Загрузка транзакций (процессы-исполнители)
+# ---------------------------------------------------------------------------
+
+_worker = {}
+
+
+def init_worker(dsn, model_args, loaded_at):
+    """Инициализация процесса: соединение без синхронной фиксации и модель потока"""
+    psycopg2 = import_psycopg2()
+    connection = psycopg2.connect(dsn)
+    with connection.cursor() as cursor:
+        cursor.execute("SET synchronous_commit TO off")
+    connection.commit()
+    model, _ = generate_model(*model_args)
+    _worker.update({
+        'connection': connection,
+        'model': model,
+        'portfolio_bytes': uuid_values(model['portfolio_ids']),
+        'stock_card_bytes': uuid_values(model['stock_card_ids']),
+        'loaded_at': timestamp_values([loaded_at])[0],
+        'seed': model_args[-1],
+    })
+
+
+def transaction_values(columns, rng, state):
+    count = len(columns['time'])
+    loaded_at = state['loaded_at']
+    return {
+        'id': random_uuids(rng, count),
+        'portfolio_id': state['portfolio_bytes'][columns['portfolio']],
+        'stock_card_id': state['stock_card_bytes'][columns['asset']],
+        'asset_type': columns['asset_type'],
+        'transaction_type': columns['transaction_type'],
+        'quantity': columns['quantity'].astype('int32'),
+        'price_per_unit': numeric_values(to_cents(columns['price'])),
+        'total_amount': numeric_values(to_cents(columns['total_amount'])),
+        'transaction_time': timestamp_values(columns['time']),
+        'currency': b'RUB',
+        'created_at': loaded_at,
+        'updated_at': loaded_at,
+    }
+
+
+def load_chunk(task):
+    """
+    Сгенерировать, закодировать и загрузить порцию одной транзакцией
+
+    Returns:
+        (номер, строк, байт, секунд, суммы Global по активу, суммы Portfolio по портфелю и активу)
+    """
+    np = import_numpy()
+    index, count = task
+    state = _worker
+    started = time.perf_counter()
+    # Генератор порции зависит только от seed и номера порции
+    rng = np.random.default_rng([state['seed'], index])
+    columns = generate_rows(state['model'], count, rng)
+    payload = encode_copy(TRANSACTION_COLUMNS, transaction_values(columns, rng, state), count)
+
+    connection = state['connection']
+    try:
+        with connection.cursor() as cursor:
+            copy_rows(cursor, TRANSACTIONS_TABLE, TRANSACTION_COLUMNS, payload)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    assets = len(state['model']['stock_card_ids'])
+    asset = columns['asset'].astype(np.int64)
+    global_sums = group_sums(asset, columns)
+    portfolio_sums = group_sums(columns['portfolio'].astype(np.int64) * assets + asset, columns)
+    return index, count, len(payload), time.perf_counter() - started, global_sums, portfolio_sums
+
+
+SUM_FIELDS = ['buy_count', 'sell_count', 'buy_amount', 'sell_amount', 'buy_quantity', 'sell_quantity']
+
+
+def merge_sums(parts):
+    """Слить частичные суммы групп (ключи могут повторяться между частями)"""
+    np = import_numpy()
+    if len(parts) == 1:
+        return parts[0]
+    keys = np.concatenate([part['key'] for part in parts])
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    merged = {'key': unique_keys}
+    for name in SUM_FIELDS:
+        merged[name] = np.bincount(inverse, weights=np.concatenate([part[name] for part in parts]),
+                                   minlength=len(unique_keys))
+    return merged
+
+
+def chunk_tasks(count, chunk_size):
+    return [(index, min(chunk_size, count - start)) for index, start in enumerate(range(0, count, chunk_size))]
+
+
+def load_transactions(args, model_args, loaded_at):
+    """
+    Загрузить транзакции порциями в --workers процессах
+
+    Returns:
+        (строк, байт, секунд, суммы Global, суммы Portfolio)
+    """
+    import multiprocessing
+
+    tasks = chunk_tasks(args.count, args.chunk_size)
+    global_parts = []
+    portfolio_parts = []
+    loaded_rows = 0
+    loaded_bytes = 0
+    started = time.perf_counter()
+    with multiprocessing.Pool(args.workers, initializer=init_worker,
+                              initargs=(args.dsn, model_args, loaded_at)) as pool:
+        for index, rows, size, seconds, global_sums, portfolio_sums in pool.imap_unordered(load_chunk, tasks):
+            loaded_rows += rows
+            loaded_bytes += size
+            if not args.skip_ratings:
+                global_parts = [merge_sums(global_parts + [global_sums])]
+                portfolio_parts.append(portfolio_sums)
+                if len(portfolio_parts) >= MERGE_PARTS:
+                    portfolio_parts = [merge_sums(portfolio_parts)]
+            elapsed = time.perf_counter() - started
+            print(f"  порция {index + 1}/{len(tasks)}: {rows} строк за {seconds:.1f} с; всего {loaded_rows} "
+                  f"({loaded_rows / elapsed:,.0f} строк/с, {loaded_bytes / elapsed / 1e6:.1f} МБ/с)")
+    elapsed = time.perf_counter() - started
+    if args.skip_ratings:
+        return loaded_rows, loaded_bytes, elapsed, None, None
+    return loaded_rows, loaded_bytes, elapsed, merge_sums(global_parts), merge_sums(portfolio_parts)
+
+
+# ---------------------------------------------------------------------------
+# Рейтинги
+# ---------------------------------------------------------------------------
+
+def group_ranks(group, value, tie_breaker):
+    """
+    Ранги внутри групп: по убыванию value, при равенстве - по StockCardId
+    (порядок Guid в .NET совпадает с порядком строкового представления)
+    """
+    np = import_numpy()
+    order = np.lexsort((tie_breaker, -value, group))
+    sorted_group = group[order]
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = sorted_group[1:] != sorted_group[:-1]
+    positions = np.arange(len(order))
+    group_start = np.maximum.accumulate(np.where(starts, positions, 0))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = positions - group_start + 1
+    return ranks
+
+
+def rating_values(sums, asset, portfolio, model, rng, period, loaded_at):
+    """Значения колонок asset_ratings для сумм по активу (и портфелю)"""
+    np = import_numpy()
+    count = len(asset)
+    stock_card_ids = model['stock_card_ids']
+    tie_breaker = np.empty(len(stock_card_ids), dtype=np.int64)
+    tie_breaker[sorted(range(len(stock_card_ids)), key=stock_card_ids.__getitem__)] = np.arange(len(stock_card_ids))
+    tickers = np.array([f"STK{uuid.UUID(value).hex[:17]}".encode('ascii') for value in stock_card_ids])
+    names = np.array([f"Asset {value}".encode('ascii') for value in stock_card_ids])
+
+    quantities = {name: np.rint(sums[name]).astype(np.int64) for name in ('buy_quantity', 'sell_quantity')}
+    if any(values.max(initial=0) > INT4_MAX for values in quantities.values()):
+        raise ValueError("Суммарное количество по активу не помещается в integer рейтинга: "
+                         "увеличьте --assets или уменьшите --count")
+    buy_cents, sell_cents = to_cents(sums['buy_amount']), to_cents(sums['sell_amount'])
+    buy_count = np.rint(sums['buy_count']).astype(np.int64)
+    sell_count = np.rint(sums['sell_count']).astype(np.int64)
+    group = portfolio if portfolio is not None else np.zeros(count, dtype=np.int64)
+    values = {
+        'id': random_uuids(rng, count),
+        'stock_card_id': uuid_values(stock_card_ids)[asset],
+        'asset_type': model['asset_types'][asset],
+        'ticker': tickers[asset],
+        'name': names[asset],
+        'period_start': timestamp_values([period[0]])[0],
+        'period_end': timestamp_values([period[1]])[0],
+        'buy_transaction_count': buy_count,
+        'sell_transaction_count': sell_count,
+        'total_buy_amount': numeric_values(buy_cents),
+        'total_sell_amount': numeric_values(sell_cents),
+        'total_buy_quantity': quantities['buy_quantity'],
+        'total_sell_quantity': quantities['sell_quantity'],
+        'transaction_count_rank': group_ranks(group, buy_count + sell_count, tie_breaker[asset]),
+        'transaction_amount_rank': group_ranks(group, buy_cents + sell_cents, tie_breaker[asset]),
+        'last_updated': loaded_at,
+        'context': CONTEXT_PORTFOLIO if portfolio is not None else CONTEXT_GLOBAL,
+        'created_at': loaded_at,
+        'updated_at': loaded_at,
+    }
+    if portfolio is not None:
+        values['portfolio_id'] = uuid_values(model['portfolio_ids'])[portfolio]
+    return values
+
+
+def load_ratings(connection, model, global_sums, portfolio_sums, seed, loaded_at):
+    """Заменить рейтинги периода генерации: Global и Portfolio одной транзакцией"""
+    np = import_numpy()
+    rng = np.random.default_rng([seed, RATINGS_STREAM])
+    period = (model['start_time'], model['end_time'])
+    loaded_at = timestamp_values([loaded_at])[0]
+    assets = len(model['stock_card_ids'])
+    portfolio, asset = np.divmod(portfolio_sums['key'], assets)
+
+    with stage('encode ratings'):
+        global_payload = encode_copy(
+            rating_columns(False),
+            rating_values(global_sums, global_sums['key'], None, model, rng, period, loaded_at),
+            len(global_sums['key']))
+        portfolio_payload = encode_copy(
+            rating_columns(True),
+            rating_values(portfolio_sums, asset, portfolio, model, rng, period, loaded_at),
+            len(asset))
+
+    with stage('copy ratings'), connection.cursor() as cursor:
+        start, end = (datetime.fromtimestamp(value, timezone.utc) for value in period)
+        cursor.execute(f"DELETE FROM {RATINGS_TABLE} WHERE period_start = %s AND period_end = %s", (start, end))
+        deleted = cursor.rowcount
+        copy_rows(cursor, RATINGS_TABLE, rating_columns(False), global_payload)
+        copy_rows(cursor, RATINGS_TABLE, rating_columns(True), portfolio_payload)
+    connection.commit()
+    return len(global_sums['key']), len(asset), deleted
+
+
+# ---------------------------------------------------------------------------
+# Индексы
+# ---------------------------------------------------------------------------
+
+def table_indexes(connection, table):
+    """Индексы таблицы и ограничения на них: [{name, create, drop, constraint}]"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT i.relname, pg_get_indexdef(i.oid), c.conname, pg_get_constraintdef(c.oid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            LEFT JOIN pg_constraint c ON c.conindid = x.indexrelid AND c.conrelid = x.indrelid
+            WHERE x.indrelid = %s::regclass
+            ORDER BY c.conname IS NULL, i.relname
+        """, (table,))
+        rows = cursor.fetchall()
+    indexes = []
+    for name, index_definition, constraint, constraint_definition in rows:
+        if constraint:
+            indexes.append({
+                'name': constraint, 'constraint': True,
+                'create': f'ALTER TABLE {table} ADD CONSTRAINT "{constraint}" {constraint_definition}',
+                'drop': f'ALTER TABLE {table} DROP CONSTRAINT "{constraint}"',
+            })
+        else:
+            indexes.append({'name': name, 'constraint': False, 'create': index_definition,
+                            'drop': f'DROP INDEX "{name}"'})
+    return indexes
+
+
+def drop_indexes(connection, table, backup_path):
+    """Сохранить определения индексов в файл и удалить индексы (и первичный ключ)"""
+    indexes = table_indexes(connection, table)
+    with open(backup_path, 'w', encoding='utf-8') as f:
+        f.write(f"-- Индексы {table}, удаленные seed_analytics_db.py перед загрузкой\n")
+        for index in indexes:
+            f.write(index['create'] + ';\n')
+    with connection.cursor() as cursor:
+        for index in indexes:
+            cursor.execute(index['drop'])
+    connection.commit()
+    return indexes
+
+
+def create_index(dsn, statement, maintenance_work_mem):
+    psycopg2 = import_psycopg2()
+    started = time.perf_counter()
+    connection = psycopg2.connect(dsn)
+    try:
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute("SET maintenance_work_mem TO %s", (maintenance_work_mem,))
+            cursor.execute(statement)
+    finally:
+        connection.close()
+    return time.perf_counter() - started
+
+
+def rebuild_indexes(args, indexes):
+    """
+    Создать индексы заново: сначала ограничения (ALTER TABLE блокирует таблицу
+    целиком), затем обычные индексы параллельно по соединению на индекс
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    for index in indexes:
+        if index['constraint']:
+            seconds = create_index(args.dsn, index['create'], args.maintenance_work_mem)
+            print(f"  ✓ {index['name']}: {seconds:.1f} с")
+    plain = [index for index in indexes if not index['constraint']]
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [(index, executor.submit(create_index, args.dsn, index['create'], args.maintenance_work_mem))
+                   for index in plain]
+        for index, future in futures:
+            print(f"  ✓ {index['name']}: {future.result():.1f} с")
+
+
+# ---------------------------------------------------------------------------
+# Запуск
+# ---------------------------------------------------------------------------
+
+def run(args):
+    psycopg2 = import_psycopg2()
+    import_numpy()
+
+    end_time = int(datetime.fromisoformat(args.end.replace('Z', '+00:00')).timestamp()) if args.end else None
+    model, _ = generate_model(args.portfolios, args.assets, args.days, end_time, args.seed)
+    # Процессы строят модель заново: окно фиксируется здесь, чтобы не зависеть от времени их запуска
+    model_args = (args.portfolios, args.assets, args.days, model['end_time'], args.seed)
+    loaded_at = time.time()
+
+    print("=" * 60)
+    print("Наполнение analytics-db транзакциями (binary COPY)")
+    print("=" * 60)
+    print(f"Транзакций: {args.count:,}, портфелей: {args.portfolios}, активов: {args.assets}, "
+          f"окно: {format_time(model['start_time'])} - {format_time(model['end_time'])}")
+    print(f"Процессов: {args.workers}, порция: {args.chunk_size:,} строк, seed: {args.seed}")
+
+    if not args.truncate and not args.skip_ratings:
+        print("⚠ Без --truncate рейтинги периода считаются только по транзакциям этого запуска")
+
+    connection = psycopg2.connect(args.dsn)
+    dropped = None
+    try:
+        if args.truncate:
+            with stage('truncate'), connection.cursor() as cursor:
+                tables = [TRANSACTIONS_TABLE] + ([] if args.skip_ratings else [RATINGS_TABLE])
+                cursor.execute(f"TRUNCATE {', '.join(tables)}")
+            connection.commit()
+            print(f"Очищено: {', '.join(tables)}")
+        if args.rebuild_indexes:
+            with stage('drop indexes'):
+                dropped = drop_indexes(connection, TRANSACTIONS_TABLE, args.index_backup)
+            print(f"Удалено индексов: {len(dropped)} (определения: {args.index_backup})")
+
+        print()
+        with stage('load transactions'):
+            rows, size, seconds, global_sums, portfolio_sums = load_transactions(args, model_args, loaded_at)
+        print(f"\nЗагружено транзакций: {rows:,} за {seconds:.1f} с ({rows / seconds:,.0f} строк/с, "
+              f"{size / 1e9:.2f} ГБ)")
+    finally:
+        if dropped:
+            print("\nСоздание индексов:")
+            started = time.perf_counter()
+            with stage('rebuild indexes'):
+                rebuild_indexes(args, dropped)
+            print(f"Индексы созданы за {time.perf_counter() - started:.1f} с")
+
+    if not args.skip_ratings:
+        global_count, portfolio_count, deleted = load_ratings(
+            connection, model, global_sums, portfolio_sums, args.seed, loaded_at)
+        print(f"\nРейтинги за период: Global {global_count}, Portfolio {portfolio_count}"
+              + (f" (заменено {deleted})" if deleted else ''))
+        print(f"  Запросы API с этим периодом: startDate={format_time(model['start_time'])} "
+              f"endDate={format_time(model['end_time'])}")
+
+    with stage('analyze'):
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {TRANSACTIONS_TABLE}")
+            if not args.skip_ratings:
+                cursor.execute(f"ANALYZE {RATINGS_TABLE}")
+    connection.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Массовое наполнение asset_transactions и asset_ratings через binary COPY'
+    )
+    parser.add_argument('--dsn', default=DEFAULT_DB_DSN,
+                        help='Строка подключения к analytics-db (по умолчанию: ANALYTICS_DB_DSN или localhost)')
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT,
+                        help=f'Количество транзакций (по умолчанию: {DEFAULT_COUNT:,})')
+    parser.add_argument('--portfolios', type=int, default=DEFAULT_PORTFOLIOS,
+                        help=f'Количество портфелей (по умолчанию: {DEFAULT_PORTFOLIOS})')
+    parser.add_argument('--assets', type=int, default=DEFAULT_ASSETS,
+                        help=f'Количество активов (по умолчанию: {DEFAULT_ASSETS})')
+    parser.add_argument('--days', type=int, default=DEFAULT_DAYS,
+                        help=f'Окно времени транзакций в днях (по умолчанию: {DEFAULT_DAYS})')
+    parser.add_argument('--end', help='Конец окна, ISO 8601 (по умолчанию: начало текущих суток UTC)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed модели и порций (по умолчанию: 0)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Процессов загрузки (по умолчанию: {DEFAULT_WORKERS})')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'Строк в порции, одна транзакция БД на порцию (по умолчанию: {DEFAULT_CHUNK_SIZE:,})')
+    parser.add_argument('--truncate', action='store_true', help='Очистить таблицы перед загрузкой')
+    parser.add_argument('--rebuild-indexes', action='store_true',
+                        help='Удалить индексы asset_transactions на время загрузки и создать заново')
+    parser.add_argument('--index-backup', default=DEFAULT_INDEX_BACKUP,
+                        help=f'Файл с определениями удаленных индексов (по умолчанию: {DEFAULT_INDEX_BACKUP})')
+    parser.add_argument('--maintenance-work-mem', default=DEFAULT_MAINTENANCE_WORK_MEM,
+                        help=f'maintenance_work_mem при создании индексов (по умолчанию: {DEFAULT_MAINTENANCE_WORK_MEM})')
+    parser.add_argument('--skip-ratings', action='store_true', help='Не считать и не загружать asset_ratings')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.count <= 0 or args.chunk_size <= 0 or args.workers <= 0:
+        print("Ошибка: --count, --chunk-size и --workers должны быть положительными")
+        return 1
+    try:
+        return run_profiled(args, run, args)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
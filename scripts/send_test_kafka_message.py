@@ -8,21 +8,78 @@
 
 Или с параметрами:
     python scripts/send_test_kafka_message.py --bootstrap-server localhost:9092 --topic portfolio.transactions
+
+Повторная отправка заранее записанного потока (JSONL, одно сообщение на строку),
+например, от scripts/reference_aggregation.py --write-stream:
+    python scripts/send_test_kafka_message.py --replay stream.jsonl
+
+Долгая отправка с контрольными точками: состояние сохраняется в --checkpoint
+каждые --checkpoint-interval секунд и при остановке, --resume продолжает с
+места остановки без повторной отправки подтвержденных сообщений:
+    python scripts/send_test_kafka_message.py --replay stream.jsonl --checkpoint replay.ckpt
+    python scripts/send_test_kafka_message.py --replay stream.jsonl --checkpoint replay.ckpt --resume
+    python scripts/send_test_kafka_message.py --count 10000000 --checkpoint gen.ckpt [--resume]
+
+Нагрузка с нескольких машин: каждая отправляет свой шард общего потока (см.
+load_shards.py), старт синхронизируется барьером, отчеты узлов сливаются:
+    python scripts/send_test_kafka_message.py --count 3000000 --seed 7 --rate 30000 --shard 0/3 \
+        --rendezvous node0:7070 --report node0.json
+    python scripts/send_test_kafka_message.py --merge-reports node0.json node1.json node2.json
+
+Трассировка: выбранные отправки получают спан и заголовок W3C traceparent,
+спаны пишутся в OTLP/JSON файл или коллектор (см. trace_context.py), разбивка
+задержки по стадиям - scripts/trace_breakdown.py:
+    python scripts/send_test_kafka_message.py --count 100000 --rate 2000 --trace-export spans.jsonl \
+        --trace-sample 0.01
+
+Значения в Avro по локальной схеме (только в отдельный топик: AnalyticsService
+читает JSON), сравнение с JSON - scripts/wire_format_benchmark.py:
+    python scripts/send_test_kafka_message.py --count 1000 --format avro --topic portfolio.transactions.avro
+
+Подбор batch.size, linger.ms, сжатия и acks продюсера на той же нагрузке -
+scripts/producer_sweep.py.
 """
 
+import os
+import sys
 import json
+import time
 import uuid
+import random
+import signal
 import argparse
+import threading
+from collections import deque
 from datetime import datetime, timezone
-from kafka import KafkaProducer
-from kafka.errors import KafkaError
 
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from kafka_common import DEFAULT_TOPIC, LatencyHistogram, PERCENTILES
+from load_shards import (parse_shard, shard_range, owns_key, barrier_start, rendezvous_start, node_report,
+                         merge_reports, DEFAULT_START_DELAY)
+from trace_context import Tracer, make_exporter
+from transaction_codec import make_codec, FORMATS
+
+# kafka-python импортируется в send_message(), чтобы --help и генерация
+# сообщений не тратили время на загрузку клиента
+
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_INTERVAL = 10.0
+DEFAULT_MAX_IN_FLIGHT = 10000
+FLUSH_TIMEOUT = 60
+
+
+def create_test_transaction_message(rng=None):
+    """
+    Создает тестовое сообщение о транзакции
 
-def create_test_transaction_message():
-    """Создает тестовое сообщение о транзакции"""
-    transaction_id = str(uuid.uuid4())
-    portfolio_id = str(uuid.uuid4())
-    stock_card_id = str(uuid.uuid4())
+    Args:
+        rng: random.Random для воспроизводимых идентификаторов (по умолчанию uuid4)
+    """
+    if rng is None:
+        transaction_id, portfolio_id, stock_card_id = (str(uuid.uuid4()) for _ in range(3))
+    else:
+        transaction_id, portfolio_id, stock_card_id = (
+            str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(3))
 
     message = {
         "id": transaction_id,
@@ -41,19 +98,44 @@ def create_test_transaction_message():
     return message, portfolio_id
 
 
-def send_message(bootstrap_servers, topic, message, key):
+def serialize_value(value):
+    """Сериализует значение сообщения в JSON"""
+    with stage('serialize'):
+        return json.dumps(value).encode('utf-8')
+
+
+def make_value_serializer(value_format):
+    """Сериализатор значения для --format: JSON или Avro по схеме (transaction_codec.py)"""
+    if value_format == 'json':
+        return serialize_value
+    codec = make_codec(value_format)
+
+    def serialize(value):
+        with stage('serialize'):
+            return codec.encode(value)
+
+    return serialize
+
+
+def send_message(bootstrap_servers, topic, message, key, value_serializer=serialize_value):
     """Отправляет сообщение в Kafka"""
+    from kafka import KafkaProducer
+    from kafka.errors import KafkaError
+
     try:
-        producer = KafkaProducer(
-            bootstrap_servers=bootstrap_servers,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-            key_serializer=lambda k: k.encode('utf-8') if k else None
-        )
+        with stage('connect'):
+            producer = KafkaProducer(
+                bootstrap_servers=bootstrap_servers,
+                value_serializer=value_serializer,
+                key_serializer=lambda k: k.encode('utf-8') if k else None
+            )
 
-        future = producer.send(topic, key=key, value=message)
+        with stage('send'):
+            future = producer.send(topic, key=key, value=message)
 
         # Ждем подтверждения
-        record_metadata = future.get(timeout=10)
+        with stage('ack'):
+            record_metadata = future.get(timeout=10)
 
         print(f"✅ Сообщение успешно отправлено!")
         print(f"   Топик: {record_metadata.topic}")
@@ -74,7 +156,531 @@ def send_message(bootstrap_servers, topic, message, key):
         return False
 
 
-def main():
+def read_replay_records(path, offset=0):
+    """
+    Читает записи JSONL файла начиная со смещения offset
+
+    Yields:
+        (смещение начала строки, смещение следующей строки, сообщение, ключ = portfolioId)
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            start, offset = offset, offset + len(line)
+            if line.strip():
+                message = json.loads(line)
+                yield start, offset, message, message['portfolioId']
+
+
+def read_replay_record(path, offset):
+    """Читает одну запись JSONL файла по смещению начала строки: (сообщение, ключ)"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        message = json.loads(f.readline())
+    return message, message['portfolioId']
+
+
+def read_replay_messages(path, count=None):
+    """Читает сообщения из JSONL файла: (сообщение, ключ = portfolioId)"""
+    for index, (_, _, message, key) in enumerate(read_replay_records(path)):
+        if count is not None and index >= count:
+            return
+        yield message, key
+
+
+def generate_message(args, index):
+    """
+    Тестовое сообщение с номером index: (сообщение, ключ)
+
+    С --seed идентификаторы зависят только от seed и номера, поэтому любое
+    сообщение потока можно получить заново без генерации предыдущих.
+    """
+    with stage('generate'):
+        rng = random.Random(f"{args.seed}:{index}") if args.seed is not None else None
+        message, key = create_test_transaction_message(rng)
+        message['transactionType'] = args.transaction_type
+        message['assetType'] = args.asset_type
+    return message, key
+
+
+def generate_messages(args):
+    """Генерирует args.count тестовых сообщений: (сообщение, ключ)"""
+    for index in range(args.count):
+        yield generate_message(args, index)
+
+
+def send_messages(args):
+    """Отправляет сообщения (сгенерированные или из --replay), возвращает (успешно, ошибок)"""
+    success_count = 0
+    fail_count = 0
+
+    if args.replay:
+        messages = read_replay_messages(args.replay, args.count)
+        total = args.count if args.count is not None else '?'
+    else:
+        messages = generate_messages(args)
+        total = args.count
+    value_serializer = make_value_serializer(args.format)
+
+    for i, (message, key) in enumerate(messages):
+        print(f"[{i+1}/{total}] Отправка сообщения...")
+
+        if send_message(args.bootstrap_server, args.topic, message, key, value_serializer):
+            success_count += 1
+        else:
+            fail_count += 1
+
+        print()
+
+    return success_count, fail_count
+
+
+class Checkpoint:
+    """
+    Состояние долгой отправки для --resume
+
+    Все записи с номерами меньше next_index прочитаны (next_offset - смещение
+    следующей строки в --replay файле) и подтверждены брокером, кроме unacked:
+    номер -> смещение строки для записей в полете и с ошибкой. При --resume
+    отправляются заново только unacked, затем поток продолжается с next_index.
+    """
+
+    def __init__(self, path, source, count):
+        self.path = path
+        self.source = source
+        self.count = count
+        self.next_index = 0
+        self.next_offset = 0
+        self.unacked = {}
+        self.failed = set()
+        self.acked = 0
+        self.last_acked = None
+        self.completed = False
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"неподдерживаемая версия checkpoint {path}: {data.get('version')}")
+        checkpoint = cls(path, data['source'], data['count'])
+        checkpoint.next_index = data['next_index']
+        checkpoint.next_offset = data['next_offset']
+        checkpoint.unacked = {index: offset for index, offset in data['unacked']}
+        checkpoint.acked = data['acked']
+        checkpoint.last_acked = data['last_acked']
+        checkpoint.completed = data['completed']
+        return checkpoint
+
+    def sent(self, index, offset, next_offset):
+        """Запись index уходит в отправку (вызывается до producer.send)"""
+        with self.lock:
+            self.unacked[index] = offset
+            self.failed.discard(index)
+            if index >= self.next_index:
+                self.next_index = index + 1
+                self.next_offset = next_offset
+
+    def on_success(self, index, message_id, metadata):
+        with self.lock:
+            if self.unacked.pop(index, None) is not None:
+                self.acked += 1
+            self.last_acked = {
+                'index': index,
+                'id': message_id,
+                'partition': getattr(metadata, 'partition', None),
+                'offset': getattr(metadata, 'offset', None),
+            }
+
+    def on_error(self, index, _exception):
+        with self.lock:
+            self.failed.add(index)
+
+    def in_flight(self):
+        with self.lock:
+            return len(self.unacked) - len(self.failed)
+
+    def save(self):
+        """Записать состояние атомарно: временный файл и os.replace (без --checkpoint - ничего)"""
+        if self.path is None:
+            return
+        with self.lock:
+            data = {
+                'version': CHECKPOINT_VERSION,
+                'source': self.source,
+                'count': self.count,
+                'next_index': self.next_index,
+                'next_offset': self.next_offset,
+                'unacked': sorted(self.unacked.items()),
+                'acked': self.acked,
+                'last_acked': self.last_acked,
+                'completed': self.completed,
+                'updated_at': datetime.now(timezone.utc).isoformat(),
+            }
+        temporary = f"{self.path}.tmp"
+        with stage('checkpoint'):
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.path)
+
+
+def replay_source(path):
+    """Описание --replay файла для проверки при --resume"""
+    stat = os.stat(path)
+    return {'replay': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def checkpoint_source(args):
+    if args.replay:
+        return dict(replay_source(args.replay), shard=args.shard)
+    return {'seed': args.seed, 'transaction_type': args.transaction_type, 'asset_type': args.asset_type,
+            'shard': args.shard}
+
+
+def open_checkpoint(args):
+    """
+    Новый checkpoint или состояние прерванной отправки (--resume)
+
+    Returns:
+        Checkpoint или None, если продолжать нечего
+    """
+    if not args.resume:
+        if args.checkpoint and os.path.exists(args.checkpoint):
+            raise ValueError(f"checkpoint {args.checkpoint} уже существует: "
+                             f"продолжите отправку с --resume или удалите файл")
+        if not args.replay and args.seed is None:
+            if args.shard:
+                raise ValueError("шардам нужен общий --seed, иначе их потоки разойдутся")
+            args.seed = random.SystemRandom().randrange(2 ** 32)
+        return Checkpoint(args.checkpoint, checkpoint_source(args), args.count)
+
+    if not os.path.exists(args.checkpoint):
+        raise ValueError(f"checkpoint {args.checkpoint} не найден")
+    checkpoint = Checkpoint.load(args.checkpoint)
+    source = checkpoint.source
+    # В checkpoint'ах, записанных до появления --shard, ключа 'shard' нет - это отправка без шардов
+    source.setdefault('shard', None)
+    if args.shard and args.shard != source.get('shard'):
+        raise ValueError(f"checkpoint записан для шарда {source.get('shard')}, а не {args.shard}")
+    args.shard = source.get('shard')
+    if 'replay' in source:
+        if args.replay and os.path.abspath(args.replay) != source['replay']:
+            raise ValueError(f"checkpoint записан для {source['replay']}, а не {args.replay}")
+        args.replay = source['replay']
+        if dict(replay_source(args.replay), shard=args.shard) != source:
+            raise ValueError(f"файл {args.replay} изменился после записи checkpoint")
+    else:
+        if args.replay:
+            raise ValueError("checkpoint записан для сгенерированного потока, а не --replay")
+        args.seed = source['seed']
+        args.transaction_type = source['transaction_type']
+        args.asset_type = source['asset_type']
+    if args.count is not None and args.count != checkpoint.count:
+        print(f"⚠ --count {args.count} вместо {checkpoint.count} из checkpoint")
+        checkpoint.count = args.count
+    args.count = checkpoint.count
+    if checkpoint.completed and not checkpoint.unacked:
+        return None
+    return checkpoint
+
+
+def checkpoint_records(args, checkpoint):
+    """
+    Записи для отправки: сначала неподтвержденные из checkpoint, затем поток с next_index
+
+    С --shard - только записи своего шарда: для --replay по ключу, для генерации
+    по диапазону номеров.
+
+    Yields:
+        (номер, смещение строки, смещение следующей строки, сообщение, ключ)
+    """
+    shard = parse_shard(args.shard) if args.shard else None
+    with checkpoint.lock:
+        retry = sorted(checkpoint.unacked.items())
+        index, offset = checkpoint.next_index, checkpoint.next_offset
+    for retry_index, retry_offset in retry:
+        if args.replay:
+            message, key = read_replay_record(args.replay, retry_offset)
+        else:
+            message, key = generate_message(args, retry_index)
+        yield retry_index, retry_offset, None, message, key
+
+    if args.replay:
+        for start, end, message, key in read_replay_records(args.replay, offset):
+            if args.count is not None and index >= args.count:
+                return
+            if shard is None or owns_key(shard, key):
+                yield index, start, end, message, key
+            index += 1
+    else:
+        first, last = shard_range(shard, args.count) if shard else (0, args.count)
+        for index in range(max(index, first), last):
+            message, key = generate_message(args, index)
+            yield index, 0, 0, message, key
+
+
+def make_backfill_producer(args):
+    try:
+        from kafka import KafkaProducer
+    except ImportError:
+        print("Ошибка: библиотека kafka-python не установлена!")
+        print("Установите: pip install kafka-python")
+        sys.exit(1)
+    with stage('connect'):
+        return KafkaProducer(
+            bootstrap_servers=args.bootstrap_server,
+            value_serializer=make_value_serializer(args.format),
+            key_serializer=lambda k: k.encode('utf-8') if k else None,
+            acks='all',
+        )
+
+
+def print_progress(checkpoint, sent, started):
+    with checkpoint.lock:
+        acked, failed, unacked = checkpoint.acked, len(checkpoint.failed), len(checkpoint.unacked)
+        next_index = checkpoint.next_index
+    elapsed = max(time.monotonic() - started, 1e-9)
+    total = checkpoint.count if checkpoint.count is not None else '?'
+    print(f"  [{next_index}/{total}] подтверждено {acked}, в полете {unacked - failed}, ошибок {failed}, "
+          f"{sent / elapsed:,.0f} сообщ./с", flush=True)
+
+
+def _interrupt(_signum, _frame):
+    raise KeyboardInterrupt
+
+
+def sync_signature(args):
+    """Параметры, которые должны совпадать у всех шардов одного запуска"""
+    return {'shards': parse_shard(args.shard)[1], 'topic': args.topic, 'count': args.count, 'seed': args.seed,
+            'replay': os.path.basename(args.replay) if args.replay else None, 'rate': args.rate,
+            'format': args.format}
+
+
+def wait_for_start(args):
+    """Дождаться общего старта шардов (--barrier или --rendezvous)"""
+    if not (args.barrier or args.rendezvous):
+        return
+    shard = parse_shard(args.shard)
+    print(f"Ожидание остальных шардов ({args.barrier or args.rendezvous})...", flush=True)
+    with stage('barrier'):
+        if args.barrier:
+            start_at = barrier_start(args.barrier, shard, sync_signature(args), args.start_delay)
+        else:
+            start_at = rendezvous_start(args.rendezvous, shard, sync_signature(args), args.start_delay)
+        delay = start_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    print(f"Старт шарда {args.shard}", flush=True)
+
+
+def backfill(args, checkpoint):
+    """
+    Долгая отправка одним асинхронным продюсером с сохранением состояния
+
+    Ctrl+C и SIGTERM останавливают отправку с ожиданием подтверждений, так что
+    --resume ничего не отправит повторно. После аварийного завершения (kill -9)
+    повторно уйдут сообщения, подтвержденные после последнего сохранения, -
+    не больше чем за --checkpoint-interval.
+
+    С --rate сообщения отправляются по расписанию (у шарда - своя доля
+    скорости), и задержка подтверждения считается от запланированного момента.
+
+    С --trace-export выбранные отправки получают спан от send() до
+    подтверждения и заголовок traceparent в записи.
+
+    Returns:
+        Словарь: sent, acked (за запуск), errors, latency (гистограмма задержек
+        подтверждения, мс), started_at и finished_at (Unix время)
+    """
+    futures = deque()
+    latency = LatencyHistogram()
+    tracer = Tracer(make_exporter(args.trace_export), args.trace_sample,
+                    scope_name='send_test_kafka_message') if args.trace_export else None
+    rate = args.rate / parse_shard(args.shard)[1] if args.rate and args.shard else args.rate
+    acked_before = checkpoint.acked
+    sent = 0
+    state = {'started_at': None, 'finished_at': None}
+
+    def on_ack(index, message_id, sent_at, span, metadata):
+        latency.record((time.perf_counter() - sent_at) * 1000)
+        state['finished_at'] = time.time()
+        if span:
+            tracer.end(span, metadata)
+        checkpoint.on_success(index, message_id, metadata)
+
+    def on_error(index, span, exception):
+        if span:
+            tracer.fail(span, exception)
+        checkpoint.on_error(index, exception)
+
+    producer = make_backfill_producer(args)
+
+    previous_handler = signal.signal(signal.SIGTERM, _interrupt)
+    started = time.monotonic()
+    try:
+        wait_for_start(args)
+        started = last_save = time.monotonic()
+        started_perf = time.perf_counter()
+        state['started_at'] = time.time()
+        for index, offset, next_offset, message, key in checkpoint_records(args, checkpoint):
+            if rate:
+                sent_at = started_perf + sent / rate
+                delay = sent_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                sent_at = time.perf_counter()
+            checkpoint.sent(index, offset, next_offset)
+            span = tracer.start(args.topic, key, message['id']) if tracer else None
+            try:
+                with stage('send'):
+                    future = producer.send(args.topic, key=key, value=message,
+                                           headers=span.headers() if span else None)
+            except Exception as e:
+                on_error(index, span, e)
+                continue
+            future.add_callback(on_ack, index, message['id'], sent_at, span)
+            future.add_errback(on_error, index, span)
+            futures.append(future)
+            sent += 1
+
+            # Ограничиваем число неподтвержденных записей (и размер checkpoint)
+            while len(futures) > args.max_in_flight:
+                with stage('ack'):
+                    try:
+                        futures.popleft().get(timeout=FLUSH_TIMEOUT)
+                    except Exception:
+                        pass  # Ошибка уже учтена в on_error
+
+            now = time.monotonic()
+            if now - last_save >= args.checkpoint_interval:
+                checkpoint.save()
+                if tracer:
+                    tracer.export()
+                print_progress(checkpoint, sent, started)
+                last_save = now
+        with stage('flush'):
+            producer.flush(timeout=FLUSH_TIMEOUT)
+        checkpoint.completed = True
+    except KeyboardInterrupt:
+        print("\nПрервано: ожидание подтверждений отправленных сообщений...")
+        try:
+            producer.flush(timeout=FLUSH_TIMEOUT)
+        except Exception:
+            pass
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        checkpoint.save()
+        producer.close()
+        if tracer:
+            tracer.close()
+    print_progress(checkpoint, sent, started)
+    if tracer:
+        print(f"  Спанов отправки: {tracer.exported} -> {tracer.exporter.target}")
+    return {
+        'sent': sent,
+        'acked': checkpoint.acked - acked_before,
+        'errors': len(checkpoint.failed),
+        'latency': latency,
+        'started_at': state['started_at'] or time.time(),
+        'finished_at': state['finished_at'] or time.time(),
+    }
+
+
+def print_latency(latency, label):
+    line = ', '.join(f"p{p} {latency.percentile(p):.1f}" for p in PERCENTILES)
+    print(f"{label}: {line}, max {latency.max_value:.1f} мс")
+
+
+def write_node_report(args, result):
+    params = {'topic': args.topic, 'count': args.count, 'seed': args.seed, 'rate': args.rate,
+              'replay': args.replay}
+    report = node_report(parse_shard(args.shard or '0/1'), result['started_at'], result['finished_at'],
+                         result['sent'], result['acked'], result['errors'], result['latency'], params)
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Отчет узла сохранен: {args.report}")
+
+
+def run_merge_reports(args):
+    """--merge-reports: общий отчет кластера из отчетов узлов"""
+    reports = []
+    for path in args.merge_reports:
+        with open(path, 'r', encoding='utf-8') as f:
+            reports.append(json.load(f))
+    try:
+        merged, latency = merge_reports(reports)
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+    print("=" * 78)
+    print(f"Сводный отчет: шардов {len(reports)} из {merged['shards']}")
+    print("=" * 78)
+    print(f"  {'шард':>6} {'узел':<20} {'отправлено':>11} {'подтверждено':>13} {'ошибок':>7} {'сообщ./с':>10}")
+    for node in sorted(merged['nodes'], key=lambda node: node['shard'][0]):
+        duration = max(node['finished_at'] - node['started_at'], 1e-9)
+        print(f"  {'/'.join(map(str, node['shard'])):>6} {node['host'][:20]:<20} {node['sent']:>11} "
+              f"{node['acked']:>13} {node['errors']:>7} {node['acked'] / duration:>10,.0f}")
+    print("=" * 78)
+    print(f"Кластер: подтверждено {merged['acked']} за {merged['duration_s']:.1f} с - "
+          f"{merged['messages_per_s']:,.0f} сообщ./с (сумма узлов {merged['sum_node_messages_per_s']:,.0f})")
+    print_latency(latency, "Задержка подтверждения")
+    if merged['missing_shards']:
+        print(f"⚠ Нет отчетов шардов: {', '.join(map(str, merged['missing_shards']))}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, indent=2, ensure_ascii=False)
+        print(f"\nОтчет сохранен: {args.report}")
+    return 1 if merged['missing_shards'] or merged['errors'] else 0
+
+
+def run_backfill(args):
+    """
+    Отправка одним продюсером (--checkpoint, --shard, --rate, --report, --trace-export)
+
+    Returns:
+        (успешно, ошибок) или None при ошибке параметров
+    """
+    try:
+        checkpoint = open_checkpoint(args)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка: {e}")
+        return None
+    if checkpoint is None:
+        print(f"Отправка по {args.checkpoint} уже завершена")
+        return 0, 0
+
+    if args.resume:
+        print(f"Продолжение с записи {checkpoint.next_index}: подтверждено {checkpoint.acked}, "
+              f"отправить заново {len(checkpoint.unacked)}")
+        if checkpoint.last_acked:
+            last = checkpoint.last_acked
+            print(f"Последняя подтвержденная: #{last['index']} {last['id']} "
+                  f"(partition {last['partition']}, offset {last['offset']})")
+    if not args.replay:
+        print(f"Seed генерации: {args.seed}")
+    if args.shard:
+        print(f"Шард: {args.shard}")
+    print()
+    try:
+        result = backfill(args, checkpoint)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка: {e}")
+        return None
+    if result['latency'].count:
+        print_latency(result['latency'], "Задержка подтверждения")
+    if args.report:
+        write_node_report(args, result)
+    if args.checkpoint and (not checkpoint.completed or checkpoint.unacked):
+        print(f"\n💡 Продолжить: добавьте --resume (checkpoint: {args.checkpoint})")
+    return result['acked'], result['errors']
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description='Отправка тестового сообщения в Kafka для AnalyticsService'
     )
@@ -85,14 +691,13 @@ def main():
     )
     parser.add_argument(
         '--topic',
-        default='portfolio.transactions',
-        help='Название топика (по умолчанию: portfolio.transactions)'
+        default=DEFAULT_TOPIC,
+        help=f'Название топика (по умолчанию: {DEFAULT_TOPIC})'
     )
     parser.add_argument(
         '--count',
         type=int,
-        default=1,
-        help='Количество сообщений для отправки (по умолчанию: 1)'
+        help='Количество сообщений для отправки (по умолчанию: 1, для --replay - весь файл)'
     )
     parser.add_argument(
         '--transaction-type',
@@ -108,33 +713,136 @@ def main():
         default=1,
         help='Тип актива: 1=Share, 2=Bond, 3=Crypto (по умолчанию: 1)'
     )
+    parser.add_argument(
+        '--replay',
+        metavar='FILE',
+        help='Отправить сообщения из JSONL файла вместо генерации'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='Seed идентификаторов генерируемых сообщений (с --checkpoint выбирается случайно)'
+    )
+    parser.add_argument(
+        '--checkpoint',
+        metavar='FILE',
+        help='Отправлять одним продюсером и сохранять состояние в FILE для --resume'
+    )
+    parser.add_argument(
+        '--checkpoint-interval',
+        type=float,
+        default=DEFAULT_CHECKPOINT_INTERVAL,
+        help=f'Интервал сохранения checkpoint в секундах (по умолчанию: {DEFAULT_CHECKPOINT_INTERVAL:g})'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Продолжить отправку по --checkpoint с места остановки'
+    )
+    parser.add_argument(
+        '--max-in-flight',
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f'Максимум неподтвержденных сообщений с --checkpoint (по умолчанию: {DEFAULT_MAX_IN_FLIGHT})'
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        help='Скорость отправки, сообщений/с (с --shard - на весь кластер, по умолчанию: без ограничения)'
+    )
+    parser.add_argument(
+        '--shard',
+        metavar='I/N',
+        help='Отправить шард I из N общего потока (I от 0; для генерации нужен общий --seed)'
+    )
+    sync = parser.add_mutually_exclusive_group()
+    sync.add_argument(
+        '--barrier',
+        metavar='DIR',
+        help='Общий старт шардов через каталог на общем диске (новый для каждого запуска)'
+    )
+    sync.add_argument(
+        '--rendezvous',
+        metavar='HOST:PORT',
+        help='Общий старт шардов через TCP: шард 0 слушает PORT, остальные подключаются к HOST:PORT'
+    )
+    parser.add_argument(
+        '--start-delay',
+        type=float,
+        default=DEFAULT_START_DELAY,
+        help=f'Задержка старта после сбора шардов, с (по умолчанию: {DEFAULT_START_DELAY:g})'
+    )
+    parser.add_argument(
+        '--report',
+        metavar='FILE',
+        help='Сохранить отчет узла (с --merge-reports - сводный отчет) в JSON'
+    )
+    parser.add_argument(
+        '--merge-reports',
+        nargs='+',
+        metavar='FILE',
+        help='Слить отчеты узлов в общий: гистограмма задержек и пропускная способность кластера'
+    )
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        default='json',
+        help='Формат значения: json (контракт AnalyticsService) или avro по schemas/transaction_message.avsc '
+             '(по умолчанию: json)'
+    )
+    parser.add_argument(
+        '--trace-export',
+        metavar='FILE|URL',
+        help='Спаны отправок с заголовком traceparent: OTLP/JSON файл или коллектор http://host:4318'
+    )
+    parser.add_argument(
+        '--trace-sample',
+        type=float,
+        default=1.0,
+        help='Доля трассируемых отправок от 0 до 1 (по умолчанию: 1)'
+    )
+    add_profiling_arguments(parser)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.merge_reports:
+        return run_merge_reports(args)
+    if args.format != 'json' and args.topic == DEFAULT_TOPIC:
+        parser.error(f'AnalyticsService не читает {args.format}: для --format {args.format} укажите отдельный --topic')
+    if not 0.0 <= args.trace_sample <= 1.0:
+        parser.error('--trace-sample должен быть от 0 до 1')
+    if args.resume and not args.checkpoint:
+        parser.error('--resume требует --checkpoint')
+    if (args.barrier or args.rendezvous) and not args.shard:
+        parser.error('--barrier и --rendezvous требуют --shard')
+    if args.shard:
+        try:
+            parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.shard and not args.replay and args.count is None and not args.resume:
+        parser.error('--shard для генерации требует --count (размер всего потока)')
+    if args.count is None and not args.replay and not args.resume:
+        args.count = 1
 
     print("=" * 60)
     print("Отправка тестового сообщения в Kafka")
     print("=" * 60)
     print(f"Bootstrap Server: {args.bootstrap_server}")
     print(f"Topic: {args.topic}")
-    print(f"Количество сообщений: {args.count}")
+    if args.format != 'json':
+        print(f"Формат: {args.format}")
+    if args.replay:
+        print(f"Поток из файла: {args.replay}")
+    print(f"Количество сообщений: {args.count if args.count is not None else 'весь файл'}")
     print()
 
-    success_count = 0
-    fail_count = 0
-
-    for i in range(args.count):
-        message, key = create_test_transaction_message()
-        message['transactionType'] = args.transaction_type
-        message['assetType'] = args.asset_type
-
-        print(f"[{i+1}/{args.count}] Отправка сообщения...")
-
-        if send_message(args.bootstrap_server, args.topic, message, key):
-            success_count += 1
-        else:
-            fail_count += 1
-
-        print()
+    if args.checkpoint or args.shard or args.rate or args.report or args.trace_export:
+        result = run_profiled(args, run_backfill, args)
+        if result is None:
+            return 1
+        success_count, fail_count = result
+    else:
+        success_count, fail_count = run_profiled(args, send_messages, args)
 
     print("=" * 60)
     print(f"Результат: {success_count} успешно, {fail_count} ошибок")
@@ -143,8 +851,9 @@ def main():
     if success_count > 0:
         print("\n💡 Проверьте логи AnalyticsService для подтверждения обработки сообщения")
         print("💡 Проверьте базу данных: SELECT * FROM asset_transactions ORDER BY transaction_time DESC LIMIT 10;")
+    return 1 if fail_count else 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
 
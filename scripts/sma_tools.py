@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Единая точка входа для Python-инструментов Stock Market Assistant
+
+Использование:
+    python scripts/sma_tools.py kafka send [--count 10 ...] [--replay stream.jsonl] [--shard 0/4 --rendezvous HOST:PORT]
+    python scripts/sma_tools.py kafka lag [--interval 5] [--json] [--until-caught-up]
+    python scripts/sma_tools.py kafka export --output transactions.parquet [--since ...]
+    python scripts/sma_tools.py kafka capacity [--max-lag 1000] [--signal lag|db]
+    python scripts/sma_tools.py kafka sweep [--search grid|coordinate] [--compression none,lz4,zstd]
+    python scripts/sma_tools.py kafka poison [--ratios 0,0.1] [--violations all]
+    python scripts/sma_tools.py kafka scenario scripts/scenarios/mixed_portfolio_activity.json
+    python scripts/sma_tools.py kafka envelope [--sizes 1,10,50,100] [--dsn DSN]
+    python scripts/sma_tools.py kafka traces spans.jsonl [collector.jsonl ...] [--report FILE]
+    python scripts/sma_tools.py kafka wire-format [--formats json,avro] [--no-broker] [--input stream.jsonl]
+    python scripts/sma_tools.py analytics reference [--count 10000000] [--api-url URL]
+    python scripts/sma_tools.py analytics load [--stub] [--rate 50] [--sla p95=500]
+    python scripts/sma_tools.py analytics history-cache [--model zipf] [--check-size 1000]
+    python scripts/sma_tools.py analytics seed [--count 50000000] [--truncate] [--rebuild-indexes]
+    python scripts/sma_tools.py prices fanout [--stub] [--subscribers 100,500,1000]
+    python scripts/sma_tools.py diagrams svg Presentation/Sequence_Diagrams.mmd
+    python scripts/sma_tools.py diagrams docx Presentation/Архитектура.mmd
+    python scripts/sma_tools.py deck build [--dpi 150] [--variants Presentation/variants.json]
+    python scripts/sma_tools.py docs build [--jobs 4] [--force]
+    python scripts/sma_tools.py docs bench [--rounds 3] [--latency-ms 50]
+    python scripts/sma_tools.py selfcheck imports [--budget-ms 150]
+
+Или через обертку scripts/sma-tools с теми же аргументами.
+
+Модуль инструмента загружается только при вызове его команды, а сами
+инструменты импортируют тяжелые библиотеки (pptx, cairosvg, PIL, docx,
+requests, kafka, numpy, pyarrow, psycopg2, fastavro) лениво - поэтому --help
+и короткие команды запускаются быстро.
+"""
+
+import os
+import sys
+import argparse
+import importlib
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPTS_DIR.parent
+TOOL_DIRS = [SCRIPTS_DIR, REPO_ROOT / 'Presentation']
+
+# Команды: (группа, команда) -> (модуль инструмента, описание)
+COMMANDS = {
+    ('kafka', 'send'): (
+        'send_test_kafka_message',
+        'Отправка тестовых сообщений в топик portfolio.transactions'
+    ),
+    ('kafka', 'lag'): (
+        'kafka_lag_monitor',
+        'Мониторинг отставания consumer group AnalyticsService'
+    ),
+    ('kafka', 'export'): (
+        'export_kafka_topic',
+        'Выгрузка топика в Parquet / Arrow IPC для офлайн-анализа'
+    ),
+    ('kafka', 'capacity'): (
+        'capacity_producer',
+        'Поиск максимальной устойчивой скорости обработки (AIMD по отставанию)'
+    ),
+    ('kafka', 'sweep'): (
+        'producer_sweep',
+        'Подбор batch.size, linger.ms, сжатия и acks продюсера (Парето по задержке)'
+    ),
+    ('kafka', 'poison'): (
+        'poison_benchmark',
+        'Бенчмарк обработки битых и некорректных сообщений (путь ошибок и DLQ)'
+    ),
+    ('kafka', 'scenario'): (
+        'scenario_runner',
+        'Смешанная нагрузка по сценарию: несколько потоков событий в топики'
+    ),
+    ('kafka', 'envelope'): (
+        'envelope_benchmark',
+        'Оценка приема транзакций конвертами по N штук в одной записи'
+    ),
+    ('kafka', 'traces'): (
+        'trace_breakdown',
+        'Разбивка задержки сообщений по стадиям из спанов OTLP/JSON'
+    ),
+    ('kafka', 'wire-format'): (
+        'wire_format_benchmark',
+        'Сравнение JSON и Avro для значений записей: размер, скорость, брокер'
+    ),
+    ('analytics', 'reference'): (
+        'reference_aggregation',
+        'Эталонная агрегация транзакций и сравнение с API AnalyticsService'
+    ),
+    ('analytics', 'load'): (
+        'load_test_api',
+        'Нагрузочный тест HTTP API AnalyticsService с проверкой SLA'
+    ),
+    ('analytics', 'history-cache'): (
+        'history_workload',
+        'Поток запросов истории портфелей и оценка попаданий в кэш'
+    ),
+    ('analytics', 'seed'): (
+        'seed_analytics_db',
+        'Массовое наполнение analytics-db транзакциями и рейтингами через COPY'
+    ),
+    ('prices', 'fanout'): (
+        'price_hub_load',
+        'Нагрузка на рассылку котировок SignalR /pricehub: задержка и потери'
+    ),
+    ('diagrams', 'svg'): (
+        'convert_mmd_to_svg',
+        'Конвертация Mermaid диаграмм из MMD файла в SVG'
+    ),
+    ('diagrams', 'docx'): (
+        'convert_mmd_to_docx',
+        'Конвертация MMD/Markdown файла в DOCX с диаграммами'
+    ),
+    ('deck', 'build'): (
+        'create_presentation',
+        'Сборка презентации из slides.json'
+    ),
+    ('docs', 'build'): (
+        'build_docs',
+        'Сборка mmd -> svg -> png -> pptx/docx по графу зависимостей'
+    ),
+    ('docs', 'bench'): (
+        'benchmark_docs',
+        'Бенчмарк инструментов документации на локальной заглушке mermaid.ink'
+    ),
+}
+
+# Бюджет времени импорта одного модуля (в миллисекундах), проверяется командой
+# selfcheck imports по выводу python -X importtime
+IMPORT_TIME_BUDGET_MS = 150
+
+
+def load_tool(module_name):
+    """Импортировать модуль инструмента из scripts/ или Presentation/"""
+    for tool_dir in TOOL_DIRS:
+        if str(tool_dir) not in sys.path:
+            sys.path.insert(0, str(tool_dir))
+    return importlib.import_module(module_name)
+
+
+def parse_importtime(stderr, module_name):
+    """
+    Получить суммарное время импорта модуля (мс) из вывода -X importtime
+
+    Строки имеют вид: "import time:  self [us] | cumulative | imported package"
+    """
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or parts[2].strip() != module_name:
+            continue
+        try:
+            return int(parts[1].strip()) / 1000
+        except ValueError:
+            continue
+    return None
+
+
+def measure_import_time(module_name):
+    """
+    Измерить время импорта модуля в отдельном процессе с -X importtime
+
+    Returns:
+        Время в миллисекундах или None, если модуль не импортировался
+    """
+    import subprocess
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [str(tool_dir) for tool_dir in TOOL_DIRS] +
+        ([env['PYTHONPATH']] if env.get('PYTHONPATH') else [])
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        print(f"  ✗ {module_name}: ошибка импорта")
+        print('    ' + result.stderr.strip().splitlines()[-1])
+        return None
+    return parse_importtime(result.stderr, module_name)
+
+
+def check_import_budget(budget_ms=IMPORT_TIME_BUDGET_MS):
+    """
+    Проверить, что каждый инструмент (и сам sma_tools) импортируется быстрее бюджета
+
+    Returns:
+        True, если все модули уложились в бюджет
+    """
+    modules = ['sma_tools'] + sorted({module for module, _ in COMMANDS.values()})
+    print(f"Проверка времени импорта (бюджет: {budget_ms} мс на модуль)")
+    ok = True
+    for module_name in modules:
+        elapsed = measure_import_time(module_name)
+        if elapsed is None:
+            ok = False
+        elif elapsed > budget_ms:
+            print(f"  ✗ {module_name}: {elapsed:.1f} мс")
+            ok = False
+        else:
+            print(f"  ✓ {module_name}: {elapsed:.1f} мс")
+    return ok
+
+
+def build_parser():
+    """Построить парсер команд (аргументы инструментов разбирает сам инструмент)"""
+    parser = argparse.ArgumentParser(
+        prog='sma-tools',
+        description='Python-инструменты Stock Market Assistant'
+    )
+    groups = parser.add_subparsers(dest='group', metavar='<группа>')
+    groups.required = True
+
+    group_parsers = {}
+    for (group, command), (_, description) in COMMANDS.items():
+        if group not in group_parsers:
+            group_parser = groups.add_parser(group, help=f'Команды {group}')
+            commands = group_parser.add_subparsers(dest='command', metavar='<команда>')
+            commands.required = True
+            group_parsers[group] = commands
+        # add_help=False: --help передается самому инструменту
+        group_parsers[group].add_parser(command, help=description, add_help=False)
+
+    selfcheck = groups.add_parser('selfcheck', help='Самопроверки инструментов')
+    checks = selfcheck.add_subparsers(dest='command', metavar='<команда>')
+    checks.required = True
+    imports = checks.add_parser('imports', help='Проверка бюджета времени импорта')
+    imports.add_argument(
+        '--budget-ms',
+        type=float,
+        default=IMPORT_TIME_BUDGET_MS,
+        help=f'Бюджет на модуль в мс (по умолчанию: {IMPORT_TIME_BUDGET_MS})'
+    )
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, tool_args = parser.parse_known_args(argv)
+
+    if args.group == 'selfcheck':
+        if tool_args:
+            parser.error(f"неизвестные аргументы: {' '.join(tool_args)}")
+        return 0 if check_import_budget(args.budget_ms) else 1
+
+    module_name, _ = COMMANDS[(args.group, args.command)]
+    tool = load_tool(module_name)
+    result = tool.main(tool_args)
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Замер времени по этапам и профилирование для Python-инструментов
+
+Инструменты размечают этапы работы через stage('имя'), а общие опции
+--timings и --profile подключаются через add_profiling_arguments() и
+run_profiled():
+
+    --timings               таблица времени по этапам в конце работы
+    --profile out.prof      дамп cProfile (смотреть: python -m pstats out.prof)
+    --profile out.folded    свернутые стеки для flamegraph.pl / speedscope
+                            (сэмплирование стека главного потока)
+
+Время этапа - собственное: вложенный stage() вычитается из объемлющего,
+поэтому доли в таблице не пересекаются и в сумме не превышают 100%.
+Пока замер не включен, stage() почти ничего не стоит.
+"""
+
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+# Интервал сэмплирования стека для --profile *.folded (в секундах)
+SAMPLE_INTERVAL = 0.005
+# Расширения файла профиля, для которых пишутся свернутые стеки
+FOLDED_SUFFIXES = ('.folded', '.collapsed', '.txt')
+
+_lock = threading.Lock()
+_enabled = False
+_timings = {}
+_order = []
+# Стек открытых этапов текущего потока: [время вложенных этапов] на каждый уровень
+_local = threading.local()
+
+
+def enable_timings(enabled=True):
+    """Включить или выключить замер этапов (и сбросить накопленные данные)"""
+    global _enabled
+    with _lock:
+        _enabled = enabled
+        _timings.clear()
+        _order.clear()
+
+
+def record(name, seconds):
+    """Добавить длительность к этапу"""
+    if not _enabled:
+        return
+    with _lock:
+        if name not in _timings:
+            _timings[name] = [0.0, 0]
+            _order.append(name)
+        _timings[name][0] += seconds
+        _timings[name][1] += 1
+
+
+@contextmanager
+def stage(name):
+    """Контекстный менеджер для замера этапа (без времени вложенных этапов)"""
+    if not _enabled:
+        yield
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        record(name, elapsed - nested)
+
+
+def get_timings():
+    """Накопленные данные: список (этап, суммарное время в секундах, количество вызовов)"""
+    with _lock:
+        return [(name, _timings[name][0], _timings[name][1]) for name in _order]
+
+
+def print_timings(wall_time, file=None):
+    """Вывести таблицу времени по этапам"""
+    file = file or sys.stdout
+    timings = get_timings()
+    print(file=file)
+    print("=" * 60, file=file)
+    print(f"Время по этапам (общее время: {wall_time:.3f} с)", file=file)
+    print("=" * 60, file=file)
+    if not timings:
+        print("  (этапы не размечены)", file=file)
+    for name, total, calls in timings:
+        share = total * 100 / wall_time if wall_time > 0 else 0
+        average_ms = total * 1000 / calls if calls else 0
+        print(f"  {name:<20} {total:9.3f} с {share:6.1f}%  вызовов: {calls:<6} "
+              f"среднее: {average_ms:.2f} мс", file=file)
+    print("=" * 60, file=file)
+
+
+class StackSampler:
+    """Сэмплирование стека потока для построения flamegraph (свернутые стеки)"""
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def add_profiling_arguments(parser):
+    """Добавить в argparse-парсер общие опции --timings и --profile"""
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Показать время по этапам в конце работы'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Записать профиль: cProfile (.prof) или свернутые стеки для flamegraph (.folded)'
+    )
+    return parser
+
+
+def run_profiled(args, func, *func_args, **func_kwargs):
+    """
+    Выполнить func с учетом опций --timings и --profile из args
+
+    Returns:
+        Результат func
+    """
+    timings = getattr(args, 'timings', False)
+    profile_path = getattr(args, 'profile', None)
+    if timings:
+        enable_timings()
+
+    profiler = None
+    sampler = None
+    if profile_path and profile_path.endswith(FOLDED_SUFFIXES):
+        sampler = StackSampler()
+        sampler.start()
+    elif profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    started = time.perf_counter()
+    try:
+        return func(*func_args, **func_kwargs)
+    finally:
+        wall_time = time.perf_counter() - started
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"\nПрофиль cProfile сохранен: {profile_path}")
+        if sampler:
+            sampler.stop()
+            sampler.write(profile_path)
+            print(f"\nСвернутые стеки сохранены: {profile_path} ({sum(sampler.stacks.values())} сэмплов)")
+        if timings:
+            print_timings(wall_time)
+            enable_timings(False)
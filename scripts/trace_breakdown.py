@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Разбивка сквозной задержки сообщений по стадиям из спанов OTLP/JSON
+
+Читает спаны отправки, записанные send_test_kafka_message.py --trace-export,
+и спаны сервисов из того же или других файлов (например, file exporter
+коллектора OpenTelemetry, в который пишет AnalyticsService). Спан consumer
+относится к отправке, если продолжает ее контекст из заголовка traceparent:
+он дочерний для спана отправки или ссылается на него через link (пакетная
+обработка). Стадии:
+
+    отправка  - спан отправки: send() до подтверждения брокера (acks=all);
+    брокер    - от подтверждения до начала первого спана consumer;
+    обработка - спаны consumer и их потомки без сохранения;
+    сохранение - спаны БД (атрибут db.system / db.system.name) в поддереве
+                consumer, пересечения по времени считаются один раз.
+
+При пакетной обработке спан consumer покрывает всю пачку, так что обработка
+включает ожидание остальных сообщений пачки. Стадия брокера сравнивает часы
+продюсера и сервиса - отрицательные значения означают рассинхронизацию часов
+и считаются нулем.
+
+Использование:
+    python scripts/trace_breakdown.py spans.jsonl
+    python scripts/trace_breakdown.py spans.jsonl collector/traces.jsonl --report breakdown.json
+"""
+
+import sys
+import json
+import argparse
+from datetime import datetime, timezone
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from kafka_common import LatencyHistogram, PERCENTILES
+from trace_context import read_otlp_spans, attributes_to_dict, SPAN_KIND_PRODUCER, SPAN_KIND_CONSUMER
+
+STAGES = [
+    ('produce', 'отправка'),
+    ('broker', 'брокер'),
+    ('consume', 'обработка'),
+    ('persist', 'сохранение'),
+    ('end_to_end', 'сквозная'),
+]
+CONSUMER_OPERATIONS = {'receive', 'process'}
+DB_ATTRIBUTES = ('db.system', 'db.system.name')
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'kind', 'start', 'end', 'attributes', 'service', 'links')
+
+    def __init__(self, service, data):
+        self.trace_id = data.get('traceId', '').lower()
+        self.span_id = data.get('spanId', '').lower()
+        self.parent_id = (data.get('parentSpanId') or '').lower()
+        self.kind = data.get('kind', 0)
+        self.start = int(data.get('startTimeUnixNano', 0))
+        self.end = int(data.get('endTimeUnixNano', 0))
+        self.attributes = attributes_to_dict(data.get('attributes'))
+        self.service = service
+        self.links = [(link.get('traceId', '').lower(), link.get('spanId', '').lower())
+                      for link in data.get('links', [])]
+
+    @property
+    def key(self):
+        return self.trace_id, self.span_id
+
+    @property
+    def is_producer(self):
+        return self.kind == SPAN_KIND_PRODUCER and self.attributes.get('messaging.system') == 'kafka'
+
+    @property
+    def is_consumer(self):
+        operation = self.attributes.get('messaging.operation.type', self.attributes.get('messaging.operation'))
+        return self.kind == SPAN_KIND_CONSUMER or operation in CONSUMER_OPERATIONS
+
+    @property
+    def is_db(self):
+        return any(name in self.attributes for name in DB_ATTRIBUTES)
+
+
+class SpanIndex:
+    """Спаны с индексами по родителю и по link"""
+
+    def __init__(self):
+        self.spans = []
+        self.children = {}
+        self.linked = {}
+
+    def add(self, span):
+        self.spans.append(span)
+        if span.parent_id:
+            self.children.setdefault((span.trace_id, span.parent_id), []).append(span)
+        for link in span.links:
+            self.linked.setdefault(link, []).append(span)
+
+    def consumers_of(self, producer):
+        """Спаны consumer, продолжающие контекст отправки (дочерние или по link)"""
+        spans = self.children.get(producer.key, []) + self.linked.get(producer.key, [])
+        return [span for span in spans if span.is_consumer and not span.is_producer]
+
+    def subtree(self, roots):
+        seen, stack = {}, list(roots)
+        while stack:
+            span = stack.pop()
+            if span.key in seen:
+                continue
+            seen[span.key] = span
+            stack.extend(self.children.get(span.key, []))
+        return list(seen.values())
+
+
+def load_spans(paths):
+    index = SpanIndex()
+    for path in paths:
+        for service, data in read_otlp_spans(path):
+            index.add(Span(service, data))
+    return index
+
+
+def union_length(intervals):
+    """Суммарная длина объединения интервалов [начало, конец)"""
+    total, current_start, current_end = 0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def breakdown(index):
+    """
+    Задержки стадий по всем отправкам
+
+    Returns:
+        Словарь: producer_spans, failed, linked, clock_skew, services,
+        histograms (стадия -> LatencyHistogram, мс), sums (стадия -> сумма, мс),
+        linked_produce (сумма отправки по связанным сообщениям, мс)
+    """
+    histograms = {name: LatencyHistogram() for name, _ in STAGES}
+    sums = {name: 0.0 for name, _ in STAGES}
+    result = {'producer_spans': 0, 'failed': 0, 'linked': 0, 'clock_skew': 0, 'services': set(),
+              'histograms': histograms, 'sums': sums, 'linked_produce': 0.0}
+
+    def record(name, nanoseconds):
+        value = nanoseconds / 1e6
+        histograms[name].record(value)
+        sums[name] += value
+
+    for producer in index.spans:
+        if not producer.is_producer:
+            continue
+        result['producer_spans'] += 1
+        if 'error.type' in producer.attributes:
+            result['failed'] += 1
+            continue
+        record('produce', producer.end - producer.start)
+
+        consumers = index.consumers_of(producer)
+        if not consumers:
+            continue
+        result['linked'] += 1
+        result['linked_produce'] += (producer.end - producer.start) / 1e6
+        subtree = index.subtree(consumers)
+        result['services'].update(span.service for span in subtree)
+        consume_start = min(span.start for span in consumers)
+        consume_end = max(span.end for span in subtree)
+        persist = union_length([(span.start, span.end) for span in subtree if span.is_db])
+        broker = consume_start - producer.end
+        if broker < 0:
+            result['clock_skew'] += 1
+            broker = 0
+        record('broker', broker)
+        record('consume', consume_end - consume_start - persist)
+        record('persist', persist)
+        record('end_to_end', consume_end - producer.start)
+    return result
+
+
+def print_breakdown(result):
+    histograms, sums = result['histograms'], result['sums']
+    print("=" * 78)
+    print("Задержка сообщений по стадиям, мс")
+    print("=" * 78)
+    print(f"Спанов отправки: {result['producer_spans']} (с ошибкой {result['failed']}), "
+          f"связано со спанами consumer: {result['linked']}")
+    if result['services']:
+        print(f"Сервисы consumer: {', '.join(sorted(result['services']))}")
+    print()
+    header = f"  {'стадия':<12} {'n':>7}" + ''.join(f" {'p' + str(p):>8}" for p in PERCENTILES)
+    print(header + f" {'max':>8} {'среднее':>8} {'доля':>6}")
+    end_to_end = sums['end_to_end']
+    for name, label in STAGES:
+        histogram = histograms[name]
+        if not histogram.count:
+            continue
+        mean = sums[name] / histogram.count
+        line = f"  {label:<12} {histogram.count:>7}"
+        line += ''.join(f" {histogram.percentile(p):>8.1f}" for p in PERCENTILES)
+        line += f" {histogram.max_value:>8.1f} {mean:>8.1f}"
+        # Доля от сквозной задержки - по связанным отправкам
+        if name != 'end_to_end' and end_to_end:
+            total = result['linked_produce'] if name == 'produce' else sums[name]
+            line += f" {total / end_to_end:>6.0%}"
+        print(line)
+    print("=" * 78)
+    if not result['linked']:
+        print("⚠ Нет спанов consumer с контекстом отправок: сервис должен продолжать trace из заголовка "
+              "traceparent и экспортировать спаны (OTEL_EXPORTER_OTLP_ENDPOINT)")
+    if result['clock_skew']:
+        print(f"⚠ У {result['clock_skew']} сообщений consumer начал раньше подтверждения: "
+              f"часы продюсера и сервиса не синхронизированы, стадия брокера занижена")
+
+
+def report_data(result, paths):
+    stages = {}
+    for name, _ in STAGES:
+        histogram = result['histograms'][name]
+        stages[name] = {
+            'count': histogram.count,
+            'mean_ms': result['sums'][name] / histogram.count if histogram.count else None,
+            **{f"p{p}_ms": histogram.percentile(p) for p in PERCENTILES},
+            'max_ms': histogram.max_value,
+            'histogram': histogram.to_dict(),
+        }
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'files': paths,
+        'producer_spans': result['producer_spans'],
+        'failed': result['failed'],
+        'linked': result['linked'],
+        'clock_skew': result['clock_skew'],
+        'services': sorted(result['services']),
+        'stages': stages,
+    }
+
+
+def run(args):
+    with stage('read'):
+        index = load_spans(args.files)
+    with stage('analyze'):
+        result = breakdown(index)
+    if not result['producer_spans']:
+        print(f"Ошибка: в {', '.join(args.files)} нет спанов отправки в Kafka")
+        return 1
+    print_breakdown(result)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report_data(result, args.files), f, indent=2, ensure_ascii=False)
+        print(f"\nОтчет сохранен: {args.report}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Разбивка сквозной задержки сообщений Kafka по стадиям из спанов OTLP/JSON'
+    )
+    parser.add_argument('files', nargs='+', metavar='FILE',
+                        help='OTLP/JSON файлы со спанами (по запросу ExportTraceServiceRequest на строку)')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить результаты в JSON')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        return run_profiled(args, run, args)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Контекст трассировки W3C для сообщений продюсера и экспорт спанов в OTLP/JSON
+
+Каждая выбранная (sampled) отправка получает спан вида PRODUCER. Заголовок
+traceparent этого спана кладется в заголовки записи Kafka:
+
+    traceparent: 00-<trace-id, 32 hex>-<span-id, 16 hex>-01
+
+Consumer, который продолжает этот контекст (родитель спана или link), попадает
+в тот же trace, и trace_breakdown.py делит сквозную задержку на стадии:
+отправка, ожидание в брокере, обработка, сохранение.
+
+Выбор отправок - как TraceIdRatioBased в OpenTelemetry: младшие 8 байт
+trace-id сравниваются с долей --trace-sample. Невыбранные отправки уходят
+без заголовка и спана.
+
+Спаны пишутся в формате OTLP/JSON (ExportTraceServiceRequest) без
+зависимости от opentelemetry-sdk:
+    - в файл: по одному запросу на строку, как у file exporter коллектора
+      (читается otlpjsonfile receiver и trace_breakdown.py);
+    - на http(s)://host:4318 - POST /v1/traces в коллектор или его заглушку.
+Атрибуты - по семантическим соглашениям OpenTelemetry для messaging.
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+
+TRACEPARENT_HEADER = 'traceparent'
+TRACEPARENT_VERSION = '00'
+FLAG_SAMPLED = 0x01
+
+SPAN_KIND_PRODUCER = 4
+SPAN_KIND_CONSUMER = 5
+STATUS_CODE_ERROR = 2
+
+DEFAULT_SERVICE_NAME = 'sma-test-producer'
+DEFAULT_EXPORT_BATCH = 512
+EXPORT_TIMEOUT = 10
+
+
+def format_traceparent(trace_id, span_id, sampled=True):
+    """Значение заголовка traceparent из hex trace-id и span-id"""
+    return f"{TRACEPARENT_VERSION}-{trace_id}-{span_id}-{FLAG_SAMPLED if sampled else 0:02x}"
+
+
+def parse_traceparent(value):
+    """
+    Разобрать заголовок traceparent
+
+    Returns:
+        (trace_id, span_id, sampled)
+
+    Raises:
+        ValueError: некорректный формат или нулевые идентификаторы
+    """
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('ascii', errors='replace')
+    parts = value.strip().split('-')
+    if len(parts) < 4 or [len(part) for part in parts[:4]] != [2, 32, 16, 2]:
+        raise ValueError(f"некорректный traceparent: {value}")
+    version, trace_id, span_id, flags = parts[:4]
+    try:
+        version_number, flag_bits = int(version, 16), int(flags, 16)
+        int(trace_id, 16), int(span_id, 16)
+    except ValueError:
+        raise ValueError(f"некорректный traceparent: {value}") from None
+    if version_number == 0xff or (version_number == 0 and len(parts) != 4):
+        raise ValueError(f"некорректный traceparent: {value}")
+    if trace_id != trace_id.lower() or span_id != span_id.lower():
+        raise ValueError(f"некорректный traceparent: {value}")
+    if trace_id == '0' * 32 or span_id == '0' * 16:
+        raise ValueError(f"нулевой trace-id или span-id: {value}")
+    return trace_id, span_id, bool(flag_bits & FLAG_SAMPLED)
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def attributes_to_dict(attributes):
+    """Атрибуты OTLP/JSON ([{key, value: {stringValue: ...}}]) -> dict"""
+    result = {}
+    for attribute in attributes or []:
+        value = attribute.get('value', {})
+        if 'intValue' in value:
+            result[attribute['key']] = int(value['intValue'])
+        elif value:
+            result[attribute['key']] = next(iter(value.values()))
+    return result
+
+
+class ProducerSpan:
+    """Открытый спан отправки: идентификаторы и время начала"""
+
+    __slots__ = ('trace_id', 'span_id', 'start_ns', 'attributes')
+
+    def __init__(self, trace_id, span_id, start_ns, attributes):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.start_ns = start_ns
+        self.attributes = attributes
+
+    @property
+    def traceparent(self):
+        return format_traceparent(self.trace_id, self.span_id)
+
+    def headers(self):
+        """Заголовки записи Kafka для kafka-python: [(имя, bytes)]"""
+        return [(TRACEPARENT_HEADER, self.traceparent.encode('ascii'))]
+
+
+class Tracer:
+    """
+    Спаны отправок с выборкой по доле sample_ratio
+
+    end()/fail() можно вызывать из потока колбэков продюсера: готовые спаны
+    копятся в памяти, а export() отправляет их экспортеру из основного потока,
+    чтобы запись в файл или HTTP не задерживала обработку подтверждений.
+    """
+
+    def __init__(self, exporter, sample_ratio=1.0, service_name=DEFAULT_SERVICE_NAME, scope_name=None,
+                 batch_size=DEFAULT_EXPORT_BATCH):
+        if not 0.0 <= sample_ratio <= 1.0:
+            raise ValueError(f"доля выборки должна быть от 0 до 1: {sample_ratio}")
+        self.exporter = exporter
+        self.threshold = int(sample_ratio * 2 ** 64)
+        self.batch_size = batch_size
+        self.resource = {'attributes': [_attribute('service.name', service_name),
+                                        _attribute('host.name', socket.gethostname()),
+                                        _attribute('process.pid', os.getpid())]}
+        self.scope = {'name': scope_name or service_name}
+        self.pending = []
+        self.lock = threading.Lock()
+        self.started = 0
+        self.exported = 0
+
+    def start(self, topic, key=None, message_id=None, start_ns=None):
+        """Открыть спан отправки; None, если отправка не попала в выборку"""
+        trace_bytes = os.urandom(16)
+        if int.from_bytes(trace_bytes[8:], 'big') >= self.threshold or not any(trace_bytes):
+            return None
+        attributes = {
+            'messaging.system': 'kafka',
+            'messaging.operation.name': 'send',
+            'messaging.operation.type': 'send',
+            'messaging.destination.name': topic,
+        }
+        if key is not None:
+            attributes['messaging.kafka.message.key'] = key
+        if message_id is not None:
+            attributes['messaging.message.id'] = message_id
+        self.started += 1
+        return ProducerSpan(trace_bytes.hex(), os.urandom(8).hex(),
+                            start_ns if start_ns is not None else time.time_ns(), attributes)
+
+    def end(self, span, metadata=None, end_ns=None):
+        """Закрыть спан по подтверждению (metadata - RecordMetadata kafka-python)"""
+        attributes = dict(span.attributes)
+        if metadata is not None:
+            attributes['messaging.destination.partition.id'] = str(metadata.partition)
+            attributes['messaging.kafka.offset'] = metadata.offset
+        self._finish(span, attributes, None, end_ns)
+
+    def fail(self, span, exception, end_ns=None):
+        """Закрыть спан с ошибкой отправки"""
+        attributes = dict(span.attributes)
+        attributes['error.type'] = type(exception).__name__
+        self._finish(span, attributes, {'code': STATUS_CODE_ERROR, 'message': str(exception)}, end_ns)
+
+    def _finish(self, span, attributes, status, end_ns):
+        data = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': f"send {attributes['messaging.destination.name']}",
+            'kind': SPAN_KIND_PRODUCER,
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(end_ns if end_ns is not None else time.time_ns()),
+            'attributes': [_attribute(key, value) for key, value in attributes.items()],
+        }
+        if status:
+            data['status'] = status
+        with self.lock:
+            self.pending.append(data)
+
+    def export(self, force=False):
+        """Отправить накопленные спаны экспортеру (без force - только полными пачками)"""
+        while True:
+            with self.lock:
+                if not self.pending or (not force and len(self.pending) < self.batch_size):
+                    return
+                spans, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            if self.exporter.export({'resourceSpans': [{
+                'resource': self.resource,
+                'scopeSpans': [{'scope': self.scope, 'spans': spans}],
+            }]}):
+                self.exported += len(spans)
+
+    def close(self):
+        self.export(force=True)
+        self.exporter.close()
+
+
+class OtlpFileExporter:
+    """OTLP/JSON в файл: один ExportTraceServiceRequest на строку"""
+
+    def __init__(self, path):
+        self.target = path
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def export(self, request):
+        self.file.write(json.dumps(request, separators=(',', ':')) + '\n')
+        self.file.flush()
+        return True
+
+    def close(self):
+        self.file.close()
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP с JSON телом: POST {endpoint}/v1/traces"""
+
+    def __init__(self, endpoint):
+        endpoint = endpoint.rstrip('/')
+        self.target = endpoint if endpoint.endswith('/v1/traces') else f"{endpoint}/v1/traces"
+        self.errors = 0
+
+    def export(self, request):
+        from urllib.request import Request, urlopen
+        from urllib.error import URLError
+
+        body = json.dumps(request, separators=(',', ':')).encode('utf-8')
+        http_request = Request(self.target, data=body, method='POST',
+                               headers={'Content-Type': 'application/json'})
+        try:
+            with urlopen(http_request, timeout=EXPORT_TIMEOUT) as response:
+                response.read()
+            return True
+        except (URLError, OSError) as e:
+            # Потеря спанов не должна останавливать отправку сообщений
+            self.errors += 1
+            if self.errors == 1:
+                print(f"⚠ Не удалось отправить спаны в {self.target}: {e}")
+            return False
+
+    def close(self):
+        pass
+
+
+def make_exporter(target):
+    """Экспортер по цели: http(s)://... - коллектор, иначе путь к файлу"""
+    if target.startswith(('http://', 'https://')):
+        return OtlpHttpExporter(target)
+    return OtlpFileExporter(target)
+
+
+def read_otlp_spans(path):
+    """
+    Спаны из OTLP/JSON файла (по запросу на строку)
+
+    Yields:
+        (имя сервиса из resource, спан OTLP/JSON)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: не JSON: {e}") from None
+            for resource_spans in request.get('resourceSpans', []):
+                resource = attributes_to_dict(resource_spans.get('resource', {}).get('attributes'))
+                service = resource.get('service.name', '?')
+                for scope_spans in resource_spans.get('scopeSpans', []):
+                    for span in scope_spans.get('spans', []):
+                        yield service, span
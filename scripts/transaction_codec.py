@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Форматы значения записи portfolio.transactions: JSON (текущий контракт) и Avro
+
+JSON несет в каждой записи имена полей, GUID строками по 36 символов и
+числа текстом, а разбор JSON - часть горячего пути consumer. Avro кодирует
+те же поля по схеме scripts/schemas/transaction_message.avsc (поля -
+Presentation/EVENT_FIELDS_LIST.md): GUID - 16 байт, типы и количество -
+varint, цены - decimal(18, 4), время - микросекунды UTC.
+
+Реестра схем нет, поэтому запись Avro использует single object encoding из
+спецификации Avro:
+
+    C3 01 | CRC-64-AVRO fingerprint схемы (8 байт) | тело Avro
+
+По первым байтам consumer отличает Avro от JSON (decode_value) и проверяет,
+что запись закодирована известной схемой. AnalyticsService Avro пока не
+читает - формат для оценки и отдельных топиков.
+
+Требует для Avro: fastavro
+"""
+
+import io
+import os
+import sys
+import json
+import uuid
+from decimal import Decimal
+from datetime import datetime, timezone
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas', 'transaction_message.avsc')
+SINGLE_OBJECT_MARKER = b'\xc3\x01'
+FORMATS = ['json', 'avro']
+# Шаг decimal(18, 4) схемы: цены с большим числом знаков округляются
+DECIMAL_QUANTUM = Decimal('0.0001')
+GUID_FIELDS = ('id', 'portfolioId', 'stockCardId')
+DECIMAL_FIELDS = ('pricePerUnit', 'totalAmount')
+INT_FIELDS = ('assetType', 'transactionType', 'quantity')
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class CodecError(ValueError):
+    """Значение записи не разбирается выбранным форматом"""
+
+
+def import_fastavro():
+    """Импортировать fastavro при первом обращении"""
+    try:
+        import fastavro
+    except ImportError:
+        print("Ошибка: библиотека fastavro не установлена!")
+        print("Установите: pip install fastavro")
+        sys.exit(1)
+    return fastavro
+
+
+class JsonCodec:
+    """Текущий контракт: json.dumps сообщения, как serialize_value продюсера"""
+
+    name = 'json'
+
+    def encode(self, message):
+        return json.dumps(message).encode('utf-8')
+
+    def decode(self, value):
+        try:
+            return json.loads(value)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise CodecError(f"не JSON: {e}") from None
+
+
+def _guid_bytes(value):
+    # bytes.fromhex заметно быстрее uuid.UUID(value).bytes
+    if isinstance(value, uuid.UUID):
+        return value.bytes
+    data = bytes.fromhex(value.replace('-', ''))
+    if len(data) != 16:
+        raise ValueError(f"некорректный GUID: {value}")
+    return data
+
+
+def _guid_str(data):
+    text = data.hex()
+    return f"{text[:8]}-{text[8:12]}-{text[12:16]}-{text[16:20]}-{text[20:]}"
+
+
+def _int32(field, value):
+    # schemaless_writer не проверяет значения: 1.5 записался бы как 1, а 2**40 - varint,
+    # который другие читатели int не примут
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{field} должно быть целым, получено {value!r}")
+    if not INT32_MIN <= value <= INT32_MAX:
+        raise ValueError(f"{field} вне диапазона int: {value}")
+    return value
+
+
+def _decimal(value):
+    return (value if isinstance(value, Decimal) else Decimal(repr(value))).quantize(DECIMAL_QUANTUM)
+
+
+def _utc(value):
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class AvroCodec:
+    """
+    Avro по схеме transaction_message.avsc в single object encoding
+
+    encode() принимает сообщение в виде продюсера (GUID и время строками, цены
+    числами) или уже типизированные значения; decode() возвращает сообщение
+    в том же виде, что json.loads для JSON.
+    """
+
+    name = 'avro'
+
+    def __init__(self, schema_path=SCHEMA_PATH):
+        fastavro = import_fastavro()
+        from fastavro.schema import to_parsing_canonical_form, fingerprint
+
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            self.schema = fastavro.parse_schema(json.load(f))
+        # fastavro возвращает fingerprint уже в порядке байт single object encoding
+        self.fingerprint = fingerprint(to_parsing_canonical_form(self.schema), 'CRC-64-AVRO')
+        self.header = SINGLE_OBJECT_MARKER + bytes.fromhex(self.fingerprint)
+        self.writer = fastavro.schemaless_writer
+        self.reader = fastavro.schemaless_reader
+
+    def encode(self, message):
+        record = dict(message)
+        buffer = io.BytesIO()
+        buffer.write(self.header)
+        try:
+            for field in GUID_FIELDS:
+                record[field] = _guid_bytes(message[field])
+            if message.get('portfolioAssetId') is not None:
+                record['portfolioAssetId'] = _guid_bytes(message['portfolioAssetId'])
+            for field in INT_FIELDS:
+                _int32(field, message[field])
+            for field in DECIMAL_FIELDS:
+                record[field] = _decimal(message[field])
+            record['transactionTime'] = _utc(message['transactionTime'])
+            self.writer(buffer, self.schema, record)
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            raise CodecError(f"сообщение {message.get('id')} не соответствует схеме: {e}") from None
+        return buffer.getvalue()
+
+    def decode(self, value):
+        if value[:len(self.header)] != self.header:
+            if value[:len(SINGLE_OBJECT_MARKER)] == SINGLE_OBJECT_MARKER:
+                raise CodecError(f"запись Avro с другой схемой: {value[2:10].hex()}, "
+                                 f"ожидается {self.fingerprint}")
+            raise CodecError("запись не в формате Avro single object encoding")
+        buffer = io.BytesIO(value)
+        buffer.seek(len(self.header))
+        try:
+            record = self.reader(buffer, self.schema)
+        except (EOFError, ValueError, IndexError) as e:
+            raise CodecError(f"поврежденная запись Avro: {e}") from None
+        for field in GUID_FIELDS:
+            record[field] = _guid_str(record[field])
+        portfolio_asset_id = record.pop('portfolioAssetId')
+        if portfolio_asset_id is not None:
+            record['portfolioAssetId'] = _guid_str(portfolio_asset_id)
+        for field in DECIMAL_FIELDS:
+            record[field] = float(record[field])
+        record['transactionTime'] = record['transactionTime'].isoformat()
+        return record
+
+
+def make_codec(name):
+    """Кодек по имени формата (--format)"""
+    if name == 'json':
+        return JsonCodec()
+    if name == 'avro':
+        return AvroCodec()
+    raise ValueError(f"неизвестный формат: {name} (доступны: {', '.join(FORMATS)})")
+
+
+def decode_value(value, avro=None):
+    """
+    Сообщение из значения записи любого формата
+
+    Args:
+        avro: AvroCodec для записей Avro (без него создается на каждый вызов)
+    """
+    if value[:len(SINGLE_OBJECT_MARKER)] == SINGLE_OBJECT_MARKER:
+        return (avro or AvroCodec()).decode(value)
+    return JsonCodec().decode(value)
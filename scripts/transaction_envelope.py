@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Конверт (envelope) с несколькими транзакциями в одной записи Kafka
+
+Сейчас каждая запись portfolio.transactions содержит один TransactionMessage.
+Конверт - кандидат на новый контракт: одна запись, N транзакций.
+
+    {
+        "type": "TransactionBatch",
+        "version": 1,
+        "batchId": "<UUID>",
+        "count": 3,
+        "createdAt": "2024-01-01T00:00:00+00:00",
+        "items": [<TransactionMessage>, <TransactionMessage>, <TransactionMessage>]
+    }
+
+Порядок транзакций одного портфеля сохраняется, если все транзакции конверта
+попадают в одну партицию: EnvelopePacker собирает конверты по партициям ключа
+(portfolioId), и конверт отправляется в эту партицию явно, без ключа.
+
+decode_record() - эталонный декодер для consumer: принимает и конверт, и
+одиночный TransactionMessage (на время перехода в топике будут оба формата).
+Нарушения формата конверта - EnvelopeError; значения полей транзакций
+(диапазоны, enum, totalAmount) по-прежнему проверяет consumer.
+"""
+
+import json
+import uuid
+from datetime import datetime, timezone
+
+ENVELOPE_TYPE = 'TransactionBatch'
+ENVELOPE_VERSION = 1
+# Поля TransactionMessage, обязательные в каждом элементе конверта
+ITEM_FIELDS = ['id', 'portfolioId', 'stockCardId', 'assetType', 'transactionType', 'quantity',
+               'pricePerUnit', 'totalAmount', 'transactionTime', 'currency']
+
+
+class EnvelopeError(ValueError):
+    """Запись не является корректным конвертом"""
+
+
+def make_envelope(items, batch_id=None):
+    """Конверт из списка TransactionMessage"""
+    return {
+        'type': ENVELOPE_TYPE,
+        'version': ENVELOPE_VERSION,
+        'batchId': batch_id or str(uuid.uuid4()),
+        'count': len(items),
+        'createdAt': datetime.now(timezone.utc).isoformat(),
+        'items': items,
+    }
+
+
+def encode_envelope(envelope):
+    return json.dumps(envelope, separators=(',', ':')).encode('utf-8')
+
+
+def decode_envelope(data):
+    """
+    Разобрать и проверить конверт
+
+    Args:
+        data: dict или значение записи (bytes/str с JSON)
+
+    Returns:
+        (batchId, список TransactionMessage)
+
+    Raises:
+        EnvelopeError: не JSON, чужой type, неподдерживаемая version,
+            count не совпадает с числом элементов, элемент без обязательных полей
+    """
+    if isinstance(data, (bytes, bytearray, str)):
+        try:
+            data = json.loads(data)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise EnvelopeError(f"не JSON: {e}") from None
+    if not isinstance(data, dict) or data.get('type') != ENVELOPE_TYPE:
+        raise EnvelopeError("запись не является конвертом TransactionBatch")
+    version = data.get('version')
+    if not isinstance(version, int) or version > ENVELOPE_VERSION:
+        raise EnvelopeError(f"неподдерживаемая версия конверта: {version}")
+
+    batch_id = data.get('batchId')
+    try:
+        uuid.UUID(str(batch_id))
+    except ValueError:
+        raise EnvelopeError(f"некорректный batchId: {batch_id}") from None
+    items = data.get('items')
+    if not isinstance(items, list):
+        raise EnvelopeError(f"конверт {batch_id}: items не является массивом")
+    if data.get('count') != len(items):
+        raise EnvelopeError(f"конверт {batch_id}: count={data.get('count')}, элементов {len(items)}")
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise EnvelopeError(f"конверт {batch_id}: элемент {index} не является объектом")
+        missing = [field for field in ITEM_FIELDS if field not in item]
+        if missing:
+            raise EnvelopeError(f"конверт {batch_id}: в элементе {index} нет полей {', '.join(missing)}")
+    return batch_id, items
+
+
+def decode_record(value):
+    """
+    Транзакции из значения записи: конверт или одиночный TransactionMessage
+
+    Returns:
+        (batchId или None для одиночного сообщения, список TransactionMessage)
+    """
+    try:
+        data = json.loads(value)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise EnvelopeError(f"не JSON: {e}") from None
+    if isinstance(data, dict) and 'type' not in data and 'items' not in data:
+        return None, [data]
+    return decode_envelope(data)
+
+
+class EnvelopePacker:
+    """
+    Сборка конвертов по size транзакций отдельно для каждой партиции
+
+    partition_of(key) должна совпадать с разбиением продюсера по ключу,
+    иначе транзакции портфеля окажутся в разных партициях.
+    """
+
+    def __init__(self, size, partition_of):
+        self.size = size
+        self.partition_of = partition_of
+        self.pending = {}
+
+    def add(self, message, key):
+        """Добавить транзакцию; вернуть (партиция, конверт), если конверт заполнен, иначе None"""
+        partition = self.partition_of(key)
+        items = self.pending.setdefault(partition, [])
+        items.append(message)
+        if len(items) < self.size:
+            return None
+        del self.pending[partition]
+        return partition, make_envelope(items)
+
+    def flush(self):
+        """Неполные конверты по всем партициям: [(партиция, конверт)]"""
+        envelopes = [(partition, make_envelope(items)) for partition, items in sorted(self.pending.items())]
+        self.pending.clear()
+        return envelopes
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сравнение форматов значения записи: JSON (текущий json.dumps) и Avro по схеме
+
+На одних и тех же сообщениях для каждого формата из --formats измеряет:
+    - размер значения (байт на сообщение) и размер после сжатия пачками по
+      --batch-records записей (zlib, как compression_type='gzip' продюсера);
+    - скорость кодирования и разбора (лучший из --rounds проходов) и
+      совпадение разобранного сообщения с исходным;
+    - без --no-broker - пропускную способность брокера: отправка заранее
+      закодированных значений с acks=all и чтение их обратно с разбором.
+
+Сообщения - из --input (JSONL поток, например stream.jsonl) или
+сгенерированные с разными типами, количествами, ценами и временем.
+Avro - transaction_codec.AvroCodec (schemas/transaction_message.avsc).
+Скорость кодирования и разбора в Python определяется json (C) и fastavro и
+не переносится на .NET consumer напрямую; размер и пропускная способность
+брокера от языка не зависят.
+
+Использование:
+    python scripts/wire_format_benchmark.py --no-broker --count 100000
+    python scripts/wire_format_benchmark.py --input stream.jsonl --count 200000 --report wire.json
+    python scripts/wire_format_benchmark.py --compression-type lz4
+
+Требует: fastavro; без --no-broker - kafka-python
+"""
+
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+from datetime import datetime, timezone, timedelta
+
+from tool_profiling import stage, add_profiling_arguments, run_profiled
+from send_test_kafka_message import create_test_transaction_message, read_replay_messages
+from transaction_codec import make_codec, CodecError, FORMATS
+from kafka_common import DEFAULT_BOOTSTRAP, DEFAULT_TOPIC, import_kafka, topic_partitions, produce
+
+# kafka-python и fastavro импортируются при запуске
+
+DEFAULT_BENCHMARK_TOPIC = 'portfolio.transactions.wire-format'
+DEFAULT_COUNT = 100000
+DEFAULT_ROUNDS = 3
+# Записей в пачке продюсера для оценки сжатия (batch.size 16 КБ - порядка сотни записей JSON)
+DEFAULT_BATCH_RECORDS = 100
+DEFAULT_IDLE_TIMEOUT = 30
+METADATA_SHARE = 0.1
+
+
+def build_messages(count, seed):
+    """Сообщения с разными полями: размер varint и decimal зависит от значений"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for _ in range(count):
+        message, key = create_test_transaction_message(rng)
+        quantity = rng.randint(1, 1000)
+        price = round(rng.uniform(1, 5000), 2)
+        message.update({
+            'assetType': rng.choice([1, 2, 3]),
+            'transactionType': rng.choice([1, 2]),
+            'quantity': quantity,
+            'pricePerUnit': price,
+            'totalAmount': round(quantity * price, 2),
+            'transactionTime': (start + timedelta(seconds=rng.randrange(365 * 86400))).isoformat(),
+            'metadata': 'Продажа части позиции' if rng.random() < METADATA_SHARE else None,
+        })
+        messages.append((message, key))
+    return messages
+
+
+def load_messages(args):
+    if args.input:
+        return list(read_replay_messages(args.input, args.count))
+    return build_messages(args.count, args.seed)
+
+
+def best_time(function, rounds):
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def compressed_size(values, batch_records):
+    """Байт после сжатия пачками по batch_records значений"""
+    return sum(len(zlib.compress(b''.join(values[start:start + batch_records])))
+               for start in range(0, len(values), batch_records))
+
+
+def measure_codec(codec, messages, args):
+    """Размер, скорость кодирования и разбора, совпадение после разбора"""
+    plain = [message for message, _ in messages]
+    with stage(f'encode-{codec.name}'):
+        encode_seconds, values = best_time(lambda: [codec.encode(message) for message in plain], args.rounds)
+    with stage(f'decode-{codec.name}'):
+        decode_seconds, decoded = best_time(lambda: [codec.decode(value) for value in values], args.rounds)
+    with stage('compress'):
+        compressed = compressed_size(values, args.batch_records)
+    count = len(values)
+    sizes = [len(value) for value in values]
+    return values, {
+        'format': codec.name,
+        'messages': count,
+        'bytes_per_message': sum(sizes) / count,
+        'min_bytes': min(sizes),
+        'max_bytes': max(sizes),
+        'compressed_bytes_per_message': compressed / count,
+        'encode_us': encode_seconds * 1e6 / count,
+        'decode_us': decode_seconds * 1e6 / count,
+        'encode_per_s': count / encode_seconds,
+        'decode_per_s': count / decode_seconds,
+        'mismatches': sum(1 for original, result in zip(plain, decoded) if result != original),
+    }
+
+
+def read_back(args, kafka, codec, ranges):
+    """Прочитать диапазоны offset'ов с разбором значений: (секунд, записей, ошибок разбора)"""
+    consumer = kafka.KafkaConsumer(bootstrap_servers=args.bootstrap_server, group_id=None,
+                                   enable_auto_commit=False)
+    records = errors = 0
+    try:
+        partitions = [tp for tp, (start, stop) in ranges.items() if stop > start]
+        consumer.assign(partitions)
+        for tp in partitions:
+            consumer.seek(tp, ranges[tp][0])
+        pending = set(partitions)
+        started = time.perf_counter()
+        last_data = time.monotonic()
+        while pending:
+            with stage('poll'):
+                batches = consumer.poll(timeout_ms=1000)
+            if not batches:
+                if time.monotonic() - last_data > args.idle_timeout:
+                    print(f"  ⚠ Нет записей {args.idle_timeout} с, чтение оборвано")
+                    errors += 1
+                    break
+                continue
+            last_data = time.monotonic()
+            with stage('decode'):
+                for tp, tp_records in batches.items():
+                    for record in tp_records:
+                        if record.offset >= ranges[tp][1]:
+                            continue
+                        records += 1
+                        try:
+                            codec.decode(record.value)
+                        except CodecError:
+                            errors += 1
+            for tp in list(pending):
+                if consumer.position(tp) >= ranges[tp][1]:
+                    pending.discard(tp)
+        seconds = time.perf_counter() - started
+    finally:
+        consumer.close()
+    return seconds, records, errors
+
+
+def measure_broker(args, kafka, producer, offsets, codec, messages, values):
+    """Отправка закодированных значений и чтение их обратно"""
+    records = [(None, key.encode('utf-8'), value) for (_, key), value in zip(messages, values)]
+    partitions = topic_partitions(kafka, offsets, args.topic)
+    start = offsets.end_offsets(partitions)
+    produce_seconds, produce_errors = produce(producer, args.topic, records)
+    stop = offsets.end_offsets(partitions)
+    total_bytes = sum(len(value) for value in values)
+    result = {
+        'produce_per_s': len(records) / produce_seconds if produce_seconds else 0.0,
+        'produce_mb_per_s': total_bytes / produce_seconds / 1e6 if produce_seconds else 0.0,
+        'produce_errors': produce_errors,
+    }
+    seconds, consumed, errors = read_back(args, kafka, codec, {tp: (start[tp], stop[tp]) for tp in partitions})
+    result.update({
+        'consume_per_s': consumed / seconds if seconds else 0.0,
+        'consumed': consumed,
+        'consume_errors': errors,
+    })
+    return result
+
+
+def print_report(results, args):
+    broker = not args.no_broker
+    print()
+    print("=" * 100)
+    print(f"Форматы значения: {results[0]['messages']} сообщений, сжатие пачками по {args.batch_records}")
+    print("=" * 100)
+    header = (f"  {'формат':<7} {'байт':>7} {'сжато':>7} {'кодир. мкс':>11} {'разбор мкс':>11} "
+              f"{'кодир./с':>10} {'разбор/с':>10}")
+    if broker:
+        header += f" {'отправка/с':>11} {'МБ/с':>6} {'чтение/с':>10}"
+    print(header)
+    for result in results:
+        line = (f"  {result['format']:<7} {result['bytes_per_message']:>7.1f} "
+                f"{result['compressed_bytes_per_message']:>7.1f} {result['encode_us']:>11.2f} "
+                f"{result['decode_us']:>11.2f} {result['encode_per_s']:>10,.0f} {result['decode_per_s']:>10,.0f}")
+        if broker:
+            line += (f" {result['produce_per_s']:>11,.0f} {result['produce_mb_per_s']:>6.1f} "
+                     f"{result['consume_per_s']:>10,.0f}")
+        print(line)
+    print("=" * 100)
+    baseline = results[0]
+    for result in results[1:]:
+        line = (f"  {result['format']} к {baseline['format']}: размер "
+                f"{result['bytes_per_message'] / baseline['bytes_per_message']:.2f}x, сжатый "
+                f"{result['compressed_bytes_per_message'] / baseline['compressed_bytes_per_message']:.2f}x, "
+                f"кодирование {baseline['encode_us'] / result['encode_us']:.2f}x, "
+                f"разбор {baseline['decode_us'] / result['decode_us']:.2f}x")
+        if broker and baseline['consume_per_s']:
+            line += (f", отправка {result['produce_per_s'] / baseline['produce_per_s']:.2f}x, "
+                     f"чтение {result['consume_per_s'] / baseline['consume_per_s']:.2f}x")
+        print(line + " (скорость: больше 1 - быстрее)")
+    for result in results:
+        problems = []
+        if result['mismatches']:
+            problems.append(f"после разбора отличаются {result['mismatches']} сообщений")
+        if result.get('produce_errors'):
+            problems.append(f"ошибок отправки {result['produce_errors']}")
+        if result.get('consume_errors'):
+            problems.append(f"ошибок чтения {result['consume_errors']}")
+        if broker and result.get('consumed') != result['messages']:
+            problems.append(f"прочитано {result.get('consumed')} из {result['messages']}")
+        if problems:
+            print(f"  ✗ {result['format']}: {', '.join(problems)}")
+    return any(result['mismatches'] or result.get('produce_errors') or result.get('consume_errors')
+               or (broker and result.get('consumed') != result['messages']) for result in results)
+
+
+def parse_formats(text):
+    formats = [value.strip() for value in text.split(',') if value.strip()]
+    unknown = [value for value in formats if value not in FORMATS]
+    if not formats or unknown:
+        raise ValueError(f"Неизвестные форматы: {', '.join(unknown) or text} (доступны: {', '.join(FORMATS)})")
+    return formats
+
+
+def run(args):
+    formats = parse_formats(args.formats)
+    codecs = [make_codec(name) for name in formats]
+    kafka = None if args.no_broker else import_kafka()
+
+    print("=" * 60)
+    print("Сравнение форматов значения записи")
+    print("=" * 60)
+    print(f"Форматы: {', '.join(formats)}, сообщений: {args.count}"
+          f"{f', из {args.input}' if args.input else ''}")
+    if kafka:
+        print(f"Bootstrap Server: {args.bootstrap_server}, топик: {args.topic}, "
+              f"сжатие продюсера: {args.compression_type or 'нет'}")
+    print()
+
+    with stage('generate'):
+        messages = load_messages(args)
+    if not messages:
+        raise ValueError("нет сообщений для замера")
+
+    producer = offsets = None
+    if kafka:
+        with stage('connect'):
+            producer = kafka.KafkaProducer(bootstrap_servers=args.bootstrap_server, acks='all',
+                                           compression_type=args.compression_type)
+            offsets = kafka.KafkaConsumer(bootstrap_servers=args.bootstrap_server, group_id=None)
+    results = []
+    try:
+        for codec in codecs:
+            print(f"Формат {codec.name}...", flush=True)
+            values, result = measure_codec(codec, messages, args)
+            if kafka:
+                result.update(measure_broker(args, kafka, producer, offsets, codec, messages, values))
+            results.append(result)
+    finally:
+        if producer is not None:
+            producer.close()
+            offsets.close()
+
+    failed = print_report(results, args)
+    if args.report:
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'params': {'count': len(messages), 'input': args.input, 'seed': args.seed, 'rounds': args.rounds,
+                       'batch_records': args.batch_records, 'broker': not args.no_broker,
+                       'topic': args.topic, 'compression_type': args.compression_type},
+            'formats': results,
+        }
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nОтчет сохранен: {args.report}")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Сравнение JSON и Avro для значений portfolio.transactions: размер, скорость, брокер'
+    )
+    parser.add_argument('--formats', default=','.join(FORMATS),
+                        help=f'Форматы через запятую, первый - база сравнения (по умолчанию: {",".join(FORMATS)})')
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT,
+                        help=f'Сообщений (по умолчанию: {DEFAULT_COUNT}, с --input - не больше файла)')
+    parser.add_argument('--input', metavar='FILE', help='Сообщения из JSONL потока вместо генерации')
+    parser.add_argument('--seed', type=int, default=1, help='Seed генерации (по умолчанию: 1)')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help=f'Проходов кодирования и разбора, берется лучший (по умолчанию: {DEFAULT_ROUNDS})')
+    parser.add_argument('--batch-records', type=int, default=DEFAULT_BATCH_RECORDS,
+                        help=f'Записей в пачке для оценки сжатия (по умолчанию: {DEFAULT_BATCH_RECORDS})')
+    parser.add_argument('--no-broker', action='store_true', help='Без Kafka: только размер и скорость кодеков')
+    parser.add_argument('--bootstrap-server', default=DEFAULT_BOOTSTRAP,
+                        help=f'Адрес Kafka брокера (по умолчанию: {DEFAULT_BOOTSTRAP})')
+    parser.add_argument('--topic', default=DEFAULT_BENCHMARK_TOPIC,
+                        help=f'Топик для замера брокера (по умолчанию: {DEFAULT_BENCHMARK_TOPIC})')
+    parser.add_argument('--compression-type', choices=['gzip', 'snappy', 'lz4', 'zstd'],
+                        help='Сжатие продюсера при замере брокера (по умолчанию: без сжатия)')
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help=f'Сколько ждать записей при чтении, с (по умолчанию: {DEFAULT_IDLE_TIMEOUT})')
+    parser.add_argument('--report', metavar='FILE', help='Сохранить результаты в JSON')
+    add_profiling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.count <= 0 or args.rounds <= 0 or args.batch_records <= 0:
+        print("Ошибка: --count, --rounds и --batch-records должны быть положительными")
+        return 1
+    if args.topic == DEFAULT_TOPIC and not args.no_broker:
+        print(f"Ошибка: AnalyticsService читает только JSON, используйте отдельный топик, а не {DEFAULT_TOPIC}")
+        return 1
+    try:
+        return run_profiled(args, run, args)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())